@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Aplica en orden las migraciones SQL de migrations/ que aún no se aplicaron
+(registradas en la tabla schema_migrations). Cada archivo corre en su propia transacción.
+
+Uso:
+    python aplicar_migraciones.py [--dry-run]
+"""
+import os
+import sys
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+
+# Agregar path
+sys.path.append('.')
+
+# Cargar variables
+load_dotenv()
+
+from app.core.config import POSTGRES_HOST, POSTGRES_PORT, POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def pending_migrations(applied: set) -> list:
+    files = sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+    return [name for name in files if name not in applied]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones de PostgreSQL")
+    parser.add_argument("--dry-run", action="store_true", help="solo lista las migraciones pendientes")
+    args = parser.parse_args()
+
+    print("🐘 MIGRACIONES POSTGRESQL")
+    print("=" * 40)
+    # Conexión propia (sin el statement_timeout del pool: crear índices puede tardar)
+    conn = psycopg2.connect(host=POSTGRES_HOST, port=POSTGRES_PORT, dbname=POSTGRES_DB,
+                            user=POSTGRES_USER, password=POSTGRES_PASSWORD)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    name TEXT PRIMARY KEY,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )""")
+            cursor.execute("SELECT name FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+
+        pending = pending_migrations(applied)
+        if not pending:
+            print("✅ No hay migraciones pendientes")
+            return
+
+        for name in pending:
+            if args.dry_run:
+                print(f"⏳ Pendiente: {name}")
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as sql_file:
+                sql = sql_file.read()
+            with conn, conn.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+            print(f"✅ Aplicada: {name}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from app.models.ChatMessage import UserMessage, ChatResponse
-from app.services.chatbot_engine import proccess_chat_turn
+from app.services.chatbot_engine import aprocess_chat_turn
+from app.core.bulkheads import BulkheadRejected, BulkheadTimeout
 #from app.utils.intention_detection import tiene_intencion_busqueda
 #from app.services.embeddings.search_opensearch import search_similar_properties
 
@@ -42,7 +43,7 @@ async def chat_endpoint(payload: UserMessage):
         #         return ChatResponse(output="No encontramos propiedades que coincidan. ¿Querés intentar con otra búsqueda?")
 
         # 2️⃣ Flujo normal del chatbot
-        stage, response_data = proccess_chat_turn(
+        stage, response_data = await aprocess_chat_turn(
             user_id=user_id,
             conv_id=conv_id,
             user_name=user_name,
@@ -51,18 +52,21 @@ async def chat_endpoint(payload: UserMessage):
             verbose=verbose
         )
 
-        # Formatear la respuesta final para el usuario
-        final_response = response_data
-        if isinstance(response_data, dict) and response_data.get("model_response"):
-            # Caso 1: La respuesta es un texto del modelo (ej. saludo inicial)
-            final_response = response_data.get("model_response")
-        elif isinstance(response_data, list) and len(response_data) > 0:
-            # Caso 2: La respuesta es una lista de propiedades recomendadas
-            property_count = len(response_data)
-            final_response = f"¡Excelente! He encontrado {property_count} propiedades que podrían interesarte. ¿Te gustaría que te las muestre?"
-
-        return ChatResponse(stage=stage, response=final_response)
+        return ChatResponse(stage=stage, response=format_chat_response(response_data))
 
+    except (BulkheadRejected, BulkheadTimeout) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def format_chat_response(response_data):
+    """Formatea la respuesta final para el usuario"""
+    if isinstance(response_data, dict) and response_data.get("model_response"):
+        # Caso 1: La respuesta es un texto del modelo (ej. saludo inicial)
+        return response_data.get("model_response")
+    if isinstance(response_data, list) and len(response_data) > 0:
+        # Caso 2: La respuesta es una lista de propiedades recomendadas
+        property_count = len(response_data)
+        return f"¡Excelente! He encontrado {property_count} propiedades que podrían interesarte. ¿Te gustaría que te las muestre?"
+    return response_data
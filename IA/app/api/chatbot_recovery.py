@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from app.models.ChatMessage import ChatHistoryRequest, ChatHistoryResponse
-from app.services.dynamodb_queries import get_latests_messages, format_messages
+from app.services.dynamodb_queries import format_messages
+from app.services.storage.factory import get_chat_storage
+from app.core.bulkheads import BulkheadRejected, BulkheadTimeout
 
 router = APIRouter()
 
@@ -8,15 +10,21 @@ router = APIRouter()
 async def chat_history_request(payload: ChatHistoryRequest):
     """
     Recupera los últimos mensajes de una conversación por usuario y conversación.
+
+    Paginado: si la respuesta trae `next_cursor`, enviarlo como `cursor` para obtener
+    los mensajes anteriores. `reverse=True` retorna cada página del más reciente al más antiguo.
     """
     try:
         primary_key = "USER#" + payload.user_id + "#CONV#" + payload.conv_id
-        raw_conversation = get_latests_messages(primary_key, payload.limit, )
-        formatted_conversation = format_messages(raw_conversation, payload.verbose)
+        page = await get_chat_storage().ahistory_page(primary_key, payload.limit, cursor=payload.cursor,
+                                                     newest_first=payload.reverse, include_metadata=payload.verbose)
+        formatted_conversation = format_messages(page, payload.verbose)
 
-        if payload.reverse == True:
-            return ChatHistoryResponse(history=formatted_conversation[::-1])
-        return ChatHistoryResponse(history=formatted_conversation)
+        return ChatHistoryResponse(history=formatted_conversation, next_cursor=page['next_cursor'])
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (BulkheadRejected, BulkheadTimeout) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al recuperar historial: {str(e)}")
@@ -0,0 +1,68 @@
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from app.models.ChatMessage import UserMessage
+from app.services.streaming import astream_chat_turn
+from app.api.chatbot_endpoint import format_chat_response
+
+router = APIRouter()
+
+
+async def chat_events(payload: UserMessage):
+    """Eventos del turno; en "done" la respuesta va formateada igual que en /chat."""
+    yield {"event": "start", "data": {"conv_id": payload.conv_id}}
+    async for item in astream_chat_turn(
+        user_id=payload.user_id,
+        conv_id=payload.conv_id,
+        message=payload.message,
+        user_name=payload.user_name,
+        metadata=payload.metadata
+    ):
+        if item["event"] == "done":
+            item = {"event": "done", "data": {
+                "stage": item["data"]["stage"],
+                "response": format_chat_response(item["data"]["response"])
+            }}
+        yield item
+
+
+def to_sse(item: dict) -> str:
+    return f"event: {item['event']}\ndata: {json.dumps(item['data'], ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(payload: UserMessage):
+    """
+    Igual que /chat, pero como Server-Sent Events: los tokens del modelo se envían a medida
+    que Bedrock los genera (evento "token") y al final llega la respuesta completa ("done"),
+    ya guardada en el historial.
+    """
+    async def body():
+        async for item in chat_events(payload):
+            yield to_sse(item)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/chat/ws")
+async def chat_websocket_endpoint(websocket: WebSocket):
+    """
+    WebSocket del chat: cada mensaje JSON (mismos campos que /chat) recibe los eventos
+    {"event": "start" | "token" | "done" | "error", "data": ...} de su turno.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            raw = await websocket.receive_json()
+            try:
+                payload = UserMessage(**raw)
+            except ValidationError as e:
+                await websocket.send_json({"event": "error", "data": e.errors(include_context=False)})
+                continue
+
+            async for item in chat_events(payload):
+                await websocket.send_json(json.loads(json.dumps(item, default=str)))
+    except WebSocketDisconnect:
+        pass
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from app.models.ChatMessage import ChatMessage, ChatResponse
-from app.services.chatbot_engine import proccess_chat_turn
-from app.services.dynamodb_queries import get_latests_messages, get_metadata
+from app.services.chatbot_engine import aprocess_chat_turn
+from app.services.storage.factory import get_chat_storage
+from app.core.bulkheads import BulkheadRejected, BulkheadTimeout
 
 router = APIRouter()
 
@@ -26,26 +27,23 @@ async def debug_chat_endpoint(payload: ChatMessage):
         primary_key = "USER#" + user_id + "#CONV#" + conv_id
 
         try:
-            latest_messages = get_latests_messages(primary_key, limit=5)
+            latest_messages = await get_chat_storage().alatest_messages(primary_key, limit=5)
             message_count = len(latest_messages.get('Items', []))
             print(f"DEBUG ENDPOINT - Messages in DB before processing: {message_count}")
 
-            if message_count > 0:
-                metadata_list = get_metadata(latest_messages)
-                if metadata_list:
-                    last_metadata = metadata_list[0]
-                    print(f"DEBUG ENDPOINT - Last stage: {last_metadata.get('stage')}")
-                    print(f"DEBUG ENDPOINT - Awaiting confirmation: {last_metadata.get('awaiting_confirmation')}")
-                    print(f"DEBUG ENDPOINT - Has recommendations: {'last_recommendations' in last_metadata}")
-
-                    if 'last_recommendations' in last_metadata:
-                        props = last_metadata.get('last_recommendations', [])
-                        print(f"DEBUG ENDPOINT - Properties count: {len(props) if props else 0}")
+            last_state = await get_chat_storage().aget_state(primary_key)
+            if last_state:
+                print(f"DEBUG ENDPOINT - Last stage: {last_state.get('stage')}")
+                print(f"DEBUG ENDPOINT - Awaiting confirmation: {last_state.get('awaiting_confirmation')}")
+                print(f"DEBUG ENDPOINT - Has recommendations: {'result_set' in last_state}")
+
+                if 'result_set' in last_state:
+                    print(f"DEBUG ENDPOINT - Properties count: {last_state['result_set'].get('count', 0)}")
         except Exception as e:
             print(f"DEBUG ENDPOINT - Error checking pre-state: {e}")
 
         # Procesar el mensaje
-        stage, response_data = proccess_chat_turn(
+        stage, response_data = await aprocess_chat_turn(
             user_id=user_id,
             conv_id=conv_id,
             user_name=user_name,
@@ -81,18 +79,18 @@ async def debug_chat_endpoint(payload: ChatMessage):
 
         # Verificar estado después del procesamiento
         try:
-            latest_messages_after = get_latests_messages(primary_key, limit=5)
+            latest_messages_after = await get_chat_storage().alatest_messages(primary_key, limit=5)
             message_count_after = len(latest_messages_after.get('Items', []))
             print(f"DEBUG ENDPOINT - Messages in DB after processing: {message_count_after}")
             debug_info["messages_after"] = message_count_after
 
-            if message_count_after > 0:
-                metadata_list_after = get_metadata(latest_messages_after)
-                if metadata_list_after:
-                    last_metadata_after = metadata_list_after[0]
-                    debug_info["final_stage"] = last_metadata_after.get('stage')
-                    debug_info["final_awaiting_confirmation"] = last_metadata_after.get('awaiting_confirmation')
-                    debug_info["final_has_recommendations"] = 'last_recommendations' in last_metadata_after
+            state_after = await get_chat_storage().aget_state(primary_key)
+            if state_after:
+                debug_info["final_stage"] = state_after.get('stage')
+                debug_info["final_awaiting_confirmation"] = state_after.get('awaiting_confirmation')
+                debug_info["final_has_recommendations"] = 'result_set' in state_after
+                if 'result_set' in state_after:
+                    debug_info["final_result_set_id"] = state_after['result_set'].get('id')
         except Exception as e:
             print(f"DEBUG ENDPOINT - Error checking post-state: {e}")
             debug_info["post_check_error"] = str(e)
@@ -103,6 +101,8 @@ async def debug_chat_endpoint(payload: ChatMessage):
             "debug": debug_info if verbose else None
         }
 
+    except (BulkheadRejected, BulkheadTimeout) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"DEBUG ENDPOINT - Error: {e}")
         import traceback
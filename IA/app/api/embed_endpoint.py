@@ -5,6 +5,7 @@ from fastapi import APIRouter
 from app.models.EmbedRequest import EmbedRequest, EmbedResponse
 from app.services.embeddings.bedrock_service import embed_text
 from fastapi import APIRouter, HTTPException
+from app.core.bulkheads import run_in_bulkhead, BulkheadRejected, BulkheadTimeout
 
 
 router = APIRouter()
@@ -13,10 +14,12 @@ router = APIRouter()
 async def chat_history_request(payload: EmbedRequest):
     try:
         input_message = payload.message
-        embed = embed_text(input_message)
+        embed = await run_in_bulkhead("bedrock", embed_text, input_message)
 
         return EmbedResponse(embed=embed)
-    
+
+    except (BulkheadRejected, BulkheadTimeout) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -4,6 +4,7 @@ from typing import Dict, Any
 import time
 import os
 from datetime import datetime
+from app.core.bulkheads import run_in_bulkhead
 
 router = APIRouter()
 
@@ -36,7 +37,7 @@ async def health_check():
         from app.core.aws_clients import get_dynamodb_client
         client = get_dynamodb_client()
         # Test simple: listar tablas
-        response = client.list_tables()
+        response = await run_in_bulkhead("dynamodb", client.list_tables)
         dynamo_time = (time.time() - dynamo_start) * 1000
 
         services["dynamodb"] = ServiceStatus(
@@ -58,7 +59,7 @@ async def health_check():
         from app.core.aws_clients import get_opensearch_client
         client = get_opensearch_client()
         # Test simple: cluster health
-        health = client.cluster.health()
+        health = await run_in_bulkhead("opensearch", client.cluster.health)
         opensearch_time = (time.time() - opensearch_start) * 1000
 
         services["opensearch"] = ServiceStatus(
@@ -83,7 +84,7 @@ async def health_check():
         from app.core.aws_clients import get_bedrock_client
         client = get_bedrock_client()
         # Test simple: listar modelos disponibles
-        models = client.list_foundation_models()
+        models = await run_in_bulkhead("bedrock", client.list_foundation_models)
         bedrock_time = (time.time() - bedrock_start) * 1000
 
         services["bedrock"] = ServiceStatus(
@@ -102,25 +103,20 @@ async def health_check():
     # Check PostgreSQL
     try:
         postgres_start = time.time()
-        import psycopg2
-        conn = psycopg2.connect(
-            host=os.getenv("POSTGRES_HOST"),
-            port=os.getenv("POSTGRES_PORT"),
-            user=os.getenv("POSTGRES_USER"),
-            password=os.getenv("POSTGRES_PASSWORD"),
-            database=os.getenv("POSTGRES_DB")
-        )
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM properties;")
-        count = cursor.fetchone()[0]
-        cursor.close()
-        conn.close()
+        from app.core.postgres_pool import get_postgres_cursor, postgres_pool_stats
+
+        def count_properties():
+            with get_postgres_cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM properties;")
+                return cursor.fetchone()[0]
+
+        count = await run_in_bulkhead("postgres", count_properties)
         postgres_time = (time.time() - postgres_start) * 1000
 
         services["postgresql"] = ServiceStatus(
             status="healthy",
             response_time_ms=postgres_time,
-            details={"properties_count": count}
+            details={"properties_count": count, "pool": postgres_pool_stats()}
         )
     except Exception as e:
         services["postgresql"] = ServiceStatus(
@@ -152,11 +148,22 @@ async def get_metrics():
     """
     Endpoint básico de métricas para monitoreo
     """
+    from app.core.postgres_pool import postgres_pool_stats, async_postgres_pool_stats
+    from app.services.write_behind import write_behind_stats
+    from app.core.bulkheads import bulkhead_stats
+    from app.services.search_cache import search_cache_stats
+    from app.graph.chat_graph import CHAT_GRAPH
     uptime = time.time() - start_time
 
     return {
         "uptime_seconds": uptime,
         "timestamp": datetime.utcnow().isoformat(),
         "environment": os.getenv("ENV", "unknown"),
-        "region": os.getenv("AWS_REGION", "unknown")
+        "region": os.getenv("AWS_REGION", "unknown"),
+        "postgres_pool": postgres_pool_stats(),
+        "postgres_async_pool": async_postgres_pool_stats(),
+        "write_behind": write_behind_stats(),
+        "bulkheads": bulkhead_stats(),
+        "search_cache": search_cache_stats(),
+        "stages": CHAT_GRAPH.stats()
     }
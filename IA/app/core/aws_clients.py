@@ -1,7 +1,35 @@
 # codigo para manejo de clientes de aws.
 import os
+import time
+import asyncio
+import inspect
+import logging
+import threading
+from datetime import datetime, timezone
 import boto3
-from app.core.config import AWS_REGION
+from botocore.config import Config
+from app.core.config import (
+    AWS_REGION,
+    AWS_MAX_POOL_CONNECTIONS,
+    AWS_TCP_KEEPALIVE,
+    AWS_RETRY_MODE,
+    AWS_MAX_ATTEMPTS,
+    AWS_CONNECT_TIMEOUT,
+    AWS_READ_TIMEOUT,
+    AWS_CLIENT_MAX_AGE_SECONDS,
+    DYNAMODB_ENDPOINT_URL,
+    S3_ENDPOINT_URL,
+)
+
+# Registro de clientes por proceso: {(servicio, region): (cliente, credenciales, creado_en)}
+_CLIENT_REGISTRY = {}
+_REGISTRY_LOCK = threading.Lock()
+
+# Endpoints alternativos por servicio (stand-ins locales para desarrollo y pruebas)
+_ENDPOINT_URLS = {"dynamodb": DYNAMODB_ENDPOINT_URL, "s3": S3_ENDPOINT_URL}
+
+# Margen antes de la expiración de credenciales temporales para recrear el cliente
+_CREDENTIALS_REFRESH_MARGIN_SECONDS = 300
 
 
 def get_boto3_session():
@@ -13,60 +41,390 @@ def get_boto3_session():
     return boto3.Session()
 
 
+def get_client_config() -> Config:
+    """Configuración compartida de botocore: pool de conexiones, keep-alive y reintentos adaptativos."""
+    return Config(
+        region_name=AWS_REGION,
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=AWS_TCP_KEEPALIVE,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        retries={"mode": AWS_RETRY_MODE, "max_attempts": AWS_MAX_ATTEMPTS},
+    )
+
+
+def get_client(service_name: str, region_name: str = AWS_REGION):
+    """Retorna un cliente boto3 único por proceso para el servicio indicado.
+
+    El cliente se crea una sola vez (thread-safe) y se reutiliza entre requests.
+    Se recrea cuando las credenciales están por expirar o supera AWS_CLIENT_MAX_AGE_SECONDS.
+    """
+    key = (service_name, region_name)
+    entry = _CLIENT_REGISTRY.get(key)
+    if entry is not None and not _is_stale(entry):
+        return entry[0]
+
+    with _REGISTRY_LOCK:
+        # Otro hilo pudo haber creado el cliente mientras esperábamos el lock
+        entry = _CLIENT_REGISTRY.get(key)
+        if entry is not None and not _is_stale(entry):
+            return entry[0]
+
+        session = get_boto3_session()
+        client = session.client(service_name, region_name=region_name, config=get_client_config(),
+                                endpoint_url=_ENDPOINT_URLS.get(service_name))
+        credentials = session.get_credentials()
+        _CLIENT_REGISTRY[key] = (client, credentials, time.monotonic())
+        if entry is not None:
+            logging.info(f"Cliente AWS '{service_name}' recreado (credenciales o antigüedad)")
+        return client
+
+
+def reset_aws_clients(service_name: str = None):
+    """Invalida los clientes registrados (todos o los de un servicio) para forzar su recreación."""
+    with _REGISTRY_LOCK:
+        for key in list(_CLIENT_REGISTRY):
+            if service_name is None or key[0] == service_name:
+                del _CLIENT_REGISTRY[key]
+
+
+def _is_stale(entry) -> bool:
+    """Determina si un cliente registrado debe recrearse."""
+    _, credentials, created_at = entry
+
+    if AWS_CLIENT_MAX_AGE_SECONDS and time.monotonic() - created_at > AWS_CLIENT_MAX_AGE_SECONDS:
+        return True
+
+    # Credenciales temporales: botocore las refresca solo si son "refreshable";
+    # para credenciales estáticas con expiración (ej. SSO exportado) recreamos el cliente.
+    expiry_time = getattr(credentials, "_expiry_time", None)
+    refresh_using = getattr(credentials, "_refresh_using", None)
+    if expiry_time is not None and refresh_using is None:
+        remaining = (expiry_time - datetime.now(timezone.utc)).total_seconds()
+        return remaining < _CREDENTIALS_REFRESH_MARGIN_SECONDS
+
+    return False
+
 
 def get_embed_client():
-    session = get_boto3_session()
-    return session.client("bedrock-runtime", region_name=AWS_REGION)
+    return get_client("bedrock-runtime")
 
 def get_dynamodb_client():
-    session = get_boto3_session()
-    return session.client("dynamodb", region_name=AWS_REGION)
+    return get_client("dynamodb")
 
 def get_bedrock_client():
-    session = get_boto3_session()
-    return session.client("bedrock-runtime", region_name=AWS_REGION)
+    return get_client("bedrock-runtime")
 
 def get_s3_client():
-    session = get_boto3_session()
-    return session.client("s3", region_name=AWS_REGION)
+    return get_client("s3")
+
+_OPENSEARCH_CLIENT = None
+
 
 def get_opensearch_client():
-    from opensearchpy import OpenSearch, RequestsHttpConnection
-    from requests.auth import HTTPBasicAuth
-    from app.core.config import OPENSEARCH_USER
-    from app.core.config import OPENSEARCH_PASSWORD
-    from app.core.config import OPENSEARCH_HOST
-
-    auth = HTTPBasicAuth(OPENSEARCH_USER, OPENSEARCH_PASSWORD)
-
-    client = OpenSearch(
-        hosts=OPENSEARCH_HOST,
-        http_auth=auth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection
-    )
-    return client
+    """Cliente OpenSearch único por proceso, con pool urllib3 persistente (keep-alive).
+
+    Sniffing desactivado y compresión HTTP activada. El tamaño del pool y los timeouts
+    se configuran con OPENSEARCH_POOL_MAXSIZE / OPENSEARCH_TIMEOUT / OPENSEARCH_MAX_RETRIES.
+    """
+    global _OPENSEARCH_CLIENT
+    if _OPENSEARCH_CLIENT is not None:
+        return _OPENSEARCH_CLIENT
+
+    with _REGISTRY_LOCK:
+        if _OPENSEARCH_CLIENT is None:
+            from opensearchpy import OpenSearch, Urllib3HttpConnection
+            from app.core.config import (
+                OPENSEARCH_USER,
+                OPENSEARCH_PASSWORD,
+                OPENSEARCH_HOST,
+                OPENSEARCH_PORT,
+                OPENSEARCH_POOL_MAXSIZE,
+                OPENSEARCH_TIMEOUT,
+                OPENSEARCH_MAX_RETRIES,
+                OPENSEARCH_HTTP_COMPRESS,
+            )
+
+            # OPENSEARCH_HOST puede venir como URL completa o solo como hostname
+            if OPENSEARCH_HOST and "://" in OPENSEARCH_HOST:
+                hosts = [OPENSEARCH_HOST]
+            else:
+                hosts = [{"host": OPENSEARCH_HOST, "port": OPENSEARCH_PORT}]
+
+            _OPENSEARCH_CLIENT = OpenSearch(
+                hosts=hosts,
+                http_auth=(OPENSEARCH_USER, OPENSEARCH_PASSWORD) if OPENSEARCH_USER else None,
+                use_ssl=True,
+                verify_certs=True,
+                connection_class=Urllib3HttpConnection,
+                pool_maxsize=OPENSEARCH_POOL_MAXSIZE,
+                timeout=OPENSEARCH_TIMEOUT,
+                max_retries=OPENSEARCH_MAX_RETRIES,
+                retry_on_timeout=True,
+                http_compress=OPENSEARCH_HTTP_COMPRESS,
+                sniff_on_start=False,
+                sniff_on_connection_fail=False,
+                sniffer_timeout=None,
+            )
+    return _OPENSEARCH_CLIENT
+
+
+def reset_opensearch_client():
+    """Cierra y descarta el cliente OpenSearch compartido."""
+    global _OPENSEARCH_CLIENT
+    with _REGISTRY_LOCK:
+        if _OPENSEARCH_CLIENT is not None:
+            try:
+                _OPENSEARCH_CLIENT.close()
+            except Exception:
+                pass
+            _OPENSEARCH_CLIENT = None
+
+
+# Modelos LangChain memoizados: {(model_id, max_tokens, temperature, top_p): BulkheadChatBedrockConverse}
+_LLM_CACHE = {}
+_STRUCTURED_LLM_CACHE = {}
+_LLM_CACHE_CLIENT = None
 
 
 def get_langchain_bedrock_client(model_id, max_tokens: int = 250, temperature: float = 0.6, top_p: float =0.6):
-    """Sets up langchain bedrock client"""
-    from langchain_aws.chat_models.bedrock_converse import ChatBedrockConverse
+    """Sets up langchain bedrock client
 
+    Los modelos se memoizan por (model_id, max_tokens, temperature, top_p) y comparten el
+    cliente bedrock-runtime del registro; si ese cliente se recrea, el cache se descarta."""
+    key = (model_id, max_tokens, temperature, top_p)
+    with _REGISTRY_LOCK:
+        chat = _LLM_CACHE.get(key)
     client = get_bedrock_client()
+    if chat is not None and client is _LLM_CACHE_CLIENT:
+        return chat
 
     #client config
-    chat = ChatBedrockConverse(
+    chat = _bulkhead_chat_model_class()(
         client=client,
         model=model_id,
         max_tokens=max_tokens,
         temperature=temperature,
         top_p=top_p
         )
+
+    with _REGISTRY_LOCK:
+        _sync_llm_cache_client(client)
+        chat = _LLM_CACHE.setdefault(key, chat)
     return chat
 
 
+_BULKHEAD_CHAT_MODEL = None
+
+
+def _bulkhead_chat_model_class():
+    """ChatBedrockConverse cuyas versiones asyncio (ainvoke/astream) corren el cliente boto3
+    sync en el pool del bulkhead "bedrock" y no en el executor por defecto del loop."""
+    global _BULKHEAD_CHAT_MODEL
+    if _BULKHEAD_CHAT_MODEL is not None:
+        return _BULKHEAD_CHAT_MODEL
+
+    from langchain_aws.chat_models.bedrock_converse import ChatBedrockConverse
+
+    class BulkheadChatBedrockConverse(ChatBedrockConverse):
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            from app.core.bulkheads import run_in_bulkhead
+            return await run_in_bulkhead("bedrock", self._generate, messages, stop,
+                                         run_manager.get_sync() if run_manager else None, **kwargs)
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            # Igual que BaseChatModel._astream: cada chunk se lee con next() en el pool del bulkhead
+            from app.core.bulkheads import run_in_bulkhead
+            iterator = await run_in_bulkhead("bedrock", self._stream, messages, stop,
+                                             run_manager.get_sync() if run_manager else None, **kwargs)
+            done = object()
+            while True:
+                chunk = await run_in_bulkhead("bedrock", next, iterator, done)
+                if chunk is done:
+                    break
+                yield chunk
+
+    _BULKHEAD_CHAT_MODEL = BulkheadChatBedrockConverse
+    return _BULKHEAD_CHAT_MODEL
+
+
+def get_structured_llm(model_id, schema, include_raw: bool = False, max_tokens: int = 250,
+                       temperature: float = 0.6, top_p: float = 0.6):
+    """Runnable `with_structured_output(schema)` memoizado sobre el modelo cacheado."""
+    chat = get_langchain_bedrock_client(model_id, max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+    key = (model_id, max_tokens, temperature, top_p, schema, include_raw)
+    with _REGISTRY_LOCK:
+        structured = _STRUCTURED_LLM_CACHE.get(key)
+        if structured is not None and structured[0] is chat:
+            return structured[1]
 
+    runnable = chat.with_structured_output(schema, include_raw=include_raw)
+    with _REGISTRY_LOCK:
+        _STRUCTURED_LLM_CACHE[key] = (chat, runnable)
+    return runnable
 
 
+def _sync_llm_cache_client(client):
+    """Descarta los modelos memoizados si el cliente bedrock-runtime cambió (llamar con el lock tomado)."""
+    global _LLM_CACHE_CLIENT
+    if client is not _LLM_CACHE_CLIENT:
+        _LLM_CACHE.clear()
+        _STRUCTURED_LLM_CACHE.clear()
+        _LLM_CACHE_CLIENT = client
+
+
+### Clientes asyncio ###
+
+# Bulkhead de cada servicio AWS para las llamadas bloqueantes
+_SERVICE_BULKHEADS = {"dynamodb": "dynamodb", "bedrock-runtime": "bedrock"}
+
+
+class ThreadedAsyncClient:
+    """Adaptador `await client.metodo(**kwargs)` sobre un cliente boto3 sync.
+
+    Se usa cuando aiobotocore no está instalado: cada llamada corre en el bulkhead de su
+    dependencia (o en el pool por defecto del loop), sin bloquear el event loop. El cliente
+    sync se toma del registro en cada llamada, así se respeta su recreación por credenciales."""
+
+    def __init__(self, service_name: str, region_name: str = AWS_REGION):
+        self.service_name = service_name
+        self.region_name = region_name
+
+    def __getattr__(self, name):
+        async def _call(*args, **kwargs):
+            from app.core.bulkheads import run_in_bulkhead
+            method = getattr(get_client(self.service_name, self.region_name), name)
+            bulkhead = _SERVICE_BULKHEADS.get(self.service_name)
+            if bulkhead is None:
+                return await asyncio.to_thread(method, *args, **kwargs)
+            return await run_in_bulkhead(bulkhead, method, *args, **kwargs)
+        return _call
+
+
+class GuardedAsyncClient:
+    """Envuelve un cliente aiobotocore: cada llamada asíncrona ocupa un cupo del bulkhead
+    de su dependencia (`guard`), igual que las llamadas del ThreadedAsyncClient."""
+
+    def __init__(self, client, bulkhead: str):
+        self._client = client
+        self._bulkhead = bulkhead
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not inspect.iscoroutinefunction(attr):
+            # get_paginator, meta, exceptions... se usan tal cual
+            return attr
+
+        async def _call(*args, **kwargs):
+            from app.core.bulkheads import get_bulkhead
+            return await get_bulkhead(self._bulkhead).guard(attr(*args, **kwargs))
+        return _call
+
+
+_ASYNC_CLIENTS = {}
+_ASYNC_EXIT_STACK = None
+
+
+async def get_async_client(service_name: str, region_name: str = AWS_REGION):
+    """Cliente AWS asyncio único por proceso (aiobotocore si está disponible).
+
+    Debe usarse siempre desde el mismo event loop; se cierra con close_async_aws_clients()."""
+    global _ASYNC_EXIT_STACK
+    key = (service_name, region_name)
+    client = _ASYNC_CLIENTS.get(key)
+    if client is not None:
+        return client
+
+    try:
+        from aiobotocore.session import get_session
+        from aiobotocore.config import AioConfig
+    except ImportError:
+        client = ThreadedAsyncClient(service_name, region_name)
+        return _ASYNC_CLIENTS.setdefault(key, client)
+
+    from contextlib import AsyncExitStack
+
+    session = get_session()
+    if os.getenv("ENV", "local") == "local":
+        from app.core.config import LOCAL_PROFILE_NAME
+        session.set_config_variable("profile", LOCAL_PROFILE_NAME)
+    config = AioConfig(
+        region_name=region_name,
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=AWS_TCP_KEEPALIVE,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        retries={"mode": AWS_RETRY_MODE, "max_attempts": AWS_MAX_ATTEMPTS},
+    )
+    if _ASYNC_EXIT_STACK is None:
+        _ASYNC_EXIT_STACK = AsyncExitStack()
+    client = await _ASYNC_EXIT_STACK.enter_async_context(
+        session.create_client(service_name, region_name=region_name, config=config,
+                              endpoint_url=_ENDPOINT_URLS.get(service_name)))
+    bulkhead = _SERVICE_BULKHEADS.get(service_name)
+    if bulkhead is not None:
+        client = GuardedAsyncClient(client, bulkhead)
+    # Otra corrutina pudo crear el cliente mientras esperábamos
+    return _ASYNC_CLIENTS.setdefault(key, client)
+
+
+async def get_async_dynamodb_client():
+    return await get_async_client("dynamodb")
+
+
+async def get_async_s3_client():
+    return await get_async_client("s3")
+
+
+async def close_async_aws_clients():
+    """Cierra los clientes asyncio (shutdown de la app)."""
+    global _ASYNC_EXIT_STACK
+    _ASYNC_CLIENTS.clear()
+    if _ASYNC_EXIT_STACK is not None:
+        await _ASYNC_EXIT_STACK.aclose()
+        _ASYNC_EXIT_STACK = None
+
+
+_ASYNC_OPENSEARCH_CLIENT = None
+
+
+def get_async_opensearch_client():
+    """Cliente AsyncOpenSearch (aiohttp) único por proceso, con la misma configuración que el sync."""
+    global _ASYNC_OPENSEARCH_CLIENT
+    if _ASYNC_OPENSEARCH_CLIENT is None:
+        from opensearchpy import AsyncOpenSearch
+        from app.core.config import (
+            OPENSEARCH_USER,
+            OPENSEARCH_PASSWORD,
+            OPENSEARCH_HOST,
+            OPENSEARCH_PORT,
+            OPENSEARCH_POOL_MAXSIZE,
+            OPENSEARCH_TIMEOUT,
+            OPENSEARCH_MAX_RETRIES,
+            OPENSEARCH_HTTP_COMPRESS,
+        )
+
+        if OPENSEARCH_HOST and "://" in OPENSEARCH_HOST:
+            hosts = [OPENSEARCH_HOST]
+        else:
+            hosts = [{"host": OPENSEARCH_HOST, "port": OPENSEARCH_PORT}]
+
+        _ASYNC_OPENSEARCH_CLIENT = AsyncOpenSearch(
+            hosts=hosts,
+            http_auth=(OPENSEARCH_USER, OPENSEARCH_PASSWORD) if OPENSEARCH_USER else None,
+            use_ssl=True,
+            verify_certs=True,
+            maxsize=OPENSEARCH_POOL_MAXSIZE,
+            timeout=OPENSEARCH_TIMEOUT,
+            max_retries=OPENSEARCH_MAX_RETRIES,
+            retry_on_timeout=True,
+            http_compress=OPENSEARCH_HTTP_COMPRESS,
+        )
+    return _ASYNC_OPENSEARCH_CLIENT
+
 
+async def close_async_opensearch_client():
+    global _ASYNC_OPENSEARCH_CLIENT
+    if _ASYNC_OPENSEARCH_CLIENT is not None:
+        await _ASYNC_OPENSEARCH_CLIENT.close()
+        _ASYNC_OPENSEARCH_CLIENT = None
@@ -0,0 +1,197 @@
+# Bulkheads: un pool de hilos acotado por dependencia (DynamoDB, PostgreSQL, OpenSearch, Bedrock).
+import time
+import asyncio
+import logging
+import weakref
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import BULKHEAD_SETTINGS
+
+
+class BulkheadRejected(Exception):
+    """El bulkhead está lleno (trabajos en curso + cola) y rechaza la llamada."""
+
+
+class BulkheadTimeout(Exception):
+    """La llamada no terminó dentro del timeout del bulkhead."""
+
+
+class Bulkhead:
+    """Aísla las llamadas a una dependencia para que una lenta no agote a las demás.
+
+    - `run(func, ...)`: ejecuta una función bloqueante en el pool propio del bulkhead.
+    - `guard(coro)`: limita la concurrencia de una llamada ya asíncrona (mismo cupo y timeout).
+
+    Cada bulkhead tiene `max_workers` en paralelo, hasta `max_queue` llamadas esperando
+    (por encima se rechaza con BulkheadRejected) y un `timeout` por llamada (BulkheadTimeout).
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"bulkhead-{name}")
+        self._lock = threading.Lock()
+        # Se libera solo cuando el event loop deja de existir
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._metrics = {
+            "queued": 0,
+            "active": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "started": 0,
+        }
+
+    async def run(self, func, *args, **kwargs):
+        """Ejecuta `func(*args, **kwargs)` en el pool del bulkhead, conservando los contextvars."""
+        self._admit()
+        enqueued_at = time.monotonic()
+        context = contextvars.copy_context()
+
+        def _task():
+            self._started(enqueued_at)
+            try:
+                return context.run(func, *args, **kwargs)
+            finally:
+                self._finished()
+
+        try:
+            future = self._executor.submit(_task)
+        except Exception:
+            self._release_queued()
+            raise
+        # Si se cancela antes de empezar (timeout en cola), libera el cupo
+        future.add_done_callback(lambda f: f.cancelled() and self._release_queued())
+        return await self._await(asyncio.wrap_future(future))
+
+    async def guard(self, coro):
+        """Ejecuta una corrutina ocupando un cupo del bulkhead."""
+        try:
+            self._admit()
+        except BulkheadRejected:
+            coro.close()
+            raise
+        enqueued_at = time.monotonic()
+        semaphore = self._semaphore()
+        started = False
+
+        async def _task():
+            nonlocal started
+            async with semaphore:
+                started = True
+                self._started(enqueued_at)
+                try:
+                    return await coro
+                finally:
+                    self._finished()
+
+        try:
+            return await self._await(_task())
+        finally:
+            if not started:
+                # Cancelado (timeout) mientras esperaba cupo: nunca llegó a empezar
+                coro.close()
+                self._release_queued()
+
+    async def _await(self, awaitable):
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise BulkheadTimeout(f"Bulkhead '{self.name}': la llamada superó {self.timeout}s")
+        except (BulkheadRejected, BulkheadTimeout):
+            raise
+        except Exception:
+            with self._lock:
+                self._metrics["failed"] += 1
+            raise
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Un semáforo por event loop (los semáforos asyncio quedan ligados a su loop)
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores.setdefault(loop, asyncio.Semaphore(self.max_workers))
+        return semaphore
+
+    def _admit(self):
+        with self._lock:
+            if self._metrics["queued"] + self._metrics["active"] >= self.max_workers + self.max_queue:
+                self._metrics["rejected"] += 1
+                raise BulkheadRejected(f"Bulkhead '{self.name}' lleno ({self.max_workers} en curso + {self.max_queue} en cola)")
+            self._metrics["queued"] += 1
+
+    def _started(self, enqueued_at: float):
+        wait_ms = (time.monotonic() - enqueued_at) * 1000
+        with self._lock:
+            self._metrics["queued"] -= 1
+            self._metrics["active"] += 1
+            self._metrics["started"] += 1
+            self._metrics["wait_ms_total"] += wait_ms
+            self._metrics["wait_ms_max"] = max(self._metrics["wait_ms_max"], wait_ms)
+
+    def _finished(self):
+        with self._lock:
+            self._metrics["active"] -= 1
+            self._metrics["completed"] += 1
+
+    def _release_queued(self):
+        with self._lock:
+            self._metrics["queued"] -= 1
+
+    def stats(self) -> dict:
+        """Métricas del bulkhead: profundidad de cola, en curso y tiempos de espera."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        started = metrics.pop("started")
+        metrics["avg_wait_ms"] = metrics["wait_ms_total"] / started if started else 0.0
+        metrics["max_workers"] = self.max_workers
+        metrics["max_queue"] = self.max_queue
+        metrics["timeout"] = self.timeout
+        return metrics
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_BULKHEADS = {}
+_BULKHEADS_LOCK = threading.Lock()
+
+
+def get_bulkhead(name: str) -> Bulkhead:
+    """Bulkhead del proceso para una dependencia ("dynamodb", "postgres", "opensearch", "bedrock")."""
+    bulkhead = _BULKHEADS.get(name)
+    if bulkhead is not None:
+        return bulkhead
+
+    with _BULKHEADS_LOCK:
+        if name not in _BULKHEADS:
+            if name not in BULKHEAD_SETTINGS:
+                logging.warning(f"Bulkhead '{name}' sin configuración, se usan valores por defecto")
+            max_workers, max_queue, timeout = BULKHEAD_SETTINGS.get(name, (8, 32, 30.0))
+            _BULKHEADS[name] = Bulkhead(name, max_workers, max_queue, timeout)
+        return _BULKHEADS[name]
+
+
+async def run_in_bulkhead(name: str, func, *args, **kwargs):
+    """Atajo: `await run_in_bulkhead("postgres", funcion_bloqueante, ...)`."""
+    return await get_bulkhead(name).run(func, *args, **kwargs)
+
+
+def bulkhead_stats() -> dict:
+    return {name: bulkhead.stats() for name, bulkhead in _BULKHEADS.items()}
+
+
+def shutdown_bulkheads():
+    """Detiene los pools (shutdown de la app)."""
+    with _BULKHEADS_LOCK:
+        for bulkhead in _BULKHEADS.values():
+            bulkhead.shutdown()
+        _BULKHEADS.clear()
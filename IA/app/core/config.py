@@ -20,11 +20,108 @@ INTENT_DETECTION_MODEL = os.getenv("INTENT_DETECTION_MODEL", "amazon.nova-micro-
 SUMMARIZE_MODEL = os.getenv("INTENT_DETECTION_MODEL", "amazon.nova-micro-v1:0")
 BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "amazon.nova-micro-v1:0")
 DYNAMODB_TABLE = os.getenv("DYNAMODB_TABLE", "ChatMessages")
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "10"))  # mensajes enviados al LLM (par)
+CHAT_HISTORY_MAX_PAGE = int(os.getenv("CHAT_HISTORY_MAX_PAGE", "100"))  # tamaño máximo de página del endpoint de historial
+CHAT_SUMMARY_MAX_FOLD = int(os.getenv("CHAT_SUMMARY_MAX_FOLD", "40"))  # máx. mensajes a resumir por vez
+CHAT_WRITE_MODE = os.getenv("CHAT_WRITE_MODE", "transaction")  # "transaction" | "batch"
+CHAT_WRITE_MAX_RETRIES = int(os.getenv("CHAT_WRITE_MAX_RETRIES", "5"))
+CHAT_STATE_CONFLICT_RETRIES = int(os.getenv("CHAT_STATE_CONFLICT_RETRIES", "2"))  # relecturas del estado si otro turno lo cambió
+CHAT_STORAGE_BACKEND = os.getenv("CHAT_STORAGE_BACKEND", "dynamodb").lower()  # "dynamodb" | "memory" | "sqlite"
+CHAT_STORAGE_SQLITE_PATH = os.getenv("CHAT_STORAGE_SQLITE_PATH", "/tmp/chat_storage.db")
+CHAT_COMPRESSION = os.getenv("CHAT_COMPRESSION", "off").lower()  # "off" | "gzip" | "zstd" (content/metadata grandes)
+CHAT_COMPRESSION_MIN_BYTES = int(os.getenv("CHAT_COMPRESSION_MIN_BYTES", "2048"))
+
+# TTL y archivo frío de conversaciones (JSONL comprimido en un prefijo S3)
+CHAT_TTL_ATTRIBUTE = os.getenv("CHAT_TTL_ATTRIBUTE", "expires_at")  # atributo TTL configurado en la tabla
+CHAT_TTL_DAYS = float(os.getenv("CHAT_TTL_DAYS", "0"))  # 0 = los items no expiran
+CHAT_ARCHIVE_BUCKET = os.getenv("CHAT_ARCHIVE_BUCKET")  # sin bucket no se archiva ni se lee del archivo
+CHAT_ARCHIVE_PREFIX = os.getenv("CHAT_ARCHIVE_PREFIX", "chat-archive/")
+CHAT_ARCHIVE_LEAD_DAYS = float(os.getenv("CHAT_ARCHIVE_LEAD_DAYS", "7"))  # archivar lo que expira en estos días
+CHAT_ARCHIVE_SEGMENTS = int(os.getenv("CHAT_ARCHIVE_SEGMENTS", "4"))  # segmentos del scan paralelo
+CHAT_ARCHIVE_READ_THROUGH = os.getenv("CHAT_ARCHIVE_READ_THROUGH", "true").lower() == "true"
+
+# Write-behind: persistencia de turnos fuera del camino de la respuesta (cola local SQLite)
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_DB_PATH = os.getenv("WRITE_BEHIND_DB_PATH", "/tmp/chat_write_behind.db")
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "50"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "8"))
+WRITE_BEHIND_CLAIM_TIMEOUT = float(os.getenv("WRITE_BEHIND_CLAIM_TIMEOUT", "60"))  # turnos tomados por un worker caído
+WRITE_BEHIND_DRAIN_TIMEOUT = float(os.getenv("WRITE_BEHIND_DRAIN_TIMEOUT", "10"))
 
 LOCAL_PROFILE_NAME=os.getenv("LOCAL_PROFILE_NAME", "HousyProject")
 
 EMBED_MODEL_ID=os.getenv("EMBED_MODEL_ID", "amazon.titan-embed-text-v1")
 OPENSEARCH_INDEX = os.getenv("OPENSEARCH_INDEX", "properties")
-OPENSEARCH_USER= os.getenv("OPENSEARCH_USER")
+OPENSEARCH_USER= os.getenv("OPENSEARCH_USER", os.getenv("OPENSEARCH_USERNAME"))
 OPENSEARCH_PASSWORD= os.getenv("OPENSEARCH_PASSWORD")
 OPENSEARCH_HOST=os.getenv("OPENSEARCH_HOST")
+OPENSEARCH_PORT = int(os.getenv("OPENSEARCH_PORT", "443"))
+OPENSEARCH_POOL_MAXSIZE = int(os.getenv("OPENSEARCH_POOL_MAXSIZE", "20"))
+OPENSEARCH_TIMEOUT = float(os.getenv("OPENSEARCH_TIMEOUT", "30"))
+OPENSEARCH_MAX_RETRIES = int(os.getenv("OPENSEARCH_MAX_RETRIES", "2"))
+OPENSEARCH_HTTP_COMPRESS = os.getenv("OPENSEARCH_HTTP_COMPRESS", "true").lower() == "true"
+# Vecinos que trae el knn por búsqueda: cubre todas las páginas de "ver más" (search_after)
+OPENSEARCH_KNN_CANDIDATES = int(os.getenv("OPENSEARCH_KNN_CANDIDATES", "100"))
+
+# Pool de clientes AWS (boto3)
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+AWS_TCP_KEEPALIVE = os.getenv("AWS_TCP_KEEPALIVE", "true").lower() == "true"
+AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "adaptive")
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "5"))
+AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "60"))
+AWS_CLIENT_MAX_AGE_SECONDS = int(os.getenv("AWS_CLIENT_MAX_AGE_SECONDS", "0"))  # 0 = sin límite
+# Endpoints locales (DynamoDB Local, MinIO / LocalStack); vacíos = endpoints de AWS
+DYNAMODB_ENDPOINT_URL = os.getenv("DYNAMODB_ENDPOINT_URL") or None
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+
+# PostgreSQL (pool compartido). Se aceptan los nombres POSTGRESQL_DEV_* y POSTGRES_* usados en el proyecto.
+POSTGRES_HOST = os.getenv("POSTGRESQL_DEV_URL", os.getenv("POSTGRES_HOST"))
+POSTGRES_PORT = int(os.getenv("POSTGRES_PORT", "5432"))
+POSTGRES_DB = os.getenv("POSTGRESQL_DEV_DB", os.getenv("POSTGRES_DB"))
+POSTGRES_USER = os.getenv("POSTGRESQL_DEV_USER", os.getenv("POSTGRES_USER"))
+POSTGRES_PASSWORD = os.getenv("POSTGRESQL_DEV_PASSWORD", os.getenv("POSTGRES_PASSWORD"))
+POSTGRES_POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", "1"))
+POSTGRES_POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10"))
+POSTGRES_POOL_ACQUIRE_TIMEOUT = float(os.getenv("POSTGRES_POOL_ACQUIRE_TIMEOUT", "5"))
+POSTGRES_POOL_HEALTHCHECK_IDLE_SECONDS = float(os.getenv("POSTGRES_POOL_HEALTHCHECK_IDLE_SECONDS", "30"))
+POSTGRES_STATEMENT_TIMEOUT_MS = int(os.getenv("POSTGRES_STATEMENT_TIMEOUT_MS", "5000"))
+POSTGRES_CONNECT_TIMEOUT = int(os.getenv("POSTGRES_CONNECT_TIMEOUT", "5"))
+# Búsqueda de propiedades: "like" (sin índices) | "fulltext" (tsvector + pg_trgm) | "geo" (PostGIS,
+# si la ubicación no se resuelve usa fulltext). Los modos con índices requieren migrations/
+PROPERTY_SEARCH_MODE = os.getenv("PROPERTY_SEARCH_MODE", "like").lower()
+PROPERTY_PAGE_SIZE = int(os.getenv("PROPERTY_PAGE_SIZE", "10"))  # propiedades por página ("ver más")
+PROPERTY_BUDGET_TOLERANCE = float(os.getenv("PROPERTY_BUDGET_TOLERANCE", "0.1"))  # precio <= presupuesto * (1 + tolerancia)
+PROPERTY_GEO_RADIUS_M = float(os.getenv("PROPERTY_GEO_RADIUS_M", "3000"))  # alrededor del centro de un lugar
+PROPERTY_GEO_NEAR_RADIUS_M = float(os.getenv("PROPERTY_GEO_NEAR_RADIUS_M", "1500"))  # "cerca de" un punto de referencia
+PROPERTY_GEO_POLYGON_MARGIN_M = float(os.getenv("PROPERTY_GEO_POLYGON_MARGIN_M", "300"))  # margen fuera del polígono
+
+# Cache de catálogos (tipos de propiedad, operaciones, etc.)
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "600"))
+CATALOG_CACHE_STALE_SECONDS = float(os.getenv("CATALOG_CACHE_STALE_SECONDS", "3600"))
+CATALOG_CACHE_ERROR_BACKOFF_SECONDS = float(os.getenv("CATALOG_CACHE_ERROR_BACKOFF_SECONDS", "5"))  # sin reintentos tras un error
+
+# Cache de resultados de búsqueda por lead canónico (LRU + TTL). Los scripts de indexación
+# incrementan una generación en PostgreSQL (migrations/004) que invalida todas las entradas.
+PROPERTY_CACHE_ENABLED = os.getenv("PROPERTY_CACHE_ENABLED", "true").lower() == "true"
+PROPERTY_CACHE_MAX_ENTRIES = int(os.getenv("PROPERTY_CACHE_MAX_ENTRIES", "1000"))
+PROPERTY_CACHE_TTL_SECONDS = float(os.getenv("PROPERTY_CACHE_TTL_SECONDS", "300"))
+PROPERTY_CACHE_BUDGET_BUCKET = int(os.getenv("PROPERTY_CACHE_BUDGET_BUCKET", "100"))  # presupuesto redondeado hacia arriba
+PROPERTY_CACHE_GENERATION_TTL_SECONDS = float(os.getenv("PROPERTY_CACHE_GENERATION_TTL_SECONDS", "5"))
+
+# Bulkheads por dependencia: (hilos en paralelo, llamadas en cola, timeout en segundos)
+def _bulkhead_setting(name: str, workers: int, queue: int, timeout: float) -> tuple:
+    prefix = f"BULKHEAD_{name.upper()}"
+    return (
+        int(os.getenv(f"{prefix}_WORKERS", str(workers))),
+        int(os.getenv(f"{prefix}_QUEUE", str(queue))),
+        float(os.getenv(f"{prefix}_TIMEOUT", str(timeout))),
+    )
+
+BULKHEAD_SETTINGS = {
+    "dynamodb": _bulkhead_setting("dynamodb", 32, 256, 10),
+    "postgres": _bulkhead_setting("postgres", POSTGRES_POOL_MAX_SIZE, 100, 15),
+    "opensearch": _bulkhead_setting("opensearch", 16, 128, 20),
+    "bedrock": _bulkhead_setting("bedrock", 16, 64, 60),
+}
@@ -0,0 +1,274 @@
+# Pool de conexiones PostgreSQL compartido por todo el proceso (sync: psycopg2, async: asyncpg).
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from app.core.config import (
+    POSTGRES_HOST,
+    POSTGRES_PORT,
+    POSTGRES_DB,
+    POSTGRES_USER,
+    POSTGRES_PASSWORD,
+    POSTGRES_POOL_MIN_SIZE,
+    POSTGRES_POOL_MAX_SIZE,
+    POSTGRES_POOL_ACQUIRE_TIMEOUT,
+    POSTGRES_POOL_HEALTHCHECK_IDLE_SECONDS,
+    POSTGRES_STATEMENT_TIMEOUT_MS,
+    POSTGRES_CONNECT_TIMEOUT,
+)
+
+
+class PostgresPoolTimeout(Exception):
+    """No se obtuvo una conexión del pool dentro del tiempo límite."""
+
+
+class PostgresPool:
+    """Pool thread-safe sobre psycopg2.ThreadedConnectionPool.
+
+    - Bloquea (con timeout) cuando el pool está agotado en lugar de fallar de inmediato.
+    - Verifica la conexión al hacer checkout si estuvo inactiva más de `healthcheck_idle_seconds`.
+    - Aplica `statement_timeout` a nivel de sesión.
+    - Expone métricas básicas con `stats()`.
+    """
+
+    def __init__(self, min_size: int = POSTGRES_POOL_MIN_SIZE, max_size: int = POSTGRES_POOL_MAX_SIZE,
+                 acquire_timeout: float = POSTGRES_POOL_ACQUIRE_TIMEOUT,
+                 healthcheck_idle_seconds: float = POSTGRES_POOL_HEALTHCHECK_IDLE_SECONDS,
+                 statement_timeout_ms: int = POSTGRES_STATEMENT_TIMEOUT_MS, **connect_kwargs):
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.healthcheck_idle_seconds = healthcheck_idle_seconds
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._metrics = {
+            "checkouts": 0,
+            "checkout_timeouts": 0,
+            "discarded": 0,
+            "healthchecks": 0,
+            "wait_ms_total": 0.0,
+            "in_use": 0,
+        }
+        options = f"-c statement_timeout={statement_timeout_ms}" if statement_timeout_ms else None
+        self._pool = ThreadedConnectionPool(
+            min_size,
+            max_size,
+            options=options,
+            **connect_kwargs,
+        )
+
+    def getconn(self):
+        """Obtiene una conexión sana del pool (bloquea hasta `acquire_timeout`)."""
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._metrics["checkout_timeouts"] += 1
+            raise PostgresPoolTimeout(f"Pool PostgreSQL agotado ({self.max_size} conexiones)")
+
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                self._discard(conn)
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._metrics["checkouts"] += 1
+            self._metrics["in_use"] += 1
+            self._metrics["wait_ms_total"] += (time.monotonic() - start) * 1000
+        return conn
+
+    def putconn(self, conn, close: bool = False):
+        """Devuelve la conexión al pool, dejando la sesión sin transacción abierta."""
+        try:
+            if not close and not conn.closed:
+                from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            self._last_used[id(conn)] = time.monotonic()
+            self._pool.putconn(conn, close=close or bool(conn.closed))
+        except Exception as e:
+            logging.warning(f"Error devolviendo conexión PostgreSQL al pool: {e}")
+            self._discard(conn)
+        finally:
+            with self._lock:
+                self._metrics["in_use"] -= 1
+            self._slots.release()
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.healthcheck_idle_seconds:
+            return True
+        with self._lock:
+            self._metrics["healthchecks"] += 1
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._metrics["discarded"] += 1
+        self._last_used.pop(id(conn), None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        """Métricas del pool para monitoreo."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["min_size"] = self.min_size
+        metrics["max_size"] = self.max_size
+        metrics["open_connections"] = len(getattr(self._pool, "_used", {})) + len(getattr(self._pool, "_pool", []))
+        metrics["avg_wait_ms"] = metrics["wait_ms_total"] / metrics["checkouts"] if metrics["checkouts"] else 0.0
+        return metrics
+
+    def close(self):
+        self._pool.closeall()
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_postgres_pool() -> PostgresPool:
+    """Retorna el pool sync del proceso, creándolo la primera vez."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = PostgresPool(
+                    host=POSTGRES_HOST,
+                    port=POSTGRES_PORT,
+                    dbname=POSTGRES_DB,
+                    user=POSTGRES_USER,
+                    password=POSTGRES_PASSWORD,
+                    connect_timeout=POSTGRES_CONNECT_TIMEOUT,
+                )
+    return _POOL
+
+
+@contextmanager
+def get_postgres_connection():
+    """Context manager: `with get_postgres_connection() as conn:` toma y devuelve una conexión del pool."""
+    pool = get_postgres_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except Exception:
+        broken = bool(conn.closed)
+        raise
+    finally:
+        pool.putconn(conn, close=broken)
+
+
+@contextmanager
+def get_postgres_cursor():
+    """Context manager que entrega directamente un cursor de una conexión del pool."""
+    with get_postgres_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+
+def postgres_pool_stats() -> dict:
+    """Métricas del pool sync (vacío si aún no se creó)."""
+    return _POOL.stats() if _POOL is not None else {}
+
+
+def close_postgres_pool():
+    """Cierra el pool sync (shutdown de la app)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.close()
+            _POOL = None
+
+
+### Variante asyncio (asyncpg) ###
+
+_ASYNC_POOL = None
+_ASYNC_POOL_LOCK = asyncio.Lock()
+_ASYNC_METRICS = {"checkouts": 0, "wait_ms_total": 0.0}
+
+
+async def get_async_postgres_pool():
+    """Retorna el pool asyncpg del proceso. Debe usarse siempre desde el mismo event loop."""
+    global _ASYNC_POOL
+    if _ASYNC_POOL is not None:
+        return _ASYNC_POOL
+
+    async with _ASYNC_POOL_LOCK:
+        if _ASYNC_POOL is not None:
+            return _ASYNC_POOL
+        import asyncpg
+
+        _ASYNC_POOL = await asyncpg.create_pool(
+            host=POSTGRES_HOST,
+            port=POSTGRES_PORT,
+            database=POSTGRES_DB,
+            user=POSTGRES_USER,
+            password=POSTGRES_PASSWORD,
+            min_size=POSTGRES_POOL_MIN_SIZE,
+            max_size=POSTGRES_POOL_MAX_SIZE,
+            timeout=POSTGRES_CONNECT_TIMEOUT,
+            max_inactive_connection_lifetime=300,
+            server_settings={"statement_timeout": str(POSTGRES_STATEMENT_TIMEOUT_MS)},
+        )
+    return _ASYNC_POOL
+
+
+@asynccontextmanager
+async def get_async_postgres_connection():
+    """`async with get_async_postgres_connection() as conn:` con health check al hacer checkout."""
+    pool = await get_async_postgres_pool()
+    start = time.monotonic()
+    conn = await pool.acquire(timeout=POSTGRES_POOL_ACQUIRE_TIMEOUT)
+    try:
+        if conn.is_closed():
+            await pool.release(conn)
+            conn = await pool.acquire(timeout=POSTGRES_POOL_ACQUIRE_TIMEOUT)
+        _ASYNC_METRICS["checkouts"] += 1
+        _ASYNC_METRICS["wait_ms_total"] += (time.monotonic() - start) * 1000
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+def async_postgres_pool_stats() -> dict:
+    """Métricas del pool asyncpg (vacío si aún no se creó)."""
+    if _ASYNC_POOL is None:
+        return {}
+    checkouts = _ASYNC_METRICS["checkouts"]
+    return {
+        "size": _ASYNC_POOL.get_size(),
+        "idle": _ASYNC_POOL.get_idle_size(),
+        "min_size": _ASYNC_POOL.get_min_size(),
+        "max_size": _ASYNC_POOL.get_max_size(),
+        "checkouts": checkouts,
+        "avg_wait_ms": _ASYNC_METRICS["wait_ms_total"] / checkouts if checkouts else 0.0,
+    }
+
+
+async def close_async_postgres_pool():
+    """Cierra el pool asyncpg (shutdown de la app)."""
+    global _ASYNC_POOL
+    if _ASYNC_POOL is not None:
+        await _ASYNC_POOL.close()
+        _ASYNC_POOL = None
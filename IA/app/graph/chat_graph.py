@@ -0,0 +1,487 @@
+"""
+Grafo de stages del chatbot inmobiliario.
+
+Cada stage de la conversación es un nodo con sus transiciones declaradas; el router elige
+el nodo del turno a partir del mensaje y del estado guardado (reset, filtro de intención,
+confirmación de recomendaciones o el stage actual). Los módulos de los stages se importan
+una sola vez aquí y warm_chat_graph() los deja listos al arrancar la app.
+"""
+import random
+from typing import Optional
+from app.graph.stage_graph import StageGraph
+from app.models.PropertyLead import PropertyLead
+from app.services.postgres_queries import get_property_types
+from app.utils.intent_recognition import check_intent
+from app.utils.intent_filter_simple import is_real_estate_related, get_rejection_message
+from app.utils.nlu import parse_message, register_keywords
+from app.services.stages.stage1_extract_intuitive import handle_smart_extraction, is_greeting_message, generate_greeting_response
+from app.services.stages.stage4_refine_search import handle_search_refinement
+from app.services.chatbot_engine import effect, attach_result_set, recommendation_count, enrich_properties_display, format_message
+
+AGENT_NAMES = ["Sofía"]
+
+RESET_KEYWORDS = [
+    'nueva búsqueda', 'nueva busqueda', 'reiniciar', 'reset', 'empezar de nuevo',
+    'volver a empezar', 'cancelar búsqueda', 'cancelar busqueda', 'comenzar otra vez',
+    'nueva consulta', 'otra búsqueda', 'otra busqueda', 'empezar otra vez'
+]
+RESET = register_keywords('reset', RESET_KEYWORDS)
+
+MORE_RESULTS_KEYWORDS = [
+    'ver más', 'ver mas', 'muéstrame más', 'muestrame mas', 'más propiedades', 'mas propiedades',
+    'más resultados', 'mas resultados', 'más opciones', 'mas opciones', 'siguiente página',
+    'siguiente pagina', 'siguientes'
+]
+MORE_RESULTS = register_keywords('more_results', MORE_RESULTS_KEYWORDS)
+
+# Nodos que solo elige el router (nunca quedan guardados como stage de la conversación)
+ROUTER_ONLY_NODES = {'reset', 'rejection', 'confirm_recommendation'}
+
+
+class ChatTurn:
+    """Contexto de un turno: lo leen y modifican los nodos del grafo."""
+
+    def __init__(self, primary_key: str, message: str, user_name: Optional[str], metadata: dict, state: dict):
+        self.primary_key = primary_key
+        self.message = message
+        self.parsed = parse_message(message)       # normalizado una vez para todos los stages
+        self.message_lower = self.parsed.lower
+        self.user_name = user_name
+        self.metadata = metadata                    # metadata del turno (mensajes + estado)
+        self.state = state                          # estado guardado (last_metadata)
+        self.conversation_length = state['conversation_length']
+        self.state_updates = {}
+        self.new_result_set = None                  # result set nuevo de este turno
+        self.response = None
+        self.lead = None                            # None: se mantiene el lead del estado
+        self.outcome = 'turn'                       # 'turn' | 'reset' | 'rejection'
+        self.rejection_reason = None
+        self.checkpoint = None
+        self.stage = state.get('stage', 'extract')
+
+
+CHAT_GRAPH = StageGraph("chat")
+
+
+@CHAT_GRAPH.router
+def route_turn(ctx: ChatTurn) -> str:
+    if ctx.parsed.has(RESET):
+        return 'reset'
+
+    # 🛡️ FILTRO DE INTENCIONES - Validar que la consulta sea inmobiliaria
+    is_valid, ctx.rejection_reason = is_real_estate_related(ctx.parsed)
+    if not is_valid:
+        return 'rejection'
+
+    stage = ctx.state.get('stage', 'extract')
+    print(f"DEBUG - Retrieved state:")
+    print(f"  Stage: {stage}")
+    print(f"  Awaiting confirmation: {ctx.state.get('awaiting_confirmation', False)}")
+    print(f"  Has recommendations: {'result_set' in ctx.state}")
+    if 'result_set' in ctx.state:
+        print(f"  Properties count: {recommendation_count(ctx.state)}")
+
+    if ctx.state.get('awaiting_confirmation', False) and stage == 'recommend':
+        return 'confirm_recommendation'
+    if stage not in CHAT_GRAPH.nodes or stage in ROUTER_ONLY_NODES:
+        return 'extract'
+    return stage
+
+
+### Nodos del router ###
+
+@CHAT_GRAPH.node('reset', transitions=['extract'])
+def reset_node(ctx: ChatTurn):
+    """🔄 Reinicia la búsqueda: el estado se reemplaza (no se combina)."""
+    print(f"DEBUG - Reset solicitado: {ctx.message}")
+    ctx.outcome = 'reset'
+    ctx.metadata = {
+        'stage': 'extract',
+        'conversation_length': 2.0,
+        'user_name': ctx.user_name,
+        'awaiting_confirmation': False,
+        'reset_requested': True
+    }
+    ctx.response = {
+        'model_response': f'¡Perfecto {ctx.user_name}! Vamos a comenzar una nueva búsqueda desde cero. ¿Qué tipo de propiedad estás buscando? (ej. {", ".join(get_property_types())})'
+    }
+    return 'extract'
+
+
+@CHAT_GRAPH.node('rejection')
+def rejection_node(ctx: ChatTurn):
+    """Consulta no inmobiliaria: el stage de la conversación no cambia, solo su longitud."""
+    print(f"DEBUG - Consulta rechazada: {ctx.rejection_reason}")
+    ctx.outcome = 'rejection'
+    ctx.response = {'model_response': get_rejection_message(ctx.user_name)}
+    return 'rejection'
+
+
+@CHAT_GRAPH.node('confirm_recommendation', transitions=['display_properties', 'no_properties', 'extract', 'recommend'])
+def confirm_recommendation_node(ctx: ChatTurn):
+    """Flujo de confirmación: ofrecer opciones claras al usuario tras recomendar."""
+    message_lower = ctx.message_lower
+    intent = check_intent(ctx.parsed)
+    ctx.user_name = ctx.state.get('user_name', ctx.user_name or 'amigo')
+    user_name = ctx.user_name
+    next_stage = 'recommend'
+
+    print(f"DEBUG - Checking if user wants to see properties...")
+    print(f"DEBUG - Message: '{ctx.message}' -> '{message_lower}'")
+    print(f"DEBUG - Intent: {intent}")
+
+    # Opción A: Mostrar propiedades enriquecidas
+    if (message_lower in ['a', 'a.', 'opcion a', 'opción a', 'mostrar', 'ver', 'propiedades', 'si', 'sí'] or
+        intent == 'affirmative' or
+        any(keyword in message_lower for keyword in ['ver', 'mostrar', 'interesado', 'quiero', 'gustaría', 'gustaria', 'dale', 'ok'])):
+
+        print(f"DEBUG - User wants to see properties!")
+        properties = yield effect('load_recommendations', ctx.primary_key, ctx.state, ctx.new_result_set)
+        print(f"DEBUG - Properties in result set: {len(properties) if properties else 0}")
+
+        ctx.response = enrich_properties_display(properties, user_name, has_more=has_more_results(ctx.state))
+        ctx.metadata['awaiting_confirmation'] = False
+        if properties:
+            next_stage = 'display_properties'
+            print(f"DEBUG - Response generated: {ctx.response.get('model_response', '')[:100]}...")
+        else:
+            next_stage = 'no_properties'
+            print(f"DEBUG - No properties found, showing friendly message")
+
+    # Opción B: Iniciar nueva búsqueda
+    elif (message_lower in ['b', 'opcion b', 'opción b', 'reiniciar', 'reset', 'nueva busqueda', 'nueva búsqueda', 'nueva', 'buscar'] or
+          'nueva' in message_lower):
+        ctx.response = {'model_response': f'Perfecto {user_name}, vamos a comenzar una nueva búsqueda. ¿En qué ciudad o distrito te gustaría buscar una propiedad?'}
+        ctx.metadata['awaiting_confirmation'] = False
+        ctx.metadata['user_name'] = user_name
+        next_stage = 'extract'
+
+    # Opción C: Volver atrás o cancelar
+    elif (intent == 'negative' or
+          message_lower in ['no', 'negativo', 'cancelar', 'salir', 'atrás', 'atras', 'volver']):
+        ctx.response = {'model_response': f'Entendido {user_name}. ¿En qué más puedo ayudarte? Puedo ayudarte a buscar propiedades o responder preguntas sobre el mercado inmobiliario.'}
+        ctx.metadata['awaiting_confirmation'] = False
+        next_stage = 'extract'
+
+    # Opción por defecto: Repetir opciones con más claridad
+    else:
+        property_count = recommendation_count(ctx.state)
+        ctx.response = {'model_response': f'Hola {user_name}, encontré {property_count} propiedades que podrían interesarte. Para continuar, por favor elige una opción:\n\n🏠 **A** - Ver las propiedades encontradas\n🔍 **B** - Hacer una nueva búsqueda\n❌ **Cancelar** - Salir de la búsqueda\n\nPuedes responder simplemente con "A", "B" o "Cancelar".'}
+
+    ctx.lead = ctx.state.get('lead', {})  # Mantener el lead anterior
+    return next_stage
+
+
+### Stages de la conversación ###
+
+@CHAT_GRAPH.node('extract', transitions=['recommend'])
+def extract_node(ctx: ChatTurn):
+    current_lead = ctx.state.get('lead')
+    if current_lead:
+        current_lead = PropertyLead(**current_lead)
+
+    # Detectar si es un saludo simple
+    if is_greeting_message(ctx.parsed) and not current_lead:
+        ctx.response = {'model_response': generate_greeting_response(ctx.user_name)}
+        ctx.lead = PropertyLead()  # Lead vacío para empezar
+        return 'extract'
+
+    # Usar extracción inteligente (solo necesita el último mensaje del usuario)
+    smart_result = handle_smart_extraction([format_message(ctx.message)], current_lead)
+    ctx.response = smart_result
+    ctx.lead = smart_result["lead"]
+    if smart_result["next_stage"] != True:
+        return 'extract'
+
+    properties = yield effect('recommend', ctx.lead)
+
+    # Guardar propiedades y configurar confirmación
+    ctx.new_result_set = attach_result_set(ctx.metadata, properties)
+    ctx.metadata['awaiting_confirmation'] = True
+
+    ctx.user_name = ctx.state.get('user_name', ctx.user_name)
+    property_count = len(properties) if properties else 0
+    ctx.response = {'model_response': f'¡Perfecto {ctx.user_name}! Encontré {property_count} propiedades que podrían interesarte. ¿Qué te gustaría hacer?\n\nA. 🏠 Mostrar las propiedades encontradas\nB. 🔍 Hacer una nueva búsqueda\n\nPor favor, responde con "A" o "B" para indicarme qué deseas hacer.'}
+    return 'recommend'
+
+
+@CHAT_GRAPH.node('recommend', transitions=['extract'])
+def recommend_node(ctx: ChatTurn):
+    """Solo se activa la primera vez que se recomienda (la confirmación es otro nodo):
+    re-evalúa el lead con el stage 1 (LLM)."""
+    latest_conversation, ctx.state_updates = yield effect('load_conversation', ctx.primary_key, ctx.state, ctx.message)
+    ctx.response = yield effect('extract_lead', latest_conversation)
+    ctx.lead = ctx.response["lead"]
+    return 'recommend' if ctx.response["next_stage"] else 'extract'
+
+
+@CHAT_GRAPH.node('display_properties', transitions=['extract', 'property_details', 'refine_search'])
+def display_properties_node(ctx: ChatTurn):
+    """Stage 3: manejo post-visualización de propiedades."""
+    message_lower = ctx.message_lower
+    intent = check_intent(ctx.parsed)
+    ctx.user_name = user_name = ctx.state.get('user_name', ctx.user_name or 'amigo')
+    ctx.lead = ctx.state.get('lead', {})
+
+    if ctx.parsed.has(MORE_RESULTS) and 'detalle' not in message_lower:
+        return (yield from show_next_page(ctx))
+    if message_lower in ['a', 'opcion a', 'opción a', 'buscar', 'nueva'] or 'nueva' in message_lower:
+        ctx.response = {'model_response': f'Perfecto {user_name}, vamos a comenzar una nueva búsqueda. ¿En qué ciudad o distrito te gustaría buscar una propiedad?'}
+        return 'extract'
+    if message_lower in ['b', 'opcion b', 'opción b', 'detalles', 'más'] or 'detalle' in message_lower:
+        ctx.response = {'model_response': f'¡Claro {user_name}! ¿Sobre cuál propiedad te gustaría saber más? Puedes decirme el número de la opción (1, 2, 3...) o la referencia.'}
+        return 'property_details'
+    if message_lower in ['c', 'opcion c', 'opción c', 'refinar', 'filtrar']:
+        ctx.response = {'model_response': f'Excelente {user_name}, vamos a refinar tu búsqueda. ¿Qué criterio te gustaría ajustar? Por ejemplo: presupuesto, número de habitaciones, ubicación específica, etc.'}
+        return 'refine_search'
+    if message_lower in ['salir', 'terminar', 'cancelar'] or intent == 'negative':
+        ctx.response = {'model_response': f'Entendido {user_name}. Ha sido un placer ayudarte en tu búsqueda. Si necesitas algo más, estaré aquí para asistirte.'}
+        return 'extract'
+
+    ctx.response = {'model_response': f'No estoy seguro de entender {user_name}. ¿Podrías elegir una de las opciones?\n\n🔍 **A** - Nueva búsqueda\n💬 **B** - Más detalles\n🔄 **C** - Refinar búsqueda\n❌ **Salir** - Terminar'}
+    return 'display_properties'
+
+
+def has_more_results(state: dict) -> bool:
+    return bool((state.get('result_set') or {}).get('next_cursor'))
+
+
+def show_next_page(ctx: ChatTurn):
+    """"Ver más": la página siguiente sale del cursor guardado en el estado (seek después de la
+    última propiedad mostrada), sin repetir la búsqueda completa."""
+    result_set = ctx.state.get('result_set') or {}
+    if not result_set.get('next_cursor'):
+        ctx.response = {'model_response': f'Esas son todas las propiedades que encontré para tu búsqueda, {ctx.user_name}. ¿Quieres ver detalles de alguna (B), refinar la búsqueda (C) o hacer una nueva búsqueda (A)?'}
+        return 'display_properties'
+
+    properties = yield effect('recommend', PropertyLead(**ctx.lead), cursor=result_set['next_cursor'])
+    if not properties:
+        ctx.response = {'model_response': f'No encontré más propiedades para tu búsqueda, {ctx.user_name}. ¿Quieres refinar la búsqueda (C) o hacer una nueva búsqueda (A)?'}
+        return 'display_properties'
+
+    ctx.new_result_set = attach_result_set(ctx.metadata, properties, page=int(result_set.get('page', 1)) + 1)
+    ctx.response = enrich_properties_display(properties, ctx.user_name, has_more=has_more_results(ctx.metadata))
+    return 'display_properties'
+
+
+@CHAT_GRAPH.node('no_properties', transitions=['extract', 'refine_search'])
+def no_properties_node(ctx: ChatTurn):
+    """Stage para manejar cuando no se encuentran propiedades."""
+    message_lower = ctx.message_lower
+    intent = check_intent(ctx.parsed)
+    ctx.user_name = user_name = ctx.state.get('user_name', ctx.user_name or 'amigo')
+    ctx.lead = ctx.state.get('lead', {})
+
+    if message_lower in ['a', 'opcion a', 'opción a', 'buscar', 'nueva'] or 'nueva' in message_lower:
+        ctx.response = {'model_response': f'Perfecto {user_name}, vamos a comenzar una nueva búsqueda. ¿En qué ciudad o distrito te gustaría buscar una propiedad?'}
+        return 'extract'
+    if message_lower in ['b', 'opcion b', 'opción b', 'refinar', 'filtrar'] or 'refin' in message_lower:
+        ctx.response = {'model_response': f'Excelente {user_name}, vamos a refinar tu búsqueda. ¿Qué criterio te gustaría ajustar? Por ejemplo: presupuesto, número de habitaciones, ubicación específica, etc.'}
+        return 'refine_search'
+    if message_lower in ['salir', 'terminar', 'cancelar'] or intent == 'negative':
+        ctx.response = {'model_response': f'Entendido {user_name}. Ha sido un placer ayudarte en tu búsqueda. Si necesitas algo más, estaré aquí para asistirte.'}
+        return 'extract'
+
+    ctx.response = {'model_response': f'😔 Lo siento {user_name}, por el momento no tenemos propiedades disponibles en tu búsqueda.\n\n¿Te gustaría hacer una nueva búsqueda o refinar tus criterios?\n\n🔍 **A** - Hacer una nueva búsqueda en otra ubicación\n🔄 **B** - Refinar tus criterios de búsqueda (presupuesto, tipo, etc.)\n❌ **Salir** - Terminar la búsqueda\n\nPor favor, responde con "A", "B" o "Salir".'}
+    return 'no_properties'
+
+
+@CHAT_GRAPH.node('property_details')
+def property_details_node(ctx: ChatTurn):
+    """Detalles de una propiedad recomendada; se mantiene el stage para seguir con detalles."""
+    properties = yield effect('load_recommendations', ctx.primary_key, ctx.state, ctx.new_result_set)
+    ctx.user_name = ctx.state.get('user_name', ctx.user_name or 'amigo')
+
+    ctx.response = yield effect('property_details', ctx.message, properties, ctx.user_name)
+    ctx.lead = ctx.state.get('lead', {})
+    if 'selected_property' in ctx.response:
+        ctx.metadata['selected_property'] = ctx.response['selected_property']
+    return 'property_details'
+
+
+@CHAT_GRAPH.node('refine_search', transitions=['update_criteria'])
+def refine_search_node(ctx: ChatTurn):
+    ctx.user_name = ctx.state.get('user_name', ctx.user_name or 'amigo')
+    ctx.lead = ctx.state.get('lead', {})  # Mantener el lead actual
+
+    ctx.response = handle_search_refinement(ctx.parsed, ctx.lead, ctx.user_name)
+
+    # Si el usuario especifica un refinamiento, actualizar el stage
+    if ctx.response.get('refinement_type') and ctx.response.get('refinement_type') != 'selection':
+        ctx.metadata['refinement_type'] = ctx.response['refinement_type']
+        return 'update_criteria'
+    return 'refine_search'
+
+
+@CHAT_GRAPH.node('update_criteria', transitions=['confirm_updated_search'])
+def update_criteria_node(ctx: ChatTurn):
+    """Actualiza solo el criterio elegido en refine_search."""
+    refinement_type = ctx.state.get('refinement_type')
+    ctx.user_name = user_name = ctx.state.get('user_name', ctx.user_name or 'amigo')
+    current_lead = ctx.state.get('lead', {})
+
+    update_prompt = f"""
+    El usuario quiere actualizar el criterio '{refinement_type}' de su búsqueda inmobiliaria.
+
+    Criterios actuales: {dict(current_lead) if current_lead else {}}
+
+    Nuevo mensaje del usuario: {ctx.message}
+
+    Extrae SOLO el nuevo valor para '{refinement_type}' del mensaje del usuario.
+    """
+
+    try:
+        updated_lead = yield effect('lead_with_prompt', update_prompt)
+    except Exception as e:
+        ctx.response = {
+            'model_response': f'Lo siento {user_name}, no pude procesar esa actualización. ¿Podrías ser más específico sobre el {refinement_type} que buscas?'
+        }
+        ctx.lead = current_lead
+        return 'update_criteria'
+
+    # Combinar el lead actual con la actualización
+    if current_lead:
+        for key, value in dict(current_lead).items():
+            if getattr(updated_lead, key, None) is None and value is not None:
+                setattr(updated_lead, key, value)
+    ctx.lead = updated_lead
+
+    updated_value = getattr(updated_lead, refinement_type, None)
+    ctx.response = {
+        'model_response': f'Perfecto {user_name}, he actualizado tu criterio de {refinement_type} a: {updated_value}. ¿Te gustaría que busque propiedades con estos nuevos criterios?\n\n✅ **Sí** - Buscar con criterios actualizados\n🔄 **Refinar más** - Ajustar otros criterios\n❌ **Cancelar** - Volver al menú principal'
+    }
+    return 'confirm_updated_search'
+
+
+@CHAT_GRAPH.node('confirm_updated_search', transitions=['recommend', 'refine_search', 'extract'])
+def confirm_updated_search_node(ctx: ChatTurn):
+    message_lower = ctx.message_lower
+    ctx.user_name = user_name = ctx.state.get('user_name', ctx.user_name or 'amigo')
+    current_lead = ctx.state.get('lead', {})
+    ctx.lead = current_lead
+
+    if message_lower in ['si', 'sí', 'yes', 'buscar', 'dale'] or 'si' in message_lower:
+        # Ejecutar nueva búsqueda con criterios actualizados
+        properties = yield effect('recommend', current_lead)
+
+        ctx.new_result_set = attach_result_set(ctx.metadata, properties)
+        ctx.metadata['awaiting_confirmation'] = True
+        ctx.response = {
+            'model_response': f'¡Excelente {user_name}! He encontrado propiedades con tus nuevos criterios. ¿Qué te gustaría hacer?\n\nA. 🏠 Ver las propiedades encontradas\nB. 🔍 Hacer otra búsqueda\n\nResponde con "A" o "B".'
+        }
+        return 'recommend'
+    if 'refinar' in message_lower or 'ajustar' in message_lower:
+        ctx.response = {'model_response': f'Claro {user_name}, ¿qué otro criterio te gustaría ajustar?'}
+        return 'refine_search'
+
+    ctx.response = {'model_response': f'Entendido {user_name}. ¿En qué más puedo ayudarte?'}
+    return 'extract'
+
+
+### Guardado del turno ###
+
+def commit_turn(ctx: ChatTurn):
+    """Guarda el turno (mensajes + estado + checkpoint del nodo) en una sola escritura."""
+    checkpoint = {'checkpoint': ctx.checkpoint} if ctx.checkpoint else {}
+
+    if ctx.outcome == 'reset':
+        yield effect('save_turn', ctx.primary_key, ctx.message, ctx.response, ctx.metadata, 'extract', ctx.state,
+                     {**ctx.metadata, **checkpoint}, reset=True)
+        return
+
+    if ctx.outcome == 'rejection':
+        metadata_rejection = {
+            'stage': 'rejection',
+            'conversation_length': ctx.conversation_length + 2.0,
+            'rejection_reason': ctx.rejection_reason
+        }
+        if ctx.user_name:
+            metadata_rejection['user_name'] = ctx.user_name
+
+        # El rechazo no cambia el stage de la conversación, solo su longitud
+        rejection_updates = {'conversation_length': ctx.conversation_length + 2.0, **checkpoint}
+        if ctx.new_result_set:
+            rejection_updates['result_set'] = ctx.metadata['result_set']
+        yield effect('save_turn', ctx.primary_key, ctx.message, ctx.response, metadata_rejection, 'rejection', ctx.state,
+                     rejection_updates, result_set=ctx.new_result_set)
+        return
+
+    metadata = ctx.metadata
+    metadata['stage'] = ctx.stage
+    metadata['lead'] = ctx.lead if ctx.lead is not None else ctx.state.get('lead', {})
+    metadata['conversation_length'] = ctx.conversation_length + 2.0
+    if ctx.user_name:
+        metadata['user_name'] = ctx.user_name
+
+    # Si la respuesta es una lista de propiedades (primera vez en recommend), guardar en metadata
+    if isinstance(ctx.response, list) and len(ctx.response) > 0:
+        ctx.new_result_set = attach_result_set(metadata, ctx.response)
+        metadata['awaiting_confirmation'] = True
+    elif ctx.stage == 'recommend' and recommendation_count(metadata) > 0:
+        # Si estamos en recommend y ya tenemos propiedades, mantener awaiting_confirmation
+        metadata['awaiting_confirmation'] = True
+    else:
+        metadata['awaiting_confirmation'] = False
+
+    response_to_save = ctx.response
+    if isinstance(ctx.response, list):
+        response_to_save = {'model_response': f'Encontré {len(ctx.response)} propiedades.'}
+
+    yield effect('save_turn', ctx.primary_key, ctx.message, response_to_save, metadata, ctx.stage, ctx.state,
+                 {**metadata, **ctx.state_updates, **checkpoint}, result_set=ctx.new_result_set)
+
+    if ctx.conversation_length == 0:
+        ctx.response = add_welcome_greeting(ctx.response, ctx.user_name)
+
+
+def add_welcome_greeting(response, user_name: Optional[str] = None):
+    """Añade un saludo personalizado en conversaciones nuevas."""
+    agent_name = random.choice(AGENT_NAMES)
+
+    # Saludos más naturales y variados
+    greetings = [
+        f"¡Hola! Soy {agent_name}, tu agente inmobiliario virtual. Me da mucho gusto conocerte",
+        f"¡Qué tal! Mi nombre es {agent_name} y seré tu asistente para encontrar la propiedad perfecta",
+        f"¡Hola! Soy {agent_name}, especialista en bienes raíces. Estoy aquí para ayudarte",
+        f"¡Bienvenido! Me llamo {agent_name} y me especializo en ayudar a encontrar propiedades ideales"
+    ]
+
+    if user_name:
+        personalized_greetings = [
+            f"¡Hola {user_name}! Soy {agent_name}, tu agente inmobiliario virtual. Es un placer conocerte",
+            f"¡Qué tal {user_name}! Mi nombre es {agent_name} y seré tu asistente personal para encontrar tu propiedad ideal",
+            f"¡Hola {user_name}! Soy {agent_name}, especialista en bienes raíces. Estoy aquí para ayudarte en todo lo que necesites",
+            f"¡Bienvenido {user_name}! Me llamo {agent_name} y me especializo en conectar personas con sus hogares perfectos"
+        ]
+        greeting = random.choice(personalized_greetings)
+    else:
+        greeting = random.choice(greetings)
+
+    # Combinar el saludo personalizado con la pregunta del chatbot de forma fluida
+    if isinstance(response, dict) and response.get("model_response"):
+        model_message = response.get("model_response")
+        # Eliminar saludos genéricos del chatbot si existen
+        generic_starts = ['¡Hola! ', 'Hola, ', 'Hola ', '¡Hola, ']
+        for start in generic_starts:
+            if model_message.startswith(start):
+                model_message = model_message.replace(start, '', 1)
+                break
+
+        response["model_response"] = f"{greeting}. {model_message}"
+        return response
+
+    # Si no hay respuesta del modelo, crear una introducción completa
+    intro_questions = [
+        "¿Qué tipo de propiedad estás buscando?",
+        "¿En qué zona te gustaría vivir?",
+        "¿Estás buscando para comprar o alquilar?",
+        "Cuéntame, ¿qué características debe tener tu propiedad ideal?"
+    ]
+    return {'model_response': f"{greeting}. {random.choice(intro_questions)}"}
+
+
+def warm_chat_graph() -> StageGraph:
+    """Compila el grafo y construye las cadenas LangChain (startup de la app)."""
+    from app.services.stages.stage1_extract import build_stage1_chain
+    build_stage1_chain()
+    return CHAT_GRAPH.compile()
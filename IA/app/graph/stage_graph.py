@@ -0,0 +1,116 @@
+"""
+Motor de grafos de stages: registro de nodos con transiciones explícitas.
+
+Un nodo `nodo(ctx)` retorna el stage siguiente, que debe estar entre sus transiciones
+declaradas. Si necesita I/O es un generador que lo pide con `yield effect(...)` (igual que
+chat_turn_flow); si no, basta una función normal. El grafo elige el nodo de entrada con su router, mide cada nodo
+(log_performance + métricas en memoria) y deja en `ctx.checkpoint` el punto de control
+que se persiste junto con el turno.
+"""
+import time
+import inspect
+import threading
+from typing import Callable, Iterable, Optional
+from app.utils.logger import log_performance
+
+
+class StageGraphError(Exception):
+    """Grafo mal definido o transición no declarada."""
+
+
+class Node:
+    def __init__(self, name: str, func: Callable, transitions: Iterable[str]):
+        self.name = name
+        self.func = func
+        self.transitions = frozenset(transitions)
+        self.is_generator = inspect.isgeneratorfunction(func)
+
+    def run(self, ctx):
+        """Ejecuta el nodo dentro del flujo de efectos (las funciones normales no piden I/O)."""
+        if self.is_generator:
+            return (yield from self.func(ctx))
+        return self.func(ctx)
+
+
+class StageGraph:
+    """Grafo de stages compilado una vez por proceso.
+
+    - `@graph.node("nombre", transitions=[...])` registra un nodo.
+    - `@graph.router` registra la función `router(ctx) -> nombre de nodo`.
+    - `compile()` valida que todas las transiciones apunten a nodos registrados.
+    - `run_turn(ctx)` ejecuta un paso (generador de efectos, lo resuelve run_chat_flow /
+      arun_chat_flow).
+    """
+
+    def __init__(self, name: str, terminal: Iterable[str] = ()):
+        self.name = name
+        self.nodes = {}
+        self.terminal = frozenset(terminal)  # stages válidos que no son nodos (ej. 'rejection')
+        self._router = None
+        self._compiled = False
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def node(self, name: str, transitions: Iterable[str] = ()):
+        def register(func):
+            if name in self.nodes:
+                raise StageGraphError(f"Nodo '{name}' registrado dos veces en '{self.name}'")
+            self.nodes[name] = Node(name, func, transitions)
+            self._compiled = False
+            return func
+        return register
+
+    def router(self, func: Callable):
+        self._router = func
+        self._compiled = False
+        return func
+
+    def compile(self) -> "StageGraph":
+        if self._router is None:
+            raise StageGraphError(f"El grafo '{self.name}' no tiene router")
+        for node in self.nodes.values():
+            unknown = node.transitions - set(self.nodes) - self.terminal
+            if unknown:
+                raise StageGraphError(f"Nodo '{node.name}': transiciones a stages inexistentes {sorted(unknown)}")
+        self._compiled = True
+        return self
+
+    def run_turn(self, ctx):
+        """Ejecuta el nodo elegido por el router. Retorna el stage siguiente."""
+        if not self._compiled:
+            self.compile()
+        node = self.nodes[self._router(ctx)]
+
+        start_time = time.time()
+        error = None
+        try:
+            next_stage = yield from node.run(ctx)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duration_ms = (time.time() - start_time) * 1000
+            self._record(node.name, duration_ms, error)
+
+        if next_stage != node.name and next_stage not in node.transitions:
+            raise StageGraphError(f"Transición no declarada: '{node.name}' -> '{next_stage}'")
+
+        log_performance(f"stage_{node.name}", duration_ms, {"graph": self.name, "next_stage": next_stage})
+        ctx.checkpoint = {'node': node.name, 'next_stage': next_stage, 'duration_ms': round(duration_ms, 2)}
+        return next_stage
+
+    def _record(self, name: str, duration_ms: float, error: Optional[Exception]):
+        with self._lock:
+            stats = self._stats.setdefault(name, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += 1 if error is not None else 0
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+
+    def stats(self) -> dict:
+        """Tiempos por nodo (llamadas, errores, promedio y máximo en ms)."""
+        with self._lock:
+            return {
+                name: {**stats, "avg_ms": stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0}
+                for name, stats in self._stats.items()
+            }
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from app.api.chatbot_endpoint import router
+from app.api.chatbot_stream_endpoint import router as stream_router
 from app.api.chatbot_recovery import router as chat_router
 from app.api.embed_endpoint import router as embed_router
 from app.api.debug_chatbot_endpoint import router as debug_router
@@ -28,6 +29,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_write_behind():
+    """Arranca el flusher write-behind (reintenta turnos que quedaron de una ejecución anterior)"""
+    from app.core.config import WRITE_BEHIND_ENABLED
+    if WRITE_BEHIND_ENABLED:
+        from app.services.write_behind import get_write_behind_queue
+        get_write_behind_queue()
+
+
+@app.on_event("startup")
+async def warm_stage_graph():
+    """Compila el grafo de stages e importa sus nodos antes del primer turno"""
+    from app.graph.chat_graph import warm_chat_graph
+    warm_chat_graph()
+
+
+@app.on_event("shutdown")
+async def shutdown_connection_pools():
+    """Vacía la cola write-behind y cierra los pools, bulkheads y clientes compartidos (sync y async)"""
+    import asyncio
+    from app.core.config import WRITE_BEHIND_DRAIN_TIMEOUT
+    from app.core.postgres_pool import close_postgres_pool, close_async_postgres_pool
+    from app.services.write_behind import drain_write_behind_queue
+    from app.core.aws_clients import close_async_aws_clients, close_async_opensearch_client
+    from app.core.bulkheads import shutdown_bulkheads
+    await asyncio.to_thread(drain_write_behind_queue, WRITE_BEHIND_DRAIN_TIMEOUT)
+    close_postgres_pool()
+    await close_async_postgres_pool()
+    await close_async_aws_clients()
+    await close_async_opensearch_client()
+    shutdown_bulkheads()
+
+
 # healthcheck
 @app.get("/")
 def root():
@@ -35,6 +69,7 @@ def root():
 
 # Incluye la ruta de los archivos  api/routes.py
 app.include_router(router, prefix='/chatbot')
+app.include_router(stream_router, prefix='/chatbot')
 app.include_router(chat_router, prefix='/chat_history')
 app.include_router(embed_router, prefix='/embed_service')
 app.include_router(debug_router, prefix='/debug')
@@ -33,6 +33,7 @@ class ChatHistoryRequest(BaseModel):
     limit: int = 10
     reverse: bool = False
     verbose: Optional[bool] = False
+    cursor: Optional[str] = None      # next_cursor de la página anterior
 
 
 class ChatHistoryElement(BaseModel):
@@ -49,6 +50,7 @@ class ChatHistoryElement(BaseModel):
 class ChatHistoryResponse(BaseModel):
     """History response structure"""
     history: List[ChatHistoryElement]
+    next_cursor: Optional[str] = None  # None: no hay mensajes más antiguos
 
     class Config:
         exclude_none = True
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""
+Archivo frío de conversaciones: los items por expirar (TTL) se copian a archivos JSONL
+comprimidos con gzip bajo un prefijo S3 antes de que DynamoDB los borre.
+
+- archive_expiring_items: scan paralelo por segmentos de los items cuyo TTL cae entre el
+  horizonte de la corrida anterior (guardado en `<CHAT_ARCHIVE_PREFIX>_archived_until.json`) y
+  el de esta, así cada item se sube una vez; los items de cada conversación se
+  escriben (en streaming, una conversación a la vez) en
+  `<CHAT_ARCHIVE_PREFIX><PK>/<run>-s<segmento>-<n>@<SK mínimo>@<SK máximo>.jsonl.gz`, una línea
+  JSON por item. El rango de SK en la clave permite elegir los objetos sin descargarlos.
+- read_archived_messages: lectura del archivo de una conversación (read-through del historial);
+  solo descarga los objetos cuyo rango cae antes del cursor, del más reciente al más antiguo.
+
+Funciona contra cualquier S3 compatible (S3_ENDPOINT_URL / DYNAMODB_ENDPOINT_URL).
+"""
+import gzip
+import json
+import time
+import logging
+from decimal import Decimal
+from urllib.parse import quote, unquote
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from app.core.aws_clients import get_dynamodb_client, get_s3_client
+from botocore.exceptions import ClientError
+from app.core.config import (
+    DYNAMODB_TABLE,
+    CHAT_TTL_ATTRIBUTE,
+    CHAT_TTL_DAYS,
+    CHAT_ARCHIVE_BUCKET,
+    CHAT_ARCHIVE_PREFIX,
+    CHAT_ARCHIVE_LEAD_DAYS,
+    CHAT_ARCHIVE_SEGMENTS,
+)
+from app.services.dynamodb_codec import decode_item, encode_item
+from app.services.dynamodb_queries import MESSAGE_SK_PREFIX
+
+
+def archive_enabled() -> bool:
+    return bool(CHAT_ARCHIVE_BUCKET)
+
+
+def conversation_prefix(primary_key: str, prefix: str = CHAT_ARCHIVE_PREFIX) -> str:
+    return f"{prefix}{quote(primary_key, safe='')}/"
+
+
+ARCHIVE_SUFFIX = '.jsonl.gz'
+# quote(..., safe='') siempre codifica '@', así no aparece dentro de los SK de la clave
+_RANGE_SEPARATOR = '@'
+
+
+def archive_object_key(primary_key: str, name: str, items: list, prefix: str = CHAT_ARCHIVE_PREFIX) -> str:
+    """Clave del objeto con el rango de SK de sus items."""
+    sort_keys = [item['SK']['S'] for item in items]
+    sort_range = _RANGE_SEPARATOR.join(quote(sort_key, safe='') for sort_key in (min(sort_keys), max(sort_keys)))
+    return f"{conversation_prefix(primary_key, prefix)}{name}{_RANGE_SEPARATOR}{sort_range}{ARCHIVE_SUFFIX}"
+
+
+def archive_key_range(key: str) -> Optional[tuple]:
+    """(SK mínimo, SK máximo) de una clave de archive_object_key; None si la clave no lo tiene."""
+    name = key.rsplit('/', 1)[-1]
+    if not name.endswith(ARCHIVE_SUFFIX):
+        return None
+    parts = name[:-len(ARCHIVE_SUFFIX)].split(_RANGE_SEPARATOR)
+    if len(parts) != 3:
+        return None
+    return unquote(parts[1]), unquote(parts[2])
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return sorted(value, key=str)
+    raise TypeError(f"Tipo no serializable en el archivo: {type(value)}")
+
+
+def dump_jsonl_gz(items: list) -> bytes:
+    """Items DynamoDB -> JSONL (valores Python ya decodificados y descomprimidos) en gzip."""
+    lines = (json.dumps(decode_item(item), ensure_ascii=False, default=_json_default) for item in items)
+    return gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'), mtime=0)
+
+
+def load_jsonl_gz(data: bytes) -> list:
+    """Inverso de dump_jsonl_gz: retorna los items en formato DynamoDB."""
+    text = gzip.decompress(data).decode('utf-8')
+    return [encode_item(json.loads(line, parse_float=Decimal)) for line in text.splitlines() if line]
+
+
+### Job de archivo ###
+
+ARCHIVE_PROGRESS_KEY = '_archived_until.json'
+
+
+def load_archive_progress(s3, bucket: str, prefix: str) -> Optional[dict]:
+    """{'archived_until': horizonte, 'run_at': epoch} de la última corrida completa (None si no hay)."""
+    try:
+        body = s3.get_object(Bucket=bucket, Key=prefix + ARCHIVE_PROGRESS_KEY)['Body'].read()
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise
+    return json.loads(body)
+
+
+def archive_window_start(progress: Optional[dict], ttl_days: float = CHAT_TTL_DAYS) -> int:
+    """Menor TTL a archivar: lo que vence antes del horizonte anterior ya se subió, salvo los items
+    escritos (o renovados) después de esa corrida, que vencen desde run_at + ttl_days."""
+    if not progress:
+        return 0
+    start = int(progress['archived_until'])
+    if ttl_days > 0:
+        start = min(start, int(progress['run_at'] + ttl_days * 86400))
+    return start
+
+
+def _scan_request(segment: int, total_segments: int, since: int, horizon: int, table_name: str) -> dict:
+    return dict(
+        TableName=table_name,
+        Segment=segment,
+        TotalSegments=total_segments,
+        FilterExpression='#ttl >= :since AND #ttl < :horizon',
+        ExpressionAttributeNames={'#ttl': CHAT_TTL_ATTRIBUTE},
+        ExpressionAttributeValues={':since': {'N': str(since)}, ':horizon': {'N': str(horizon)}},
+    )
+
+
+def _archive_segment(segment: int, total_segments: int, since: int, horizon: int, run_id: str, bucket: str,
+                     prefix: str, table_name: str, max_items_per_object: int) -> dict:
+    """Recorre un segmento del scan y sube un objeto por conversación (o por bloque de items)."""
+    client, s3 = get_dynamodb_client(), get_s3_client()
+    stats = {"items": 0, "objects": 0, "bytes": 0}
+    current_pk, buffer, part = None, [], 0
+
+    def flush():
+        nonlocal buffer, part
+        if not buffer:
+            return
+        body = dump_jsonl_gz(buffer)
+        key = archive_object_key(current_pk, f"{run_id}-s{segment}-{part}", buffer, prefix)
+        s3.put_object(Bucket=bucket, Key=key, Body=body,
+                      ContentType='application/x-ndjson', ContentEncoding='gzip')
+        stats["items"] += len(buffer)
+        stats["objects"] += 1
+        stats["bytes"] += len(body)
+        buffer, part = [], part + 1
+
+    request = _scan_request(segment, total_segments, since, horizon, table_name)
+    while True:
+        response = client.scan(**request)
+        for item in response.get('Items', []):
+            primary_key = item['PK']['S']
+            # El scan entrega los items de una misma partición juntos: se escribe al cambiar de PK
+            if primary_key != current_pk or len(buffer) >= max_items_per_object:
+                flush()
+                if primary_key != current_pk:
+                    current_pk, part = primary_key, 0
+            buffer.append(item)
+        if not response.get('LastEvaluatedKey'):
+            break
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    flush()
+    return stats
+
+
+def archive_expiring_items(lead_days: float = CHAT_ARCHIVE_LEAD_DAYS, segments: int = CHAT_ARCHIVE_SEGMENTS,
+                           bucket: Optional[str] = None, prefix: str = CHAT_ARCHIVE_PREFIX,
+                           table_name: str = DYNAMODB_TABLE, max_items_per_object: int = 5000,
+                           now: float = None) -> dict:
+    """Archiva los items cuyo TTL vence dentro de `lead_days` y que la corrida anterior no
+    cubrió (scan paralelo de `segments`). El horizonte se guarda solo si todos los segmentos
+    terminan; si alguno falla, la próxima corrida repite la ventana.
+    Retorna {'items', 'objects', 'bytes', 'duration_ms'}."""
+    bucket = bucket or CHAT_ARCHIVE_BUCKET
+    if not bucket:
+        raise ValueError("CHAT_ARCHIVE_BUCKET no está configurado")
+    start_time = time.time()
+    now = time.time() if now is None else now
+    horizon = int(now + lead_days * 86400)
+    run_id = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(now))
+    s3 = get_s3_client()
+    since = archive_window_start(load_archive_progress(s3, bucket, prefix))
+
+    results = []
+    if since < horizon:
+        with ThreadPoolExecutor(max_workers=segments, thread_name_prefix="chat-archive") as executor:
+            results = list(executor.map(
+                lambda segment: _archive_segment(segment, segments, since, horizon, run_id, bucket, prefix,
+                                                 table_name, max_items_per_object),
+                range(segments)))
+        s3.put_object(Bucket=bucket, Key=prefix + ARCHIVE_PROGRESS_KEY, ContentType='application/json',
+                      Body=json.dumps({'archived_until': horizon, 'run_at': int(now)}).encode('utf-8'))
+
+    stats = {key: sum(result[key] for result in results) for key in ("items", "objects", "bytes")}
+    stats["duration_ms"] = round((time.time() - start_time) * 1000, 2)
+    logging.info(f"Archivo de conversaciones: {stats}")
+    return stats
+
+
+### Read-through ###
+
+def _archived_objects(s3, bucket: str, primary_key: str, before_sk: Optional[str], prefix: str) -> list:
+    """Objetos de la conversación que pueden tener mensajes con SK < before_sk, como
+    (SK máximo, clave) del más reciente al más antiguo. Los objetos sin rango en la clave
+    (archivados antes de incluirlo) se leen siempre, primero."""
+    objects = []
+    request = dict(Bucket=bucket, Prefix=conversation_prefix(primary_key, prefix))
+    while True:
+        listing = s3.list_objects_v2(**request)
+        for obj in listing.get('Contents', []):
+            sort_range = archive_key_range(obj['Key'])
+            if sort_range is None:
+                objects.append((None, obj['Key']))
+                continue
+            min_sk, max_sk = sort_range
+            if max_sk < MESSAGE_SK_PREFIX or (before_sk is not None and min_sk >= before_sk):
+                continue
+            objects.append((max_sk, obj['Key']))
+        if not listing.get('IsTruncated'):
+            break
+        request['ContinuationToken'] = listing['NextContinuationToken']
+    objects.sort(key=lambda entry: (entry[0] is None, entry[0] or ''), reverse=True)
+    return objects
+
+
+def read_archived_messages(primary_key: str, before_sk: Optional[str] = None, limit: int = 100,
+                           bucket: Optional[str] = None, prefix: str = CHAT_ARCHIVE_PREFIX) -> list:
+    """Mensajes archivados de la conversación con SK < before_sk, del más reciente al más antiguo.
+    Los items vienen en formato DynamoDB (igual que un query), sin duplicados entre corridas.
+    Se deja de descargar cuando los objetos restantes solo tienen mensajes más antiguos que
+    los `limit` ya encontrados."""
+    bucket = bucket or CHAT_ARCHIVE_BUCKET
+    if not bucket or limit <= 0:
+        return []
+    s3 = get_s3_client()
+    messages = {}
+    for max_sk, key in _archived_objects(s3, bucket, primary_key, before_sk, prefix):
+        if max_sk is not None and len(messages) >= limit and max_sk < sorted(messages, reverse=True)[limit - 1]:
+            break
+        body = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        for item in load_jsonl_gz(body):
+            sort_key = item['SK']['S']
+            if sort_key.startswith(MESSAGE_SK_PREFIX) and (before_sk is None or sort_key < before_sk):
+                messages[sort_key] = item
+
+    return [messages[sort_key] for sort_key in sorted(messages, reverse=True)[:limit]]
@@ -1,536 +1,362 @@
+import uuid
 import random
+import logging
 from typing import Optional
-from app.services.postgres_queries import get_property_types_from_db
-from app.models.ChatMessage import ChatHistoryElement, ChatMessage
-from app.models.PropertyLead import PropertyLead
-from app.core.config import DYNAMODB_TABLE
-from app.utils.intent_recognition import check_intent
-from app.utils.intent_filter_simple import is_real_estate_related, get_rejection_message
-from app.services.dynamodb_queries import message_wrapper_flex, serialize_item, write_message, get_latests_messages, deserialize_item, get_metadata
+from app.models.ChatMessage import ChatHistoryElement
+from app.core.config import CHAT_HISTORY_WINDOW, CHAT_SUMMARY_MAX_FOLD, WRITE_BEHIND_ENABLED
+from app.services.dynamodb_queries import deserialize_item, get_metadata, serialize_state, serialize_result_set, get_current_timestamp, apply_ttl, StateConflictError, MESSAGE_SK_PREFIX, STATE_SK, RESULT_SET_SK_PREFIX
+from app.services.storage.factory import get_chat_storage
+from app.services.dynamodb_codec import encode_chat_message, decode_attributes
+from app.core.bulkheads import get_bulkhead, run_in_bulkhead
 
 
-AGENT_NAMES = ["Sofía"]
 
-def proccess_chat_turn(user_id: str, conv_id:str, message:str, user_name: Optional[str] = None, metadata:dict = {}, verbose:bool = False):
+def proccess_chat_turn(user_id: str, conv_id:str, message:str, user_name: Optional[str] = None, metadata: Optional[dict] = None, verbose:bool = False):
     """Logica por stages para el procesamiento de chats"""
+    flow = chat_turn_flow(user_id, conv_id, message, user_name, metadata)
+    return run_chat_flow(flow, sync_effects())
 
-    primary_key = "USER#"+user_id+"#CONV#"+conv_id
 
-    # 🔄 RESET DE BÚSQUEDA - Detectar si el usuario quiere reiniciar
-    reset_keywords = [
-        'nueva búsqueda', 'nueva busqueda', 'reiniciar', 'reset', 'empezar de nuevo',
-        'volver a empezar', 'cancelar búsqueda', 'cancelar busqueda', 'comenzar otra vez',
-        'nueva consulta', 'otra búsqueda', 'otra busqueda', 'empezar otra vez'
-    ]
+async def aprocess_chat_turn(user_id: str, conv_id:str, message:str, user_name: Optional[str] = None, metadata: Optional[dict] = None, verbose:bool = False):
+    """Versión asyncio de proccess_chat_turn: misma lógica de stages, con DynamoDB, PostgreSQL
+    y Bedrock asíncronos. No bloquea el event loop."""
+    flow = chat_turn_flow(user_id, conv_id, message, user_name, metadata)
+    return await arun_chat_flow(flow, async_effects())
 
-    message_lower = message.lower().strip()
-    is_reset_request = any(keyword in message_lower for keyword in reset_keywords)
 
-    if is_reset_request:
-        print(f"DEBUG - Reset solicitado: {message}")
+def chat_turn_flow(user_id: str, conv_id:str, message:str, user_name: Optional[str] = None, metadata: Optional[dict] = None):
+    """Lógica por stages de un turno, compartida por la versión sync y la async.
 
-        # Limpiar metadata y reiniciar conversación
-        reset_metadata = {
-            'stage': 'extract',
-            'conversation_length': 2.0,
-            'user_name': user_name,
-            'awaiting_confirmation': False,
-            'reset_requested': True
-        }
+    Es un generador: cada operación de I/O (DynamoDB, PostgreSQL, Bedrock) se pide con
+    `resultado = yield effect(nombre, *args)` y la ejecuta el driver (run_chat_flow /
+    arun_chat_flow). Los stages son nodos del grafo app.graph.chat_graph.
+    Retorna (chat_stage, response)."""
+    from app.graph.chat_graph import CHAT_GRAPH, ChatTurn, commit_turn
 
-        # Respuesta de confirmación de reset
-        reset_response = {
-            'model_response': f'¡Perfecto {user_name}! Vamos a comenzar una nueva búsqueda desde cero. ¿Qué tipo de propiedad estás buscando? (ej. {', '.join(get_property_types_from_db())})'
-        }
+    primary_key = "USER#"+user_id+"#CONV#"+conv_id
+    metadata = dict(metadata or {})
+
+    # Estado de la conversación (stage, lead, confirmación, recomendaciones...): un único GetItem
+    state = yield effect('load_state', primary_key)
+    turn = ChatTurn(primary_key, message, user_name, metadata, state)
+    # Propiedades recomendadas en este turno: se guardan una sola vez como item RESULTSET#<id>
+    turn.new_result_set = migrate_legacy_recommendations(state, metadata)
+
+    # Un nodo por turno (elegido por el router) y un único guardado con su checkpoint
+    turn.stage = yield from CHAT_GRAPH.run_turn(turn)
+    yield from commit_turn(turn)
+
+    return turn.stage, turn.response
+
+
+
+# Ejecución del flujo (sync / async)
+
+def effect(name: str, *args, **kwargs):
+    """Pedido de I/O que chat_turn_flow entrega al driver."""
+    return name, args, kwargs
+
+
+def sync_effects() -> dict:
+    """Implementaciones bloqueantes de cada efecto."""
+    from app.services.stages.stage1_extract import handle, get_lead_with_prompt
+    from app.services.stages.stage2_recommend_postgres import handler
+    from app.services.stages.stage3_property_details import handle_property_details
+
+    return {
+        'load_state': load_conversation_state,
+        'save_turn': save_turn,
+        'load_recommendations': load_recommendations,
+        'load_conversation': load_conversation,
+        'recommend': handler,
+        'extract_lead': handle,
+        'property_details': handle_property_details,
+        'lead_with_prompt': get_lead_with_prompt,
+    }
+
+
+def async_effects() -> dict:
+    """Implementaciones asyncio de cada efecto."""
+    from app.services.stages.stage1_extract import ahandle, aget_lead_with_prompt
+    from app.services.stages.stage2_recommend_postgres import ahandler
+    from app.services.stages.stage3_property_details import ahandle_property_details
+
+    return {
+        'load_state': aload_conversation_state,
+        'save_turn': asave_turn,
+        'load_recommendations': aload_recommendations,
+        'load_conversation': aload_conversation,
+        'recommend': guarded("postgres", ahandler),
+        'extract_lead': guarded("bedrock", ahandle),
+        'property_details': guarded("bedrock", ahandle_property_details),
+        'lead_with_prompt': guarded("bedrock", aget_lead_with_prompt),
+    }
+
+
+def guarded(bulkhead: str, afunc):
+    """Envuelve un efecto asyncio para que ocupe un cupo del bulkhead de su dependencia."""
+    def _call(*args, **kwargs):
+        return get_bulkhead(bulkhead).guard(afunc(*args, **kwargs))
+    return _call
+
+
+def run_chat_flow(flow, effects: dict):
+    """Ejecuta el flujo resolviendo cada efecto de forma síncrona.
+    Los errores de un efecto se lanzan dentro del flujo, donde pueden capturarse."""
+    value, error = None, None
+    while True:
+        try:
+            name, args, kwargs = flow.throw(error) if error else flow.send(value)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            value, error = effects[name](*args, **kwargs), None
+        except Exception as e:
+            value, error = None, e
+
+
+async def arun_chat_flow(flow, effects: dict):
+    """Igual que run_chat_flow, esperando cada efecto (corrutinas)."""
+    value, error = None, None
+    while True:
+        try:
+            name, args, kwargs = flow.throw(error) if error else flow.send(value)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            value, error = await effects[name](*args, **kwargs), None
+        except Exception as e:
+            value, error = None, e
 
-        # Guardar mensaje de reset y respuesta
-        save_user_message(primary_key, message, reset_metadata)
-        save_response_message(primary_key, reset_response, reset_metadata, 'extract')
 
-        return 'extract', reset_response
+# Other utilities
 
-    # 🛡️ FILTRO DE INTENCIONES - Validar que la consulta sea inmobiliaria
-    is_valid, validation_reason = is_real_estate_related(message)
+def format_message(message: str, role: str="user"):
+    """Formatea el mensaje del cliente para que devuelva
+    estructura de mensaje para bedrock"""
+    return {'role': role, 'content': [{'text': message}]}
 
-    if not is_valid:
-        print(f"DEBUG - Consulta rechazada: {validation_reason}")
 
-        # Crear respuesta de rechazo
-        rejection_response = {'model_response': get_rejection_message(user_name)}
+def save_turn(primary_key: str, message: str, response, metadata: dict, stage: str, state: dict, state_updates: dict,
+              reset: bool = False, result_set: Optional[tuple] = None):
+    """Persiste el turno completo (mensaje del usuario, respuesta, estado y el result set nuevo
+    si lo hay) en una sola escritura transaccional. Un fallo no deja medio turno guardado: si
+    otro turno cambió el estado se relee y se vuelven a aplicar `state_updates`."""
+    import time
 
-        # Guardar el mensaje del usuario y la respuesta de rechazo
-        conversation_length = get_conversation_length(primary_key)
-        metadata_rejection = {
-            'stage': 'rejection',
-            'conversation_length': conversation_length + 2.0,
-            'rejection_reason': validation_reason
-        }
+    start_time = time.time()
+    try:
+        storage = get_chat_storage()
+        renewed, state_updates = renew_ttl(storage, primary_key, state, state_updates, reset, result_set, start_time)
+        items, new_state, state_item = build_turn_items(primary_key, message, response, metadata, stage, state, state_updates, reset, result_set)
+        items += renewed
+        if write_behind_active():
+            enqueue_turn(primary_key, items, state_item, state, stage, start_time, state_updates, reset)
+            return new_state
+
+        result, new_state = write_turn_with_state(storage.write_turn, storage.get_state, primary_key, items,
+                                                  state, state_updates, reset)
+        log_turn_write(stage, result, start_time)
+        return new_state
+    except Exception as e:
+        print(f"Error saving chat turn: {e}")
+        return None
 
-        if user_name:
-            metadata_rejection['user_name'] = user_name
 
-        save_user_message(primary_key, message, metadata_rejection)
-        save_response_message(primary_key, rejection_response, metadata_rejection, 'rejection')
+async def asave_turn(primary_key: str, message: str, response, metadata: dict, stage: str, state: dict, state_updates: dict,
+                     reset: bool = False, result_set: Optional[tuple] = None):
+    """Versión asyncio de save_turn"""
+    import time
 
-        return 'rejection', rejection_response
+    start_time = time.time()
+    try:
+        storage = get_chat_storage()
+        renewed, state_updates = await arenew_ttl(storage, primary_key, state, state_updates, reset, result_set, start_time)
+        items, new_state, state_item = build_turn_items(primary_key, message, response, metadata, stage, state, state_updates, reset, result_set)
+        items += renewed
+        if write_behind_active():
+            enqueue_turn(primary_key, items, state_item, state, stage, start_time, state_updates, reset)
+            return new_state
+
+        result, new_state = await awrite_turn_with_state(storage.awrite_turn, storage.aget_state, primary_key, items,
+                                                         state, state_updates, reset)
+        log_turn_write(stage, result, start_time)
+        return new_state
+    except Exception as e:
+        print(f"Error saving chat turn: {e}")
+        return None
 
-    #1. Get Chat History
-    # recuperamos historial, damos formato al nuevo mensaje y juntamos todo en una sola variable.
 
-    conversation_length = get_conversation_length(primary_key)
-    latest_messages = get_latests_messages(primary_key, limit=conversation_length)
-    latest_conversation = convert_to_conversation(latest_messages)
-    latest_conversation.append(format_message(message))
+def build_turn_items(primary_key: str, message: str, response, metadata: dict, stage: str, state: dict, state_updates: dict,
+                     reset: bool = False, result_set: Optional[tuple] = None):
+    """Items DynamoDB del turno: (mensajes + result set, nuevo estado, item de estado)."""
+    user_item = build_user_message(primary_key, message, metadata)
+    response_item = build_response_message(primary_key, response, metadata, stage)
+    # Ambos mensajes van en la misma transacción: sus SK deben ser distintos y ordenados
+    if response_item['SK']['S'] <= user_item['SK']['S']:
+        response_item['SK'] = {'S': user_item['SK']['S'] + '#1'}
 
+    items = [user_item, response_item]
+    if result_set:
+        items.append(serialize_result_set(primary_key, *result_set))
 
-    #2. Determine Stage & Metadata
-    try:
-        metadata_list = get_metadata(latest_messages)
-        last_metadata = metadata_list[0] if metadata_list else {}
-        chat_stage = last_metadata.get('stage', 'extract')
-        awaiting_confirmation = last_metadata.get('awaiting_confirmation', False)
-
-        print(f"DEBUG - Retrieved metadata:")
-        print(f"  Stage: {chat_stage}")
-        print(f"  Awaiting confirmation: {awaiting_confirmation}")
-        print(f"  Has last_recommendations: {'last_recommendations' in last_metadata}")
-        if 'last_recommendations' in last_metadata:
-            props = last_metadata.get('last_recommendations', [])
-            print(f"  Properties count: {len(props) if props else 0}")
+    new_state = build_conversation_state(state, state_updates, reset)
+    return items, new_state, serialize_state(primary_key, new_state)
 
-    except Exception as e:
-        print(f"DEBUG - Error getting metadata: {e}")
-        chat_stage = 'extract'
-        awaiting_confirmation = False
-        last_metadata = {}
-
-    #3. Route stage
-    if awaiting_confirmation and chat_stage == 'recommend':
-        # --- Flujo de confirmación: Ofrecer opciones claras al usuario ---
-        message_lower = message.lower().strip()
-        intent = check_intent(message)
-        user_name = last_metadata.get('user_name', user_name or 'amigo')
-
-        # Opción A: Mostrar propiedades enriquecidas
-        print(f"DEBUG - Checking if user wants to see properties...")
-        print(f"DEBUG - Message: '{message}' -> '{message_lower}'")
-        print(f"DEBUG - Intent: {intent}")
-
-        if (message_lower in ['a', 'a.', 'opcion a', 'opción a', 'mostrar', 'ver', 'propiedades', 'si', 'sí'] or
-            intent == 'affirmative' or
-            any(keyword in message_lower for keyword in ['ver', 'mostrar', 'interesado', 'quiero', 'gustaría', 'gustaria', 'dale', 'ok'])):
-
-            print(f"DEBUG - User wants to see properties!")
-            properties = last_metadata.get('last_recommendations', [])
-            print(f"DEBUG - Properties in metadata: {len(properties) if properties else 0}")
-            print(f"DEBUG - Metadata keys: {list(last_metadata.keys())}")
-
-            if properties:
-                print(f"DEBUG - First property sample: {properties[0] if properties else 'None'}")
-            else:
-                print(f"DEBUG - No properties in metadata, checking lead...")
-
-            if properties:
-                response = enrich_properties_display(properties, user_name)
-                metadata['awaiting_confirmation'] = False
-                chat_stage = 'display_properties'  # Nuevo stage para mostrar propiedades
-                print(f"DEBUG - Response generated: {response.get('model_response', '')[:100]}...")
-            else:
-                # Mostrar mensaje amigable cuando no hay propiedades
-                response = enrich_properties_display(properties, user_name)
-                metadata['awaiting_confirmation'] = False
-                chat_stage = 'no_properties'
-                print(f"DEBUG - No properties found, showing friendly message")
-
-        # Opción B: Iniciar nueva búsqueda
-        elif (message_lower in ['b', 'opcion b', 'opción b', 'reiniciar', 'reset', 'nueva busqueda', 'nueva búsqueda', 'nueva', 'buscar'] or
-              'nueva' in message_lower):
-
-            response = {'model_response': f'Perfecto {user_name}, vamos a comenzar una nueva búsqueda. ¿En qué ciudad o distrito te gustaría buscar una propiedad?'}
-            metadata['awaiting_confirmation'] = False
-            chat_stage = 'extract'
-            metadata['user_name'] = user_name
-
-        # Opción C: Volver atrás o cancelar
-        elif (intent == 'negative' or
-              message_lower in ['no', 'negativo', 'cancelar', 'salir', 'atrás', 'atras', 'volver']):
-
-            response = {'model_response': f'Entendido {user_name}. ¿En qué más puedo ayudarte? Puedo ayudarte a buscar propiedades o responder preguntas sobre el mercado inmobiliario.'}
-            metadata['awaiting_confirmation'] = False
-            chat_stage = 'extract'
-
-        # Opción por defecto: Repetir opciones con más claridad
-        else:
-            property_count = len(last_metadata.get('last_recommendations', []))
-            response = {'model_response': f'Hola {user_name}, encontré {property_count} propiedades que podrían interesarte. Para continuar, por favor elige una opción:\n\n🏠 **A** - Ver las propiedades encontradas\n🔍 **B** - Hacer una nueva búsqueda\n❌ **Cancelar** - Salir de la búsqueda\n\nPuedes responder simplemente con "A", "B" o "Cancelar".'}
-
-        lead = last_metadata.get('lead', {})  # Mantener el lead anterior
-    else:
-        # --- Flujo normal de conversación ---
-        for i in range(5): #loop protect (5 times)
-            print("loop count: ", i)
-            match chat_stage:
-                case "extract":
-                    from app.services.stages.stage1_extract_intuitive import handle_smart_extraction, is_greeting_message, generate_greeting_response
-
-                    # Obtener lead actual de metadata si existe
-                    current_lead = last_metadata.get('lead')
-                    if current_lead:
-                        current_lead = PropertyLead(**current_lead)
-
-                    # Detectar si es un saludo simple
-                    if is_greeting_message(message) and not current_lead:
-                        response = {'model_response': generate_greeting_response(user_name)}
-                        lead = PropertyLead()  # Lead vacío para empezar
-                    else:
-                        # Usar extracción inteligente
-                        smart_result = handle_smart_extraction(latest_conversation, current_lead)
-                        response = smart_result
-                        lead = smart_result["lead"]
-
-                        if smart_result["next_stage"] == True:
-                            from app.services.stages.stage2_recommend_postgres import handler as stage2_handler
-                            chat_stage = "recommend"
-                            properties = stage2_handler(lead)
-
-                            # Guardar propiedades y configurar confirmación
-                            metadata['last_recommendations'] = properties
-                            metadata['awaiting_confirmation'] = True
-
-                            user_name = last_metadata.get('user_name', user_name)
-                            property_count = len(properties) if properties else 0
-                            response = {'model_response': f'¡Perfecto {user_name}! Encontré {property_count} propiedades que podrían interesarte. ¿Qué te gustaría hacer?\n\nA. 🏠 Mostrar las propiedades encontradas\nB. 🔍 Hacer una nueva búsqueda\n\nPor favor, responde con "A" o "B" para indicarme qué deseas hacer.'}
-                    break
-                case "recommend":
-                    # Este caso ahora solo se activa la primera vez que se recomienda.
-                    # La confirmación se maneja arriba.
-                    from app.services.stages.stage1_extract import handle as stage1_handler # Re-evaluar
-                    response = stage1_handler(latest_conversation)
-                    lead = response["lead"]
-                    if not response["next_stage"]:
-                        chat_stage = 'extract'
-                    break
-                case "display_properties":
-                    # Stage 3: Manejo post-visualización de propiedades
-                    message_lower = message.lower().strip()
-                    intent = check_intent(message)
-                    user_name = last_metadata.get('user_name', user_name or 'amigo')
-
-                    if message_lower in ['a', 'opcion a', 'opción a', 'buscar', 'nueva'] or 'nueva' in message_lower:
-                        # Nueva búsqueda
-                        response = {'model_response': f'Perfecto {user_name}, vamos a comenzar una nueva búsqueda. ¿En qué ciudad o distrito te gustaría buscar una propiedad?'}
-                        chat_stage = 'extract'
-                    elif message_lower in ['b', 'opcion b', 'opción b', 'detalles', 'más'] or 'detalle' in message_lower:
-                        # Solicitar más detalles
-                        response = {'model_response': f'¡Claro {user_name}! ¿Sobre cuál propiedad te gustaría saber más? Puedes decirme el número de la opción (1, 2, 3...) o la referencia.'}
-                        chat_stage = 'property_details'
-                    elif message_lower in ['c', 'opcion c', 'opción c', 'refinar', 'filtrar']:
-                        # Refinar búsqueda
-                        response = {'model_response': f'Excelente {user_name}, vamos a refinar tu búsqueda. ¿Qué criterio te gustaría ajustar? Por ejemplo: presupuesto, número de habitaciones, ubicación específica, etc.'}
-                        chat_stage = 'refine_search'
-                    elif message_lower in ['salir', 'terminar', 'cancelar'] or intent == 'negative':
-                        # Terminar búsqueda
-                        response = {'model_response': f'Entendido {user_name}. Ha sido un placer ayudarte en tu búsqueda. Si necesitas algo más, estaré aquí para asistirte.'}
-                        chat_stage = 'extract'
-                    else:
-                        # Respuesta por defecto
-                        response = {'model_response': f'No estoy seguro de entender {user_name}. ¿Podrías elegir una de las opciones?\n\n🔍 **A** - Nueva búsqueda\n💬 **B** - Más detalles\n🔄 **C** - Refinar búsqueda\n❌ **Salir** - Terminar'}
-
-                    lead = last_metadata.get('lead', {})
-                    break
-                case "no_properties":
-                    # Stage para manejar cuando no se encuentran propiedades
-                    message_lower = message.lower().strip()
-                    intent = check_intent(message)
-                    user_name = last_metadata.get('user_name', user_name or 'amigo')
-
-                    if message_lower in ['a', 'opcion a', 'opción a', 'buscar', 'nueva'] or 'nueva' in message_lower:
-                        # Nueva búsqueda
-                        response = {'model_response': f'Perfecto {user_name}, vamos a comenzar una nueva búsqueda. ¿En qué ciudad o distrito te gustaría buscar una propiedad?'}
-                        chat_stage = 'extract'
-                    elif message_lower in ['b', 'opcion b', 'opción b', 'refinar', 'filtrar'] or 'refin' in message_lower:
-                        # Refinar búsqueda
-                        response = {'model_response': f'Excelente {user_name}, vamos a refinar tu búsqueda. ¿Qué criterio te gustaría ajustar? Por ejemplo: presupuesto, número de habitaciones, ubicación específica, etc.'}
-                        chat_stage = 'refine_search'
-                    elif message_lower in ['salir', 'terminar', 'cancelar'] or intent == 'negative':
-                        # Terminar búsqueda
-                        response = {'model_response': f'Entendido {user_name}. Ha sido un placer ayudarte en tu búsqueda. Si necesitas algo más, estaré aquí para asistirte.'}
-                        chat_stage = 'extract'
-                    else:
-                        # Repetir opciones con más claridad
-                        response = {'model_response': f'😔 Lo siento {user_name}, por el momento no tenemos propiedades disponibles en tu búsqueda.\n\n¿Te gustaría hacer una nueva búsqueda o refinar tus criterios?\n\n🔍 **A** - Hacer una nueva búsqueda en otra ubicación\n🔄 **B** - Refinar tus criterios de búsqueda (presupuesto, tipo, etc.)\n❌ **Salir** - Terminar la búsqueda\n\nPor favor, responde con "A", "B" o "Salir".'}
-
-                    lead = last_metadata.get('lead', {})
-                    break
-                case "property_details":
-                    # Stage para manejar solicitudes de detalles específicos
-                    from app.services.stages.stage3_property_details import handle_property_details
-                    properties = last_metadata.get('last_recommendations', [])
-                    user_name = last_metadata.get('user_name', user_name or 'amigo')
-
-                    response = handle_property_details(message, properties, user_name)
-                    lead = last_metadata.get('lead', {})
-
-                    # Mantener el stage para seguir manejando detalles
-                    if 'selected_property' in response:
-                        metadata['selected_property'] = response['selected_property']
-                    break
-                case "refine_search":
-                    # Stage para refinamiento de búsqueda
-                    from app.services.stages.stage4_refine_search import handle_search_refinement
-                    current_lead = last_metadata.get('lead', {})
-                    user_name = last_metadata.get('user_name', user_name or 'amigo')
-
-                    response = handle_search_refinement(message, current_lead, user_name)
-                    lead = current_lead  # Mantener el lead actual
-
-                    # Si el usuario especifica un refinamiento, actualizar el stage
-                    if response.get('refinement_type') and response.get('refinement_type') != 'selection':
-                        chat_stage = 'update_criteria'
-                        metadata['refinement_type'] = response['refinement_type']
-                    break
-                case "update_criteria":
-                    # Stage para actualizar criterios específicos
-                    from app.services.stages.stage1_extract import get_lead_with_prompt
-                    refinement_type = last_metadata.get('refinement_type')
-                    user_name = last_metadata.get('user_name', user_name or 'amigo')
-                    current_lead = last_metadata.get('lead', {})
-
-                    # Crear prompt para actualizar solo el criterio específico
-                    update_prompt = f"""
-                    El usuario quiere actualizar el criterio '{refinement_type}' de su búsqueda inmobiliaria.
-
-                    Criterios actuales: {dict(current_lead) if current_lead else {}}
-
-                    Nuevo mensaje del usuario: {message}
-
-                    Extrae SOLO el nuevo valor para '{refinement_type}' del mensaje del usuario.
-                    """
-
-                    try:
-                        updated_lead = get_lead_with_prompt(update_prompt)
-                        # Combinar el lead actual con la actualización
-                        if current_lead:
-                            for key, value in dict(current_lead).items():
-                                if getattr(updated_lead, key, None) is None and value is not None:
-                                    setattr(updated_lead, key, value)
-
-                        lead = updated_lead
-
-                        # Confirmar la actualización y ofrecer nueva búsqueda
-                        updated_value = getattr(updated_lead, refinement_type, None)
-                        response = {
-                            'model_response': f'Perfecto {user_name}, he actualizado tu criterio de {refinement_type} a: {updated_value}. ¿Te gustaría que busque propiedades con estos nuevos criterios?\n\n✅ **Sí** - Buscar con criterios actualizados\n🔄 **Refinar más** - Ajustar otros criterios\n❌ **Cancelar** - Volver al menú principal'
-                        }
-                        chat_stage = 'confirm_updated_search'
-                    except Exception as e:
-                        response = {
-                            'model_response': f'Lo siento {user_name}, no pude procesar esa actualización. ¿Podrías ser más específico sobre el {refinement_type} que buscas?'
-                        }
-                        lead = current_lead
-                    break
-                case "confirm_updated_search":
-                    # Confirmar búsqueda con criterios actualizados
-                    message_lower = message.lower().strip()
-                    user_name = last_metadata.get('user_name', user_name or 'amigo')
-                    current_lead = last_metadata.get('lead', {})
-
-                    if message_lower in ['si', 'sí', 'yes', 'buscar', 'dale'] or 'si' in message_lower:
-                        # Ejecutar nueva búsqueda con criterios actualizados
-                        from app.services.stages.stage2_recommend_postgres import handler as stage2_handler
-                        properties = stage2_handler(current_lead)
-
-                        metadata['last_recommendations'] = properties
-                        metadata['awaiting_confirmation'] = True
-                        chat_stage = 'recommend'
-
-                        response = {
-                            'model_response': f'¡Excelente {user_name}! He encontrado propiedades con tus nuevos criterios. ¿Qué te gustaría hacer?\n\nA. 🏠 Ver las propiedades encontradas\nB. 🔍 Hacer otra búsqueda\n\nResponde con "A" o "B".'
-                        }
-                    elif 'refinar' in message_lower or 'ajustar' in message_lower:
-                        # Volver a refinar
-                        chat_stage = 'refine_search'
-                        response = {
-                            'model_response': f'Claro {user_name}, ¿qué otro criterio te gustaría ajustar?'
-                        }
-                    else:
-                        # Cancelar o volver al menú
-                        chat_stage = 'extract'
-                        response = {
-                            'model_response': f'Entendido {user_name}. ¿En qué más puedo ayudarte?'
-                        }
-
-                    lead = current_lead
-                    break
-
-    #4. Metadata & Message Saving
-    metadata['stage'] = chat_stage
-    metadata['lead'] = lead if 'lead' in locals() else last_metadata.get('lead', {})
-    metadata['conversation_length'] = conversation_length + 2.0
-    # Guardar el nombre del usuario en los metadatos si está disponible
-    if user_name:
-        metadata['user_name'] = user_name
-
-    # Si la respuesta es una lista de propiedades (primera vez en recommend), guardar en metadata
-    if isinstance(response, list) and len(response) > 0:
-        metadata['last_recommendations'] = response
-        metadata['awaiting_confirmation'] = True
-    elif chat_stage == 'recommend' and 'last_recommendations' in metadata and len(metadata.get('last_recommendations', [])) > 0:
-        # Si estamos en recommend y ya tenemos propiedades, mantener awaiting_confirmation
-        metadata['awaiting_confirmation'] = True
-    else:
-        # Asegurarse que no quede el flag si la respuesta no es una lista
-        metadata['awaiting_confirmation'] = False
-
-    save_user_message(primary_key, message, metadata)
-    response_to_save = response
-    if isinstance(response, list):
-        response_to_save = {'model_response': f'Encontré {len(response)} propiedades.'}
-
-    # Asegurar que chat_stage esté definido
-    if 'chat_stage' not in locals():
-        chat_stage = metadata.get('stage', 'extract')
-        print(f"DEBUG - chat_stage was undefined, using: {chat_stage}")
-
-    save_response_message(primary_key, response_to_save, metadata, chat_stage)
-
-    #5. Añadir saludo personalizado para conversaciones nuevas
-    if conversation_length == 0:
-        agent_name = random.choice(AGENT_NAMES)
-
-        # Saludos más naturales y variados
-        greetings = [
-            f"¡Hola! Soy {agent_name}, tu agente inmobiliario virtual. Me da mucho gusto conocerte",
-            f"¡Qué tal! Mi nombre es {agent_name} y seré tu asistente para encontrar la propiedad perfecta",
-            f"¡Hola! Soy {agent_name}, especialista en bienes raíces. Estoy aquí para ayudarte",
-            f"¡Bienvenido! Me llamo {agent_name} y me especializo en ayudar a encontrar propiedades ideales"
-        ]
 
-        if user_name:
-            personalized_greetings = [
-                f"¡Hola {user_name}! Soy {agent_name}, tu agente inmobiliario virtual. Es un placer conocerte",
-                f"¡Qué tal {user_name}! Mi nombre es {agent_name} y seré tu asistente personal para encontrar tu propiedad ideal",
-                f"¡Hola {user_name}! Soy {agent_name}, especialista en bienes raíces. Estoy aquí para ayudarte en todo lo que necesites",
-                f"¡Bienvenido {user_name}! Me llamo {agent_name} y me especializo en conectar personas con sus hogares perfectos"
-            ]
-            greeting = random.choice(personalized_greetings)
-        else:
-            greeting = random.choice(greetings)
-
-        # Combinar el saludo personalizado con la pregunta del chatbot de forma fluida
-        if isinstance(response, dict) and response.get("model_response"):
-            model_message = response.get("model_response")
-            # Eliminar saludos genéricos del chatbot si existen
-            generic_starts = ['¡Hola! ', 'Hola, ', 'Hola ', '¡Hola, ']
-            for start in generic_starts:
-                if model_message.startswith(start):
-                    model_message = model_message.replace(start, '', 1)
-                    break
-
-            response["model_response"] = f"{greeting}. {model_message}"
-        else:
-            # Si no hay respuesta del modelo, crear una introducción completa
-            intro_questions = [
-                "¿Qué tipo de propiedad estás buscando?",
-                "¿En qué zona te gustaría vivir?",
-                "¿Estás buscando para comprar o alquilar?",
-                "Cuéntame, ¿qué características debe tener tu propiedad ideal?"
-            ]
-            intro_question = random.choice(intro_questions)
-            response = {'model_response': f"{greeting}. {intro_question}"}
-
-    #6. Retornar respuesta
-    return chat_stage, response
+def ttl_renewal_due(state: dict, now: float) -> bool:
+    """Los items tienen un TTL fijo desde que se escriben: los que la conversación sigue usando
+    se renuevan cuando pasó la mitad del TTL desde la última renovación (`ttl_renewed_at`)."""
+    from app.core.config import CHAT_TTL_DAYS
 
+    if CHAT_TTL_DAYS <= 0 or not state:
+        return False
+    return now - float(state.get('ttl_renewed_at', 0)) >= CHAT_TTL_DAYS * 86400 / 2
 
 
-# Other utilities
+def ttl_renewal_keys(state: dict, state_updates: dict, reset: bool = False, result_set: Optional[tuple] = None):
+    """Qué renovar: los mensajes aún no resumidos (ventana del LLM y pendientes del resumen), como
+    argumentos de messages_between, y el id del result set referenciado si el turno no escribe uno."""
+    new_state = build_conversation_state(state, state_updates, reset)
+    messages = {
+        'start_sk': new_state.get('summarized_until', MESSAGE_SK_PREFIX),
+        'end_sk': new_message_sk(),
+        'limit': CHAT_HISTORY_WINDOW + CHAT_SUMMARY_MAX_FOLD
+    }
+    result_set_id = None if result_set else (new_state.get('result_set') or {}).get('id')
+    return messages, result_set_id
 
-def format_message(message: str, role: str="user"):
-    """Formatea el mensaje del cliente para que devuelva
-    estructura de mensaje para bedrock"""
-    return {'role': role, 'content': [{'text': message}]}
 
+def renewed_items(primary_key: str, messages: dict, result_set_id: Optional[str], properties: list, now: float) -> list:
+    """Copias de los items con el TTL contado desde `now`."""
+    from app.core.config import CHAT_TTL_DAYS
+
+    items = [apply_ttl(dict(item), CHAT_TTL_DAYS, now) for item in messages.get('Items', [])]
+    if properties:
+        items.append(apply_ttl(serialize_result_set(primary_key, result_set_id, properties), CHAT_TTL_DAYS, now))
+    return items
 
-def save_user_message(primary_key, message, metadata):
-    """Code for formatting user message and saving into dynamoDB"""
 
+def renew_ttl(storage, primary_key: str, state: dict, state_updates: dict, reset: bool,
+              result_set: Optional[tuple], now: float):
+    """Items a reescribir en el turno con el TTL renovado y los state_updates con `ttl_renewed_at`.
+    Si la lectura falla el turno se guarda igual y la renovación queda para el siguiente."""
+    if not ttl_renewal_due(state, now):
+        return [], state_updates
+    messages, result_set_id = ttl_renewal_keys(state, state_updates, reset, result_set)
     try:
-        user_data_dict = {
-            "PK" : primary_key,
-            "role" : "user",
-            "content_type": "text",
-            "content": {
-                "text" : message
-            },
-            "metadata": metadata
-        }
-        user_message_dict = message_wrapper_flex(user_data_dict)
-        formatted_message = ChatMessage(**user_message_dict)
-        serialized_user_message = serialize_item(formatted_message)
-        return write_message(DYNAMODB_TABLE, serialized_user_message)
+        items = storage.messages_between(primary_key, **messages)
+        properties = storage.get_result_set(primary_key, result_set_id) if result_set_id else []
     except Exception as e:
-        print(f"Error saving user message: {e}")
-        return None
+        logging.warning(f"No se pudo renovar el TTL de {primary_key}: {e}")
+        return [], state_updates
+    return renewed_items(primary_key, items, result_set_id, properties, now), {**state_updates, 'ttl_renewed_at': int(now)}
+
 
-def save_response_message(primary_key:str, response, metadata:dict, stage:str):
-    """Code for formatting response and saving into dynamoDB"""
+async def arenew_ttl(storage, primary_key: str, state: dict, state_updates: dict, reset: bool,
+                     result_set: Optional[tuple], now: float):
+    """Versión asyncio de renew_ttl"""
+    if not ttl_renewal_due(state, now):
+        return [], state_updates
+    messages, result_set_id = ttl_renewal_keys(state, state_updates, reset, result_set)
     try:
-        match stage:
-            case "extract":
-                data_dict = {
-                    "PK" : primary_key,
-                    "role" : "assistant",
-                    "content_type": "text",
-                    "content": {
-                        "text" : response.get('model_response')
-                    },
-                    "metadata": metadata
-                }
+        items = await storage.amessages_between(primary_key, **messages)
+        properties = await storage.aget_result_set(primary_key, result_set_id) if result_set_id else []
+    except Exception as e:
+        logging.warning(f"No se pudo renovar el TTL de {primary_key}: {e}")
+        return [], state_updates
+    return renewed_items(primary_key, items, result_set_id, properties, now), {**state_updates, 'ttl_renewed_at': int(now)}
+
+
+def write_turn_with_state(write, read_state, primary_key: str, items: list, state: dict, state_updates: dict,
+                          reset: bool = False):
+    """Escribe los items del turno con el estado nuevo condicionado a la `version` leída.
+
+    Si otro turno cambió el estado (StateConflictError) se relee y se vuelven a aplicar
+    `state_updates`, hasta CHAT_STATE_CONFLICT_RETRIES veces; agotados los reintentos se
+    propaga el error sin haber escrito nada. Retorna (resultado, estado guardado)."""
+    from app.core.config import CHAT_STATE_CONFLICT_RETRIES
+
+    for attempt in range(CHAT_STATE_CONFLICT_RETRIES + 1):
+        new_state = build_conversation_state(state, state_updates, reset)
+        try:
+            result = write(items, state_item=serialize_state(primary_key, new_state),
+                           expected_version=state.get('version', 0))
+        except StateConflictError:
+            if attempt == CHAT_STATE_CONFLICT_RETRIES:
+                raise
+            state = read_state(primary_key) or {}
+            continue
+        return {**result, 'state_retries': attempt}, new_state
+
+
+async def awrite_turn_with_state(write, read_state, primary_key: str, items: list, state: dict, state_updates: dict,
+                                 reset: bool = False):
+    """Versión asyncio de write_turn_with_state"""
+    from app.core.config import CHAT_STATE_CONFLICT_RETRIES
+
+    for attempt in range(CHAT_STATE_CONFLICT_RETRIES + 1):
+        new_state = build_conversation_state(state, state_updates, reset)
+        try:
+            result = await write(items, state_item=serialize_state(primary_key, new_state),
+                                 expected_version=state.get('version', 0))
+        except StateConflictError:
+            if attempt == CHAT_STATE_CONFLICT_RETRIES:
+                raise
+            state = await read_state(primary_key) or {}
+            continue
+        return {**result, 'state_retries': attempt}, new_state
+
+
+def enqueue_turn(primary_key: str, items: list, state_item: dict, state: dict, stage: str, start_time: float,
+                 state_updates: Optional[dict] = None, reset: bool = False):
+    """Write-behind: la escritura a DynamoDB queda fuera del camino de la respuesta."""
+    import time
+    from app.utils.logger import log_performance
+    from app.services.write_behind import get_write_behind_queue
+
+    get_write_behind_queue().enqueue(primary_key, items, state_item, expected_version=state.get('version', 0),
+                                     state_updates=state_updates, reset=reset)
+    log_performance("dynamodb_enqueue_turn", (time.time() - start_time) * 1000, {"stage": stage})
+
+
+def log_turn_write(stage: str, result: dict, start_time: float):
+    import time
+    from app.utils.logger import log_performance
+
+    log_performance("dynamodb_write_turn", (time.time() - start_time) * 1000, {
+        "stage": stage,
+        "consumed_capacity": result.get('consumed_capacity'),
+        "state_retries": result.get('state_retries', 0)
+    })
+
+
+def build_user_message(primary_key, message, metadata):
+    """Code for formatting user message into a dynamoDB item"""
+    return apply_ttl(encode_chat_message(primary_key, new_message_sk(), "user", "text", {"text": message}, metadata))
+
+def build_response_message(primary_key:str, response, metadata:dict, stage:str):
+    """Code for formatting response into a dynamoDB item"""
+    match stage:
+            case "extract" | "display_properties" | "property_details" | "refine_search" | "update_criteria" | "confirm_updated_search" | "rejection":
+                content_type, content = "text", {"text": response.get('model_response')}
             case "recommend":
-                data_dict = {
-                    "PK" : primary_key,
-                    "role" : "assistant",
-                    "content_type": "property_list",
-                    "content": {
-                        "properties" : response
-                    },
-                    "metadata": metadata
-                }
-            case "display_properties" | "property_details" | "refine_search" | "update_criteria" | "confirm_updated_search" | "rejection":
-                data_dict = {
-                    "PK" : primary_key,
-                    "role" : "assistant",
-                    "content_type": "text",
-                    "content": {
-                        "text" : response.get('model_response')
-                    },
-                    "metadata": metadata
-                }
+                content_type, content = "property_list", {"properties": response}
             case _:
-                data_dict = {
-                    "PK" : primary_key,
-                    "role" : "assistant",
-                    "content_type": "text",
-                    "content": {
-                        "text" : "error saving response message"
-                    },
-                    "metadata": metadata
-                }
-        message_dict = message_wrapper_flex(data_dict)
-        formatted_message = ChatMessage(**message_dict)
-        ser_item = serialize_item(formatted_message)
-        return write_message(DYNAMODB_TABLE, ser_item)
-    except Exception as e:
-        print(f"Error saving response message: {e}")
-        return None
+                content_type, content = "text", {"text": "error saving response message"}
+    return apply_ttl(encode_chat_message(primary_key, new_message_sk(), "assistant", content_type, content, metadata))
+
+
+def new_message_sk() -> str:
+    return MESSAGE_SK_PREFIX + get_current_timestamp()
 
 
 def convert_to_conversation(latest_messages):
     """Convierte los mensajes en una conversación bedrock"""
     messages = []
     for serialized_item in latest_messages.get("Items"):
-        item = deserialize_item(serialized_item)
+        # Solo se decodifican los atributos usados (no la metadata)
+        item = decode_attributes(serialized_item, ('role', 'content', 'content_type'))
 
         match item.get('content_type'):
             case 'text':
@@ -550,22 +376,276 @@ def convert_to_conversation(latest_messages):
 
 
 
-def get_conversation_length(primary_key: str) -> int:
-    """Permite recuperar la cantidad de mensajes dentro del contexto actual"""
+def load_conversation(primary_key: str, state: dict, message: str):
+    """Recupera la ventana de los últimos CHAT_HISTORY_WINDOW mensajes en formato bedrock,
+    antepone el resumen acumulado de los mensajes anteriores y agrega el nuevo mensaje.
+
+    Retorna (conversation, state_updates) con los cambios del resumen a persistir en el estado."""
+    latest_messages = get_chat_storage().latest_messages(primary_key, limit=CHAT_HISTORY_WINDOW)
+    summary_updates = update_rolling_summary(primary_key, state, latest_messages.get('Items', []))
+    return build_windowed_conversation(latest_messages, summary_updates.get('summary', state.get('summary')), message), summary_updates
 
+
+async def aload_conversation(primary_key: str, state: dict, message: str):
+    """Versión asyncio de load_conversation"""
+    latest_messages = await get_chat_storage().alatest_messages(primary_key, limit=CHAT_HISTORY_WINDOW)
+    summary_updates = await aupdate_rolling_summary(primary_key, state, latest_messages.get('Items', []))
+    return build_windowed_conversation(latest_messages, summary_updates.get('summary', state.get('summary')), message), summary_updates
+
+
+def build_windowed_conversation(latest_messages: dict, summary: Optional[str], message: str) -> list:
+    """Ventana de mensajes en formato bedrock + nuevo mensaje, con el resumen antepuesto."""
+    latest_conversation = convert_to_conversation(latest_messages)
+    # Bedrock exige que la conversación empiece con un mensaje del usuario
+    while latest_conversation and latest_conversation[0]['role'] != 'user':
+        latest_conversation.pop(0)
+    latest_conversation.append(format_message(message))
+
+    if summary:
+        first_text = latest_conversation[0]['content'][0]['text']
+        latest_conversation[0] = format_message(f"(Resumen de la conversación previa: {summary})\n{first_text}")
+
+    return latest_conversation
+
+
+def update_rolling_summary(primary_key: str, state: dict, window_items: list) -> dict:
+    """Incorpora al resumen los mensajes que quedaron fuera de la ventana y aún no fueron resumidos.
+
+    Lee los pendientes más antiguos (como máximo CHAT_SUMMARY_MAX_FOLD por turno), así el costo
+    por turno no crece con el largo de la conversación; el resto se resume en los turnos siguientes."""
+    pending = pending_summary_count(state, window_items)
+    if pending <= 0:
+        return {}
+
+    from app.services.stages.stage_logic import summarize_rolling
+
+    try:
+        pending_messages = get_chat_storage().messages_between(primary_key, **pending_summary_range(state, window_items, pending))
+        if not pending_messages.get('Items'):
+            return {}
+        summary = summarize_rolling(state.get('summary'), convert_to_conversation(pending_messages))
+    except Exception as e:
+        print(f"DEBUG - Error updating rolling summary: {e}")
+        return {}
+
+    return summary_state_updates(state, pending_messages, summary)
+
+
+async def aupdate_rolling_summary(primary_key: str, state: dict, window_items: list) -> dict:
+    """Versión asyncio de update_rolling_summary"""
+    pending = pending_summary_count(state, window_items)
+    if pending <= 0:
+        return {}
+
+    from app.services.stages.stage_logic import asummarize_rolling
+
+    try:
+        pending_messages = await get_chat_storage().amessages_between(primary_key, **pending_summary_range(state, window_items, pending))
+        if not pending_messages.get('Items'):
+            return {}
+        summary = await asummarize_rolling(state.get('summary'), convert_to_conversation(pending_messages))
+    except Exception as e:
+        print(f"DEBUG - Error updating rolling summary: {e}")
+        return {}
+
+    return summary_state_updates(state, pending_messages, summary)
+
+
+def pending_summary_count(state: dict, window_items: list) -> int:
+    """Mensajes fuera de la ventana que aún no están en el resumen."""
+    if not window_items:
+        return 0
+    return state.get('conversation_length', 0) - int(state.get('summarized_count', 0)) - len(window_items)
+
+
+def pending_summary_range(state: dict, window_items: list, pending: int) -> dict:
+    return {
+        'start_sk': state.get('summarized_until', MESSAGE_SK_PREFIX),
+        'end_sk': window_items[0]['SK']['S'],
+        'limit': min(pending, CHAT_SUMMARY_MAX_FOLD),
+        'oldest_first': True  # sin saltear mensajes si hay más pendientes que el máximo
+    }
+
+
+def summary_state_updates(state: dict, pending_messages: dict, summary: str) -> dict:
+    """Avanza el resumen solo por los mensajes efectivamente resumidos."""
+    return {
+        'summary': summary,
+        'summarized_until': pending_messages['Items'][-1]['SK']['S'],
+        'summarized_count': int(state.get('summarized_count', 0)) + len(pending_messages['Items'])
+    }
+
+
+def load_conversation_state(primary_key: str) -> dict:
+    """Recupera el estado de la conversación con un GetItem fuertemente consistente.
+
+    Para conversaciones creadas antes del item de estado se deriva de la metadata del
+    último mensaje (una sola vez: el siguiente turno ya escribe el item de estado).
+    Con write-behind activo, primero se vacía la cola de la conversación (read-your-writes)."""
+
+    state = read_pending_state(primary_key) if write_behind_active() else None
+    if state is None:
+        try:
+            state = get_chat_storage().get_state(primary_key)
+        except Exception as e:
+            print(f"DEBUG - Error reading conversation state: {e}")
+            state = None
+
+    if state is None:
+        try:
+            state = legacy_state_from_messages(get_chat_storage().latest_messages(primary_key, limit=1))
+        except Exception as e:
+            print('Stage_1:message_recovery: No conversation history found')
+            state = {'version': 0}
+
+    return normalize_state(state)
+
+
+async def aload_conversation_state(primary_key: str) -> dict:
+    """Versión asyncio de load_conversation_state"""
+
+    state = await run_in_bulkhead("dynamodb", read_pending_state, primary_key) if write_behind_active() else None
+    if state is None:
+        try:
+            state = await get_chat_storage().aget_state(primary_key)
+        except Exception as e:
+            print(f"DEBUG - Error reading conversation state: {e}")
+            state = None
+
+    if state is None:
+        try:
+            state = legacy_state_from_messages(await get_chat_storage().alatest_messages(primary_key, limit=1))
+        except Exception as e:
+            print('Stage_1:message_recovery: No conversation history found')
+            state = {'version': 0}
+
+    return normalize_state(state)
+
+
+def legacy_state_from_messages(last_message: dict) -> dict:
+    metadata_list = get_metadata(last_message) if last_message.get('Items') else []
+    state = dict(metadata_list[0] or {}) if metadata_list else {}
+    state['version'] = 0
+    return state
+
+
+def normalize_state(state: dict) -> dict:
+    state['conversation_length'] = int(state.get('conversation_length', 0))
+    state['version'] = int(state.get('version', 0))
+    return state
+
+
+def attach_result_set(metadata: dict, properties: list, page: int = 1) -> tuple:
+    """Registra en la metadata solo la referencia a las recomendaciones (id + ids de propiedades
+    y, si hay más resultados, el cursor de la página siguiente).
+    Retorna (result_set_id, properties) para que save_turn escriba el item RESULTSET# del turno."""
+    result_set_id = uuid.uuid4().hex
+    next_cursor = getattr(properties, 'next_cursor', None)
+    properties = properties or []
+    metadata['result_set'] = {
+        'id': result_set_id,
+        'property_ids': [prop.get('id') for prop in properties if isinstance(prop, dict)],
+        'count': len(properties),
+        'page': page
+    }
+    if next_cursor:
+        metadata['result_set']['next_cursor'] = next_cursor
+    return result_set_id, properties
+
+
+def recommendation_count(metadata: dict) -> int:
+    """Cantidad de propiedades recomendadas sin hidratar el result set."""
+    return int((metadata.get('result_set') or {}).get('count', 0))
+
+
+def load_recommendations(primary_key: str, state: dict, pending_result_set: Optional[tuple] = None) -> list:
+    """Hidrata las propiedades del result set referenciado en el estado (GetItem bajo demanda)."""
+    result_set = state.get('result_set') or {}
+    local = local_recommendations(primary_key, result_set, pending_result_set)
+    if local is not None:
+        return local
+    try:
+        return get_chat_storage().get_result_set(primary_key, result_set['id'])
+    except Exception as e:
+        print(f"DEBUG - Error loading result set {result_set.get('id')}: {e}")
+        return []
+
+
+async def aload_recommendations(primary_key: str, state: dict, pending_result_set: Optional[tuple] = None) -> list:
+    """Versión asyncio de load_recommendations"""
+    result_set = state.get('result_set') or {}
+    local = local_recommendations(primary_key, result_set, pending_result_set)
+    if local is not None:
+        return local
+    try:
+        return await get_chat_storage().aget_result_set(primary_key, result_set['id'])
+    except Exception as e:
+        print(f"DEBUG - Error loading result set {result_set.get('id')}: {e}")
+        return []
+
+
+def local_recommendations(primary_key: str, result_set: dict, pending_result_set: Optional[tuple] = None) -> Optional[list]:
+    """Propiedades disponibles sin leer DynamoDB (result set de este turno o aún en la cola
+    write-behind); None si hay que leer el item RESULTSET#."""
+    if pending_result_set and pending_result_set[0] == result_set.get('id'):
+        return pending_result_set[1]
+    if not result_set.get('id'):
+        return []
+    if write_behind_active():
+        from app.services.write_behind import get_write_behind_queue
+        pending = get_write_behind_queue().pending_item(primary_key, RESULT_SET_SK_PREFIX + result_set['id'])
+        if pending is not None:
+            return pending.get('properties', [])
+    return None
+
+
+def migrate_legacy_recommendations(state: dict, metadata: dict) -> Optional[tuple]:
+    """Estados antiguos guardaban las propiedades completas en `last_recommendations`:
+    se mueven a un result set y el estado queda solo con la referencia."""
+    legacy = state.pop('last_recommendations', None)
+    if legacy is None or state.get('result_set'):
+        return None
+    result_set = attach_result_set(metadata, legacy)
+    state['result_set'] = metadata['result_set']
+    return result_set
+
+
+def write_behind_active() -> bool:
+    """La cola write-behind solo aplica cuando el backend de almacenamiento es DynamoDB."""
+    return WRITE_BEHIND_ENABLED and get_chat_storage().write_behind
+
+
+def read_pending_state(primary_key: str) -> Optional[dict]:
+    """Vacía la cola write-behind de la conversación; si aún quedan turnos sin escribir
+    (ej. DynamoDB no disponible) retorna el estado más reciente de la cola local."""
+    from app.services.write_behind import get_write_behind_queue
+
+    queue = get_write_behind_queue()
+    if not queue.has_pending(primary_key):
+        return None
     try:
-        last_message = get_latests_messages(primary_key, limit=1)
-        conversation_length = int(last_message['Items'][0]['metadata']['M']['conversation_length']['N'])
+        queue.flush(primary_key, ignore_backoff=True)
     except Exception as e:
-        conversation_length = 0
-        print('Stage_1:message_recovery: No conversation history found')
+        print(f"DEBUG - Error flushing write-behind queue: {e}")
+    state = queue.pending_item(primary_key, STATE_SK)
+    if state is not None:
+        state.pop('PK', None)
+        state.pop('SK', None)
+    return state
+
 
-    return conversation_length
+def build_conversation_state(state: dict, updates: dict, reset: bool = False) -> dict:
+    """Nuevo estado = estado anterior + cambios del turno, incrementando `version`."""
+    new_state = {} if reset else dict(state)
+    new_state.update(updates)
+    new_state['version'] = state.get('version', 0) + 1
+    return new_state
 
 
-def enrich_properties_display(properties, user_name=""):
+def enrich_properties_display(properties, user_name="", has_more=False):
     """
     Enriquecer la presentación de las propiedades encontradas con un toque más humano
+    (con `has_more` se ofrece la opción "Ver más")
     """
     if not properties:
         # Mensaje amigable cuando no se encuentran propiedades con sugerencias de alternativas
@@ -635,7 +715,10 @@ def enrich_properties_display(properties, user_name=""):
 🔍 **A** - Buscar más propiedades con otros criterios
 💬 **B** - Contarme más detalles sobre alguna propiedad
 🔄 **C** - Refinar mi búsqueda actual
-❌ **Salir** - Terminar la búsqueda
+❌ **Salir** - Terminar la búsqueda"""
+    if has_more:
+        properties_message += "\n➕ **Ver más** - Mostrarte las siguientes propiedades"
+    properties_message += """
 
 Puedes responder con la letra de tu opción o escribir lo que necesites."""
 
@@ -0,0 +1,266 @@
+"""
+Codec DynamoDB para los items del chat (mensajes, estado, result sets).
+
+Reemplaza el camino genérico `model_dump` -> float a Decimal -> TypeSerializer (y
+TypeDeserializer al leer) por una sola pasada recursiva:
+
+- encode_item / encode_value: dict Python -> AttributeValues (float -> N sin pasar por Decimal).
+- encode_chat_message: item ChatMessage armado directamente, sin validar con pydantic
+  (solo para datos internos del engine, ya confiables).
+- decode_item / decode_value: AttributeValues -> Python (N -> Decimal, como boto3).
+- LazyItem / decode_attributes: decodifican solo los atributos que se leen (ej. `metadata`).
+- dumps_item / loads_item: item DynamoDB <-> texto JSON (binarios en base64), para
+  almacenamientos locales.
+- compress_payloads: `content` y `metadata` grandes se guardan como binario (B) comprimido
+  con gzip o zstd (CHAT_COMPRESSION); decode_* los descomprimen de forma transparente.
+"""
+import gzip
+import json
+import base64
+from decimal import Decimal
+from collections.abc import Mapping
+from typing import Iterable, Optional
+from pydantic import BaseModel
+from app.core.config import CHAT_COMPRESSION, CHAT_COMPRESSION_MIN_BYTES
+
+
+### Encode ###
+
+def _number(value) -> str:
+    text = str(value)
+    if text in ('nan', 'inf', '-inf', 'NaN', 'Infinity', '-Infinity', 'sNaN'):
+        raise TypeError(f"Infinity y NaN no están soportados por DynamoDB: {value}")
+    return text
+
+
+def _float(value: float) -> str:
+    # Mismo texto que Decimal(str(value)) (lo que hacía convert_floats_to_decimal)
+    return _number(Decimal(repr(value)))
+
+
+def encode_value(value) -> dict:
+    """Valor Python -> AttributeValue de DynamoDB."""
+    value_type = type(value)
+    if value_type is str:
+        return {'S': value}
+    if value_type is dict:
+        return {'M': {key: encode_value(item) for key, item in value.items()}}
+    if value_type is bool:
+        return {'BOOL': value}
+    if value_type is int:
+        return {'N': str(value)}
+    if value_type is float:
+        return {'N': _float(value)}
+    if value is None:
+        return {'NULL': True}
+    if value_type is list or value_type is tuple:
+        return {'L': [encode_value(item) for item in value]}
+    return _encode_other(value)
+
+
+def _encode_other(value) -> dict:
+    if isinstance(value, BaseModel):
+        return encode_value(value.model_dump())
+    if isinstance(value, bool):
+        return {'BOOL': bool(value)}
+    if isinstance(value, (int, Decimal)):
+        return {'N': _number(value)}
+    if isinstance(value, float):
+        return {'N': _float(value)}
+    if isinstance(value, str):
+        return {'S': str(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {'B': bytes(value)}
+    if isinstance(value, Mapping):
+        return {'M': {key: encode_value(item) for key, item in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [encode_value(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return _encode_set(value)
+    if hasattr(value, 'value') and isinstance(value.value, bytes):  # boto3 Binary
+        return {'B': value.value}
+    raise TypeError(f"Tipo no soportado por DynamoDB: {type(value)}")
+
+
+def _encode_set(values) -> dict:
+    if all(isinstance(item, str) for item in values):
+        return {'SS': list(values)}
+    if all(isinstance(item, (bytes, bytearray)) for item in values):
+        return {'BS': [bytes(item) for item in values]}
+    if all(isinstance(item, (int, float, Decimal)) and not isinstance(item, bool) for item in values):
+        return {'NS': [_float(item) if isinstance(item, float) else _number(item) for item in values]}
+    raise TypeError("Los sets de DynamoDB deben ser de un solo tipo (str, número o bytes)")
+
+
+def encode_item(item: dict, skip_none: bool = False) -> dict:
+    """dict -> item DynamoDB. Con skip_none se omiten los atributos None (ej. estado)."""
+    return {key: encode_value(value) for key, value in item.items() if not (skip_none and value is None)}
+
+
+def encode_chat_message(primary_key: str, sort_key: str, role: str, content_type: str, content: dict,
+                        metadata: Optional[dict] = None) -> dict:
+    """Item con la forma de ChatMessage, sin construir ni validar el modelo pydantic."""
+    return compress_payloads({
+        'PK': {'S': primary_key},
+        'SK': {'S': sort_key},
+        'role': {'S': role},
+        'content_type': {'S': content_type},
+        'content': encode_value(content),
+        'metadata': encode_value(metadata),
+    })
+
+
+### Compresión ###
+
+COMPRESSED_ATTRIBUTES = ('content', 'metadata')
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def compress_attribute(attribute: dict, codec: str = CHAT_COMPRESSION,
+                       min_bytes: int = CHAT_COMPRESSION_MIN_BYTES) -> dict:
+    """AttributeValue -> {'B': comprimido} si su JSON supera min_bytes y comprimir lo achica.
+    Se comprime la forma AttributeValue (no el valor Python) para conservar los tipos al leer."""
+    if codec not in ('gzip', 'zstd'):
+        return attribute
+    try:
+        raw = json.dumps(attribute, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    except TypeError:  # contiene binarios: se deja tal cual
+        return attribute
+    if len(raw) < min_bytes:
+        return attribute
+
+    zstandard = _zstd() if codec == 'zstd' else None
+    if zstandard is not None:
+        compressed = zstandard.ZstdCompressor(level=3).compress(raw)
+    else:  # gzip (o zstd no instalado)
+        compressed = gzip.compress(raw, compresslevel=6, mtime=0)
+    return {'B': compressed} if len(compressed) < len(raw) else attribute
+
+
+def compress_payloads(item: dict, codec: str = CHAT_COMPRESSION,
+                      min_bytes: int = CHAT_COMPRESSION_MIN_BYTES) -> dict:
+    """Comprime `content` y `metadata` de un item ya codificado (sin copiarlo si está apagado)."""
+    if codec not in ('gzip', 'zstd'):
+        return item
+    for name in COMPRESSED_ATTRIBUTES:
+        if name in item:
+            item[name] = compress_attribute(item[name], codec, min_bytes)
+    return item
+
+
+def decompress_attribute(data: bytes) -> dict:
+    """Binario comprimido (gzip o zstd, según su número mágico) -> AttributeValue original."""
+    data = bytes(data)
+    if data.startswith(_GZIP_MAGIC):
+        raw = gzip.decompress(data)
+    elif data.startswith(_ZSTD_MAGIC):
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("El item está comprimido con zstd pero el paquete zstandard no está instalado")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raise ValueError("Atributo binario sin un formato de compresión conocido")
+    return json.loads(raw)
+
+
+### Decode ###
+
+def decode_value(attribute: dict):
+    """AttributeValue de DynamoDB -> valor Python (números como Decimal, igual que boto3)."""
+    (tag, value), = attribute.items()
+    if tag == 'S':
+        return value
+    if tag == 'M':
+        return {key: decode_value(item) for key, item in value.items()}
+    if tag == 'N':
+        return Decimal(value)
+    if tag == 'L':
+        return [decode_value(item) for item in value]
+    if tag == 'BOOL':
+        return value
+    if tag == 'NULL':
+        return None
+    if tag == 'B':
+        return bytes(value)
+    if tag == 'SS':
+        return set(value)
+    if tag == 'NS':
+        return {Decimal(item) for item in value}
+    if tag == 'BS':
+        return {bytes(item) for item in value}
+    raise TypeError(f"Tipo DynamoDB desconocido: {tag}")
+
+
+def decode_named(name: str, attribute: dict):
+    """decode_value que además descomprime `content` / `metadata` guardados como binario."""
+    if 'B' in attribute and name in COMPRESSED_ATTRIBUTES:
+        attribute = decompress_attribute(attribute['B'])
+    return decode_value(attribute)
+
+
+def decode_item(item: dict) -> dict:
+    return {key: decode_named(key, value) for key, value in item.items()}
+
+
+def decode_attributes(item: dict, names: Iterable[str]) -> dict:
+    """Decodifica solo los atributos pedidos (los ausentes se omiten)."""
+    return {name: decode_named(name, item[name]) for name in names if name in item}
+
+
+class LazyItem(Mapping):
+    """Vista de solo lectura de un item DynamoDB que decodifica cada atributo al leerlo."""
+
+    __slots__ = ('_raw', '_decoded')
+
+    def __init__(self, raw: dict):
+        self._raw = raw
+        self._decoded = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._decoded[key]
+        except KeyError:
+            value = self._decoded[key] = decode_named(key, self._raw[key])
+            return value
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    @property
+    def raw(self) -> dict:
+        return self._raw
+
+
+### JSON ###
+
+def _json_bytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {'__b64__': base64.b64encode(bytes(value)).decode('ascii')}
+    raise TypeError(f"Tipo no serializable: {type(value)}")
+
+
+def _json_object(obj):
+    if '__b64__' in obj and len(obj) == 1:
+        return base64.b64decode(obj['__b64__'])
+    return obj
+
+
+def dumps_item(item: dict) -> str:
+    """Item DynamoDB (AttributeValues) -> JSON; los atributos B se guardan en base64."""
+    return json.dumps(item, ensure_ascii=False, separators=(',', ':'), default=_json_bytes)
+
+
+def loads_item(text: str) -> dict:
+    return json.loads(text, object_hook=_json_object)
@@ -1,7 +1,22 @@
+import json
+import time
+import base64
+import random
+import asyncio
 from datetime import datetime, timezone
-from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from pydantic import BaseModel
+from app.services.dynamodb_codec import encode_item, encode_value, decode_item, decode_named, decode_attributes, compress_payloads
 from app.models.ChatMessage import ChatMessage, ChatHistoryElement, ChatHistoryResponse
-from app.core.aws_clients import get_dynamodb_client
+from app.core.aws_clients import get_dynamodb_client, get_async_dynamodb_client
+from app.core.config import DYNAMODB_TABLE, CHAT_WRITE_MODE, CHAT_WRITE_MAX_RETRIES, CHAT_HISTORY_MAX_PAGE, CHAT_TTL_ATTRIBUTE, CHAT_TTL_DAYS, CHAT_ARCHIVE_READ_THROUGH
+
+# Sort keys dentro de una conversación (PK = USER#<user>#CONV#<conv>)
+MESSAGE_SK_PREFIX = 'TIMESTAMP#'
+STATE_SK = 'STATE'
+RESULT_SET_SK_PREFIX = 'RESULTSET#'
+
 ### Return messages from Dynamodb ###
 
 def get_all_messages(primary_key: str):
@@ -9,10 +24,11 @@ def get_all_messages(primary_key: str):
     "Se debe pasar la session o cliente como el parámetro 'dynamodb'"
 
     response = get_dynamodb_client().query(
-        TableName = 'ChatMessages',
-        KeyConditionExpression = 'PK = :pk_val',
+        TableName = DYNAMODB_TABLE,
+        KeyConditionExpression = 'PK = :pk_val AND begins_with(SK, :sk_prefix)',
         ExpressionAttributeValues = {
-            ':pk_val' : {'S' : primary_key}
+            ':pk_val' : {'S' : primary_key},
+            ':sk_prefix' : {'S' : MESSAGE_SK_PREFIX}
             },
         ScanIndexForward=False
         )
@@ -22,32 +38,428 @@ def get_latests_messages(primary_key: str, limit: int = 2, order: bool=True):
     "Funcion para retornar todos los ultimos 10 mensajes, brindando un primary Key."
     "Se debe pasar la session o cliente como el parámetro 'dynamodb'"
 
-    if limit < 1:
-        limit = 1
+    response = get_dynamodb_client().query(**_latest_messages_request(primary_key, limit))
+    
+    if order==True:
+        response['Items'] = response.get('Items')[::-1]
+
+    return response
 
-    response = get_dynamodb_client().query(
-        TableName = 'ChatMessages',
-        KeyConditionExpression = 'PK = :pk_val',
+
+async def aget_latests_messages(primary_key: str, limit: int = 2, order: bool=True):
+    """Versión asyncio de get_latests_messages"""
+    client = await get_async_dynamodb_client()
+    response = await client.query(**_latest_messages_request(primary_key, limit))
+    if order==True:
+        response['Items'] = response.get('Items')[::-1]
+    return response
+
+
+def _latest_messages_request(primary_key: str, limit: int) -> dict:
+    return dict(
+        TableName = DYNAMODB_TABLE,
+        KeyConditionExpression = 'PK = :pk_val AND begins_with(SK, :sk_prefix)',
         ExpressionAttributeValues = {
-            ':pk_val' : {'S' : primary_key}
+            ':pk_val' : {'S' : primary_key},
+            ':sk_prefix' : {'S' : MESSAGE_SK_PREFIX}
             },
         ScanIndexForward=False,  # orden descendente, últimos mensajes
-        Limit=limit
+        Limit=max(limit, 1)
         )
-    
-    if order==True:
-        response['Items'] = response.get('Items')[::-1]
 
+
+def get_history_page(primary_key: str, limit: int, cursor: str = None, newest_first: bool = True,
+                     include_metadata: bool = False) -> dict:
+    """Una página del historial (endpoint de historial): {'Items': [...], 'next_cursor': str | None}.
+
+    Recorre la conversación desde el mensaje más reciente hacia atrás; `cursor` continúa
+    donde terminó la página anterior. Solo se leen los atributos que se muestran."""
+    request = _history_page_request(primary_key, limit, cursor, include_metadata)
+    response = get_dynamodb_client().query(**request)
+    if _needs_archive(response, request):
+        _fill_from_archive(response, request, _read_archive(primary_key, request, response))
+    return _history_page(response, newest_first)
+
+
+async def aget_history_page(primary_key: str, limit: int, cursor: str = None, newest_first: bool = True,
+                            include_metadata: bool = False) -> dict:
+    """Versión asyncio de get_history_page"""
+    client = await get_async_dynamodb_client()
+    request = _history_page_request(primary_key, limit, cursor, include_metadata)
+    response = await client.query(**request)
+    if _needs_archive(response, request):
+        archived = await asyncio.to_thread(_read_archive, primary_key, request, response)
+        _fill_from_archive(response, request, archived)
+    return _history_page(response, newest_first)
+
+
+def _history_page_request(primary_key: str, limit: int, cursor: str = None, include_metadata: bool = False) -> dict:
+    # SK se proyecta siempre (continuación en el archivo); format_messages lo quita si no es verbose
+    names = {'#sk': 'SK', '#role': 'role', '#content': 'content', '#content_type': 'content_type'}
+    if include_metadata:
+        names['#metadata'] = 'metadata'
+    request = dict(
+        TableName = DYNAMODB_TABLE,
+        KeyConditionExpression = 'PK = :pk_val AND begins_with(SK, :sk_prefix)',
+        ExpressionAttributeValues = {
+            ':pk_val' : {'S' : primary_key},
+            ':sk_prefix' : {'S' : MESSAGE_SK_PREFIX}
+            },
+        ProjectionExpression = ', '.join(names),
+        ExpressionAttributeNames = names,
+        ScanIndexForward=False,  # del más reciente al más antiguo
+        Limit=min(max(limit, 1), CHAT_HISTORY_MAX_PAGE)
+        )
+    if cursor:
+        request['ExclusiveStartKey'] = decode_cursor(cursor, primary_key)
+    return request
+
+
+def _needs_archive(response: dict, request: dict) -> bool:
+    """La tabla ya no tiene mensajes más antiguos y la página quedó incompleta."""
+    from app.services.chat_archive import archive_enabled
+    return (CHAT_ARCHIVE_READ_THROUGH and archive_enabled() and not response.get('LastEvaluatedKey')
+            and len(response.get('Items', [])) < request['Limit'])
+
+
+def _read_archive(primary_key: str, request: dict, response: dict) -> list:
+    """Mensajes archivados anteriores al más antiguo de la página (o al cursor). Pide uno de más
+    para saber si queda otra página."""
+    from app.services.chat_archive import read_archived_messages
+    items = response.get('Items', [])
+    if items:
+        before_sk = items[-1]['SK']['S']
+    else:
+        before_sk = request.get('ExclusiveStartKey', {}).get('SK', {}).get('S')
+    remaining = request['Limit'] - len(items)
+    return read_archived_messages(primary_key, before_sk=before_sk, limit=remaining + 1)
+
+
+def _fill_from_archive(response: dict, request: dict, archived: list):
+    """Completa la página con mensajes del archivo. El cursor sigue siendo el SK del último
+    mensaje entregado: la tabla no tiene nada antes y el archivo continúa desde ahí."""
+    names = set(request['ExpressionAttributeNames'].values())
+    items = response.setdefault('Items', [])
+    remaining = request['Limit'] - len(items)
+    items.extend({name: value for name, value in item.items() if name in names} for item in archived[:remaining])
+    if len(archived) > remaining:
+        response['LastEvaluatedKey'] = {'PK': request['ExpressionAttributeValues'][':pk_val'], 'SK': items[-1]['SK']}
+
+
+def _history_page(response: dict, newest_first: bool) -> dict:
+    items = response.get('Items', [])
+    return {
+        # La página es de tamaño acotado: el orden cronológico solo la invierte
+        'Items': items if newest_first else items[::-1],
+        'next_cursor': encode_cursor(response['LastEvaluatedKey']) if response.get('LastEvaluatedKey') else None
+    }
+
+
+def encode_cursor(last_evaluated_key: dict) -> str:
+    """LastEvaluatedKey de DynamoDB -> cursor opaco (base64 url-safe)."""
+    raw = json.dumps(last_evaluated_key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, primary_key: str) -> dict:
+    """Cursor -> ExclusiveStartKey. ValueError si es inválido o de otra conversación."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw)
+        valid = (set(key) == {'PK', 'SK'} and key['PK'] == {'S': primary_key}
+                 and key['SK'].get('S', '').startswith(MESSAGE_SK_PREFIX))
+    except (ValueError, TypeError, AttributeError, KeyError):
+        valid = False
+    if not valid:
+        raise ValueError("Cursor de historial inválido")
+    return key
+
+
+def get_messages_between(primary_key: str, start_sk: str, end_sk: str, limit: int, oldest_first: bool = False):
+    """Retorna (en orden cronológico) hasta `limit` mensajes con start_sk < SK < end_sk,
+    empezando por los más recientes (o por los más antiguos con oldest_first)."""
+
+    response = get_dynamodb_client().query(**_messages_between_request(primary_key, start_sk, end_sk, limit, oldest_first))
+    return _trim_between(response, start_sk, end_sk, limit, oldest_first)
+
+
+async def aget_messages_between(primary_key: str, start_sk: str, end_sk: str, limit: int, oldest_first: bool = False):
+    """Versión asyncio de get_messages_between"""
+    client = await get_async_dynamodb_client()
+    response = await client.query(**_messages_between_request(primary_key, start_sk, end_sk, limit, oldest_first))
+    return _trim_between(response, start_sk, end_sk, limit, oldest_first)
+
+
+def _messages_between_request(primary_key: str, start_sk: str, end_sk: str, limit: int, oldest_first: bool = False) -> dict:
+    return dict(
+        TableName = DYNAMODB_TABLE,
+        KeyConditionExpression = 'PK = :pk_val AND SK BETWEEN :start_sk AND :end_sk',
+        ExpressionAttributeValues = {
+            ':pk_val' : {'S' : primary_key},
+            ':start_sk' : {'S' : start_sk},
+            ':end_sk' : {'S' : end_sk}
+            },
+        ScanIndexForward=oldest_first,
+        Limit=limit + 2  # BETWEEN es inclusivo en ambos extremos
+        )
+
+
+def _trim_between(response: dict, start_sk: str, end_sk: str, limit: int, oldest_first: bool = False) -> dict:
+    items = [item for item in response.get('Items', []) if item['SK']['S'] not in (start_sk, end_sk)]
+    response['Items'] = items[:limit] if oldest_first else items[:limit][::-1]
     return response
 
 
+### Conversation state ###
+
+def get_conversation_state(primary_key: str):
+    """Lee el item de estado de la conversación con un único GetItem fuertemente consistente.
+    Retorna None si la conversación aún no tiene item de estado."""
+
+    response = get_dynamodb_client().get_item(**_state_request(primary_key))
+    return _state_from_response(response)
+
+
+async def aget_conversation_state(primary_key: str):
+    """Versión asyncio de get_conversation_state"""
+    client = await get_async_dynamodb_client()
+    response = await client.get_item(**_state_request(primary_key))
+    return _state_from_response(response)
+
+
+def _state_request(primary_key: str) -> dict:
+    return dict(
+        TableName = DYNAMODB_TABLE,
+        Key = {'PK': {'S': primary_key}, 'SK': {'S': STATE_SK}},
+        ConsistentRead = True
+        )
+
+
+def _state_from_response(response: dict):
+    return state_from_item(response.get('Item'))
+
+
+def state_from_item(item: dict):
+    """Item de estado DynamoDB -> dict de estado (sin PK/SK/TTL). None si no hay item."""
+    if not item:
+        return None
+
+    state = deserialize_item(item)
+    state.pop('PK', None)
+    state.pop('SK', None)
+    state.pop(CHAT_TTL_ATTRIBUTE, None)
+    return state
+
+
+def serialize_state(primary_key: str, state: dict) -> dict:
+    """Convierte el estado de la conversación en un item DynamoDB (PK, SK=STATE)."""
+    item = encode_item(state, skip_none=True)
+    item['PK'] = {'S': primary_key}
+    item['SK'] = {'S': STATE_SK}
+    return apply_ttl(item)
+
+
+def write_conversation_state(primary_key: str, state: dict, expected_version: int = 0):
+    """Guarda el estado con control optimista de concurrencia sobre `version`.
+    Falla con ConditionalCheckFailedException si otro turno lo modificó antes."""
+
+    get_dynamodb_client().put_item(
+        TableName = DYNAMODB_TABLE,
+        Item = serialize_state(primary_key, state),
+        ConditionExpression = 'attribute_not_exists(PK) OR version = :expected_version',
+        ExpressionAttributeValues = {':expected_version': {'N': str(expected_version)}}
+        )
+    return None
+
+
+### Result sets (recomendaciones) ###
+
+def serialize_result_set(primary_key: str, result_set_id: str, properties: list) -> dict:
+    """Item DynamoDB con las propiedades recomendadas (SK=RESULTSET#<id>), escrito una sola vez."""
+    return apply_ttl(encode_item({
+        'PK': primary_key,
+        'SK': RESULT_SET_SK_PREFIX + result_set_id,
+        'created_at': get_current_timestamp(),
+        'properties': properties or []
+    }))
+
+
+def get_result_set(primary_key: str, result_set_id: str) -> list:
+    """Retorna las propiedades de un result set ([] si no existe)."""
+    response = get_dynamodb_client().get_item(**_result_set_request(primary_key, result_set_id))
+    return _properties_from_response(response)
+
+
+async def aget_result_set(primary_key: str, result_set_id: str) -> list:
+    """Versión asyncio de get_result_set"""
+    client = await get_async_dynamodb_client()
+    response = await client.get_item(**_result_set_request(primary_key, result_set_id))
+    return _properties_from_response(response)
+
+
+def _result_set_request(primary_key: str, result_set_id: str) -> dict:
+    return dict(
+        TableName = DYNAMODB_TABLE,
+        Key = {'PK': {'S': primary_key}, 'SK': {'S': RESULT_SET_SK_PREFIX + result_set_id}},
+        ProjectionExpression = 'properties',
+        ConsistentRead = True  # escrito en el turno anterior: una lectura eventual puede no verlo
+        )
+
+
+def _properties_from_response(response: dict) -> list:
+    return properties_from_item(response.get('Item'))
+
+
+def properties_from_item(item: dict) -> list:
+    """Item RESULTSET# -> lista de propiedades ([] si no hay item)."""
+    if not item:
+        return []
+    return decode_attributes(item, ['properties']).get('properties', [])
+
+
 ### Writing Data to Dynamodb
 
+# Límite de BatchWriteItem por llamada
+BATCH_WRITE_LIMIT = 25
+
 def write_message(table_name: str, serialized_item):
     get_dynamodb_client().put_item(
         TableName = table_name,
         Item= serialized_item)
     return None
+
+
+class StateConflictError(Exception):
+    """Otro turno cambió el estado de la conversación (su `version` ya no es la esperada)."""
+
+    def __init__(self, primary_key: str, expected_version: int = None):
+        super().__init__(f"El estado de {primary_key} ya no está en la versión {expected_version}")
+        self.primary_key = primary_key
+        self.expected_version = expected_version
+
+
+def write_turn(table_name: str, message_items: list, state_item: dict = None,
+               expected_version: int = None, mode: str = CHAT_WRITE_MODE):
+    """Persiste los mensajes de un turno y (opcional) el estado en una sola llamada.
+
+    - mode="transaction": TransactWriteItems, todo o nada. Si falla la condición de versión
+      del estado no se escribe nada y se lanza StateConflictError (el que llama relee el
+      estado y vuelve a aplicar los cambios del turno).
+    - mode="batch": BatchWriteItem con reintento de UnprocessedItems (backoff con jitter);
+      no es atómico y no admite condición sobre el estado.
+
+    Retorna {'consumed_capacity': float}.
+    """
+    if mode == "batch":
+        items = list(message_items) + ([state_item] if state_item else [])
+        return {'consumed_capacity': batch_write_items(table_name, items)}
+
+    actions = _transact_actions(table_name, message_items, state_item, expected_version)
+    try:
+        response = get_dynamodb_client().transact_write_items(
+            TransactItems = actions,
+            ReturnConsumedCapacity = 'TOTAL'
+            )
+    except ClientError as e:
+        if state_item is None or not _is_state_condition_failure(e, len(actions) - 1):
+            raise
+        # Otro turno actualizó el estado: la transacción no escribió nada
+        raise StateConflictError(state_item['PK']['S'], expected_version) from e
+
+    return {'consumed_capacity': _sum_capacity(response)}
+
+
+async def awrite_turn(table_name: str, message_items: list, state_item: dict = None,
+                      expected_version: int = None, mode: str = CHAT_WRITE_MODE):
+    """Versión asyncio de write_turn"""
+    if mode == "batch":
+        items = list(message_items) + ([state_item] if state_item else [])
+        return {'consumed_capacity': await abatch_write_items(table_name, items)}
+
+    client = await get_async_dynamodb_client()
+    actions = _transact_actions(table_name, message_items, state_item, expected_version)
+    try:
+        response = await client.transact_write_items(
+            TransactItems = actions,
+            ReturnConsumedCapacity = 'TOTAL'
+            )
+    except ClientError as e:
+        if state_item is None or not _is_state_condition_failure(e, len(actions) - 1):
+            raise
+        raise StateConflictError(state_item['PK']['S'], expected_version) from e
+
+    return {'consumed_capacity': _sum_capacity(response)}
+
+
+def _transact_actions(table_name: str, message_items: list, state_item: dict = None, expected_version: int = None) -> list:
+    """Puts de la transacción; el del estado (siempre el último) va condicionado a `version`."""
+    actions = [{'Put': {'TableName': table_name, 'Item': item}} for item in message_items]
+    if state_item is not None:
+        state_put = {'TableName': table_name, 'Item': state_item}
+        if expected_version is not None:
+            state_put['ConditionExpression'] = 'attribute_not_exists(PK) OR version = :expected_version'
+            state_put['ExpressionAttributeValues'] = {':expected_version': {'N': str(expected_version)}}
+        actions.append({'Put': state_put})
+    return actions
+
+
+def batch_write_items(table_name: str, items: list, max_retries: int = CHAT_WRITE_MAX_RETRIES) -> float:
+    """BatchWriteItem en bloques de 25 reintentando UnprocessedItems con backoff exponencial
+    y full jitter. Retorna la capacidad consumida total."""
+    consumed = 0.0
+    client = get_dynamodb_client()
+    for start in range(0, len(items), BATCH_WRITE_LIMIT):
+        pending = {table_name: [{'PutRequest': {'Item': item}} for item in items[start:start + BATCH_WRITE_LIMIT]]}
+        attempt = 0
+        while pending:
+            response = client.batch_write_item(RequestItems = pending, ReturnConsumedCapacity = 'TOTAL')
+            consumed += _sum_capacity(response)
+            pending = response.get('UnprocessedItems') or {}
+            if not pending:
+                break
+            attempt += 1
+            time.sleep(_unprocessed_backoff(pending, attempt, max_retries))
+    return consumed
+
+
+async def abatch_write_items(table_name: str, items: list, max_retries: int = CHAT_WRITE_MAX_RETRIES) -> float:
+    """Versión asyncio de batch_write_items"""
+    consumed = 0.0
+    client = await get_async_dynamodb_client()
+    for start in range(0, len(items), BATCH_WRITE_LIMIT):
+        pending = {table_name: [{'PutRequest': {'Item': item}} for item in items[start:start + BATCH_WRITE_LIMIT]]}
+        attempt = 0
+        while pending:
+            response = await client.batch_write_item(RequestItems = pending, ReturnConsumedCapacity = 'TOTAL')
+            consumed += _sum_capacity(response)
+            pending = response.get('UnprocessedItems') or {}
+            if not pending:
+                break
+            attempt += 1
+            await asyncio.sleep(_unprocessed_backoff(pending, attempt, max_retries))
+    return consumed
+
+
+def _unprocessed_backoff(pending: dict, attempt: int, max_retries: int) -> float:
+    """Espera (full jitter) antes de reintentar UnprocessedItems; falla al agotar reintentos."""
+    if attempt > max_retries:
+        raise RuntimeError(f"BatchWriteItem: {sum(len(v) for v in pending.values())} items sin procesar tras {max_retries} reintentos")
+    return random.uniform(0, min(1.0, 0.05 * 2 ** attempt))
+
+
+def _is_state_condition_failure(error: ClientError, state_index: int) -> bool:
+    """True si la transacción se canceló únicamente por la condición del item de estado."""
+    if error.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+        return False
+    reasons = error.response.get('CancellationReasons') or []
+    if len(reasons) <= state_index:
+        return False
+    return reasons[state_index].get('Code') == 'ConditionalCheckFailed' and all(
+        r.get('Code') in (None, 'None') for i, r in enumerate(reasons) if i != state_index)
+
+
+def _sum_capacity(response: dict) -> float:
+    return float(sum(c.get('CapacityUnits', 0) for c in response.get('ConsumedCapacity') or []))
     
 def message_wrapper(PK:str , message:str , role: str, metadata: dict):
     """Converts Message into JSON format"""
@@ -68,25 +480,23 @@ def message_wrapper_flex(message_dict: dict):
 
 
 
+def convert_floats_to_decimal(obj):
+    """Prepara valores para DynamoDB: float -> Decimal y modelos pydantic -> dict."""
+    if isinstance(obj, float):
+        return Decimal(str(obj))  # Nunca uses Decimal(float), siempre convierte a str primero
+    elif isinstance(obj, BaseModel):
+        return convert_floats_to_decimal(obj.model_dump())
+    elif isinstance(obj, list):
+        return [convert_floats_to_decimal(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {k: convert_floats_to_decimal(v) for k, v in obj.items()}
+    else:
+        return obj
+
+
 def serialize_item(model: ChatMessage):
-    from decimal import Decimal
-
-    def convert_floats_to_decimal(obj):
-        if isinstance(obj, float):
-            return Decimal(str(obj))  # Nunca uses Decimal(float), siempre convierte a str primero
-        elif isinstance(obj, list):
-            return [convert_floats_to_decimal(item) for item in obj]
-        elif isinstance(obj, dict):
-            return {k: convert_floats_to_decimal(v) for k, v in obj.items()}
-        else:
-            return obj
-    
-    raw_dict = model.model_dump()
-    clean_dict = convert_floats_to_decimal(raw_dict)
-        
-    serializer = TypeSerializer()
-    serialized_item = {k: serializer.serialize(v) for k, v in clean_dict.items()}
-    return serialized_item
+    """Modelo pydantic -> item DynamoDB (una sola pasada, ver dynamodb_codec)"""
+    return apply_ttl(compress_payloads(encode_item(model.model_dump())))
 
 
 def serialize_message(message, PK, role, metadata):
@@ -97,26 +507,31 @@ def serialize_message(message, PK, role, metadata):
 
 
 
+def apply_ttl(item: dict, ttl_days: float = CHAT_TTL_DAYS, now: float = None) -> dict:
+    """Agrega el atributo TTL (epoch en segundos) al item; con ttl_days=0 no expira.
+    El estado se reescribe en cada turno, así su expiración marca la inactividad de la conversación;
+    los mensajes no resumidos y el result set referenciado se renuevan (chatbot_engine.renew_ttl)."""
+    if ttl_days > 0:
+        expires_at = (time.time() if now is None else now) + ttl_days * 86400
+        item[CHAT_TTL_ATTRIBUTE] = {'N': str(int(expires_at))}
+    return item
+
+
 def get_current_timestamp():
     """Formato utilizado para el timestamp"""
     output = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
     return output
 
 def get_metadata(raw_messages):
-    deserializer = TypeDeserializer()
-    metadata_list = []
-    for item in raw_messages['Items'][::-1]:
-        deserialized_item =  { k: deserializer.deserialize(v) for k, v in item.items()}
-        metadata_list.append(deserialized_item['metadata'])
-    return metadata_list
+    """Solo decodifica el atributo `metadata` de cada item"""
+    return [
+        decode_named('metadata', item['metadata']) if 'metadata' in item else None
+        for item in raw_messages['Items'][::-1]
+    ]
 
 def deserialize_item(dynamo_object: dict) -> dict:
-    """Deserializador de items en formato diccionario / JSON"""
-    deserializer = TypeDeserializer()
-    return {
-        k: deserializer.deserialize(v) 
-        for k, v in dynamo_object.items()
-    }
+    """Deserializador de items en formato diccionario / JSON (descomprime content/metadata)"""
+    return decode_item(dynamo_object)
 
 
 def format_messages(raw_conversation, verbose: bool):
@@ -125,8 +540,8 @@ def format_messages(raw_conversation, verbose: bool):
     for raw_item in raw_conversation.get('Items'):
         item = deserialize_item(raw_item)
         if verbose == False:
-            item.pop('SK')
-            item.pop('metadata')
+            item.pop('SK', None)
+            item.pop('metadata', None)
         message_list.append(ChatHistoryElement(**item))
     
     return message_list
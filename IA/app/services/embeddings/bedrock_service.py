@@ -1,6 +1,7 @@
 import json
+import inspect
 from botocore.exceptions import ClientError
-from app.core.aws_clients import get_embed_client
+from app.core.aws_clients import get_embed_client, get_async_client
 from app.core.config import EMBED_MODEL_ID
 
 
@@ -28,3 +29,27 @@ def embed_text(text: str):
     except (ClientError, Exception) as e:
         error = f"ERROR: Can't invoke '{EMBED_MODEL_ID}'. Reason: {e}"
         return error
+
+
+async def aembed_text(text: str):
+    """Versión asyncio de embed_text"""
+    client = await get_async_client("bedrock-runtime")
+
+    try:
+        response = await client.invoke_model(
+            body=json.dumps({"inputText": text}),
+            modelId=EMBED_MODEL_ID,
+            accept="application/json",
+            contentType="application/json"
+        )
+
+        # aiobotocore retorna un stream async; el cliente sync en hilo, uno sync
+        raw_body = response['body'].read()
+        if inspect.isawaitable(raw_body):
+            raw_body = await raw_body
+
+        return json.loads(raw_body)['embedding']
+
+    except (ClientError, Exception) as e:
+        error = f"ERROR: Can't invoke '{EMBED_MODEL_ID}'. Reason: {e}"
+        return error
@@ -4,9 +4,12 @@ import psycopg2
 import logging
 from typing import Generator, Dict, Any
 from dotenv import load_dotenv
-from opensearchpy import OpenSearch, helpers
+from opensearchpy import helpers
+from app.core.aws_clients import get_opensearch_client
 from app.services.embeddings.bedrock_service import embed_text
+from app.services.embeddings.search_opensearch import SORT_FIELD
 from app.utils.reverse_geocode import get_city_from_geo
+from app.services.search_cache import invalidate_search_cache
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -25,14 +28,8 @@ conn = psycopg2.connect(
 )
 cursor = conn.cursor()
 
-# Cliente de OpenSearch
-client = OpenSearch(
-    hosts=[{"host": os.getenv("OPENSEARCH_HOST"), "port": 443}],
-    http_auth=(os.getenv("OPENSEARCH_USERNAME"), os.getenv("OPENSEARCH_PASSWORD")),
-    use_ssl=True,
-    verify_certs=True,
-    timeout=60,
-)
+# Cliente de OpenSearch (compartido)
+client = get_opensearch_client()
 
 INDEX_NAME = os.getenv("OPENSEARCH_INDEX", "properties")
 
@@ -46,13 +43,16 @@ def create_index_if_not_exists():
                     "properties": {
                         "text": {"type": "text"},
                         "embedding": {"type": "knn_vector", "dimension": 1536},
-                        "city": {"type": "keyword"}
+                        "city": {"type": "keyword"},
+                        SORT_FIELD: {"type": "keyword"}
                     }
                 }
             }
         )
         logging.info(f"✅ Índice '{INDEX_NAME}' creado en OpenSearch")
     else:
+        # Índices creados antes del campo de orden: se agrega al mapping (los documentos lo reciben al reindexar)
+        client.indices.put_mapping(index=INDEX_NAME, body={"properties": {SORT_FIELD: {"type": "keyword"}}})
         logging.info(f"✅ Índice '{INDEX_NAME}' ya existe en OpenSearch")
 
 
@@ -113,6 +113,7 @@ def generate_actions(rows) -> Generator[Dict[str, Any], None, None]:
                 "_index": INDEX_NAME,
                 "_id": doc_id,
                 "_source": {
+                    SORT_FIELD: doc_id,
                     "text": text,
                     "embedding": embedding,
                     "city": city.lower(),  # Normalizar para búsquedas
@@ -139,10 +140,13 @@ def generate_actions(rows) -> Generator[Dict[str, Any], None, None]:
 # Indexación en lotes
 logging.info(f"🔄 Indexando {len(rows)} propiedades en lotes de 20...")
 
-success, _ = helpers.bulk(client, generate_actions(rows), chunk_size=20)
+success, _ = helpers.bulk(client, generate_actions(rows), chunk_size=20, request_timeout=60)
 
 logging.info(f"✅ Se indexaron {success} documentos correctamente.")
 
+# Invalidar el cache de búsquedas de la API (todas las instancias)
+logging.info(f"♻️ Cache de búsquedas invalidado (generación {invalidate_search_cache(conn)})")
+
 cursor.close()
 conn.close()
 
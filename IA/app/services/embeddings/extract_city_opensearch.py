@@ -1,5 +1,5 @@
 # IA/app/services/embeddings/extract_city_opensearch.py
-from app.services.embeddings.opensearch_service import client as opensearch_client
+from app.core.aws_clients import get_opensearch_client
 
 INDEX = "properties"
 
@@ -20,7 +20,7 @@ def extract_city_opensearch(user_text: str) -> str:
             }
         }
     }
-    resp = opensearch_client.search(index=INDEX, body=body)
+    resp = get_opensearch_client().search(index=INDEX, body=body)
     hits = resp.get("hits", {}).get("hits", [])
     if not hits:
         return "desconocida"
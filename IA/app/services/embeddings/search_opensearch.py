@@ -1,20 +1,72 @@
 import os
 import logging
-from app.services.embeddings.bedrock_service import embed_text
-from app.core.aws_clients import get_opensearch_client
+from app.services.embeddings.bedrock_service import embed_text, aembed_text
+from app.core.aws_clients import get_opensearch_client, get_async_opensearch_client
+from app.services.property_query import PropertyPage
 
 
 INDEX = os.getenv("OPENSEARCH_INDEX", "properties")
+# Id de la propiedad como keyword (doc values): desempate del orden y de search_after.
+# Los indexadores lo agregan al mapping y a cada documento.
+SORT_FIELD = "property_id"
 
-def search_similar_properties(query: str, ciudad: str = "", property_type: str = "", operation_type: str = "", k: int = 3) -> list[dict]:
+def search_similar_properties(query: str, ciudad: str = "", property_type: str = "", operation_type: str = "", k: int = 3,
+                              search_after: list = None, candidates: int = None) -> list[dict]:
     """
-    Búsqueda híbrida: semántica + filtros estructurados
+    Búsqueda híbrida: semántica + filtros estructurados.
+    Paginación: `search_after` = next_cursor del resultado anterior (ver build_search_body).
     """
     emb = embed_text(query)
     if not emb or isinstance(emb, str):
         logging.warning("Embedding vacío o error, retornando lista vacía")
         return []
 
+    body = build_search_body(emb, ciudad, property_type, operation_type, k, search_after, candidates)
+
+    try:
+        client = get_opensearch_client()
+        resp = client.search(index=INDEX, body=body)
+        results = format_search_hits(resp, k)
+
+        logging.info(f"Búsqueda completada: {len(results)} resultados para query='{query}', ciudad='{ciudad}'")
+        return results
+
+    except Exception as e:
+        logging.error(f"Error en OpenSearch search: {e}")
+        return []
+
+
+async def asearch_similar_properties(query: str, ciudad: str = "", property_type: str = "", operation_type: str = "", k: int = 3,
+                                     search_after: list = None, candidates: int = None) -> list[dict]:
+    """
+    Versión asyncio de search_similar_properties (AsyncOpenSearch)
+    """
+    emb = await aembed_text(query)
+    if not emb or isinstance(emb, str):
+        logging.warning("Embedding vacío o error, retornando lista vacía")
+        return []
+
+    body = build_search_body(emb, ciudad, property_type, operation_type, k, search_after, candidates)
+
+    try:
+        client = get_async_opensearch_client()
+        resp = await client.search(index=INDEX, body=body)
+        return format_search_hits(resp, k)
+
+    except Exception as e:
+        logging.error(f"Error en OpenSearch search: {e}")
+        return []
+
+
+def build_search_body(emb: list, ciudad: str = "", property_type: str = "", operation_type: str = "", k: int = 3,
+                      search_after: list = None, candidates: int = None) -> dict:
+    """
+    Query híbrida: knn sobre el embedding + filtros estructurados opcionales.
+
+    Orden estable (_score, property_id) para paginar con `search_after` (valores `sort` del último hit)
+    en lugar de `from`. El knn solo devuelve sus `k` vecinos más cercanos: `candidates` es ese
+    total (debe cubrir todas las páginas que se van a pedir).
+    """
     # Construir query híbrida
     must_clauses = []
 
@@ -38,7 +90,7 @@ def search_similar_properties(query: str, ciudad: str = "", property_type: str =
                             "knn": {
                                 "embedding": {
                                     "vector": emb,
-                                    "k": k * 2  # Buscar más para luego filtrar
+                                    "k": candidates or k * 2  # Buscar más para luego filtrar
                                 }
                             }
                         }
@@ -54,38 +106,40 @@ def search_similar_properties(query: str, ciudad: str = "", property_type: str =
                 "knn": {
          "embedding": {
                         "vector": emb,
-                        "k": k
+                        "k": candidates or k
                     }
                 }
             }
         }
 
-    try:
-        client = get_opensearch_client()
-        resp = client.search(index=INDEX, body=body)
-        hits = resp.get("hits", {}).get("hits", [])
-
-        results = []
-        for h in hits:
-            source = h["_source"]
-            results.append({
-                "id": h["_id"],
-                "text": source.get("text", ""),
-                "score": h["_score"],
-                "city": source.get("city", ""),
-                "property_type": source.get("property_type", ""),
-                "operation_type": source.get("operation_type", ""),
-                "title": source.get("title", ""),
-                "address": source.get("address", ""),
-                "location": source.get("location")
-            })
+    body["sort"] = [{"_score": "desc"}, {SORT_FIELD: "asc"}]
+    if search_after:
+        body["search_after"] = list(search_after)
+    return body
 
-        logging.info(f"Búsqueda completada: {len(results)} resultados para query='{query}', ciudad='{ciudad}'")
-        return results
 
-    except Exception as e:
-        logging.error(f"Error en OpenSearch search: {e}")
-        return []
+def format_search_hits(resp: dict, k: int = None) -> list[dict]:
+    """Hits -> propiedades; si la página vino completa (k hits), next_cursor son los valores
+    `sort` del último hit (search_after de la página siguiente)."""
+    hits = resp.get("hits", {}).get("hits", [])
+
+    results = PropertyPage()
+    for h in hits:
+        source = h["_source"]
+        results.append({
+            "id": h["_id"],
+            "text": source.get("text", ""),
+            "score": h["_score"],
+            "city": source.get("city", ""),
+            "property_type": source.get("property_type", ""),
+            "operation_type": source.get("operation_type", ""),
+            "title": source.get("title", ""),
+            "address": source.get("address", ""),
+            "location": source.get("location")
+        })
+    if k and len(hits) >= k and hits[-1].get("sort"):
+        results.next_cursor = list(hits[-1]["sort"])
+    return results
 
 
 def hay_propiedades_en_ciudad(ciudad: str) -> bool:
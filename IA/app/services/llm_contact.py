@@ -1,17 +1,12 @@
 # IA/app/services/llm_contact.py
 
-import boto3
 import json
 import os
 from dotenv import load_dotenv
+from app.core.aws_clients import get_bedrock_client
 
 load_dotenv()
 
-client = boto3.client(
-    service_name="bedrock-runtime",
-    region_name=os.getenv("AWS_REGION", "us-east-1"),
-)
-
 def call_model(messages, system_prompt=None):
     """
     messages: lista de {"role": "user"|"assistant", "content": str}
@@ -23,7 +18,7 @@ def call_model(messages, system_prompt=None):
 
     print("🔧 Payload Bedrock:", json.dumps(payload, indent=2))
 
-    response = client.invoke_model(
+    response = get_bedrock_client().invoke_model(
         modelId=os.getenv("BEDROCK_MODEL_ID"),
         body=json.dumps(payload),
         contentType="application/json",
@@ -1,28 +1,70 @@
-import psycopg2
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from typing import Callable
+from app.core.postgres_pool import get_postgres_cursor
+from app.core.config import CATALOG_CACHE_TTL_SECONDS, CATALOG_CACHE_STALE_SECONDS, CATALOG_CACHE_ERROR_BACKOFF_SECONDS
+from app.utils.cache import RefreshingCache
 
 def get_property_types_from_db() -> list:
     """Obtiene una lista de tipos de propiedad únicos de la base de datos PostgreSQL."""
-    conn = None
     try:
-        conn = psycopg2.connect(
-            host=os.getenv("POSTGRESQL_DEV_URL"),
-            port=5432,
-            dbname=os.getenv("POSTGRESQL_DEV_DB"),
-            user=os.getenv("POSTGRESQL_DEV_USER"),
-            password=os.getenv("POSTGRESQL_DEV_PASSWORD")
-        )
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT property_type FROM properties WHERE property_type IS NOT NULL")
-        types = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        return types
+        return fetch_distinct_values("property_type")
     except Exception as e:
         print(f"ERROR al obtener tipos de propiedad de PostgreSQL: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+
+def fetch_distinct_values(column: str) -> list:
+    """SELECT DISTINCT sobre una columna de `properties`. Propaga errores (lo usa el cache)."""
+    if column not in CATALOG_COLUMNS:
+        raise ValueError(f"Columna de catálogo no permitida: {column}")
+    with get_postgres_cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT {column} FROM properties WHERE {column} IS NOT NULL ORDER BY {column}")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def fetch_property_columns() -> list:
+    """Columnas de la tabla `properties` (indican qué migraciones están aplicadas)."""
+    with get_postgres_cursor() as cursor:
+        cursor.execute("SELECT column_name FROM information_schema.columns "
+                       "WHERE table_name = 'properties' ORDER BY column_name")
+        return [row[0] for row in cursor.fetchall()]
+
+
+### Catálogos cacheados ###
+
+CATALOG_COLUMNS = ("property_type", "operation_type")
+
+_CATALOGS = {}
+
+def register_catalog(name: str, loader: Callable[[], list], ttl_seconds: float = CATALOG_CACHE_TTL_SECONDS,
+                     stale_seconds: float = CATALOG_CACHE_STALE_SECONDS) -> RefreshingCache:
+    """Registra un catálogo de baja cardinalidad servido desde memoria (TTL + refresh en segundo plano)."""
+    cache = RefreshingCache(loader, ttl_seconds=ttl_seconds, stale_seconds=stale_seconds, name=name, default=[],
+                            error_backoff_seconds=CATALOG_CACHE_ERROR_BACKOFF_SECONDS)
+    _CATALOGS[name] = cache
+    return cache
+
+def get_catalog(name: str) -> list:
+    """Retorna los valores de un catálogo registrado."""
+    return _CATALOGS[name].get()
+
+def invalidate_catalogs(name: str = None):
+    """Invalida uno o todos los catálogos (ej. después de cargar propiedades nuevas)."""
+    for catalog_name, cache in _CATALOGS.items():
+        if name is None or catalog_name == name:
+            cache.invalidate()
+
+def get_property_types() -> list:
+    """Tipos de propiedad desde el cache de catálogos."""
+    return get_catalog("property_types")
+
+def get_operation_types() -> list:
+    """Tipos de operación (alquiler, venta, ...) desde el cache de catálogos."""
+    return get_catalog("operation_types")
+
+def get_property_columns() -> list:
+    """Columnas de `properties` desde el cache de catálogos."""
+    return get_catalog("property_columns")
+
+
+register_catalog("property_types", lambda: fetch_distinct_values("property_type"))
+register_catalog("operation_types", lambda: fetch_distinct_values("operation_type"))
+register_catalog("property_columns", fetch_property_columns)
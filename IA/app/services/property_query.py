@@ -0,0 +1,147 @@
+"""
+Armado de la query de propiedades (placeholders %s, convertibles a asyncpg con
+to_asyncpg_placeholders): cada campo del PropertyLead se traduce a un predicado sargable
+que usa los índices de migrations/002_property_lead_filters.sql.
+
+    query = PropertyQuery()
+    add_lead_filters(query, lead)
+    sql, params = query.build(limit=10)
+
+Paginación keyset: cada página se pide con `build(limit, after=cursor)`, donde el cursor es
+la clave de orden y el id de la última fila de la página anterior ({'key', 'id'}); el seek
+`(clave::float8, id) < (%s::float8, %s)` reemplaza al OFFSET. La clave se selecciona y se
+compara como float8 (ts_rank y similarity son real): el valor del cursor es exactamente el
+de la fila. Evita saltar filas, pero con una clave calculada (score) PostgreSQL igual evalúa y
+ordena todas las filas que cumplen los filtros en cada página; solo el orden KNN de "geo"
+sale de un índice.
+"""
+from decimal import Decimal
+from typing import Iterable, Optional
+from app.core.config import PROPERTY_BUDGET_TOLERANCE
+from app.models.PropertyLead import PropertyLead
+
+PROPERTY_COLUMNS = "id, title, description, property_type, address, operation_type, price"
+# Columnas que usa add_structured_filters (migrations/002)
+LEAD_FILTER_COLUMNS = ("price", "bedrooms", "bathrooms", "area_m2", "amenities", "pet_friendly")
+
+
+class PropertyQuery:
+    """SELECT sobre `properties` con filtros, score y orden acumulados junto a sus parámetros."""
+
+    def __init__(self, columns: str = PROPERTY_COLUMNS):
+        self.columns = columns
+        self.extra_columns, self.extra_params = [], []
+        self.where, self.where_params = [], []
+        self.score, self.score_params = "0", []
+        self.order, self.order_params = [], []
+        self.sort_key = None  # (sql, params) de la clave del primer order_by
+
+    def select(self, sql: str, *params) -> "PropertyQuery":
+        """Columna adicional después del score (ej. la distancia)."""
+        self.extra_columns.append(sql)
+        self.extra_params.extend(params)
+        return self
+
+    def filter(self, sql: str, *params) -> "PropertyQuery":
+        self.where.append(sql)
+        self.where_params.extend(params)
+        return self
+
+    def rank(self, sql: str, *params) -> "PropertyQuery":
+        """Expresión del score de relevancia (0 a 1, mayor es mejor)."""
+        self.score, self.score_params = sql, list(params)
+        return self
+
+    def order_by(self, sql: str, *params) -> "PropertyQuery":
+        """Orden ascendente; el primero es la clave de paginación (se selecciona como sort_key)."""
+        if self.sort_key is None:
+            self.sort_key = (sql, list(params))
+        self.order.append(sql)
+        self.order_params.extend(params)
+        return self
+
+    def build(self, limit: int = 10, after: Optional[dict] = None):
+        """Sin order_by: score DESC, id DESC. Con order_by: ese orden, id ASC, y la clave como
+        última columna (sort_key). `after` agrega el seek de la página siguiente."""
+        columns = [self.columns, f"({self.score})::float8 AS score"] + self.extra_columns
+        column_params = self.score_params + self.extra_params
+        if self.sort_key is not None:
+            columns.append(f"({self.sort_key[0]})::float8 AS sort_key")
+            column_params = column_params + self.sort_key[1]
+            order = self.order + ["id"]
+        else:
+            order = ["score DESC", "id DESC"]
+
+        where, where_params = list(self.where), list(self.where_params)
+        if after:
+            key_sql, key_params = self.sort_key or (self.score, self.score_params)
+            where.append(f"(({key_sql})::float8, id) {'>' if self.sort_key else '<'} (%s::float8, %s)")
+            where_params += key_params + [float(after['key']), cursor_id(after['id'])]
+
+        query = f"""
+        SELECT {", ".join(columns)}
+        FROM properties
+        WHERE {" AND ".join(where) or "TRUE"}
+        ORDER BY {", ".join(order)}
+        LIMIT {int(limit)}
+    """
+        return query, column_params + where_params + self.order_params
+
+
+class PropertyPage(list):
+    """Propiedades de una página; `next_cursor` es None si no hay más resultados."""
+
+    next_cursor: Optional[dict] = None
+
+
+def cursor_id(value):
+    """Id del cursor con su tipo original (los números del estado vuelven como Decimal)."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def _catalog_value(value: str, catalog: Iterable[str]) -> Optional[str]:
+    value = value.lower().strip()
+    return value if value in {str(item).lower() for item in catalog} else None
+
+
+def add_text_filter(query: PropertyQuery, column: str, value: str, catalog: Iterable[str] = ()):
+    """Igualdad sobre lower(columna) si el valor existe en el catálogo (B-tree compuesto);
+    si no, LIKE '%valor%' (índice trigram)."""
+    exact = _catalog_value(value, catalog)
+    if exact is not None:
+        query.filter(f"lower({column}) = %s", exact)
+    else:
+        query.filter(f"lower({column}) LIKE %s", f"%{value.lower().strip()}%")
+
+
+def add_lead_filters(query: PropertyQuery, lead: PropertyLead, property_types: Iterable[str] = (),
+                     operation_types: Iterable[str] = ()) -> PropertyQuery:
+    """Todos los campos del lead salvo la ubicación (la resuelve cada modo de búsqueda)."""
+    if lead.tipo_propiedad:
+        add_text_filter(query, "property_type", lead.tipo_propiedad[0], property_types)
+    if lead.transaccion:
+        add_text_filter(query, "operation_type", lead.transaccion, operation_types)
+    return add_structured_filters(query, lead)
+
+
+def add_structured_filters(query: PropertyQuery, lead: PropertyLead) -> PropertyQuery:
+    """Presupuesto, dormitorios, baños, metraje, amenidades y mascotas (columnas de
+    migrations/002, cargadas por migrations/005). Una propiedad sin el dato (NULL, o sin
+    amenidades) no se descarta: solo se excluyen las que lo tienen y no cumplen."""
+    if lead.presupuesto:
+        query.filter("(price IS NULL OR price <= %s)", round(lead.presupuesto * (1 + PROPERTY_BUDGET_TOLERANCE), 2))
+    if lead.numero_dormitorios:
+        query.filter("(bedrooms IS NULL OR bedrooms >= %s)", lead.numero_dormitorios)
+    if lead.numero_banos:
+        query.filter("(bathrooms IS NULL OR bathrooms >= %s)", lead.numero_banos)
+    if lead.metraje_minimo:
+        query.filter("(area_m2 IS NULL OR area_m2 >= %s)", lead.metraje_minimo)
+    if lead.amenidades:
+        amenities = sorted({amenity.lower().strip() for amenity in lead.amenidades if amenity and amenity.strip()})
+        if amenities:
+            query.filter("(amenities = '{}' OR amenities @> %s::text[])", amenities)
+    if lead.pet_friendly:
+        query.filter("pet_friendly IS NOT FALSE")
+    return query
@@ -0,0 +1,171 @@
+"""
+Cache de resultados de búsqueda de propiedades por lead canónico (LRU + TTL).
+
+Leads equivalentes ("Departamento, Alquiler, Miraflores" y "departamento alquiler miraflores")
+comparten la clave: textos normalizados (minúsculas, sin tildes), listas sin duplicados y
+ordenadas, y el presupuesto redondeado hacia arriba a PROPERTY_CACHE_BUDGET_BUCKET (la búsqueda
+se hace con ese mismo presupuesto, ver bucket_budget, para que el resultado corresponda a la clave;
+within_budget aplica después el presupuesto exacto de cada lead sobre la página cacheada).
+
+La clave también incluye el modo de búsqueda, el tamaño de página, el cursor ("ver más") y la
+generación del cache: invalidate_search_cache() (scripts de indexación) la incrementa en
+PostgreSQL (migrations/004) y cada proceso de la API la relee cada
+PROPERTY_CACHE_GENERATION_TTL_SECONDS, así las entradas anteriores dejan de usarse.
+"""
+import json
+import math
+import logging
+from decimal import Decimal
+from typing import Optional
+from app.core.config import (
+    PROPERTY_SEARCH_MODE,
+    PROPERTY_PAGE_SIZE,
+    PROPERTY_CACHE_ENABLED,
+    PROPERTY_CACHE_MAX_ENTRIES,
+    PROPERTY_CACHE_TTL_SECONDS,
+    PROPERTY_CACHE_BUDGET_BUCKET,
+    PROPERTY_CACHE_GENERATION_TTL_SECONDS,
+    PROPERTY_BUDGET_TOLERANCE,
+    CATALOG_CACHE_STALE_SECONDS,
+)
+from app.models.PropertyLead import PropertyLead
+from app.services.property_query import PropertyPage
+from app.utils.cache import LRUCache, RefreshingCache
+from app.utils.nlu import normalize_text
+
+CACHE_NAME = "property_search"
+
+_RESULTS = LRUCache(PROPERTY_CACHE_MAX_ENTRIES, PROPERTY_CACHE_TTL_SECONDS, name=CACHE_NAME)
+
+
+### Lead canónico ###
+
+def bucket_budget(lead: PropertyLead, bucket: int = PROPERTY_CACHE_BUDGET_BUCKET) -> PropertyLead:
+    """Copia del lead con el presupuesto redondeado hacia arriba al múltiplo de `bucket`."""
+    if not lead.presupuesto or bucket <= 0:
+        return lead
+    return lead.model_copy(update={'presupuesto': int(math.ceil(lead.presupuesto / bucket) * bucket)})
+
+
+def within_budget(properties: list, lead: PropertyLead) -> list:
+    """Propiedades de la página que cumplen el presupuesto exacto del lead (mismo criterio que
+    el filtro SQL: precio <= presupuesto * (1 + tolerancia); sin precio no se descartan)."""
+    if not lead.presupuesto:
+        return properties
+    limit = round(lead.presupuesto * (1 + PROPERTY_BUDGET_TOLERANCE), 2)
+    page = PropertyPage(prop for prop in properties if prop.get('price') is None or prop['price'] <= limit)
+    page.next_cursor = getattr(properties, 'next_cursor', None)
+    return page
+
+
+def _canonical_value(value):
+    if isinstance(value, str):
+        return normalize_text(value) or None
+    if isinstance(value, (list, tuple, set)):
+        items = sorted({normalize_text(str(item)) for item in value if item is not None} - {''})
+        return items or None
+    return value
+
+
+def canonical_lead(lead: PropertyLead) -> dict:
+    """Campos con valor del lead, normalizados (el presupuesto ya debe venir de bucket_budget)."""
+    canonical = {}
+    for name, value in dict(lead).items():
+        value = _canonical_value(value)
+        if value is not None:
+            canonical[name] = value
+    return canonical
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Tipo no serializable en la clave del cache: {type(value)}")
+
+
+def search_cache_key(lead: PropertyLead, cursor: Optional[dict] = None, mode: str = PROPERTY_SEARCH_MODE) -> Optional[str]:
+    """Clave del cache para el lead (None si el cache está apagado)."""
+    if not PROPERTY_CACHE_ENABLED:
+        return None
+    return json.dumps({
+        'generation': current_generation(),
+        'mode': mode,
+        'page_size': PROPERTY_PAGE_SIZE,
+        'cursor': cursor,
+        'lead': canonical_lead(lead),
+    }, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+
+
+### Resultados ###
+
+def get_cached_properties(key: Optional[str]) -> Optional[list]:
+    """Copia de la página cacheada (los stages modifican las listas) o None."""
+    if key is None:
+        return None
+    entry = _RESULTS.get(key)
+    if entry is None:
+        return None
+    properties, next_cursor = entry
+    page = PropertyPage(dict(prop) for prop in properties)
+    page.next_cursor = next_cursor
+    return page
+
+
+def cache_properties(key: Optional[str], properties: list):
+    if key is None:
+        return
+    _RESULTS.put(key, (tuple(dict(prop) for prop in properties), getattr(properties, 'next_cursor', None)))
+
+
+### Generación / invalidación ###
+
+def _load_generation() -> int:
+    """Generación actual (0 si aún no se invalidó). Propaga errores: RefreshingCache conserva
+    la última generación conocida en vez de volver a 0 y reusar entradas invalidadas."""
+    from app.core.postgres_pool import get_postgres_cursor
+    with get_postgres_cursor() as cursor:
+        cursor.execute("SELECT generation FROM cache_generations WHERE name = %s", (CACHE_NAME,))
+        row = cursor.fetchone()
+    return int(row[0]) if row else 0
+
+
+_GENERATION = RefreshingCache(_load_generation, ttl_seconds=PROPERTY_CACHE_GENERATION_TTL_SECONDS,
+                              stale_seconds=CATALOG_CACHE_STALE_SECONDS, name=f"{CACHE_NAME}_generation", default=0)
+
+
+def current_generation() -> int:
+    return _GENERATION.get()
+
+
+def invalidate_search_cache(connection=None) -> Optional[int]:
+    """Invalida los resultados cacheados en este proceso y en todos los procesos de la API
+    (incrementa la generación en PostgreSQL). `connection`: conexión psycopg2 propia del
+    script; si no se pasa se usa el pool. Retorna la nueva generación (None si no se pudo)."""
+    _RESULTS.clear()
+    _GENERATION.invalidate()
+    try:
+        if connection is not None:
+            return _bump_generation(connection)
+        from app.core.postgres_pool import get_postgres_connection
+        with get_postgres_connection() as conn:
+            return _bump_generation(conn)
+    except Exception as e:
+        logging.warning(f"Cache '{CACHE_NAME}': no se pudo incrementar la generación: {e}")
+        return None
+
+
+def _bump_generation(conn) -> int:
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO cache_generations (name, generation, updated_at) VALUES (%s, 1, now())
+            ON CONFLICT (name) DO UPDATE
+            SET generation = cache_generations.generation + 1, updated_at = now()
+            RETURNING generation
+        """, (CACHE_NAME,))
+        generation = int(cursor.fetchone()[0])
+    conn.commit()
+    return generation
+
+
+def search_cache_stats() -> dict:
+    return {**_RESULTS.snapshot(), "enabled": PROPERTY_CACHE_ENABLED, "generation": _GENERATION._value}
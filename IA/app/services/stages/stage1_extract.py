@@ -1,8 +1,8 @@
-from app.core.aws_clients import get_langchain_bedrock_client
+from app.core.aws_clients import get_langchain_bedrock_client, get_structured_llm
 from app.core.config import BEDROCK_MODEL_ID
 from app.models.PropertyLead import PropertyLead
 from langchain_core.runnables import RunnableLambda, RunnableBranch
-from app.services.stages.stage_logic import summarize_conversation
+from app.services.stages.stage_logic import summarize_conversation, asummarize_conversation
 #doc: https://python.langchain.com/api_reference/aws/index.html
 #doc: https://python.langchain.com/api_reference/aws/chat_models/langchain_aws.chat_models.bedrock_converse.ChatBedrockConverse.html#langchain_aws.chat_models.bedrock_converse.ChatBedrockConverse
 
@@ -59,19 +59,51 @@ def handle(conversation):
     ]
     """
 
+    # Invocacion de cadena
+    result = build_stage1_chain().invoke(
+        {'conversation': conversation,
+         'base_prompt': BASE_PROMPT}
+    )
+
+    return result
+
+
+async def ahandle(conversation):
+    """Versión asyncio de handle: los pasos con LLM usan ainvoke"""
+    return await build_stage1_chain().ainvoke(
+        {'conversation': conversation,
+         'base_prompt': BASE_PROMPT}
+    )
+
+
+_STAGE1_CHAIN = None
+
+def build_stage1_chain():
+    """Construye (una sola vez) la cadena del stage 1. Los pasos con LLM tienen variante
+    async (afunc) para que `ainvoke` no bloquee el event loop."""
+    global _STAGE1_CHAIN
+    if _STAGE1_CHAIN is not None:
+        return _STAGE1_CHAIN
+
     # Wrap de funciones en cadenas Langchain:
     build_prompt_chain = RunnableLambda(lambda vars: build_question_prompt(
         base_prompt=vars["base_prompt"],
         missing_info=vars["missing_info"]
     ))
-    contact_llm_chain = RunnableLambda(lambda vars: model_converse(
-        prompt=vars["final_prompt"],
-        conversation=vars["conversation"]
-    ))
+    contact_llm_chain = RunnableLambda(
+        lambda vars: model_converse(prompt=vars["final_prompt"], conversation=vars["conversation"]),
+        afunc=lambda vars: amodel_converse(prompt=vars["final_prompt"], conversation=vars["conversation"])
+    )
 
-    summarize_conversation_chain = RunnableLambda(lambda vars: summarize_conversation(conversation= vars['conversation']))
+    summarize_conversation_chain = RunnableLambda(
+        lambda vars: summarize_conversation(conversation= vars['conversation']),
+        afunc=lambda vars: asummarize_conversation(conversation= vars['conversation'])
+    )
     build_lead_prompt_chain = RunnableLambda(lambda vars: build_lead_prompt_from_summary(conversation_summary= vars['conversation_summary']))
-    get_lead_chain = RunnableLambda(lambda vars: get_lead_with_prompt(lead_prompt=vars['lead_prompt']))
+    get_lead_chain = RunnableLambda(
+        lambda vars: get_lead_with_prompt(lead_prompt=vars['lead_prompt']),
+        afunc=lambda vars: aget_lead_with_prompt(lead_prompt=vars['lead_prompt'])
+    )
     #lead_extraction_chain = RunnableLambda(lambda vars: get_lead(conversation = vars['conversation']))
     lead_verification_chain = RunnableLambda(lambda vars: has_minimium_data(lead=vars['lead']))
     get_missing_keys_chain =  RunnableLambda(lambda vars: get_missing_info(lead=vars['lead']))
@@ -108,15 +140,8 @@ def handle(conversation):
     )
 
     # Cadena final
-    full_chain = (pre_chain | branch_chain)
-
-    # Invocacion de cadena
-    result = full_chain.invoke(
-        {'conversation': conversation,
-         'base_prompt': BASE_PROMPT}
-    )
-
-    return result
+    _STAGE1_CHAIN = (pre_chain | branch_chain)
+    return _STAGE1_CHAIN
 
 
 def model_converse(prompt, conversation):
@@ -128,11 +153,17 @@ def model_converse(prompt, conversation):
     return response.content
 
 
+async def amodel_converse(prompt, conversation):
+    """Versión asyncio de model_converse (en el endpoint de streaming reenvía los tokens)"""
+    from app.services.streaming import astream_llm_text
+    chat = get_langchain_bedrock_client(model_id=BEDROCK_MODEL_ID)
+    return await astream_llm_text(chat, message_with_prompt_build(prompt, conversation))
+
+
 def get_lead(conversation):
     """Obtiene un lead formateado segun la clase definida en app.models.PropertyLead"""
 
-    chat = get_langchain_bedrock_client(model_id=BEDROCK_MODEL_ID,**LEAD_GENERATION_PARAMS)
-    structured_llm = chat.with_structured_output(PropertyLead)
+    structured_llm = get_structured_llm(BEDROCK_MODEL_ID, PropertyLead, **LEAD_GENERATION_PARAMS)
     prompt = build_lead_prompt(conversation)
 
     return structured_llm.invoke(prompt)
@@ -141,12 +172,17 @@ def get_lead_with_prompt(lead_prompt:str, include_raw:bool = False):
     """Obtiene un lead formateado segun la clase definida en app.models.PropertyLead
     Usa un prompt ya definido"""
 
-    chat = get_langchain_bedrock_client(model_id=BEDROCK_MODEL_ID, **LEAD_GENERATION_PARAMS)
-    structured_llm = chat.with_structured_output(PropertyLead, include_raw=include_raw)
+    structured_llm = get_structured_llm(BEDROCK_MODEL_ID, PropertyLead, include_raw=include_raw, **LEAD_GENERATION_PARAMS)
 
     return structured_llm.invoke(lead_prompt)
 
 
+async def aget_lead_with_prompt(lead_prompt:str, include_raw:bool = False):
+    """Versión asyncio de get_lead_with_prompt"""
+    structured_llm = get_structured_llm(BEDROCK_MODEL_ID, PropertyLead, include_raw=include_raw, **LEAD_GENERATION_PARAMS)
+    return await structured_llm.ainvoke(lead_prompt)
+
+
 def has_minimium_data(lead: PropertyLead) -> bool:
     """Determina si se tiene la minima data para continuar con el siguiente stage"""
     print(f"DEBUG - Checking lead data:")
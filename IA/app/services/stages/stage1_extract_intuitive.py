@@ -1,7 +1,8 @@
 from app.models.PropertyLead import PropertyLead
 import re
-from app.services.postgres_queries import get_property_types_from_db
+from app.services.postgres_queries import get_property_types
 import random
+from app.utils.nlu import parse_message, register_keywords
 
 def handle_smart_extraction(conversation, current_lead=None):
     """
@@ -41,8 +42,100 @@ def handle_smart_extraction(conversation, current_lead=None):
             "model_response": next_question
         }
 
+# Palabras clave de cada dato del lead (se buscan todas en una sola pasada, ver app.utils.nlu)
+TIPO_PROPIEDAD_KEYWORDS = {
+    'departamento': [
+        'departamento', 'depto', 'apartamento', 'piso', 'flat',
+        'quiero un departamento', 'busco departamento', 'me interesa un departamento',
+        'un departamento', 'algún departamento'
+    ],
+    'casa': [
+        'casa', 'vivienda', 'hogar', 'residencia',
+        'quiero una casa', 'busco casa', 'me interesa una casa',
+        'una casa', 'alguna casa'
+    ],
+    'oficina': [
+        'oficina', 'local', 'espacio comercial', 'negocio',
+        'quiero una oficina', 'busco oficina', 'local comercial'
+    ],
+}
+
+# En orden de prioridad (la primera que coincide)
+UBICACION_KEYWORDS = {
+    'Lima': ['lima', 'ciudad de lima', 'en lima', 'por lima', 'lima metropolitana', 'capital', 'centro de lima'],
+    'Miraflores': ['miraflores', 'en miraflores', 'por miraflores', 'distrito de miraflores'],
+    'San Isidro': ['san isidro', 'en san isidro', 'por san isidro', 'isidro'],
+    'Surco': ['surco', 'en surco', 'por surco', 'santiago de surco'],
+    'Barranco': ['barranco', 'en barranco', 'por barranco'],
+}
+
+TRANSACCION_KEYWORDS = {
+    'alquiler': [
+        'alquiler', 'alquilar', 'rentar', 'para alquiler', 'en alquiler',
+        'quiero alquilar', 'busco para alquilar', 'me interesa alquilar',
+        'renta', 'arrendar', 'mensual'
+    ],
+    'compra': [
+        'compra', 'comprar', 'venta', 'para comprar', 'en venta',
+        'quiero comprar', 'busco para comprar', 'me interesa comprar',
+        'adquirir', 'invertir'
+    ],
+}
+
+NO_IMPORTA_KEYWORDS = [
+    'no importa', 'no me importa', 'cualquiera', 'no importa cuantos',
+    'cualquiera esta bien', 'no importa la cantidad', 'sin preferencia',
+    'no tengo preferencia', 'da igual'
+]
+
+DORMITORIOS_EN_PALABRAS = {
+    1: ['un dormitorio', 'una habitacion', 'un cuarto'],
+    2: ['dos dormitorio', 'dos habitacion', 'dos cuarto'],
+    3: ['tres dormitorio', 'tres habitacion', 'tres cuarto'],
+}
+
+BANOS_EN_PALABRAS = {
+    1: ['un bano', 'un baño'],
+    2: ['dos bano', 'dos baño'],
+    3: ['tres bano', 'tres baño'],
+}
+
+GREETING_KEYWORDS = [
+    'hola', 'hello', 'hi', 'hey', 'buenas', 'saludos',
+    'buenos dias', 'buenas tardes', 'buenas noches',
+    'que tal', 'como estas'
+]
+
+TIPO_PROPIEDAD = {tipo: register_keywords(f'lead.tipo.{tipo}', keywords) for tipo, keywords in TIPO_PROPIEDAD_KEYWORDS.items()}
+UBICACION = {ubicacion: register_keywords(f'lead.ubicacion.{ubicacion}', keywords) for ubicacion, keywords in UBICACION_KEYWORDS.items()}
+TRANSACCION = {transaccion: register_keywords(f'lead.transaccion.{transaccion}', keywords) for transaccion, keywords in TRANSACCION_KEYWORDS.items()}
+NO_IMPORTA = register_keywords('lead.no_importa', NO_IMPORTA_KEYWORDS)
+DORMITORIOS = {number: register_keywords(f'lead.dormitorios.{number}', words) for number, words in DORMITORIOS_EN_PALABRAS.items()}
+BANOS = {number: register_keywords(f'lead.banos.{number}', words) for number, words in BANOS_EN_PALABRAS.items()}
+GREETING = register_keywords('greeting', GREETING_KEYWORDS)
+
+# Los patrones se aplican sobre el texto normalizado (sin tildes: 'baño' -> 'bano')
+DORMITORIO_PATTERNS = [re.compile(r'(\d+)\s*dormitorio'), re.compile(r'(\d+)\s*habitacion'), re.compile(r'(\d+)\s*cuarto')]
+BANO_PATTERNS = [re.compile(r'(\d+)\s*bano')]
+PRESUPUESTO_PATTERNS = [
+    re.compile(r'(\d+)\s*soles?'),
+    re.compile(r'(\d+)\s*dolares?'),
+    re.compile(r'(\d+)\s*usd'),
+    re.compile(r'presupuesto.*?(\d+)'),
+    re.compile(r'hasta.*?(\d+)'),
+    re.compile(r'maximo.*?(\d+)'),
+    re.compile(r'no mas de.*?(\d+)')
+]
+
+def first_number(patterns, text):
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return int(match.group(1))
+    return None
+
 def extract_info_intuitive(message, current_lead):
-    """Extrae información de forma súper intuitiva"""
+    """Extrae información de forma súper intuitiva (message: texto o ParsedMessage)"""
     # Crear copia del lead actual
     new_lead = PropertyLead(
         ubicacion=current_lead.ubicacion,
@@ -53,182 +146,46 @@ def extract_info_intuitive(message, current_lead):
         numero_banos=current_lead.numero_banos
     )
 
-    message_lower = message.lower().strip()
+    parsed = parse_message(message)
 
-    # 🏠 TIPO DE PROPIEDAD - Súper intuitivo
+    # 🏠 TIPO DE PROPIEDAD - si hay varias, gana la última (departamento < casa < oficina)
     if not new_lead.tipo_propiedad:
-        # Departamentos
-        departamento_keywords = [
-            'departamento', 'depto', 'apartamento', 'piso', 'flat',
-            'quiero un departamento', 'busco departamento', 'me interesa un departamento',
-            'un departamento', 'algún departamento'
-        ]
-        if any(keyword in message_lower for keyword in departamento_keywords):
-            new_lead.tipo_propiedad = ["departamento"]
-
-        # Casas
-        casa_keywords = [
-            'casa', 'vivienda', 'hogar', 'residencia',
-            'quiero una casa', 'busco casa', 'me interesa una casa',
-            'una casa', 'alguna casa'
-        ]
-        if any(keyword in message_lower for keyword in casa_keywords):
-            new_lead.tipo_propiedad = ["casa"]
-
-        # Oficinas
-        oficina_keywords = [
-            'oficina', 'local', 'espacio comercial', 'negocio',
-            'quiero una oficina', 'busco oficina', 'local comercial'
-        ]
-        if any(keyword in message_lower for keyword in oficina_keywords):
-            new_lead.tipo_propiedad = ["oficina"]
-
-    # 📍 UBICACIÓN - Súper intuitivo
+        for tipo, label in TIPO_PROPIEDAD.items():
+            if parsed.has(label):
+                new_lead.tipo_propiedad = [tipo]
+
+    # 📍 UBICACIÓN
     if not new_lead.ubicacion:
-        # Lima
-        lima_keywords = [
-            'lima', 'ciudad de lima', 'en lima', 'por lima', 'lima metropolitana',
-            'capital', 'centro de lima'
-        ]
-        if any(keyword in message_lower for keyword in lima_keywords):
-            new_lead.ubicacion = "Lima"
-
-        # Miraflores
-        elif any(keyword in message_lower for keyword in [
-            'miraflores', 'en miraflores', 'por miraflores', 'distrito de miraflores'
-        ]):
-            new_lead.ubicacion = "Miraflores"
-
-        # San Isidro
-        elif any(keyword in message_lower for keyword in [
-            'san isidro', 'en san isidro', 'por san isidro', 'isidro'
-        ]):
-            new_lead.ubicacion = "San Isidro"
-
-        # Surco
-        elif any(keyword in message_lower for keyword in [
-            'surco', 'en surco', 'por surco', 'santiago de surco'
-        ]):
-            new_lead.ubicacion = "Surco"
-
-        # Barranco
-        elif any(keyword in message_lower for keyword in [
-            'barranco', 'en barranco', 'por barranco'
-        ]):
-            new_lead.ubicacion = "Barranco"
-
-    # 💰 TRANSACCIÓN - Súper intuitivo
+        new_lead.ubicacion = next((ubicacion for ubicacion, label in UBICACION.items() if parsed.has(label)), new_lead.ubicacion)
+
+    # 💰 TRANSACCIÓN - si hay ambas, gana compra
     if not new_lead.transaccion:
-        # Alquiler
-        alquiler_keywords = [
-            'alquiler', 'alquilar', 'rentar', 'para alquiler', 'en alquiler',
-            'quiero alquilar', 'busco para alquilar', 'me interesa alquilar',
-            'renta', 'arrendar', 'mensual'
-        ]
-        if any(keyword in message_lower for keyword in alquiler_keywords):
-            new_lead.transaccion = "alquiler"
-
-        # Compra
-        compra_keywords = [
-            'compra', 'comprar', 'venta', 'para comprar', 'en venta',
-            'quiero comprar', 'busco para comprar', 'me interesa comprar',
-            'adquirir', 'invertir'
-        ]
-        if any(keyword in message_lower for keyword in compra_keywords):
-            new_lead.transaccion = "compra"
-
-    # 🛏️ DORMITORIOS - Súper intuitivo
-    if new_lead.numero_dormitorios is None:  # Solo procesar si no se ha establecido
-        # Verificar si el usuario indica que no le importa
-        no_importa_keywords = [
-            'no importa', 'no me importa', 'cualquiera', 'no importa cuantos',
-            'cualquiera esta bien', 'no importa la cantidad', 'sin preferencia',
-            'no tengo preferencia', 'da igual'
-        ]
-        
-        if any(keyword in message_lower for keyword in no_importa_keywords):
-            new_lead.numero_dormitorios = None  # Mantener como None para indicar que no importa
-        else:
-            # Patrones numéricos
-            dormitorio_patterns = [
-                (r'(\d+)\s*dormitorio', lambda m: int(m.group(1))),
-                (r'(\d+)\s*habitacion', lambda m: int(m.group(1))),
-                (r'(\d+)\s*cuarto', lambda m: int(m.group(1))),
-            ]
-
-            for pattern, extractor in dormitorio_patterns:
-                match = re.search(pattern, message_lower)
-                if match:
-                    new_lead.numero_dormitorios = extractor(match)
-                    break
-
-            # Patrones en palabras
-            if new_lead.numero_dormitorios is None:
-                if any(word in message_lower for word in ['un dormitorio', 'una habitacion', 'un cuarto']):
-                    new_lead.numero_dormitorios = 1
-                elif any(word in message_lower for word in ['dos dormitorio', 'dos habitacion', 'dos cuarto']):
-                    new_lead.numero_dormitorios = 2
-                elif any(word in message_lower for word in ['tres dormitorio', 'tres habitacion', 'tres cuarto']):
-                    new_lead.numero_dormitorios = 3
-
-    # 🛁 BAÑOS - Súper intuitivo
-    if new_lead.numero_banos is None:  # Solo procesar si no se ha establecido
-        # Verificar si el usuario indica que no le importa
-        no_importa_keywords = [
-            'no importa', 'no me importa', 'cualquiera', 'no importa cuantos',
-            'cualquiera esta bien', 'no importa la cantidad', 'sin preferencia',
-            'no tengo preferencia', 'da igual'
-        ]
-        
-        if any(keyword in message_lower for keyword in no_importa_keywords):
-            new_lead.numero_banos = None  # Mantener como None para indicar que no importa
-        else:
-            # Patrones numéricos para baños
-            banos_patterns = [
-                (r'(\d+)\s*bano', lambda m: int(m.group(1))),
-                (r'(\d+)\s*baño', lambda m: int(m.group(1))),
-            ]
-
-            for pattern, extractor in banos_patterns:
-                match = re.search(pattern, message_lower)
-                if match:
-                    new_lead.numero_banos = extractor(match)
-                    break
-
-            # Patrones en palabras
-            if new_lead.numero_banos is None:
-                if any(word in message_lower for word in ['un bano', 'un baño']):
-                    new_lead.numero_banos = 1
-                elif any(word in message_lower for word in ['dos bano', 'dos baño']):
-                    new_lead.numero_banos = 2
-                elif any(word in message_lower for word in ['tres bano', 'tres baño']):
-                    new_lead.numero_banos = 3
-
-    # 💵 PRESUPUESTO - Súper intuitivo
+        for transaccion, label in TRANSACCION.items():
+            if parsed.has(label):
+                new_lead.transaccion = transaccion
+
+    # 🛏️ DORMITORIOS ('no importa' lo deja en None)
+    if new_lead.numero_dormitorios is None and not parsed.has(NO_IMPORTA):
+        new_lead.numero_dormitorios = first_number(DORMITORIO_PATTERNS, parsed.text)
+        if new_lead.numero_dormitorios is None:
+            new_lead.numero_dormitorios = next((number for number, label in DORMITORIOS.items() if parsed.has(label)), None)
+
+    # 🛁 BAÑOS ('no importa' lo deja en None)
+    if new_lead.numero_banos is None and not parsed.has(NO_IMPORTA):
+        new_lead.numero_banos = first_number(BANO_PATTERNS, parsed.text)
+        if new_lead.numero_banos is None:
+            new_lead.numero_banos = next((number for number, label in BANOS.items() if parsed.has(label)), None)
+
+    # 💵 PRESUPUESTO
     if not new_lead.presupuesto:
-        # Patrones de presupuesto
-        presupuesto_patterns = [
-            r'(\d+)\s*soles?',
-            r'(\d+)\s*dolares?',
-            r'(\d+)\s*usd',
-            r'presupuesto.*?(\d+)',
-            r'hasta.*?(\d+)',
-            r'maximo.*?(\d+)',
-            r'no mas de.*?(\d+)'
-        ]
-
-        for pattern in presupuesto_patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                new_lead.presupuesto = int(match.group(1))
-                break
+        new_lead.presupuesto = first_number(PRESUPUESTO_PATTERNS, parsed.text) or new_lead.presupuesto
 
     return new_lead  # Correctamente terminamos esta función
 
 def get_next_question_smart(lead):
     """Genera preguntas más naturales e intuitivas"""
     if not lead.tipo_propiedad:
-        return f"¿Qué tipo de propiedad te interesa? Puedes decirme: {', '.join(get_property_types_from_db())}, o lo que tengas en mente 😊"
+        return f"¿Qué tipo de propiedad te interesa? Puedes decirme: {', '.join(get_property_types())}, o lo que tengas en mente 😊"
 
     elif not lead.ubicacion:
         tipo = lead.tipo_propiedad[0] if lead.tipo_propiedad else "propiedad"
@@ -261,19 +218,11 @@ def has_minimum_data(lead):
     ])
 
 def is_greeting_message(message):
-    """Detecta saludos de forma más intuitiva"""
-    greetings = [
-        'hola', 'hello', 'hi', 'hey', 'buenas', 'saludos',
-        'buenos dias', 'buenas tardes', 'buenas noches',
-        'que tal', 'como estas'
-    ]
-    message_lower = message.lower().strip()
+    """Detecta saludos de forma más intuitiva (message: texto o ParsedMessage)"""
+    parsed = parse_message(message)
 
     # Es saludo si es corto y contiene palabras de saludo
-    if len(message_lower) < 20 and any(greeting in message_lower for greeting in greetings):
-        return True
-
-    return False
+    return len(parsed.lower) < 20 and parsed.has(GREETING)
 
 def generate_greeting_response(user_name=""):
     """Genera respuesta de saludo más natural"""
@@ -283,10 +232,14 @@ def generate_greeting_response(user_name=""):
     name_part = f" {user_name}" if user_name else ""
 
     greetings = [
-        f"¡Hola{name_part}! Soy {agent_name}, tu agente inmobiliario virtual 😊 ¿Qué tipo de propiedad estás buscando? (ej. {', '.join(get_property_types_from_db())})",
-        f"¡Qué tal{name_part}! Me llamo {agent_name} y estoy aquí para ayudarte a encontrar tu propiedad ideal 🏠 ¿En qué puedo asistirte?",
-        f"¡Hola{name_part}! Soy {agent_name}, especialista en bienes raíces ✨ ¿Qué tipo de inmueble te interesa?",
-        f"¡Bienvenido{name_part}! Me llamo {agent_name} y me encanta ayudar a las personas a encontrar su hogar perfecto 🏡 ¿Qué buscas?"
+        "¡Hola{name_part}! Soy {agent_name}, tu agente inmobiliario virtual 😊 ¿Qué tipo de propiedad estás buscando? (ej. {property_types})",
+        "¡Qué tal{name_part}! Me llamo {agent_name} y estoy aquí para ayudarte a encontrar tu propiedad ideal 🏠 ¿En qué puedo asistirte?",
+        "¡Hola{name_part}! Soy {agent_name}, especialista en bienes raíces ✨ ¿Qué tipo de inmueble te interesa?",
+        "¡Bienvenido{name_part}! Me llamo {agent_name} y me encanta ayudar a las personas a encontrar su hogar perfecto 🏡 ¿Qué buscas?"
     ]
 
-    return random.choice(greetings)
+    greeting = random.choice(greetings)
+    # Solo consultamos el catálogo si la plantilla elegida lo usa
+    property_types = ', '.join(get_property_types()) if "{property_types}" in greeting else ""
+
+    return greeting.format(name_part=name_part, agent_name=agent_name, property_types=property_types)
@@ -1,30 +1,32 @@
 from app.services.embeddings.search_opensearch import search_similar_properties
 from app.models.PropertyLead import PropertyLead
+from app.core.config import PROPERTY_PAGE_SIZE, OPENSEARCH_KNN_CANDIDATES
 from app.utils.logger import log_search_performed, log_performance
 import time
 
-def handler(lead: PropertyLead, user_id: str = "", conv_id: str = "") -> list:
+def handler(lead: PropertyLead, user_id: str = "", conv_id: str = "", cursor: list = None) -> list:
     """
-    Invoca la búsqueda en opensearch con filtros mejorados y logging
+    Invoca la búsqueda en opensearch con filtros mejorados y logging. Con `cursor`
+    (next_cursor de la página anterior) retorna la página siguiente vía search_after.
     """
     start_time = time.time()
 
     try:
         # Crear descripción para búsqueda semántica
-        # con OPENSEARCH // lead_description = create_lead_description(lead)
-        properties = search_properties_postgres(lead)
+        lead_description = create_lead_description(lead)
 
         # Extraer filtros estructurados del lead
         filters = extract_search_filters(lead)
 
         # Realizar búsqueda híbrida
         properties = search_similar_properties(
-
             query=lead_description,
             ciudad=filters.get("ciudad", ""),
             property_type=filters.get("property_type", ""),
             operation_type=filters.get("operation_type", ""),
-            k=5  # Buscar más propiedades para mejor selección
+            k=PROPERTY_PAGE_SIZE,
+            search_after=cursor,
+            candidates=OPENSEARCH_KNN_CANDIDATES  # el knn debe cubrir todas las páginas
         )
 
         # Log de la búsqueda
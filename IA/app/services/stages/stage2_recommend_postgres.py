@@ -1,20 +1,32 @@
+import re
+import logging
+from collections.abc import Mapping
 from app.models.PropertyLead import PropertyLead
-import psycopg2
-import os
-from dotenv import load_dotenv
+from app.core.postgres_pool import get_postgres_cursor, get_async_postgres_connection
+from app.core.config import PROPERTY_SEARCH_MODE, PROPERTY_PAGE_SIZE
+from app.services.property_query import PropertyQuery, PropertyPage, LEAD_FILTER_COLUMNS, add_lead_filters, add_structured_filters, cursor_id
+from app.services.search_cache import bucket_budget, within_budget, search_cache_key, get_cached_properties, cache_properties
 
-load_dotenv()
-
-def handler(lead: PropertyLead, user_id: str = "", conv_id: str = "") -> list:
+def handler(lead: PropertyLead, user_id: str = "", conv_id: str = "", cursor: dict = None) -> list:
     """
-    Busca propiedades directamente en PostgreSQL
+    Busca propiedades directamente en PostgreSQL. Con `cursor` (next_cursor de la página
+    anterior) retorna la página siguiente. Leads equivalentes se sirven desde el cache
+    (app/services/search_cache.py).
     """
     try:
-        print(f"DEBUG - Buscando propiedades para: {dict(lead)}")
+        lead = as_lead(lead)
+        search_lead = bucket_budget(lead)
+        print(f"DEBUG - Buscando propiedades para: {dict(search_lead)}")
 
-        # Buscar en PostgreSQL
-        properties = search_properties_postgres(lead)
+        cache_key = search_cache_key(search_lead, cursor)
+        properties = get_cached_properties(cache_key)
+        if properties is None:
+            # Buscar en PostgreSQL (los errores no se cachean)
+            properties = fetch_property_page(search_lead, cursor)
+            cache_properties(cache_key, properties)
 
+        # La página se buscó con el presupuesto redondeado: se aplica el exacto del lead
+        properties = within_budget(properties, lead)
         print(f"DEBUG - Encontradas {len(properties)} propiedades")
 
         return properties
@@ -23,84 +35,259 @@ def handler(lead: PropertyLead, user_id: str = "", conv_id: str = "") -> list:
         print(f"ERROR - Búsqueda PostgreSQL: {e}")
         return []
 
-def search_properties_postgres(lead: PropertyLead) -> list:
+async def ahandler(lead: PropertyLead, user_id: str = "", conv_id: str = "", cursor: dict = None) -> list:
     """
-    Busca propiedades en PostgreSQL usando criterios del lead
+    Versión asyncio de handler (pool asyncpg)
     """
     try:
-        # Conectar a PostgreSQL
-        conn = psycopg2.connect(
-            host=os.getenv("POSTGRESQL_DEV_URL"),
-            port=5432,
-            dbname=os.getenv("POSTGRESQL_DEV_DB"),
-            user=os.getenv("POSTGRESQL_DEV_USER"),
-            password=os.getenv("POSTGRESQL_DEV_PASSWORD")
-        )
-        cursor = conn.cursor()
-
-        # Construir query SQL básica
-        query = """
-            SELECT title, description, property_type, address, operation_type
-            FROM properties
-            WHERE 1=1
-        """
-        params = []
-
-        # Filtros basados en el lead
-        if lead.tipo_propiedad and len(lead.tipo_propiedad) > 0:
-            query += " AND LOWER(property_type) LIKE %s"
-            params.append(f"%{lead.tipo_propiedad[0].lower()}%")
-            print(f"DEBUG - Filtro tipo: {lead.tipo_propiedad[0]}")
-
-        if lead.transaccion:
-            query += " AND LOWER(operation_type) LIKE %s"
-            params.append(f"%{lead.transaccion.lower()}%")
-            print(f"DEBUG - Filtro transacción: {lead.transaccion}")
-
-        if lead.ubicacion:
-            # Buscar en dirección y título
-            query += " AND (LOWER(address) LIKE %s OR LOWER(title) LIKE %s)"
-            ubicacion_param = f"%{lead.ubicacion.lower()}%"
-            params.extend([ubicacion_param, ubicacion_param])
-            print(f"DEBUG - Filtro ubicación: {lead.ubicacion}")
-
-        # Limitar resultados
-        query += " LIMIT 10"
-
-        print(f"DEBUG - Query SQL: {query}")
-        print(f"DEBUG - Parámetros: {params}")
-
-        # Ejecutar query
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-
-        print(f"DEBUG - Filas obtenidas: {len(rows)}")
-
-        # Formatear resultados para el chatbot
-        properties = []
-        for i, (title, desc, ptype, address, op) in enumerate(rows):
-            property_data = {
-                "id": f"postgres_prop_{i}",
-                "text": f"{title} - {desc[:100]}... Ubicado en {address}. Tipo: {ptype}, Operación: {op}",
-                "score": 0.95 - (i * 0.05),  # Score simulado decreciente
-                "title": title,
-                "description": desc,
-                "property_type": ptype,
-                "address": address,
-                "operation_type": op
-            }
-            properties.append(property_data)
-            print(f"DEBUG - Propiedad {i+1}: {title[:30]}...")
-
-        cursor.close()
-        conn.close()
-
+        lead = as_lead(lead)
+        search_lead = bucket_budget(lead)
+        cache_key = search_cache_key(search_lead, cursor)
+        properties = get_cached_properties(cache_key)
+        if properties is None:
+            from app.core.bulkheads import run_in_bulkhead
+            # Con el cache frío, los catálogos y la resolución de ubicación consultan PostgreSQL (sync)
+            query, params = await run_in_bulkhead("postgres", build_property_query, search_lead, cursor=cursor)
+            async with get_async_postgres_connection() as conn:
+                rows = await conn.fetch(to_asyncpg_placeholders(query), *params)
+            properties = format_property_page([dict(row) for row in rows])
+            cache_properties(cache_key, properties)
+        properties = within_budget(properties, lead)
+        print(f"DEBUG - Encontradas {len(properties)} propiedades")
         return properties
 
+    except Exception as e:
+        print(f"ERROR - Búsqueda PostgreSQL: {e}")
+        return []
+
+def search_properties_postgres(lead: PropertyLead, cursor: dict = None) -> list:
+    """
+    Busca propiedades en PostgreSQL usando criterios del lead
+    """
+    try:
+        return fetch_property_page(lead, cursor)
+
     except Exception as e:
         print(f"ERROR - PostgreSQL connection/query: {e}")
         return []
 
+def fetch_property_page(lead: PropertyLead, cursor: dict = None) -> PropertyPage:
+    """
+    Ejecuta la búsqueda con una conexión del pool compartido (propaga errores)
+    """
+    query, params = build_property_query(lead, cursor=cursor)
+
+    print(f"DEBUG - Query SQL: {query}")
+    print(f"DEBUG - Parámetros: {params}")
+
+    with get_postgres_cursor() as db_cursor:
+        db_cursor.execute(query, params)
+        columns = [column[0] for column in db_cursor.description]
+        rows = [dict(zip(columns, row)) for row in db_cursor.fetchall()]
+
+    print(f"DEBUG - Filas obtenidas: {len(rows)}")
+    return format_property_page(rows)
+
+def as_lead(lead) -> PropertyLead:
+    """Los stages pueden pasar el lead guardado en el estado (dict)"""
+    return lead if isinstance(lead, PropertyLead) else PropertyLead(**(lead or {}))
+
+def build_property_query(lead: PropertyLead, mode: str = PROPERTY_SEARCH_MODE, cursor: dict = None):
+    """
+    Construye la query SQL (placeholders %s) y sus parámetros a partir del lead.
+
+    - mode="like": filtros LIKE, sin ranking (score simulado); orden por id. Presupuesto,
+      dormitorios, etc. se filtran si la tabla ya tiene las columnas de migrations/002
+      (sin ellas la query no cambia).
+    - mode="fulltext": tsvector 'spanish' + pg_trgm y filtros de todo el lead
+      (migrations/001 y 002), resultados ordenados por relevancia.
+    - mode="geo": la ubicación se resuelve a un punto/polígono (migrations/003) y se ordena
+      por distancia; si no se resuelve, se usa "fulltext".
+
+    Se pide una fila más que PROPERTY_PAGE_SIZE (para saber si hay página siguiente) y
+    `cursor` continúa después de la última fila de la página anterior (en "like", por id).
+    """
+    if mode == "geo":
+        return build_geo_property_query(lead, cursor)
+    if mode == "fulltext":
+        return build_fulltext_property_query(lead, cursor)
+
+    # Resto del lead (tolerante a NULL), solo si las columnas existen
+    structured = add_structured_filters(PropertyQuery(), lead)
+    with_lead_filters = bool(structured.where) and lead_filter_columns_available()
+
+    # Construir query SQL básica (con el id real de cada propiedad)
+    query = f"""
+        SELECT id, title, description, property_type, address, operation_type{", price" if with_lead_filters else ""}
+        FROM properties
+        WHERE 1=1
+    """
+    params = []
+
+    # Filtros basados en el lead
+    if lead.tipo_propiedad and len(lead.tipo_propiedad) > 0:
+        query += " AND LOWER(property_type) LIKE %s"
+        params.append(f"%{lead.tipo_propiedad[0].lower()}%")
+        print(f"DEBUG - Filtro tipo: {lead.tipo_propiedad[0]}")
+
+    if lead.transaccion:
+        query += " AND LOWER(operation_type) LIKE %s"
+        params.append(f"%{lead.transaccion.lower()}%")
+        print(f"DEBUG - Filtro transacción: {lead.transaccion}")
+
+    if lead.ubicacion:
+        # Buscar en dirección y título
+        query += " AND (LOWER(address) LIKE %s OR LOWER(title) LIKE %s)"
+        ubicacion_param = f"%{lead.ubicacion.lower()}%"
+        params.extend([ubicacion_param, ubicacion_param])
+        print(f"DEBUG - Filtro ubicación: {lead.ubicacion}")
+
+    if with_lead_filters:
+        for condition in structured.where:
+            query += f" AND {condition}"
+        params.extend(structured.where_params)
+
+    # Página siguiente: seek por id (orden estable)
+    if cursor and cursor.get('id') is not None:
+        query += " AND id > %s"
+        params.append(cursor_id(cursor['id']))
+
+    query += f" ORDER BY id LIMIT {PROPERTY_PAGE_SIZE + 1}"
+    return query, params
+
+def build_fulltext_property_query(lead: PropertyLead, cursor: dict = None):
+    """
+    Query con índices: `search_vector @@ tsquery` (GIN), LIKE sobre lower(...) con índices
+    trigram y todos los filtros del lead (presupuesto, dormitorios, baños, metraje,
+    amenidades, mascotas). El score combina ts_rank normalizado y similitud trigram.
+    """
+    query = add_lead_filters(PropertyQuery(), lead, *lead_catalogs())
+
+    search_text = " ".join([lead.ubicacion or ""] + list(lead.tipo_propiedad or [])).strip()
+    if lead.ubicacion:
+        ubicacion = lead.ubicacion.lower()
+        query.filter("(search_vector @@ plainto_tsquery('spanish', %s) OR lower(address) LIKE %s OR lower(title) LIKE %s)",
+                     ubicacion, f"%{ubicacion}%", f"%{ubicacion}%")
+        query.rank("(ts_rank(search_vector, plainto_tsquery('spanish', %s), 32)"
+                   " + greatest(similarity(lower(address), %s), similarity(lower(title), %s))) / 2",
+                   search_text, ubicacion, ubicacion)
+    elif search_text:
+        query.rank("ts_rank(search_vector, plainto_tsquery('spanish', %s), 32)", search_text)
+
+    return query.build(limit=PROPERTY_PAGE_SIZE + 1, after=cursor)
+
+def build_geo_property_query(lead: PropertyLead, cursor: dict = None):
+    """
+    Query PostGIS: ST_DWithin (índice GiST) alrededor del lugar resuelto, filtros del lead,
+    orden KNN por distancia y la distancia en metros como columna.
+    """
+    from app.services.tools.geo_lookup import resolve_lead_location, add_geo_filter
+
+    try:
+        resolved = resolve_lead_location(lead)
+    except Exception as e:
+        logging.warning(f"No se pudo resolver la ubicación, se usa fulltext: {e}")
+        resolved = None
+    if resolved is None:
+        return build_fulltext_property_query(lead, cursor)
+
+    location, radius_m = resolved
+    print(f"DEBUG - Búsqueda geo: {location.name} ({location.kind}), radio {radius_m} m")
+    query = add_lead_filters(PropertyQuery(), lead, *lead_catalogs())
+    return add_geo_filter(query, location, radius_m).build(limit=PROPERTY_PAGE_SIZE + 1, after=cursor)
+
+def lead_catalogs() -> tuple:
+    """Tipos de propiedad y de operación (cache en memoria) para filtrar por igualdad."""
+    from app.services.postgres_queries import get_property_types, get_operation_types
+    try:
+        return get_property_types(), get_operation_types()
+    except Exception as e:
+        logging.warning(f"Catálogos de tipos no disponibles, se filtra sin ellos: {e}")
+        return (), ()
+
+def lead_filter_columns_available() -> bool:
+    """True si `properties` tiene las columnas de los filtros del lead (migrations/002)."""
+    from app.services.postgres_queries import get_property_columns
+    try:
+        return set(LEAD_FILTER_COLUMNS) <= set(get_property_columns())
+    except Exception as e:
+        logging.warning(f"Columnas de properties no disponibles, sin filtros del lead: {e}")
+        return False
+
+def to_asyncpg_placeholders(query: str) -> str:
+    """Convierte placeholders %s (psycopg2) a $1, $2... (asyncpg)"""
+    counter = iter(range(1, query.count("%s") + 1))
+    return re.sub(r"%s", lambda _: f"${next(counter)}", query)
+
+def format_property_page(rows, page_size: int = PROPERTY_PAGE_SIZE) -> PropertyPage:
+    """
+    Página de propiedades: las primeras `page_size` filas y, si la query trajo una fila más,
+    el cursor de la última fila mostrada: clave de orden + id, o solo el id si la query no
+    tiene score (modo "like", orden por id).
+    """
+    page = PropertyPage(format_properties(rows[:page_size]))
+    if len(rows) > page_size:
+        last = property_row(rows[page_size - 1])
+        if last.get('score') is not None:
+            # sort_key (orden por distancia) o el score sin redondear
+            key = last['sort_key'] if last.get('sort_key') is not None else last['score']
+            page.next_cursor = {'key': float(key), 'id': last['id']}
+        elif 'score' not in last and last.get('id') is not None:
+            page.next_cursor = {'id': last['id']}
+    return page
+
+RANKED_ROW_COLUMNS = ("id", "title", "description", "property_type", "address", "operation_type",
+                      "score", "distance_m", "sort_key")
+
+def property_row(row) -> dict:
+    """
+    Fila como dict por nombre de columna. Las consultas entregan dicts (cursor.description /
+    registros asyncpg); las tuplas siguen el orden de las queries: (id, title, description,
+    property_type, address, operation_type[, score[, distance_m, sort_key]]) o, sin id,
+    (title, description, property_type, address, operation_type).
+    """
+    if isinstance(row, Mapping):
+        return dict(row)
+    if len(row) == 5:
+        return dict(zip(RANKED_ROW_COLUMNS[1:6], row))
+    return dict(zip(RANKED_ROW_COLUMNS, row))
+
+def format_properties(rows) -> list:
+    """
+    Formatea las filas para el chatbot (ver property_row). Filas sin score reciben un score
+    simulado decreciente y filas sin id un id posicional; `price` se incluye si la query lo trae.
+    """
+    properties = []
+    for i, row in enumerate(rows):
+        row = property_row(row)
+        title, desc, ptype, address, op = (row.get(name) for name in RANKED_ROW_COLUMNS[1:6])
+        prop_id = str(row['id']) if row.get('id') is not None else f"postgres_prop_{i}"
+        if 'score' in row:
+            score = round(float(row['score'] or 0), 4)
+        else:
+            score = 0.95 - (i * 0.05)  # Score simulado decreciente
+        distance_m = round(float(row['distance_m'])) if row.get('distance_m') is not None else None
+        desc = desc or ""
+        property_data = {
+            "id": prop_id,
+            "text": f"{title} - {desc[:100]}... Ubicado en {address}. Tipo: {ptype}, Operación: {op}",
+            "score": score,
+            "title": title,
+            "description": desc,
+            "property_type": ptype,
+            "address": address,
+            "operation_type": op
+        }
+        if 'price' in row:
+            property_data["price"] = float(row['price']) if row['price'] is not None else None
+        if distance_m is not None:
+            property_data["distance_m"] = distance_m
+            property_data["text"] += f" A {distance_m} m."
+        properties.append(property_data)
+        print(f"DEBUG - Propiedad {i+1}: {title[:30]}...")
+
+    return properties
+
 def create_lead_description(lead: PropertyLead) -> str:
     """Crear descripción del lead para logging"""
     lead_dict = dict(lead)
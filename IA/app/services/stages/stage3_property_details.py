@@ -5,12 +5,9 @@ def handle_property_details(message, properties, user_name=""):
     """
     Maneja las solicitudes de detalles específicos sobre propiedades
     """
-    # Extraer número de propiedad del mensaje
-    property_number = extract_property_number(message)
-
-    if property_number and 1 <= property_number <= len(properties):
-        selected_property = properties[property_number - 1]
+    selected_property = select_property(message, properties)
 
+    if selected_property:
         # Generar respuesta detallada usando IA
         detailed_response = generate_detailed_property_info(selected_property, user_name)
 
@@ -18,13 +15,41 @@ def handle_property_details(message, properties, user_name=""):
             'model_response': detailed_response,
             'selected_property': selected_property
         }
-    else:
-        # Si no se puede identificar la propiedad
-        property_list = "\n".join([f"{i+1}. Ref: {prop.get('id', 'N/A')}" for i, prop in enumerate(properties)])
+    return property_not_identified_response(properties, user_name)
+
+async def ahandle_property_details(message, properties, user_name=""):
+    """
+    Versión asyncio de handle_property_details
+    """
+    selected_property = select_property(message, properties)
+
+    if selected_property:
+        detailed_response = await agenerate_detailed_property_info(selected_property, user_name)
 
         return {
-            'model_response': f'Lo siento {user_name}, no pude identificar qué propiedad te interesa. Aquí están las opciones disponibles:\n\n{property_list}\n\nPor favor, dime el número de la propiedad sobre la que quieres más información.'
+            'model_response': detailed_response,
+            'selected_property': selected_property
         }
+    return property_not_identified_response(properties, user_name)
+
+def select_property(message, properties):
+    """
+    Retorna la propiedad elegida por número en el mensaje (o None)
+    """
+    # Extraer número de propiedad del mensaje
+    property_number = extract_property_number(message)
+
+    if property_number and 1 <= property_number <= len(properties):
+        return properties[property_number - 1]
+    return None
+
+def property_not_identified_response(properties, user_name=""):
+    # Si no se puede identificar la propiedad
+    property_list = "\n".join([f"{i+1}. Ref: {prop.get('id', 'N/A')}" for i, prop in enumerate(properties)])
+
+    return {
+        'model_response': f'Lo siento {user_name}, no pude identificar qué propiedad te interesa. Aquí están las opciones disponibles:\n\n{property_list}\n\nPor favor, dime el número de la propiedad sobre la que quieres más información.'
+    }
 
 def extract_property_number(message):
     """
@@ -58,10 +83,35 @@ def generate_detailed_property_info(property_data, user_name=""):
     """
     Genera información detallada sobre una propiedad usando IA
     """
+    try:
+        chat = get_langchain_bedrock_client(model_id=BEDROCK_MODEL_ID)
+        response = chat.invoke([("user", build_property_details_prompt(property_data, user_name))])
+
+        return f"{response.content}{property_follow_up(user_name)}"
+
+    except Exception as e:
+        return property_details_fallback(property_data)
+
+async def agenerate_detailed_property_info(property_data, user_name=""):
+    """
+    Versión asyncio de generate_detailed_property_info (en el endpoint de streaming reenvía los tokens)
+    """
+    from app.services.streaming import astream_llm_text, emit
+    try:
+        chat = get_langchain_bedrock_client(model_id=BEDROCK_MODEL_ID)
+        content = await astream_llm_text(chat, [("user", build_property_details_prompt(property_data, user_name))])
+
+        follow_up = property_follow_up(user_name)
+        emit("token", follow_up)
+        return f"{content}{follow_up}"
+
+    except Exception as e:
+        return property_details_fallback(property_data)
+
+def build_property_details_prompt(property_data, user_name=""):
     property_text = property_data.get('text', 'Información no disponible')
-    property_id = property_data.get('id', 'N/A')
 
-    prompt = f"""
+    return f"""
     Actúa como un agente inmobiliario experto y amigable. El usuario {user_name} quiere más detalles sobre esta propiedad:
 
     {property_text}
@@ -75,14 +125,9 @@ def generate_detailed_property_info(property_data, user_name=""):
     Mantén un tono conversacional, amigable y profesional. Máximo 200 palabras.
     """
 
-    try:
-        chat = get_langchain_bedrock_client(model_id=BEDROCK_MODEL_ID)
-        response = chat.invoke([("user", prompt)])
-
-        detailed_info = response.content
-
-        # Agregar opciones de seguimiento
-        follow_up = f"""
+def property_follow_up(user_name=""):
+    # Agregar opciones de seguimiento
+    return f"""
 
 ¿Te gustaría {user_name}?
 📞 **A** - Programar una visita
@@ -92,7 +137,7 @@ def generate_detailed_property_info(property_data, user_name=""):
 
 Responde con la letra de tu opción."""
 
-        return f"{detailed_info}{follow_up}"
-
-    except Exception as e:
-        return f"Aquí tienes los detalles de la propiedad {property_id}:\n\n{property_text}\n\n¿Te gustaría programar una visita o necesitas más información específica?"
+def property_details_fallback(property_data):
+    property_text = property_data.get('text', 'Información no disponible')
+    property_id = property_data.get('id', 'N/A')
+    return f"Aquí tienes los detalles de la propiedad {property_id}:\n\n{property_text}\n\n¿Te gustaría programar una visita o necesitas más información específica?"
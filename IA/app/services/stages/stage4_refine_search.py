@@ -1,6 +1,7 @@
 from app.core.aws_clients import get_langchain_bedrock_client
 from app.core.config import BEDROCK_MODEL_ID
 from app.models.PropertyLead import PropertyLead
+from app.utils.nlu import parse_message, register_keywords
 
 def handle_search_refinement(message, current_lead, user_name=""):
     """
@@ -15,25 +16,30 @@ def handle_search_refinement(message, current_lead, user_name=""):
       # Si no se puede identificar qué quiere refinar, preguntar
         return ask_for_refinement_preference(current_lead, user_name)
 
+REFINEMENT_KEYWORDS = {
+    'presupuesto': ['presupuesto', 'precio', 'costo', 'dinero', 'plata', 'económico', 'barato', 'caro'],
+    'ubicacion': ['ubicación', 'ubicacion', 'zona', 'distrito', 'barrio', 'lugar', 'ciudad'],
+    'tipo_propiedad': ['tipo', 'propiedad', 'casa', 'departamento', 'oficina', 'terreno'],
+    'dormitorios': ['dormitorios', 'habitaciones', 'cuartos', 'habitación', 'dormitorio'],
+    'banos': ['baños', 'baño', 'servicios'],
+    'metraje': ['metros', 'tamaño', 'área', 'espacio', 'grande', 'pequeño'],
+    'amenidades': ['amenidades', 'servicios', 'gimnasio', 'piscina', 'seguridad'],
+    'transaccion': ['alquiler', 'compra', 'venta', 'renta']
+}
+REFINEMENT_LABELS = {
+    refinement: register_keywords(f'refine.{refinement}', keywords)
+    for refinement, keywords in REFINEMENT_KEYWORDS.items()
+}
+
 def identify_refinement_type(message):
     """
     Identifica qué aspecto de la búsqueda quiere refinar el usuario
+    (el primero, en el orden de REFINEMENT_KEYWORDS, con alguna palabra clave en el mensaje)
     """
-    message_lower = message.lower()
-
-    refinement_keywords = {
-        'presupuesto': ['presupuesto', 'precio', 'costo', 'dinero', 'plata', 'económico', 'barato', 'caro'],
-        'ubicacion': ['ubicación', 'ubicacion', 'zona', 'distrito', 'barrio', 'lugar', 'ciudad'],
-        'tipo_propiedad': ['tipo', 'propiedad', 'casa', 'departamento', 'oficina', 'terreno'],
-        'dormitorios': ['dormitorios', 'habitaciones', 'cuartos', 'habitación', 'dormitorio'],
-        'banos': ['baños', 'baño', 'servicios'],
-        'metraje': ['metros', 'tamaño', 'área', 'espacio', 'grande', 'pequeño'],
-        'amenidades': ['amenidades', 'servicios', 'gimnasio', 'piscina', 'seguridad'],
-        'transaccion': ['alquiler', 'compra', 'venta', 'renta']
-    }
+    parsed = parse_message(message)
 
-    for refinement, keywords in refinement_keywords.items():
-        if any(keyword in message_lower for keyword in keywords):
+    for refinement, label in REFINEMENT_LABELS.items():
+        if parsed.has(label):
             return refinement
 
     return None
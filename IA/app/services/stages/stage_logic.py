@@ -29,6 +29,50 @@ def summarize_conversation(conversation)->str:
 
     return response.content
 
+async def asummarize_conversation(conversation) -> str:
+    """Versión asyncio de summarize_conversation"""
+    conversation_chat_history = ' '.join([ message['content'][0]['text']for message in conversation ])
+
+    chat_summary_prompt = [
+        SystemMessage(content=SUMMARIZE_PROMPT),
+        HumanMessage(content=conversation_chat_history)
+    ]
+
+    chat = get_langchain_bedrock_client(SUMMARIZE_MODEL)
+    response = await chat.ainvoke(chat_summary_prompt)
+
+    return response.content
+
+ROLLING_SUMMARY_PROMPT = """
+Eres un asistente especializado en bienes raíces. Recibirás el resumen previo de una conversación con un cliente y los mensajes que siguieron.
+Actualiza el resumen incorporando la nueva información: conserva solo la versión más reciente de cada necesidad (ubicación, tipo de propiedad, compra o alquiler, presupuesto, dormitorios, etc.) y los datos relevantes del cliente.
+❗No completes campos por inferencia. Máximo 80 palabras.
+
+Responde únicamente con el resumen actualizado, sin encabezados, explicaciones ni listas.
+"""
+
+def summarize_rolling(previous_summary, conversation) -> str:
+    """Actualiza incrementalmente el resumen acumulado con mensajes nuevos."""
+    chat = get_langchain_bedrock_client(SUMMARIZE_MODEL)
+    response = chat.invoke(build_rolling_summary_prompt(previous_summary, conversation))
+
+    return response.content
+
+async def asummarize_rolling(previous_summary, conversation) -> str:
+    """Versión asyncio de summarize_rolling"""
+    chat = get_langchain_bedrock_client(SUMMARIZE_MODEL)
+    response = await chat.ainvoke(build_rolling_summary_prompt(previous_summary, conversation))
+
+    return response.content
+
+def build_rolling_summary_prompt(previous_summary, conversation) -> list:
+    new_messages = '\n'.join([f"{message['role']}: {message['content'][0]['text']}" for message in conversation])
+
+    return [
+        SystemMessage(content=ROLLING_SUMMARY_PROMPT),
+        HumanMessage(content=f"Resumen previo: {previous_summary or 'Sin resumen previo.'}\n\nMensajes nuevos:\n{new_messages}")
+    ]
+
 def get_chat_stage_metadata(latest_messages):
     for msg in reversed(latest_messages):
         try:
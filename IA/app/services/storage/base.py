@@ -0,0 +1,162 @@
+"""
+Interfaz de almacenamiento del chat (mensajes, estado, result sets e historial).
+
+Todos los backends trabajan con items en formato DynamoDB (AttributeValues), así el engine,
+el codec y format_messages no dependen del backend. Las lecturas de mensajes respetan el
+orden de los sort keys igual que DynamoDB (SK = TIMESTAMP#<iso>).
+
+- ChatStorage: operaciones sync (abstractas); las versiones `a*` por defecto llaman a las
+  sync a través de `_run_sync` (en línea para memoria, en un hilo para SQLite).
+  DynamoDBStorage las sobreescribe con el cliente asyncio.
+- SortedItemStorage: implementa toda la semántica sobre tres primitivas abstractas (_range,
+  _get, _write); la usan los backends en memoria y SQLite.
+"""
+from abc import ABC, abstractmethod
+from typing import Optional
+from app.services.dynamodb_queries import (
+    MESSAGE_SK_PREFIX,
+    STATE_SK,
+    RESULT_SET_SK_PREFIX,
+    encode_cursor,
+    decode_cursor,
+    state_from_item,
+    properties_from_item,
+    StateConflictError,
+)
+
+HISTORY_ATTRIBUTES = ('SK', 'role', 'content', 'content_type')
+
+
+def prefix_end(prefix: str) -> Optional[str]:
+    """Menor string mayor que todos los que empiezan con `prefix` (cota superior de begins_with)."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+
+
+class ChatStorage(ABC):
+    """Operaciones de persistencia que usa el engine."""
+
+    name = "base"
+    write_behind = False  # la cola write-behind solo escribe en DynamoDB
+
+    @abstractmethod
+    def latest_messages(self, primary_key: str, limit: int = 2, order: bool = True) -> dict:
+        """Últimos `limit` mensajes: {'Items': [...]} en orden cronológico si `order`."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def messages_between(self, primary_key: str, start_sk: str, end_sk: str, limit: int,
+                         oldest_first: bool = False) -> dict:
+        """Hasta `limit` mensajes con start_sk < SK < end_sk (los más recientes, o los más antiguos
+        con oldest_first), en orden cronológico."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def history_page(self, primary_key: str, limit: int, cursor: str = None, newest_first: bool = True,
+                     include_metadata: bool = False) -> dict:
+        """Una página del historial: {'Items': [...], 'next_cursor': str | None}."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_state(self, primary_key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_result_set(self, primary_key: str, result_set_id: str) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_turn(self, message_items: list, state_item: dict = None, expected_version: int = None) -> dict:
+        """Escribe los items del turno y el estado, todo o nada: si la `version` del estado ya no es
+        expected_version no escribe nada y lanza StateConflictError. Retorna {'consumed_capacity': float}."""
+        raise NotImplementedError
+
+    ### Versiones asyncio ###
+
+    async def _run_sync(self, func, *args):
+        """Ejecuta una operación sync desde las versiones `a*` (los backends con I/O bloqueante
+        la sobreescriben para no bloquear el event loop)."""
+        return func(*args)
+
+    async def alatest_messages(self, primary_key: str, limit: int = 2, order: bool = True) -> dict:
+        return await self._run_sync(self.latest_messages, primary_key, limit, order)
+
+    async def amessages_between(self, primary_key: str, start_sk: str, end_sk: str, limit: int,
+                                oldest_first: bool = False) -> dict:
+        return await self._run_sync(self.messages_between, primary_key, start_sk, end_sk, limit, oldest_first)
+
+    async def ahistory_page(self, primary_key: str, limit: int, cursor: str = None, newest_first: bool = True,
+                            include_metadata: bool = False) -> dict:
+        return await self._run_sync(self.history_page, primary_key, limit, cursor, newest_first, include_metadata)
+
+    async def aget_state(self, primary_key: str) -> Optional[dict]:
+        return await self._run_sync(self.get_state, primary_key)
+
+    async def aget_result_set(self, primary_key: str, result_set_id: str) -> list:
+        return await self._run_sync(self.get_result_set, primary_key, result_set_id)
+
+    async def awrite_turn(self, message_items: list, state_item: dict = None, expected_version: int = None) -> dict:
+        return await self._run_sync(self.write_turn, message_items, state_item, expected_version)
+
+
+class SortedItemStorage(ChatStorage):
+    """Semántica DynamoDB (PK + SK ordenado) sobre primitivas de un almacenamiento ordenado."""
+
+    @abstractmethod
+    def _range(self, primary_key: str, prefix: str = '', after: str = None, before: str = None,
+               descending: bool = True, limit: int = None) -> list:
+        """Items de la PK con SK que empieza con `prefix` y after < SK < before, ordenados por SK."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _get(self, primary_key: str, sort_key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _write(self, items: list, state_item: Optional[dict], expected_version: Optional[int]) -> bool:
+        """Escribe todo de forma atómica. Si la versión del estado no coincide no escribe nada
+        y retorna False."""
+        raise NotImplementedError
+
+    def latest_messages(self, primary_key: str, limit: int = 2, order: bool = True) -> dict:
+        items = self._range(primary_key, MESSAGE_SK_PREFIX, limit=max(limit, 1))
+        return {'Items': items[::-1] if order else items}
+
+    def messages_between(self, primary_key: str, start_sk: str, end_sk: str, limit: int,
+                         oldest_first: bool = False) -> dict:
+        items = self._range(primary_key, after=start_sk, before=end_sk, descending=not oldest_first, limit=limit)
+        return {'Items': items if oldest_first else items[::-1]}
+
+    def history_page(self, primary_key: str, limit: int, cursor: str = None, newest_first: bool = True,
+                     include_metadata: bool = False) -> dict:
+        from app.core.config import CHAT_HISTORY_MAX_PAGE
+
+        limit = min(max(limit, 1), CHAT_HISTORY_MAX_PAGE)
+        before = decode_cursor(cursor, primary_key)['SK']['S'] if cursor else None
+        items = self._range(primary_key, MESSAGE_SK_PREFIX, before=before, limit=limit + 1)
+        names = HISTORY_ATTRIBUTES + (('metadata',) if include_metadata else ())
+        page = [{name: item[name] for name in names if name in item} for item in items[:limit]]
+
+        next_cursor = None
+        if len(items) > limit:
+            next_cursor = encode_cursor({'PK': {'S': primary_key}, 'SK': page[-1]['SK']})
+        return {'Items': page if newest_first else page[::-1], 'next_cursor': next_cursor}
+
+    def get_state(self, primary_key: str) -> Optional[dict]:
+        return state_from_item(self._get(primary_key, STATE_SK))
+
+    def get_result_set(self, primary_key: str, result_set_id: str) -> list:
+        return properties_from_item(self._get(primary_key, RESULT_SET_SK_PREFIX + result_set_id))
+
+    def write_turn(self, message_items: list, state_item: dict = None, expected_version: int = None) -> dict:
+        if not self._write(list(message_items), state_item, expected_version):
+            # Igual que DynamoDB: otro turno actualizó el estado, no se escribió nada
+            raise StateConflictError(state_item['PK']['S'], expected_version)
+        return {'consumed_capacity': 0.0}
+
+    @staticmethod
+    def _version_matches(current_state: Optional[dict], expected_version: Optional[int]) -> bool:
+        """Misma condición que DynamoDB: attribute_not_exists(PK) OR version = :expected_version."""
+        if expected_version is None or current_state is None:
+            return True
+        version = current_state.get('version')
+        return version is not None and int(version['N']) == expected_version
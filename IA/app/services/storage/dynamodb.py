@@ -0,0 +1,58 @@
+"""
+Backend DynamoDB (producción): delega en app.services.dynamodb_queries.
+"""
+from typing import Optional
+from app.core.config import DYNAMODB_TABLE, CHAT_WRITE_MODE
+from app.services import dynamodb_queries
+from app.services.storage.base import ChatStorage
+
+
+class DynamoDBStorage(ChatStorage):
+    """Tabla ChatMessages (PK = USER#<user>#CONV#<conv>, SK = TIMESTAMP# | STATE | RESULTSET#)."""
+
+    name = "dynamodb"
+    write_behind = True
+
+    def __init__(self, table_name: str = DYNAMODB_TABLE, mode: str = CHAT_WRITE_MODE):
+        self.table_name = table_name
+        self.mode = mode
+
+    def latest_messages(self, primary_key: str, limit: int = 2, order: bool = True) -> dict:
+        return dynamodb_queries.get_latests_messages(primary_key, limit, order)
+
+    def messages_between(self, primary_key: str, start_sk: str, end_sk: str, limit: int,
+                         oldest_first: bool = False) -> dict:
+        return dynamodb_queries.get_messages_between(primary_key, start_sk, end_sk, limit, oldest_first)
+
+    def history_page(self, primary_key: str, limit: int, cursor: str = None, newest_first: bool = True,
+                     include_metadata: bool = False) -> dict:
+        return dynamodb_queries.get_history_page(primary_key, limit, cursor, newest_first, include_metadata)
+
+    def get_state(self, primary_key: str) -> Optional[dict]:
+        return dynamodb_queries.get_conversation_state(primary_key)
+
+    def get_result_set(self, primary_key: str, result_set_id: str) -> list:
+        return dynamodb_queries.get_result_set(primary_key, result_set_id)
+
+    def write_turn(self, message_items: list, state_item: dict = None, expected_version: int = None) -> dict:
+        return dynamodb_queries.write_turn(self.table_name, message_items, state_item, expected_version, self.mode)
+
+    async def alatest_messages(self, primary_key: str, limit: int = 2, order: bool = True) -> dict:
+        return await dynamodb_queries.aget_latests_messages(primary_key, limit, order)
+
+    async def amessages_between(self, primary_key: str, start_sk: str, end_sk: str, limit: int,
+                                oldest_first: bool = False) -> dict:
+        return await dynamodb_queries.aget_messages_between(primary_key, start_sk, end_sk, limit, oldest_first)
+
+    async def ahistory_page(self, primary_key: str, limit: int, cursor: str = None, newest_first: bool = True,
+                            include_metadata: bool = False) -> dict:
+        return await dynamodb_queries.aget_history_page(primary_key, limit, cursor, newest_first, include_metadata)
+
+    async def aget_state(self, primary_key: str) -> Optional[dict]:
+        return await dynamodb_queries.aget_conversation_state(primary_key)
+
+    async def aget_result_set(self, primary_key: str, result_set_id: str) -> list:
+        return await dynamodb_queries.aget_result_set(primary_key, result_set_id)
+
+    async def awrite_turn(self, message_items: list, state_item: dict = None, expected_version: int = None) -> dict:
+        return await dynamodb_queries.awrite_turn(self.table_name, message_items, state_item, expected_version, self.mode)
@@ -0,0 +1,42 @@
+"""
+Backend de almacenamiento del chat, elegido con CHAT_STORAGE_BACKEND (uno por proceso).
+"""
+import threading
+from typing import Optional
+from app.core.config import CHAT_STORAGE_BACKEND
+from app.services.storage.base import ChatStorage
+
+_STORAGE = None
+_LOCK = threading.Lock()
+
+
+def create_chat_storage(backend: str = CHAT_STORAGE_BACKEND) -> ChatStorage:
+    if backend == "dynamodb":
+        from app.services.storage.dynamodb import DynamoDBStorage
+        return DynamoDBStorage()
+    if backend == "memory":
+        from app.services.storage.memory import MemoryStorage
+        return MemoryStorage()
+    if backend == "sqlite":
+        from app.services.storage.sqlite import SQLiteStorage
+        return SQLiteStorage()
+    raise ValueError(f"CHAT_STORAGE_BACKEND desconocido: {backend}")
+
+
+def get_chat_storage() -> ChatStorage:
+    """Backend único por proceso (se crea en el primer uso)."""
+    global _STORAGE
+    storage = _STORAGE
+    if storage is None:
+        with _LOCK:
+            if _STORAGE is None:
+                _STORAGE = create_chat_storage()
+            storage = _STORAGE
+    return storage
+
+
+def set_chat_storage(storage: Optional[ChatStorage]):
+    """Reemplaza el backend del proceso (tests y benchmarks); None vuelve al configurado."""
+    global _STORAGE
+    with _LOCK:
+        _STORAGE = storage
@@ -0,0 +1,65 @@
+"""
+Backend en memoria: items por conversación en una lista ordenada por SK (bisect).
+Para tests, benchmarks del engine y ejecución sin AWS; no persiste entre procesos.
+"""
+import copy
+import bisect
+import threading
+from typing import Optional
+from app.services.storage.base import SortedItemStorage, prefix_end
+
+
+class MemoryStorage(SortedItemStorage):
+    """Almacenamiento de items del chat en memoria del proceso (thread-safe)."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._items = {}      # PK -> {SK: item}
+        self._sort_keys = {}  # PK -> [SK ordenados]
+        self._lock = threading.Lock()
+
+    def _range(self, primary_key: str, prefix: str = '', after: str = None, before: str = None,
+               descending: bool = True, limit: int = None) -> list:
+        with self._lock:
+            sort_keys = self._sort_keys.get(primary_key, [])
+            items = self._items.get(primary_key, {})
+            start = bisect.bisect_left(sort_keys, prefix)
+            end = bisect.bisect_left(sort_keys, prefix_end(prefix)) if prefix else len(sort_keys)
+            if after is not None:
+                start = max(start, bisect.bisect_right(sort_keys, after))
+            if before is not None:
+                end = min(end, bisect.bisect_left(sort_keys, before))
+            selected = sort_keys[start:end]
+            if descending:
+                selected.reverse()
+            # Copias: quien lee no puede modificar lo guardado (como al leer de DynamoDB)
+            return [copy.deepcopy(items[sort_key]) for sort_key in selected[:limit]]
+
+    def _get(self, primary_key: str, sort_key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._items.get(primary_key, {}).get(sort_key)
+            return copy.deepcopy(item) if item is not None else None
+
+    def _write(self, items: list, state_item: Optional[dict], expected_version: Optional[int]) -> bool:
+        with self._lock:
+            if state_item is not None:
+                current = self._items.get(state_item['PK']['S'], {}).get(state_item['SK']['S'])
+                if not self._version_matches(current, expected_version):
+                    return False
+                items = items + [state_item]
+            for item in items:
+                self._put(copy.deepcopy(item))
+            return True
+
+    def _put(self, item: dict):
+        primary_key, sort_key = item['PK']['S'], item['SK']['S']
+        items = self._items.setdefault(primary_key, {})
+        if sort_key not in items:
+            bisect.insort(self._sort_keys.setdefault(primary_key, []), sort_key)
+        items[sort_key] = item
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sort_keys.clear()
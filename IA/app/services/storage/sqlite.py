@@ -0,0 +1,88 @@
+"""
+Backend SQLite: una tabla (pk, sk, item) con clave primaria (pk, sk), así los rangos por
+SK salen del índice en el mismo orden que en DynamoDB (comparación binaria UTF-8).
+Sirve para correr el engine offline con persistencia local y para pruebas de carga.
+Las versiones asyncio corren en un hilo (asyncio.to_thread) para no bloquear el event loop.
+"""
+import asyncio
+import sqlite3
+import threading
+from typing import Optional
+from app.core.config import CHAT_STORAGE_SQLITE_PATH
+from app.services.dynamodb_codec import dumps_item, loads_item
+from app.services.storage.base import SortedItemStorage, prefix_end
+
+
+class SQLiteStorage(SortedItemStorage):
+    """Almacenamiento de items del chat en un archivo SQLite (modo WAL)."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = CHAT_STORAGE_SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS chat_items (
+                pk TEXT NOT NULL,
+                sk TEXT NOT NULL,
+                item TEXT NOT NULL,
+                PRIMARY KEY (pk, sk)
+            ) WITHOUT ROWID""")
+
+    async def _run_sync(self, func, *args):
+        return await asyncio.to_thread(func, *args)
+
+    def _range(self, primary_key: str, prefix: str = '', after: str = None, before: str = None,
+               descending: bool = True, limit: int = None) -> list:
+        conditions, params = ["pk = ?"], [primary_key]
+        if prefix:
+            conditions.append("sk >= ? AND sk < ?")
+            params += [prefix, prefix_end(prefix)]
+        if after is not None:
+            conditions.append("sk > ?")
+            params.append(after)
+        if before is not None:
+            conditions.append("sk < ?")
+            params.append(before)
+        query = (f"SELECT item FROM chat_items WHERE {' AND '.join(conditions)} "
+                 f"ORDER BY sk {'DESC' if descending else 'ASC'}")
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [loads_item(row[0]) for row in rows]
+
+    def _get(self, primary_key: str, sort_key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT item FROM chat_items WHERE pk = ? AND sk = ?",
+                                   (primary_key, sort_key)).fetchone()
+        return loads_item(row[0]) if row else None
+
+    def _write(self, items: list, state_item: Optional[dict], expected_version: Optional[int]) -> bool:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if state_item is not None:
+                    row = self._db.execute("SELECT item FROM chat_items WHERE pk = ? AND sk = ?",
+                                           (state_item['PK']['S'], state_item['SK']['S'])).fetchone()
+                    if not self._version_matches(loads_item(row[0]) if row else None, expected_version):
+                        self._db.execute("ROLLBACK")
+                        return False
+                    items = items + [state_item]
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO chat_items (pk, sk, item) VALUES (?, ?, ?)",
+                    [(item['PK']['S'], item['SK']['S'], dumps_item(item)) for item in items])
+                self._db.execute("COMMIT")
+                return True
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,89 @@
+"""
+Streaming de tokens de Bedrock hacia el cliente (SSE / WebSocket).
+
+El turno se procesa con aprocess_chat_turn (misma lógica y mismo guardado al final);
+mientras tanto, las respuestas de texto del LLM (model_converse, detalle de propiedad)
+se piden con la API converse-stream y cada fragmento se reenvía al "sink" del request,
+una cola asyncio guardada en un ContextVar. Sin sink (endpoint /chat normal) se usa ainvoke.
+"""
+import asyncio
+import contextvars
+from typing import AsyncIterator, Optional
+
+_TOKEN_SINK = contextvars.ContextVar("token_sink", default=None)
+_DONE = object()
+_PENDING_TURNS = set()  # turnos cuyo cliente se desconectó: terminan (y se guardan) igual
+
+
+def _chunk_text(chunk) -> str:
+    """Texto de un AIMessageChunk (content como str o como lista de bloques de Converse)."""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content
+                   if isinstance(block, dict) and block.get("type", "text") == "text")
+
+
+def emit(event: str, data) -> None:
+    """Envía un evento al cliente del request en curso (no hace nada si no está en streaming)."""
+    sink = _TOKEN_SINK.get()
+    if sink is not None:
+        sink.put_nowait({"event": event, "data": data})
+
+
+def is_streaming() -> bool:
+    return _TOKEN_SINK.get() is not None
+
+
+async def astream_llm_text(chat, messages) -> str:
+    """Respuesta de texto del LLM: en streaming reenvía cada token y retorna el texto completo."""
+    if not is_streaming():
+        response = await chat.ainvoke(messages)
+        return response.content
+
+    parts = []
+    async for chunk in chat.astream(messages):
+        text = _chunk_text(chunk)
+        if text:
+            parts.append(text)
+            emit("token", text)
+    return "".join(parts)
+
+
+async def astream_chat_turn(user_id: str, conv_id: str, message: str, user_name: Optional[str] = None,
+                            metadata: Optional[dict] = None) -> AsyncIterator[dict]:
+    """Procesa un turno emitiendo eventos {"event", "data"}:
+
+    - "token": fragmento de texto del LLM, a medida que llega.
+    - "done": {"stage", "response"} cuando el turno terminó y quedó guardado.
+    - "error": mensaje de error (el turno no se completó).
+    """
+    from app.services.chatbot_engine import aprocess_chat_turn
+
+    sink = asyncio.Queue()
+    token = _TOKEN_SINK.set(sink)
+    try:
+        # La tarea copia el contexto actual, incluido el sink
+        task = asyncio.create_task(aprocess_chat_turn(user_id=user_id, conv_id=conv_id, message=message,
+                                                      user_name=user_name, metadata=metadata))
+    finally:
+        _TOKEN_SINK.reset(token)
+    task.add_done_callback(lambda _: sink.put_nowait(_DONE))
+
+    try:
+        while True:
+            item = await sink.get()
+            if item is _DONE:
+                break
+            yield item
+
+        if task.exception() is not None:
+            yield {"event": "error", "data": str(task.exception())}
+        else:
+            stage, response = task.result()
+            yield {"event": "done", "data": {"stage": stage, "response": response}}
+    finally:
+        # Cliente desconectado: el turno sigue hasta guardarse, sin nadie que lea los tokens
+        if not task.done():
+            _PENDING_TURNS.add(task)
+            task.add_done_callback(_PENDING_TURNS.discard)
@@ -1 +1,81 @@
-pass
\ No newline at end of file
+"""
+Resolución geográfica para la búsqueda de propiedades (PROPERTY_SEARCH_MODE=geo).
+
+La tabla `locations` (migrations/003_property_geo_search.sql) se sirve desde memoria como
+catálogo; la ubicación o las cercanías del lead se resuelven a un punto o polígono y la
+query filtra con ST_DWithin (índice GiST) y ordena por distancia KNN (`<->`).
+"""
+from typing import NamedTuple, Optional
+from app.core.config import PROPERTY_GEO_RADIUS_M, PROPERTY_GEO_NEAR_RADIUS_M, PROPERTY_GEO_POLYGON_MARGIN_M
+from app.core.postgres_pool import get_postgres_cursor
+from app.models.PropertyLead import PropertyLead
+from app.services.postgres_queries import register_catalog, get_catalog
+from app.utils.nlu import normalize_text
+
+POINT_SQL = "ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography"
+
+
+class GeoLocation(NamedTuple):
+    id: int
+    name: str
+    kind: str
+    lon: float
+    lat: float
+    has_polygon: bool
+
+
+def load_locations() -> list:
+    """Lugares conocidos (propaga errores: lo usa el cache de catálogos)."""
+    with get_postgres_cursor() as cursor:
+        cursor.execute("""
+            SELECT id, name, kind, ST_X(center::geometry), ST_Y(center::geometry), geom IS NOT NULL
+            FROM locations
+        """)
+        return [GeoLocation(*row) for row in cursor.fetchall()]
+
+
+register_catalog("locations", load_locations)
+
+
+def resolve_location(text: Optional[str], kinds: tuple = ()) -> Optional[GeoLocation]:
+    """Lugar cuyo nombre coincide con el texto (o está contenido en él: 'cerca de Miraflores').
+    Ante varias coincidencias gana el nombre más largo."""
+    if not text:
+        return None
+    normalized = f" {normalize_text(text)} "
+    best = None
+    for location in get_catalog("locations"):
+        if kinds and location.kind not in kinds:
+            continue
+        name = normalize_text(location.name)
+        if name and f" {name} " in normalized and (best is None or len(name) > len(normalize_text(best.name))):
+            best = location
+    return best
+
+
+def resolve_lead_location(lead: PropertyLead) -> Optional[tuple]:
+    """(lugar, radio en metros): primero un punto de referencia de `cercania`, si no la `ubicacion`."""
+    for nearby in lead.cercania or []:
+        location = resolve_location(nearby, kinds=("landmark",))
+        if location is not None:
+            return location, PROPERTY_GEO_NEAR_RADIUS_M
+    location = resolve_location(lead.ubicacion)
+    if location is None:
+        return None
+    return location, PROPERTY_GEO_POLYGON_MARGIN_M if location.has_polygon else PROPERTY_GEO_RADIUS_M
+
+
+def add_geo_filter(query, location: GeoLocation, radius_m: float):
+    """Filtro ST_DWithin (al polígono si existe, si no al centro), distancia en metros como
+    columna, score por cercanía y orden KNN al centro del lugar."""
+    point = (location.lon, location.lat)
+    if location.has_polygon:
+        query.filter("ST_DWithin(geolocation::geography, (SELECT geom FROM locations WHERE id = %s), %s)",
+                     location.id, radius_m)
+    else:
+        query.filter(f"ST_DWithin(geolocation::geography, {POINT_SQL}, %s)", *point, radius_m)
+    query.select(f"ST_Distance(geolocation::geography, {POINT_SQL}) AS distance_m", *point)
+    query.rank(f"greatest(0, 1 - ST_Distance(geolocation::geography, {POINT_SQL}) / %s)",
+               *point, max(radius_m, PROPERTY_GEO_RADIUS_M))
+    query.order_by(f"geolocation::geography <-> {POINT_SQL}", *point)
+    return query
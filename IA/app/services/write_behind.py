@@ -0,0 +1,334 @@
+"""
+Write-behind de turnos de chat: los items del turno se guardan en una cola local durable
+(SQLite en modo WAL) y un hilo en segundo plano los escribe en DynamoDB con lotes,
+reintentos con backoff y drenado al apagar la app.
+
+Read-your-writes: antes de leer el estado de una conversación se intenta vaciar su cola;
+si DynamoDB no está disponible, el estado (y los result sets) se leen de la cola local.
+
+El archivo de la cola lo comparten todos los workers del host: cada flush toma (claim) sus
+turnos en una transacción (status 'inflight') antes de escribirlos, así un turno no se envía
+dos veces, y no toma conversaciones con turnos en vuelo de otro worker (orden FIFO).
+"""
+import os
+import json
+import time
+import base64
+import random
+import sqlite3
+import logging
+import threading
+from typing import Optional
+from app.core.config import (
+    DYNAMODB_TABLE,
+    CHAT_WRITE_MODE,
+    WRITE_BEHIND_DB_PATH,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_INTERVAL,
+    WRITE_BEHIND_MAX_ATTEMPTS,
+    WRITE_BEHIND_CLAIM_TIMEOUT,
+)
+from app.services.dynamodb_codec import encode_item
+from app.services.dynamodb_queries import write_turn, deserialize_item, get_conversation_state, StateConflictError
+
+
+def _encode(value):
+    """json.dumps default: los atributos binarios (B) de DynamoDB se guardan en base64."""
+    if isinstance(value, (bytes, bytearray)):
+        return {'__b64__': base64.b64encode(bytes(value)).decode('ascii')}
+    raise TypeError(f"Tipo no serializable: {type(value)}")
+
+
+def _decode(obj):
+    if '__b64__' in obj and len(obj) == 1:
+        return base64.b64decode(obj['__b64__'])
+    return obj
+
+
+class WriteBehindQueue:
+    """Cola durable de turnos pendientes, ordenada (FIFO) por conversación."""
+
+    def __init__(self, path: str = WRITE_BEHIND_DB_PATH, table_name: str = DYNAMODB_TABLE,
+                 batch_size: int = WRITE_BEHIND_BATCH_SIZE, flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+                 max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS, mode: str = CHAT_WRITE_MODE,
+                 claim_timeout: float = WRITE_BEHIND_CLAIM_TIMEOUT):
+        self.table_name = table_name
+        self.claim_timeout = claim_timeout
+        self.worker_id = f"{os.getpid()}-{id(self)}"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.mode = mode
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()  # un solo flush a la vez en el proceso (entre procesos: claim)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"enqueued": 0, "flushed": 0, "retries": 0, "dead": 0, "errors": 0}
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pending_turns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                primary_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                claimed_by TEXT,
+                claimed_at REAL
+            )""")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(pending_turns)")}
+        for column, column_type in (("claimed_by", "TEXT"), ("claimed_at", "REAL")):
+            if column not in columns:  # colas creadas antes del claim
+                self._db.execute(f"ALTER TABLE pending_turns ADD COLUMN {column} {column_type}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_pending_pk ON pending_turns (primary_key, status, id)")
+
+    ### Encolado y lecturas locales ###
+
+    def enqueue(self, primary_key: str, message_items: list, state_item: Optional[dict] = None,
+                expected_version: Optional[int] = None, state_updates: Optional[dict] = None, reset: bool = False):
+        """Guarda el turno en la cola local (commit durable) y despierta al flusher.
+
+        Con `state_updates` (cambios del turno) un conflicto de versión al escribir se resuelve
+        releyendo el estado de DynamoDB y volviendo a aplicarlos."""
+        payload = json.dumps({
+            'message_items': message_items,
+            'state_item': state_item,
+            'expected_version': expected_version,
+            'state_updates': encode_item(state_updates) if state_updates is not None else None,
+            'reset': reset
+        }, default=_encode)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO pending_turns (primary_key, payload, created_at) VALUES (?, ?, ?)",
+                (primary_key, payload, time.time()))
+            self.stats["enqueued"] += 1
+        self._wake.set()
+
+    def has_pending(self, primary_key: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM pending_turns WHERE primary_key = ? AND status IN ('pending', 'inflight') LIMIT 1",
+                (primary_key,)).fetchone()
+        return row is not None
+
+    def pending_item(self, primary_key: str, sort_key: str) -> Optional[dict]:
+        """Versión más reciente (aún no escrita en DynamoDB) del item PK/SK, deserializada."""
+        for payload in self._pending_payloads(primary_key, newest_first=True):
+            items = list(payload['message_items'])
+            if payload.get('state_item'):
+                items.append(payload['state_item'])
+            for item in items:
+                if item.get('SK', {}).get('S') == sort_key:
+                    return deserialize_item(item)
+        return None
+
+    def _pending_payloads(self, primary_key: str, newest_first: bool = False):
+        order = "DESC" if newest_first else "ASC"
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT payload FROM pending_turns WHERE primary_key = ? AND status IN ('pending', 'inflight') ORDER BY id {order}",
+                (primary_key,)).fetchall()
+        return [json.loads(row[0], object_hook=_decode) for row in rows]
+
+    ### Flush ###
+
+    def flush(self, primary_key: Optional[str] = None, ignore_backoff: bool = False) -> int:
+        """Escribe en DynamoDB los turnos pendientes (todos o los de una conversación).
+
+        Los turnos de una misma conversación se escriben en orden; si uno falla, los
+        siguientes de esa conversación esperan al próximo intento. Retorna cuántos se escribieron."""
+        with self._flush_lock:
+            return self._flush(primary_key, ignore_backoff)
+
+    def _claim(self, primary_key: Optional[str], now: float) -> list:
+        """Marca como 'inflight' (de este worker) hasta batch_size turnos, en una transacción
+        BEGIN IMMEDIATE (bloquea a los demás procesos). Se omiten las conversaciones con turnos en
+        vuelo de otro worker; los claims más viejos que claim_timeout se consideran abandonados."""
+        stale_before = now - self.claim_timeout
+        query = """
+            SELECT id, primary_key, payload, attempts, next_attempt_at FROM pending_turns
+            WHERE (status = 'pending' OR (status = 'inflight' AND claimed_at < ?))
+              AND primary_key NOT IN (
+                  SELECT primary_key FROM pending_turns WHERE status = 'inflight' AND claimed_at >= ?)"""
+        params = [stale_before, stale_before]
+        if primary_key is not None:
+            query += " AND primary_key = ?"
+            params.append(primary_key)
+        query += " ORDER BY id LIMIT ?"
+        params.append(self.batch_size)
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(query, params).fetchall()
+                self._db.executemany(
+                    "UPDATE pending_turns SET status = 'inflight', claimed_by = ?, claimed_at = ? WHERE id = ?",
+                    [(self.worker_id, now, row[0]) for row in rows])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _release(self, row_ids: list):
+        """Devuelve a 'pending' los turnos tomados que no se intentaron (backoff o bloqueados)."""
+        if not row_ids:
+            return
+        with self._lock:
+            self._db.executemany(
+                "UPDATE pending_turns SET status = 'pending', claimed_by = NULL, claimed_at = NULL WHERE id = ?",
+                [(i,) for i in row_ids])
+
+    def _flush(self, primary_key: Optional[str], ignore_backoff: bool) -> int:
+        now = time.time()
+        rows = self._claim(primary_key, now)
+
+        flushed = 0
+        blocked = set()
+        done_ids, skipped_ids = [], []
+        for row_id, pk, payload, attempts, next_attempt_at in rows:
+            if pk in blocked:
+                skipped_ids.append(row_id)
+                continue
+            if not ignore_backoff and next_attempt_at > now:
+                blocked.add(pk)
+                skipped_ids.append(row_id)
+                continue
+
+            data = json.loads(payload, object_hook=_decode)
+            try:
+                self._write_turn(pk, data)
+            except Exception as e:
+                blocked.add(pk)
+                self._record_failure(row_id, attempts + 1, e)
+                continue
+            done_ids.append(row_id)
+            flushed += 1
+
+        self._release(skipped_ids)
+        if done_ids:
+            with self._lock:
+                self._db.executemany("DELETE FROM pending_turns WHERE id = ?", [(i,) for i in done_ids])
+                self.stats["flushed"] += flushed
+        return flushed
+
+    def _write_turn(self, primary_key: str, data: dict):
+        """Escribe un turno de la cola. Si otro writer cambió el estado, se relee y se vuelven a
+        aplicar los cambios del turno (sin ellos el conflicto cuenta como fallo y se reintenta)."""
+        def write(items, state_item=None, expected_version=None):
+            return write_turn(self.table_name, items, state_item=state_item,
+                              expected_version=expected_version, mode=self.mode)
+
+        try:
+            return write(data['message_items'], state_item=data.get('state_item'),
+                         expected_version=data.get('expected_version'))
+        except StateConflictError:
+            if data.get('state_updates') is None:
+                raise
+        from app.services.chatbot_engine import write_turn_with_state
+
+        result, _ = write_turn_with_state(write, get_conversation_state, primary_key, data['message_items'],
+                                          get_conversation_state(primary_key) or {},
+                                          deserialize_item(data['state_updates']), data.get('reset', False))
+        return result
+
+    def _record_failure(self, row_id: int, attempts: int, error: Exception):
+        self.stats["errors"] += 1
+        if attempts >= self.max_attempts:
+            status = 'dead'
+            self.stats["dead"] += 1
+            logging.error(f"Write-behind: turno {row_id} descartado tras {attempts} intentos: {error}")
+        else:
+            status = 'pending'
+            self.stats["retries"] += 1
+            logging.warning(f"Write-behind: error escribiendo turno {row_id} (intento {attempts}): {error}")
+        # Backoff exponencial con full jitter, máximo 30s
+        next_attempt_at = time.time() + random.uniform(0, min(30.0, 0.2 * 2 ** attempts))
+        with self._lock:
+            self._db.execute(
+                "UPDATE pending_turns SET attempts = ?, next_attempt_at = ?, status = ?, last_error = ?, "
+                "claimed_by = NULL, claimed_at = NULL WHERE id = ?",
+                (attempts, next_attempt_at, status, str(error)[:500], row_id))
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pending_turns WHERE status = 'pending'").fetchone()[0]
+
+    ### Hilo en segundo plano ###
+
+    def start(self):
+        """Inicia el flusher en segundo plano (también reintenta lo que quedó de una ejecución anterior)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+        self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                # Sigue vaciando mientras haya lotes completos
+                while self.flush() >= self.batch_size:
+                    pass
+            except Exception as e:
+                logging.error(f"Write-behind: error en el flusher: {e}")
+
+    def drain(self, timeout: float = 10.0) -> int:
+        """Detiene el flusher y escribe lo pendiente (shutdown). Retorna los turnos que quedaron sin escribir."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        deadline = time.monotonic() + timeout
+        while self.pending_count() and time.monotonic() < deadline:
+            if not self.flush(ignore_backoff=True):
+                time.sleep(0.2)
+        remaining = self.pending_count()
+        if remaining:
+            logging.warning(f"Write-behind: {remaining} turnos quedan en la cola local para el próximo arranque")
+        return remaining
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def metrics(self) -> dict:
+        return {**self.stats, "pending": self.pending_count()}
+
+
+_QUEUE = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_write_behind_queue() -> WriteBehindQueue:
+    """Cola write-behind del proceso (se crea y arranca la primera vez)."""
+    global _QUEUE
+    if _QUEUE is None:
+        with _QUEUE_LOCK:
+            if _QUEUE is None:
+                _QUEUE = WriteBehindQueue()
+                _QUEUE.start()
+    return _QUEUE
+
+
+def drain_write_behind_queue(timeout: float = 10.0):
+    """Vacía y cierra la cola del proceso (shutdown de la app)."""
+    global _QUEUE
+    with _QUEUE_LOCK:
+        if _QUEUE is not None:
+            _QUEUE.drain(timeout)
+            _QUEUE.close()
+            _QUEUE = None
+
+
+def write_behind_stats() -> dict:
+    return _QUEUE.metrics() if _QUEUE is not None else {}
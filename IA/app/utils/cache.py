@@ -0,0 +1,177 @@
+"""
+Caches en memoria del proceso.
+
+- RefreshingCache: un único valor de baja cardinalidad (catálogos, vocabularios).
+- LRUCache: muchas claves con TTL por entrada y desalojo LRU (ej. resultados de búsqueda).
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class RefreshingCache:
+    """
+    Cache de un único valor con TTL y stale-while-revalidate.
+
+    - Mientras el valor está fresco (< ttl_seconds) se retorna sin tocar la fuente.
+    - Si está vencido pero dentro de stale_seconds, se retorna el valor viejo y se
+      lanza un refresh en segundo plano (un solo refresh a la vez).
+    - Si no hay valor o ya pasó la ventana stale, se carga de forma síncrona.
+    - Si el loader falla, se conserva el último valor conocido (o `default`), también después
+      de invalidate(), y no se reintenta hasta pasados error_backoff_seconds (con la fuente
+      caída cada lectura no espera un nuevo timeout).
+    """
+
+    def __init__(self, loader: Callable[[], Any], ttl_seconds: float, stale_seconds: float = 0,
+                 name: str = "cache", default: Any = None, error_backoff_seconds: float = 5):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.name = name
+        self.default = default
+        self.error_backoff_seconds = error_backoff_seconds
+        self._value = None
+        self._has_value = False
+        self._loaded_at: Optional[float] = None
+        self._failed_at: Optional[float] = None
+        self._load_lock = threading.Lock()
+        self._refresh_flag_lock = threading.Lock()
+        self._refreshing = False
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0, "backoff_hits": 0}
+
+    def get(self) -> Any:
+        """Retorna el valor cacheado, refrescándolo según TTL."""
+        age = self._age()
+
+        if age is not None and age < self.ttl_seconds:
+            self.stats["hits"] += 1
+            return self._value
+
+        if age is not None and age < self.ttl_seconds + self.stale_seconds:
+            self.stats["stale_hits"] += 1
+            value = self._value
+            # Con la fuente caída no se lanza un refresh por lectura: se espera el backoff
+            if not self._in_error_backoff():
+                self._refresh_in_background()
+            return value
+
+        if self._in_error_backoff():
+            self.stats["backoff_hits"] += 1
+            return self._last_value()
+
+        self.stats["misses"] += 1
+        with self._load_lock:
+            # Otro hilo pudo haberlo cargado (o fallado) mientras esperábamos
+            age = self._age()
+            if age is not None and age < self.ttl_seconds:
+                return self._value
+            if self._in_error_backoff():
+                return self._last_value()
+            self._load()
+        return self._last_value()
+
+    def invalidate(self):
+        """Fuerza que la próxima lectura vuelva a la fuente (el último valor se conserva
+        como respaldo si la carga falla)."""
+        with self._load_lock:
+            self._loaded_at = None
+            self._failed_at = None
+
+    def _last_value(self) -> Any:
+        return self._value if self._has_value else self.default
+
+    def _in_error_backoff(self) -> bool:
+        failed_at = self._failed_at
+        return failed_at is not None and time.monotonic() - failed_at < self.error_backoff_seconds
+
+    def _age(self) -> Optional[float]:
+        loaded_at = self._loaded_at
+        return None if loaded_at is None else time.monotonic() - loaded_at
+
+    def _load(self):
+        try:
+            value = self.loader()
+        except Exception as e:
+            self.stats["errors"] += 1
+            self._failed_at = time.monotonic()
+            logging.warning(f"Cache '{self.name}': error cargando valor, se mantiene el anterior: {e}")
+            return
+        self._value = value
+        self._has_value = True
+        self._loaded_at = time.monotonic()
+        self._failed_at = None
+        self.stats["refreshes"] += 1
+
+    def _refresh_in_background(self):
+        with self._refresh_flag_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                with self._load_lock:
+                    self._load()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=_run, name=f"refresh-{self.name}", daemon=True).start()
+
+
+class LRUCache:
+    """
+    Cache clave -> valor con TTL por entrada y máximo de entradas (desaloja la menos usada).
+    Thread-safe; las entradas vencidas se descartan al leerlas.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, name: str = "lru"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clave -> (vence, valor)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def snapshot(self) -> dict:
+        """Métricas para /metrics (tamaño, hit ratio y contadores)."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else None,
+            **self.stats,
+        }
@@ -2,6 +2,7 @@
 Filtro de intenciones simplificado para validar consultas inmobiliarias
 """
 from typing import Tuple
+from app.utils.nlu import parse_message, register_keywords
 
 # Palabras clave relacionadas con inmobiliaria
 REAL_ESTATE_KEYWORDS = [
@@ -10,25 +11,26 @@ REAL_ESTATE_KEYWORDS = [
     'dormitorio', 'habitacion', 'baño', 'cocina', 'garage', 'jardin',
     'ubicacion', 'zona', 'distrito', 'precio', 'presupuesto', 'buscar'
 ]
+GREETING_WORDS = ['hola', 'hello', 'hi', 'buenos', 'buenas']
 
-def is_real_estate_related(message: str) -> Tuple[bool, str]:
+REAL_ESTATE = register_keywords('filter.real_estate', REAL_ESTATE_KEYWORDS)
+GREETING = register_keywords('filter.greeting', GREETING_WORDS)
+
+def is_real_estate_related(message) -> Tuple[bool, str]:
     """
     Versión simplificada para determinar si un mensaje es inmobiliario
+    (acepta el mensaje o un ParsedMessage)
     """
-    if not message or len(message.strip()) < 3:
+    parsed = parse_message(message)
+    if len(parsed.lower) < 3:
         return False, "Mensaje muy corto"
 
-    message_lower = message.lower().strip()
-
     # Verificar palabras clave inmobiliarias
-    has_keywords = any(keyword in message_lower for keyword in REAL_ESTATE_KEYWORDS)
-
-    if has_keywords:
+    if parsed.has(REAL_ESTATE):
         return True, "Contiene palabras clave inmobiliarias"
 
     # Para mensajes de saludo o conversacionales, aceptar por defecto
-    greeting_words = ['hola', 'hello', 'hi', 'buenos', 'buenas']
-    if any(word in message_lower for word in greeting_words):
+    if parsed.has(GREETING):
         return True, "Saludo conversacional"
 
     # Por defecto, aceptar (ser permisivo para pruebas)
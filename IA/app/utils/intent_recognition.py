@@ -1,4 +1,4 @@
-import re
+from app.utils.nlu import parse_message, register_keywords
 
 # Listas de palabras clave para afirmación y negación
 AFFIRMATIVE_KEYWORDS = [
@@ -10,21 +10,22 @@ NEGATIVE_KEYWORDS = [
     'no', 'para', 'detente', 'cancela', 'nada', 'ninguna', 'negativo', 'cancelar'
 ]
 
-def check_intent(text: str) -> str:
+AFFIRMATIVE = register_keywords('intent.affirmative', AFFIRMATIVE_KEYWORDS)
+NEGATIVE = register_keywords('intent.negative', NEGATIVE_KEYWORDS)
+
+def check_intent(text) -> str:
     """
     Analiza el texto para determinar si la intención es afirmativa, negativa o desconocida.
+    Acepta el mensaje o un ParsedMessage (ya normalizado, sin puntuación ni tildes).
     """
-    text_lower = text.lower()
-    
-    # Eliminar puntuación para una coincidencia más robusta
-    text_cleaned = re.sub(r'[¡!¿?.,]', '', text_lower)
+    parsed = parse_message(text)
 
     # Comprobar si alguna palabra clave afirmativa está en el texto
-    if any(keyword in text_cleaned for keyword in AFFIRMATIVE_KEYWORDS):
+    if parsed.has(AFFIRMATIVE):
         return 'affirmative'
-    
+
     # Comprobar si alguna palabra clave negativa está en el texto
-    if any(keyword in text_cleaned for keyword in NEGATIVE_KEYWORDS):
+    if parsed.has(NEGATIVE):
         return 'negative'
-        
+
     return 'unknown'
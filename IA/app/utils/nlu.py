@@ -0,0 +1,148 @@
+"""
+Preprocesamiento NLU compartido: el mensaje se normaliza una sola vez por turno
+(minúsculas, sin tildes ni signos, tokens y números) y todas las listas de palabras
+clave registradas se buscan en una sola pasada con un autómata Aho-Corasick.
+
+Uso:
+    AFFIRMATIVE = register_keywords('intent.affirmative', ['sí', 'claro', ...])
+    parsed = parse_message(message)
+    if parsed.has(AFFIRMATIVE): ...
+
+La búsqueda conserva la semántica de `keyword in message_lower` (subcadenas), pero
+sin depender de tildes: 'habitacion' encuentra 'habitación'.
+"""
+import re
+import threading
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, Union
+
+_DROP_PUNCTUATION = re.compile(r'[¡!¿?]|(?<!\d)[.,]|[.,](?!\d)')
+_THOUSANDS_SEPARATOR = re.compile(r'(?<=\d)[.,](?=\d{3}\b)')
+_SPACES = re.compile(r'\s+')
+_TOKENS = re.compile(r'\w+')
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sin tildes (á→a, ñ→n), sin ¡!¿? ni puntuación suelta, espacios simples.
+    Los separadores de miles se eliminan ('1.500' → '1500'); los decimales se mantienen."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = _THOUSANDS_SEPARATOR.sub('', text)
+    text = _DROP_PUNCTUATION.sub('', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+class KeywordAutomaton:
+    """Autómata Aho-Corasick sobre varios conjuntos de palabras clave.
+    `match(texto)` retorna las etiquetas de todos los conjuntos con alguna coincidencia."""
+
+    def __init__(self, keyword_sets: Dict[str, Iterable[str]]):
+        goto, outputs = [{}], [set()]
+        for label, keywords in keyword_sets.items():
+            for keyword in keywords:
+                keyword = normalize_text(keyword)
+                if not keyword:
+                    continue
+                state = 0
+                for ch in keyword:
+                    next_state = goto[state].get(ch)
+                    if next_state is None:
+                        next_state = len(goto)
+                        goto[state][ch] = next_state
+                        goto.append({})
+                        outputs.append(set())
+                    state = next_state
+                outputs[state].add(label)
+
+        # Enlaces de fallo (BFS); cada estado hereda las salidas de su enlace
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(ch, 0)
+                outputs[child] |= outputs[fail[child]]
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [frozenset(labels) for labels in outputs]
+
+    def match(self, text: str) -> frozenset:
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state, found = 0, set()
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return frozenset(found)
+
+
+_KEYWORD_SETS = {}
+_AUTOMATON = None
+_VERSION = 0
+_LOCK = threading.Lock()
+
+
+def register_keywords(label: str, keywords: Iterable[str]) -> str:
+    """Registra (o reemplaza) un conjunto de palabras clave. Retorna la etiqueta."""
+    global _AUTOMATON, _VERSION
+    with _LOCK:
+        _KEYWORD_SETS[label] = tuple(keywords)
+        _AUTOMATON = None
+        _VERSION += 1
+    _parse.cache_clear()
+    return label
+
+
+def _automaton() -> KeywordAutomaton:
+    global _AUTOMATON
+    automaton = _AUTOMATON
+    if automaton is None:
+        with _LOCK:
+            if _AUTOMATON is None:
+                _AUTOMATON = KeywordAutomaton(_KEYWORD_SETS)
+            automaton = _AUTOMATON
+    return automaton
+
+
+class ParsedMessage:
+    """Mensaje ya normalizado, con las etiquetas de palabras clave encontradas."""
+
+    __slots__ = ('raw', 'lower', 'text', 'tokens', 'numbers', 'labels', '_version')
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.lower = raw.lower().strip()           # como el `message_lower` de siempre
+        self.text = normalize_text(raw)            # sin tildes ni signos
+        self.tokens = _TOKENS.findall(self.text)
+        self.numbers = [int(token) for token in self.tokens if token.isdigit()]
+        self._version = _VERSION
+        self.labels = _automaton().match(self.text)
+
+    def has(self, *labels: str) -> bool:
+        """True si el mensaje contiene alguna palabra clave de alguno de los conjuntos."""
+        if self._version != _VERSION:
+            # Se registraron conjuntos después de parsear: se vuelve a buscar
+            self._version = _VERSION
+            self.labels = _automaton().match(self.text)
+        return any(label in self.labels for label in labels)
+
+
+@lru_cache(maxsize=256)
+def _parse(message: str) -> ParsedMessage:
+    return ParsedMessage(message)
+
+
+def parse_message(message: Union[str, ParsedMessage, None]) -> ParsedMessage:
+    """Parsea el mensaje (una sola vez: los consumidores reciben el mismo ParsedMessage)."""
+    if isinstance(message, ParsedMessage):
+        return message
+    return _parse(message or "")
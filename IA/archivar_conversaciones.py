@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Archiva en S3 (JSONL + gzip) los items de ChatMessages cuyo TTL vence pronto.
+Cada corrida sigue desde el horizonte de la anterior: un item se sube una sola vez.
+
+Uso:
+    python archivar_conversaciones.py [--lead-days 7] [--segments 4] [--bucket mi-bucket]
+
+Con S3_ENDPOINT_URL / DYNAMODB_ENDPOINT_URL se puede correr contra MinIO / DynamoDB Local.
+"""
+import sys
+import argparse
+from dotenv import load_dotenv
+
+# Agregar path
+sys.path.append('.')
+
+# Cargar variables
+load_dotenv()
+
+from app.core.config import CHAT_ARCHIVE_BUCKET, CHAT_ARCHIVE_LEAD_DAYS, CHAT_ARCHIVE_SEGMENTS
+from app.services.chat_archive import archive_expiring_items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archivo frío de conversaciones")
+    parser.add_argument("--lead-days", type=float, default=CHAT_ARCHIVE_LEAD_DAYS)
+    parser.add_argument("--segments", type=int, default=CHAT_ARCHIVE_SEGMENTS)
+    parser.add_argument("--bucket", default=CHAT_ARCHIVE_BUCKET)
+    args = parser.parse_args()
+
+    print("📦 ARCHIVANDO CONVERSACIONES")
+    print("=" * 40)
+    stats = archive_expiring_items(lead_days=args.lead_days, segments=args.segments, bucket=args.bucket)
+    print(f"✅ {stats['items']} items en {stats['objects']} archivos ({stats['bytes']} bytes, {stats['duration_ms']} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
-"
+"""
 Crear propiedades de prueba directamente en OpenSearch
 """
-import os
+import sys
 from dotenv import load_dotenv
-from opensearchpy import OpenSearch, helpers
+from opensearchpy import helpers
+
+# Agregar path para imports
+sys.path.append('.')
 
 load_dotenv()
 
+from app.core.aws_clients import get_opensearch_client
+
 print("🏠 CREANDO PROPIEDADES DE PRUEBA")
 print("=" * 40)
 
@@ -15,13 +20,7 @@ def main():
     try:
         # Conectar a OpenSearch
         print("🔍 Conectando a OpenSearch...")
-        client = OpenSearch(
-            hos=[{"host": os.getenv("OPENSEARCH_HOST"), "port": 443}],
-            http_auth=(os.getenv("OPENSEARCH_USER"), os.getenv("OPENSEARCH_PASSWORD")),
-            use_ssl=True,
-            verify_certs=True,
-            timeout=60,
-        )
+        client = get_opensearch_client()
 
         index_name = "properties"
 
@@ -35,6 +34,7 @@ def main():
                         "properties": {
                             "text": {"type": "text"},
                             "embedding": {"type": "knn_vector", "dimension": 1536},
+                            "property_id": {"type": "keyword"},
                             "city": {"type": "keyword"},
                             "property_type": {"type": "keyword"},
                             "operation_type": {"type": "keyword"}
@@ -100,6 +100,7 @@ def main():
                 "_index": index_name,
                 "_id": f"test_prop_{i}",
                 "_source": {
+                    "property_id": f"test_prop_{i}",
                     "text": text,
                     "embedding": embedding,
                     "city": prop["city"],
@@ -124,6 +125,11 @@ def main():
         count = client.count(index=index_name)
         print(f"🎯 Total en OpenSearch: {count['count']}")
 
+        # Invalidar el cache de búsquedas de la API (usa el pool de PostgreSQL de la app)
+        from app.services.search_cache import invalidate_search_cache
+        generation = invalidate_search_cache()
+        print(f"♻️  Cache de búsquedas invalidado (generación {generation})")
+
         if count['count'] > 0:
             print("\n🎉 ¡PROPIEDADES DE PRUEBA CREADAS!")
             print("✅ Tu chatbot ahora puede encontrar propiedades")
@@ -9,7 +9,7 @@ import psycopg2
 import logging
 from typing import Generator, Dict, Any
 from dotenv import load_dotenv
-from opensearchpy import OpenSearch, helpers
+from opensearchpy import helpers
 
 # Agregar path para imports
 sys.path.append('.')
@@ -17,6 +17,8 @@ sys.path.append('.')
 # Cargar variables de entorno
 load_dotenv()
 
+from app.core.aws_clients import get_opensearch_client
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -34,16 +36,6 @@ def get_postgres_connection():
         password=os.getenv("POSTGRESQL_DEV_PASSWORD")
     )
 
-def get_opensearch_client():
-    """Conectar a OpenSearch"""
-    return OpenSearch(
-        hosts=[{"host": os.getenv("OPENSEARCH_HOST"), "port": 443}],
-        http_auth=(os.getenv("OPENSEARCH_USER"), os.getenv("OPENSEARCH_PASSWORD")),
-        use_ssl=True,
-        verify_certs=True,
-        timeout=60,
-    )
-
 def embed_text_simple(text: str):
     """Generar embedding usando Bedrock"""
     try:
@@ -65,6 +57,7 @@ def create_index_if_not_exists(client, index_name):
                     "properties": {
                         "text": {"type": "text"},
                         "embedding": {"type": "knn_vector", "dimension": 1536},
+                        "property_id": {"type": "keyword"},
                         "city": {"type": "keyword"},
                         "property_type": {"type": "keyword"},
                         "operation_type": {"type": "keyword"},
@@ -105,7 +98,7 @@ def generate_actions(rows, index_name) -> Generator[Dict[str, Any], None, None]:
 
     for title, desc, ptype, address, geoloc, op in rows:
         try:
-        # Crear texto enriquecido para búsqueda semántica
+            # Crear texto enriquecido para búsqueda semántica
             text = f"{title} – {desc} – {ptype} – {address} – {op}"
 
             # Extraer ciudad de la dirección
@@ -121,12 +114,13 @@ def generate_actions(rows, index_name) -> Generator[Dict[str, Any], None, None]:
                 "_index": index_name,
                 "_id": doc_id,
                 "_source": {
+                    "property_id": doc_id,
                     "text": text,
                     "embedding": embedding,
                     "city": city.lower(),
                     "property_type": ptype,
                     "operation_type": op,
-address": address,
+                    "address": address,
                     "title": title,
                     "description": desc
                 }
@@ -147,13 +141,13 @@ def main():
     """Función principal"""
     try:
         # Conectar a PostgreSQL
-        print("🐘do a PostgreSQL...")
+        print("🐘 Conectando a PostgreSQL...")
         conn = get_postgres_connection()
         cursor = conn.cursor()
 
         # Verificar propiedades
         cursor.execute("SELECT COUNT(*) FROM properties;")
-l_count = cursor.fetchone()[0]
+        total_count = cursor.fetchone()[0]
         print(f"📊 Propiedades en PostgreSQL: {total_count}")
 
         if total_count == 0:
@@ -199,6 +193,11 @@ l_count = cursor.fetchone()[0]
 
         print(f"🎯 Propiedades indexadas en OpenSearch: {indexed_count}")
 
+        # Invalidar el cache de búsquedas de la API (todas las instancias)
+        from app.services.search_cache import invalidate_search_cache
+        generation = invalidate_search_cache(conn)
+        print(f"♻️  Cache de búsquedas invalidado (generación {generation})")
+
         cursor.close()
         conn.close()
 
@@ -8,7 +8,7 @@ import hashlib
 import psycopg2
 import logging
 from dotenv import load_dotenv
-from opensearchpy import OpenSearch, helpers
+from opensearchpy import helpers
 
 # Agregar path
 sys.path.append('.')
@@ -16,6 +16,8 @@ sys.path.append('.')
 # Cargar variables
 load_dotenv()
 
+from app.core.aws_clients import get_opensearch_client
+
 print("🚀 INDEXANDO PROPIEDADES")
 print("=" * 40)
 
@@ -34,13 +36,7 @@ def main():
 
         # OpenSearch
         print("🔍 Conectando a OpenSearch...")
-        client = OpenSearch(
-            hosts=[{"host": os.getenv("OPENSEARCH_HOST"), "port": 443}],
-            http_auth=(os.getenv("OPENSEARCH_USER"), os.getenv("OPENSEARCH_PASSWORD")),
-            use_ssl=True,
-            verify_certs=True,
-            timeout=60,
-        )
+        client = get_opensearch_client()
 
         # Crear índice
         index_name = "properties"
@@ -53,6 +49,7 @@ def main():
                         "properties": {
                             "text": {"type": "text"},
                             "embedding": {"type": "knn_vector", "dimension": 1536},
+                            "property_id": {"type": "keyword"},
                             "city": {"type": "keyword"},
                             "property_type": {"type": "keyword"},
                             "operation_type": {"type": "keyword"}
@@ -87,6 +84,7 @@ def main():
                 "_index": index_name,
                 "_id": doc_id,
                 "_source": {
+                    "property_id": doc_id,
                     "text": text,
                     "embedding": embedding,
                     "city": "lima",
@@ -108,6 +106,11 @@ def main():
         count = client.count(index=index_name)
         print(f"🎯 Total en OpenSearch: {count['count']}")
 
+        # Invalidar el cache de búsquedas de la API
+        from app.services.search_cache import invalidate_search_cache
+        generation = invalidate_search_cache(conn)
+        print(f"♻️  Cache de búsquedas invalidado (generación {generation})")
+
         cursor.close()
         conn.close()
 
@@ -0,0 +1,25 @@
+-- Búsqueda indexada de propiedades (PROPERTY_SEARCH_MODE=fulltext)
+--
+-- * search_vector: tsvector generado con la configuración 'spanish' (stemming y stopwords),
+--   título y dirección con más peso que tipo y descripción. Índice GIN para `@@`.
+-- * Índices trigram (pg_trgm) sobre lower(...): los filtros `LIKE '%x%'` y similarity()
+--   dejan de ser un scan secuencial de `properties`.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE properties
+    ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(address, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(property_type, '')), 'B') ||
+        setweight(to_tsvector('spanish', coalesce(description, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_properties_search_vector ON properties USING GIN (search_vector);
+
+CREATE INDEX IF NOT EXISTS idx_properties_address_trgm ON properties USING GIN (lower(address) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_properties_title_trgm ON properties USING GIN (lower(title) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_properties_property_type_trgm ON properties USING GIN (lower(property_type) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_properties_operation_type_trgm ON properties USING GIN (lower(operation_type) gin_trgm_ops);
+
+ANALYZE properties;
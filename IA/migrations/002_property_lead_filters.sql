@@ -0,0 +1,24 @@
+-- Filtros de todo el PropertyLead en la base (PROPERTY_SEARCH_MODE=fulltext)
+--
+-- Columnas estructuradas (se agregan solo si no existen) e índices para que cada campo
+-- del lead sea un predicado sargable:
+--   presupuesto -> price <= x            numero_dormitorios -> bedrooms >= x
+--   numero_banos -> bathrooms >= x       metraje_minimo -> area_m2 >= x
+--   amenidades -> amenities @> ARRAY[]  pet_friendly -> pet_friendly (índice parcial)
+
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS price NUMERIC(12, 2);
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS bedrooms SMALLINT;
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS bathrooms SMALLINT;
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS area_m2 NUMERIC(10, 2);
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS amenities TEXT[] NOT NULL DEFAULT '{}';
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS pet_friendly BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Igualdad de operación y tipo (valores del catálogo) + rango de precio en un solo índice
+CREATE INDEX IF NOT EXISTS idx_properties_operation_type_price
+    ON properties (lower(operation_type), lower(property_type), price);
+CREATE INDEX IF NOT EXISTS idx_properties_bedrooms_bathrooms ON properties (bedrooms, bathrooms);
+CREATE INDEX IF NOT EXISTS idx_properties_area ON properties (area_m2);
+CREATE INDEX IF NOT EXISTS idx_properties_amenities ON properties USING GIN (amenities);
+CREATE INDEX IF NOT EXISTS idx_properties_pet_friendly_price ON properties (price) WHERE pet_friendly;
+
+ANALYZE properties;
@@ -0,0 +1,22 @@
+-- Búsqueda por cercanía con PostGIS (PROPERTY_SEARCH_MODE=geo)
+--
+-- * Índice GiST sobre geolocation::geography: ST_DWithin (metros) y orden KNN `<->`.
+-- * Tabla `locations`: distritos, ciudades y puntos de referencia con su centro y, si se
+--   conoce, su polígono. Se carga en memoria como catálogo para resolver la ubicación del lead.
+
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+CREATE INDEX IF NOT EXISTS idx_properties_geography ON properties USING GIST ((geolocation::geography));
+
+CREATE TABLE IF NOT EXISTS locations (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'district',          -- district | city | landmark
+    center geography(Point, 4326) NOT NULL,
+    geom geography(MultiPolygon, 4326)              -- NULL: solo se conoce el centro
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_locations_name_kind ON locations (lower(name), kind);
+CREATE INDEX IF NOT EXISTS idx_locations_geom ON locations USING GIST (geom);
+
+ANALYZE properties;
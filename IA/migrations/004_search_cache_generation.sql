@@ -0,0 +1,13 @@
+-- Generación del cache de resultados de búsqueda (app/services/search_cache.py)
+--
+-- Los scripts de indexación / carga de propiedades incrementan `generation`; cada proceso de
+-- la API la relee cada PROPERTY_CACHE_GENERATION_TTL_SECONDS y la incluye en las claves del
+-- cache, así las entradas anteriores dejan de usarse en todos los procesos.
+
+CREATE TABLE IF NOT EXISTS cache_generations (
+    name TEXT PRIMARY KEY,
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO cache_generations (name) VALUES ('property_search') ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,69 @@
+-- Carga de las columnas de migrations/002 (price, bedrooms, bathrooms, area_m2, amenities,
+-- pet_friendly) a partir del texto de cada propiedad.
+--
+-- * properties_fill_lead_filters(): trigger BEFORE INSERT/UPDATE que completa solo los
+--   campos vacíos (NULL, o amenities = '{}') con lo que se reconoce en título + descripción:
+--   "S/ 1,500" o "1500 soles", "3 dormitorios", "2 baños", "80 m2", amenidades conocidas y
+--   si se aceptan mascotas. Lo que no se reconoce queda NULL.
+-- * pet_friendly pasa a aceptar NULL ("no se sabe"): el FALSE por defecto de 002 descartaba
+--   todas las propiedades al pedir mascotas. Nada escribía la columna, así que los FALSE
+--   existentes se vuelven a calcular.
+-- * Los filtros del lead (app/services/property_query.py) no descartan filas con NULL.
+
+ALTER TABLE properties ALTER COLUMN pet_friendly DROP NOT NULL;
+ALTER TABLE properties ALTER COLUMN pet_friendly DROP DEFAULT;
+
+CREATE OR REPLACE FUNCTION properties_fill_lead_filters() RETURNS trigger AS $$
+DECLARE
+    text_value TEXT := lower(coalesce(NEW.title, '') || ' ' || coalesce(NEW.description, ''));
+    amount TEXT;
+BEGIN
+    IF NEW.price IS NULL THEN
+        amount := coalesce(
+            substring(text_value from '(?:s/\.?|us\$|\$|usd)\s*(\d{1,3}(?:[.,]\d{3})+|\d+)'),
+            substring(text_value from '(\d{1,3}(?:[.,]\d{3})+|\d+)\s*(?:soles|d[oó]lares)'));
+        NEW.price := regexp_replace(amount, '[.,]', '', 'g')::NUMERIC(12, 2);
+    END IF;
+    IF NEW.bedrooms IS NULL THEN
+        NEW.bedrooms := substring(text_value from '(\d{1,2})\s*(?:dormitorios?|habitaci[oó]n(?:es)?|cuartos?|rec[aá]maras?)')::SMALLINT;
+    END IF;
+    IF NEW.bathrooms IS NULL THEN
+        NEW.bathrooms := substring(text_value from '(\d{1,2})\s*(?:baños?|banos?)')::SMALLINT;
+    END IF;
+    IF NEW.area_m2 IS NULL THEN
+        NEW.area_m2 := replace(substring(text_value from '(\d{1,6}(?:[.,]\d{1,2})?)\s*(?:m2|m²|mts2?|metros cuadrados)'), ',', '.')::NUMERIC(10, 2);
+    END IF;
+    IF NEW.amenities IS NULL OR NEW.amenities = '{}' THEN
+        NEW.amenities := ARRAY(
+            SELECT amenity FROM unnest(ARRAY['piscina', 'gimnasio', 'estacionamiento', 'cochera', 'garage',
+                                             'jardín', 'terraza', 'balcón', 'ascensor', 'parrilla',
+                                             'lavandería', 'seguridad', 'amoblado', 'aire acondicionado']) AS amenity
+            WHERE text_value LIKE '%' || amenity || '%'
+            ORDER BY amenity);
+    END IF;
+    IF NEW.pet_friendly IS NULL THEN
+        NEW.pet_friendly := CASE
+            WHEN text_value ~ '(no (se )?(aceptan?|permiten?)|sin) mascotas' THEN FALSE
+            WHEN text_value ~ 'mascotas|pet[ -]?friendly' THEN TRUE
+        END;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_properties_fill_lead_filters ON properties;
+CREATE TRIGGER trg_properties_fill_lead_filters
+    BEFORE INSERT OR UPDATE OF title, description ON properties
+    FOR EACH ROW EXECUTE FUNCTION properties_fill_lead_filters();
+
+-- Backfill de las filas existentes (el trigger completa los campos vacíos)
+UPDATE properties
+SET description = description, pet_friendly = NULLIF(pet_friendly, FALSE)
+WHERE price IS NULL OR bedrooms IS NULL OR bathrooms IS NULL OR area_m2 IS NULL
+   OR amenities = '{}' OR pet_friendly IS NOT TRUE;
+
+-- Índice parcial de 002 (WHERE pet_friendly) reemplazado por el del predicado tolerante a NULL
+DROP INDEX IF EXISTS idx_properties_pet_friendly_price;
+CREATE INDEX IF NOT EXISTS idx_properties_pet_friendly_price ON properties (price) WHERE pet_friendly IS NOT FALSE;
+
+ANALYZE properties;
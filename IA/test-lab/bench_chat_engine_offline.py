@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Benchmark del overhead propio del engine (grafo de stages, codec, armado del turno y
+almacenamiento) sin AWS: turnos completos contra los backends en memoria y SQLite.
+Los turnos usan el camino de reinicio de búsqueda, que no llama al LLM ni a PostgreSQL.
+
+Uso (desde IA/):  python test-lab/bench_chat_engine_offline.py [turnos]
+"""
+import io
+import os
+import sys
+import time
+import logging
+import tempfile
+import contextlib
+from unittest.mock import patch
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from app.services import chatbot_engine
+from app.services.storage.factory import set_chat_storage
+from app.services.storage.memory import MemoryStorage
+from app.services.storage.sqlite import SQLiteStorage
+
+
+def run(storage, turns: int, conversations: int = 20):
+    set_chat_storage(storage)
+    timings = []
+    # Sin logs ni prints de debug: se mide el engine, no la consola
+    with patch('app.graph.chat_graph.get_property_types', return_value=['casa', 'departamento']), \
+         contextlib.redirect_stdout(io.StringIO()):
+        for turn in range(turns):
+            start = time.perf_counter()
+            chatbot_engine.proccess_chat_turn('bench', f'c{turn % conversations}', 'nueva búsqueda', 'Ana')
+            timings.append((time.perf_counter() - start) * 1000)
+    set_chat_storage(None)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95)], sum(timings) / len(timings)
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [("memory", MemoryStorage()), ("sqlite", SQLiteStorage(os.path.join(tmp, "bench.db")))]
+        for name, storage in backends:
+            p50, p95, avg = run(storage, turns)
+            print(f"{name:<8} {turns} turnos   p50 {p50:7.3f} ms   p95 {p95:7.3f} ms   promedio {avg:7.3f} ms")
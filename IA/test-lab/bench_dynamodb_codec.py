@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: codec DynamoDB de una sola pasada vs. el camino genérico anterior
+(ChatMessage -> model_dump -> float a Decimal -> TypeSerializer, TypeDeserializer al leer).
+
+Uso (desde IA/):  python test-lab/bench_dynamodb_codec.py [repeticiones]
+"""
+import os
+import sys
+import timeit
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from app.models.ChatMessage import ChatMessage
+from app.models.PropertyLead import PropertyLead
+from app.services.dynamodb_queries import convert_floats_to_decimal
+from app.services import dynamodb_codec
+
+PROPERTIES = [
+    {'id': f'p{i}', 'title': f'Departamento {i} en Miraflores', 'text': 'Departamento amplio, 3 dormitorios ' * 8,
+     'score': 0.8 + i / 100, 'precio': 1500 + i * 100, 'dormitorios': 3, 'banos': 2.5, 'amenities': ['piscina', 'gimnasio']}
+    for i in range(5)
+]
+METADATA = {
+    'stage': 'recommend', 'conversation_length': 12.0, 'awaiting_confirmation': True, 'user_name': 'Ana',
+    'lead': PropertyLead(ubicacion='Miraflores', tipo_propiedad=['departamento'], transaccion='alquiler', presupuesto=2500),
+    'result_set': {'id': 'a' * 32, 'property_ids': [p['id'] for p in PROPERTIES], 'count': len(PROPERTIES)},
+}
+MESSAGE = dict(PK='USER#u#CONV#c', SK='TIMESTAMP#2025-01-01T00:00:00Z', role='assistant',
+               content_type='property_list', content={'properties': PROPERTIES}, metadata=METADATA)
+
+
+def legacy_encode():
+    raw = ChatMessage(**MESSAGE).model_dump()
+    serializer = TypeSerializer()
+    return {k: serializer.serialize(v) for k, v in convert_floats_to_decimal(raw).items()}
+
+
+def codec_encode():
+    return dynamodb_codec.encode_chat_message(MESSAGE['PK'], MESSAGE['SK'], MESSAGE['role'],
+                                              MESSAGE['content_type'], MESSAGE['content'], METADATA)
+
+
+ITEM = legacy_encode()
+ITEMS = {'Items': [ITEM] * 10}
+
+
+def legacy_metadata():
+    deserializer = TypeDeserializer()
+    return [{k: deserializer.deserialize(v) for k, v in item.items()}['metadata'] for item in ITEMS['Items']]
+
+
+def codec_metadata():
+    return [dynamodb_codec.decode_value(item['metadata']) for item in ITEMS['Items']]
+
+
+def legacy_decode():
+    deserializer = TypeDeserializer()
+    return {k: deserializer.deserialize(v) for k, v in ITEM.items()}
+
+
+def codec_decode():
+    return dynamodb_codec.decode_item(ITEM)
+
+
+def bench(name, legacy, codec, number):
+    assert legacy() == codec(), f"{name}: resultados distintos"
+    legacy_us = min(timeit.repeat(legacy, number=number, repeat=5)) / number * 1e6
+    codec_us = min(timeit.repeat(codec, number=number, repeat=5)) / number * 1e6
+    print(f"{name:<28} anterior {legacy_us:9.1f} µs   codec {codec_us:9.1f} µs   x{legacy_us / codec_us:5.1f}")
+
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    bench("encode ChatMessage", legacy_encode, codec_encode, number)
+    bench("decode item completo", legacy_decode, codec_decode, number)
+    bench("get_metadata (10 items)", legacy_metadata, codec_metadata, number // 10 or 1)
@@ -0,0 +1,190 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from app.core import aws_clients
+
+
+class TestClientRegistry:
+    """Tests para el registro de clientes AWS por proceso"""
+
+    def setup_method(self):
+        aws_clients.reset_aws_clients()
+
+    def teardown_method(self):
+        aws_clients.reset_aws_clients()
+
+    @patch('app.core.aws_clients.get_boto3_session')
+    def test_client_is_reused(self, mock_session):
+        """El cliente se crea una sola vez por servicio"""
+        mock_session.return_value.client.side_effect = lambda *a, **kw: MagicMock()
+        mock_session.return_value.get_credentials.return_value = None
+
+        first = aws_clients.get_dynamodb_client()
+        second = aws_clients.get_dynamodb_client()
+
+        assert first is second
+        assert mock_session.return_value.client.call_count == 1
+
+    @patch('app.core.aws_clients.get_boto3_session')
+    def test_bedrock_and_embed_share_client(self, mock_session):
+        """bedrock-runtime se comparte entre embeddings y chat"""
+        mock_session.return_value.client.side_effect = lambda *a, **kw: MagicMock()
+        mock_session.return_value.get_credentials.return_value = None
+
+        assert aws_clients.get_bedrock_client() is aws_clients.get_embed_client()
+
+    @patch('app.core.aws_clients.get_boto3_session')
+    def test_reset_forces_new_client(self, mock_session):
+        """reset_aws_clients invalida el cliente registrado"""
+        mock_session.return_value.client.side_effect = lambda *a, **kw: MagicMock()
+        mock_session.return_value.get_credentials.return_value = None
+
+        first = aws_clients.get_s3_client()
+        aws_clients.reset_aws_clients("s3")
+        second = aws_clients.get_s3_client()
+
+        assert first is not second
+
+    @patch('app.core.aws_clients.get_boto3_session')
+    def test_expiring_static_credentials_recreate_client(self, mock_session):
+        """Credenciales temporales no refrescables cerca de expirar recrean el cliente"""
+        from datetime import datetime, timezone, timedelta
+        credentials = MagicMock()
+        credentials._expiry_time = datetime.now(timezone.utc) + timedelta(seconds=10)
+        credentials._refresh_using = None
+        mock_session.return_value.client.side_effect = lambda *a, **kw: MagicMock()
+        mock_session.return_value.get_credentials.return_value = credentials
+
+        first = aws_clients.get_dynamodb_client()
+        second = aws_clients.get_dynamodb_client()
+
+        assert first is not second
+
+
+class TestAsyncClients:
+    """Tests para los clientes asyncio"""
+
+    def teardown_method(self):
+        import asyncio
+        asyncio.run(aws_clients.close_async_aws_clients())
+
+    @patch('app.core.aws_clients.get_client')
+    def test_threaded_fallback_runs_sync_client(self, mock_get_client):
+        """Sin aiobotocore, el cliente async delega al cliente sync del registro en un hilo"""
+        import asyncio
+        import builtins
+        mock_get_client.return_value.get_item.return_value = {'Item': {}}
+        real_import = builtins.__import__
+
+        def no_aiobotocore(name, *args, **kwargs):
+            if name.startswith('aiobotocore'):
+                raise ImportError(name)
+            return real_import(name, *args, **kwargs)
+
+        async def _run():
+            client = await aws_clients.get_async_client("dynamodb")
+            return client, await client.get_item(TableName="T"), await aws_clients.get_async_client("dynamodb")
+
+        with patch('builtins.__import__', side_effect=no_aiobotocore):
+            client, response, again = asyncio.run(_run())
+
+        assert isinstance(client, aws_clients.ThreadedAsyncClient)
+        assert client is again
+        assert response == {'Item': {}}
+        mock_get_client.return_value.get_item.assert_called_once_with(TableName="T")
+
+    def test_native_client_calls_run_in_bulkhead(self):
+        """Con aiobotocore, las llamadas async del cliente ocupan un cupo del bulkhead"""
+        import asyncio
+        from app.core.bulkheads import get_bulkhead
+
+        class FakeNativeClient:
+            async def get_item(self, **kwargs):
+                return {'Item': kwargs}
+
+            def get_paginator(self, name):
+                return name
+
+        client = aws_clients.GuardedAsyncClient(FakeNativeClient(), "dynamodb")
+        completed = get_bulkhead("dynamodb").stats()["completed"]
+
+        response = asyncio.run(client.get_item(TableName="T"))
+
+        assert response == {'Item': {'TableName': "T"}}
+        assert get_bulkhead("dynamodb").stats()["completed"] == completed + 1
+        assert client.get_paginator("query") == "query"
+
+
+class TestLangchainModelCache:
+    """Tests para la memoización de modelos LangChain Bedrock"""
+
+    @patch('app.core.aws_clients._bulkhead_chat_model_class')
+    @patch('app.core.aws_clients.get_bedrock_client')
+    def test_models_are_memoized_by_params(self, mock_client, mock_chat):
+        mock_client.return_value = MagicMock()
+        mock_chat.return_value.side_effect = lambda **kw: MagicMock()
+
+        first = aws_clients.get_langchain_bedrock_client("model-a", max_tokens=100)
+        second = aws_clients.get_langchain_bedrock_client("model-a", max_tokens=100)
+        other = aws_clients.get_langchain_bedrock_client("model-a", max_tokens=200)
+
+        assert first is second
+        assert first is not other
+        assert mock_chat.return_value.call_count == 2
+
+    @patch('app.core.aws_clients._bulkhead_chat_model_class')
+    @patch('app.core.aws_clients.get_bedrock_client')
+    def test_structured_output_is_memoized(self, mock_client, mock_chat):
+        mock_client.return_value = MagicMock()
+        mock_chat.return_value.side_effect = lambda **kw: MagicMock()
+
+        first = aws_clients.get_structured_llm("model-b", dict, temperature=0.7)
+        second = aws_clients.get_structured_llm("model-b", dict, temperature=0.7)
+
+        assert first is second
+
+    @patch('app.core.aws_clients._bulkhead_chat_model_class')
+    @patch('app.core.aws_clients.get_bedrock_client')
+    def test_new_bedrock_client_drops_cached_models(self, mock_client, mock_chat):
+        mock_client.return_value = MagicMock()
+        mock_chat.return_value.side_effect = lambda **kw: MagicMock()
+        first = aws_clients.get_langchain_bedrock_client("model-c")
+
+        mock_client.return_value = MagicMock()
+        second = aws_clients.get_langchain_bedrock_client("model-c")
+
+        assert first is not second
+
+    def test_async_calls_run_in_the_bedrock_bulkhead(self):
+        """ainvoke/astream corren el cliente boto3 sync en el pool del bulkhead bedrock"""
+        import asyncio
+        import threading
+        from langchain_core.messages import AIMessage, AIMessageChunk
+        from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+        chat_class = aws_clients._bulkhead_chat_model_class()
+        chat = chat_class(client=MagicMock(), model="amazon.nova-micro-v1:0", region_name="us-east-1")
+        threads = []
+
+        def generate(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content="hola"))])
+
+        def stream(*args, **kwargs):
+            for text in ("ho", "la"):
+                threads.append(threading.current_thread().name)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+        async def run():
+            response = await chat.ainvoke("hola")
+            chunks = "".join([chunk.content async for chunk in chat.astream("hola")])
+            return response.content, chunks
+
+        with patch.object(chat_class, '_generate', side_effect=generate), \
+                patch.object(chat_class, '_stream', side_effect=stream):
+            assert asyncio.run(run()) == ("hola", "hola")
+
+        assert len(threads) == 3 and all(name.startswith("bulkhead-bedrock") for name in threads)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,92 @@
+import time
+import asyncio
+import threading
+import contextvars
+import pytest
+from app.core.bulkheads import Bulkhead, BulkheadRejected, BulkheadTimeout
+
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class TestBulkhead:
+    """Tests para los bulkheads por dependencia"""
+
+    def setup_method(self):
+        self.bulkhead = Bulkhead("test", max_workers=1, max_queue=1, timeout=1.0)
+
+    def teardown_method(self):
+        self.bulkhead.shutdown()
+
+    def test_run_uses_own_pool_and_context(self):
+        """La función corre en el pool del bulkhead y ve los contextvars del llamador"""
+        def work():
+            return threading.current_thread().name, request_id.get()
+
+        async def _run():
+            request_id.set("req-1")
+            return await self.bulkhead.run(work)
+
+        thread_name, value = asyncio.run(_run())
+
+        assert thread_name.startswith("bulkhead-test")
+        assert value == "req-1"
+        assert self.bulkhead.stats()["completed"] == 1
+
+    def test_rejects_when_full(self):
+        """Con los hilos y la cola ocupados, la siguiente llamada se rechaza"""
+        release = threading.Event()
+
+        async def _run():
+            first = asyncio.ensure_future(self.bulkhead.run(release.wait))
+            second = asyncio.ensure_future(self.bulkhead.run(release.wait))
+            await asyncio.sleep(0.05)
+            with pytest.raises(BulkheadRejected):
+                await self.bulkhead.run(release.wait)
+            release.set()
+            await asyncio.gather(first, second)
+
+        asyncio.run(_run())
+        stats = self.bulkhead.stats()
+        assert stats["rejected"] == 1
+        assert stats["queued"] == 0 and stats["active"] == 0
+
+    def test_timeout(self):
+        """Una llamada lenta se corta con BulkheadTimeout"""
+        self.bulkhead.timeout = 0.05
+
+        with pytest.raises(BulkheadTimeout):
+            asyncio.run(self.bulkhead.run(time.sleep, 0.3))
+        assert self.bulkhead.stats()["timeouts"] == 1
+
+    def test_guard_limits_concurrency(self):
+        """guard() deja correr a lo sumo max_workers corrutinas a la vez"""
+        bulkhead = Bulkhead("guard", max_workers=2, max_queue=10, timeout=1.0)
+        running, peak = 0, 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        async def _run():
+            await asyncio.gather(*(bulkhead.guard(work()) for _ in range(6)))
+
+        asyncio.run(_run())
+        bulkhead.shutdown()
+        assert peak == 2
+        assert bulkhead.stats()["completed"] == 6
+
+    def test_guard_does_not_keep_closed_loops(self):
+        """Los semáforos por event loop se liberan cuando el loop deja de existir"""
+        import gc
+
+        async def work():
+            return 1
+
+        for _ in range(3):
+            asyncio.run(self.bulkhead.guard(work()))
+        gc.collect()
+        assert len(self.bulkhead._semaphores) == 0
@@ -0,0 +1,111 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+from app.utils.cache import RefreshingCache, LRUCache
+
+
+class TestRefreshingCache:
+    """Tests para el cache con TTL y stale-while-revalidate"""
+
+    def test_fresh_value_is_served_from_memory(self):
+        loader = MagicMock(return_value=["casa", "departamento"])
+        cache = RefreshingCache(loader, ttl_seconds=60)
+
+        assert cache.get() == ["casa", "departamento"]
+        assert cache.get() == ["casa", "departamento"]
+        assert loader.call_count == 1
+
+    def test_stale_value_is_returned_while_refreshing(self):
+        loader = MagicMock(side_effect=[["casa"], ["casa", "oficina"]])
+        cache = RefreshingCache(loader, ttl_seconds=0.01, stale_seconds=60)
+
+        assert cache.get() == ["casa"]
+        time.sleep(0.02)
+        assert cache.get() == ["casa"]  # valor viejo, refresh en segundo plano
+
+        for _ in range(50):
+            if loader.call_count == 2 and cache.stats["refreshes"] == 2:
+                break
+            time.sleep(0.01)
+        assert cache.get() == ["casa", "oficina"]
+
+    def test_loader_error_keeps_previous_value(self):
+        loader = MagicMock(side_effect=[["casa"], Exception("db caída")])
+        cache = RefreshingCache(loader, ttl_seconds=0, stale_seconds=0, default=[])
+
+        assert cache.get() == ["casa"]
+        assert cache.get() == ["casa"]
+        assert cache.stats["errors"] == 1
+
+    def test_loader_error_without_value_returns_default(self):
+        cache = RefreshingCache(MagicMock(side_effect=Exception("db caída")), ttl_seconds=60, default=[])
+        assert cache.get() == []
+
+    def test_failed_load_is_not_retried_during_backoff(self):
+        loader = MagicMock(side_effect=Exception("db caída"))
+        cache = RefreshingCache(loader, ttl_seconds=60, default=[], error_backoff_seconds=60)
+
+        assert cache.get() == [] and cache.get() == []
+        assert loader.call_count == 1 and cache.stats["backoff_hits"] == 1
+
+    def test_stale_refresh_is_not_retried_during_backoff(self):
+        loader = MagicMock(side_effect=[["casa"]] + [Exception("db caída")] * 20)
+        cache = RefreshingCache(loader, ttl_seconds=0.01, stale_seconds=60, error_backoff_seconds=60)
+
+        cache.get()
+        time.sleep(0.02)
+        cache.get()  # primer refresh en segundo plano (falla)
+        for _ in range(50):
+            if cache.stats["errors"] == 1 and not cache._refreshing:
+                break
+            time.sleep(0.01)
+        for _ in range(20):
+            assert cache.get() == ["casa"]
+            time.sleep(0.002)
+
+        assert loader.call_count == 2
+
+    def test_invalidate_then_failed_load_keeps_last_value(self):
+        loader = MagicMock(side_effect=[["casa"], Exception("db caída")])
+        cache = RefreshingCache(loader, ttl_seconds=60, default=[])
+
+        cache.get()
+        cache.invalidate()
+        assert cache.get() == ["casa"]
+
+    def test_invalidate_forces_reload(self):
+        loader = MagicMock(return_value=["casa"])
+        cache = RefreshingCache(loader, ttl_seconds=60)
+
+        cache.get()
+        cache.invalidate()
+        cache.get()
+
+        assert loader.call_count == 2
+
+
+class TestLRUCache:
+    """Tests para el cache LRU con TTL por entrada"""
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(max_entries=2, ttl_seconds=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+        assert cache.stats["evictions"] == 1
+        assert cache.snapshot()["hit_ratio"] == 0.75
+
+    def test_expired_entry_is_a_miss(self):
+        cache = LRUCache(max_entries=10, ttl_seconds=0.01)
+        cache.put("a", 1)
+        time.sleep(0.02)
+
+        assert cache.get("a", "miss") == "miss"
+        assert cache.stats["expired"] == 1 and len(cache) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
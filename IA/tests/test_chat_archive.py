@@ -0,0 +1,140 @@
+import io
+import pytest
+from unittest.mock import patch
+from botocore.exceptions import ClientError
+from app.services import chat_archive, dynamodb_queries
+from app.services.dynamodb_codec import encode_chat_message
+
+PK = 'USER#u#CONV#c'
+
+
+class FakeS3:
+    """Stand-in en memoria de S3 (put/get/list con paginación)."""
+
+    def __init__(self):
+        self.objects = {}
+        self.reads = []
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        self.reads.append(Key)
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None):
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + 2]
+        response = {'Contents': [{'Key': key} for key in page], 'IsTruncated': start + 2 < len(keys)}
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = str(start + 2)
+        return response
+
+
+class FakeDynamoDB:
+    """Stand-in en memoria de DynamoDB: scan por segmentos (una página por item) y query."""
+
+    def __init__(self, items):
+        self.items = items
+        self.scans = 0
+
+    def scan(self, Segment, TotalSegments, ExpressionAttributeValues, ExclusiveStartKey=None, **kwargs):
+        since, horizon = (int(ExpressionAttributeValues[name]['N']) for name in (':since', ':horizon'))
+        self.scans += 1
+        candidates = [item for item in self.items
+                      if hash(item['PK']['S']) % TotalSegments == Segment
+                      and since <= int(item.get('expires_at', {'N': '0'})['N']) < horizon]
+        start = 0 if ExclusiveStartKey is None else candidates.index(ExclusiveStartKey) + 1
+        response = {'Items': candidates[start:start + 1]}
+        if start + 1 < len(candidates):
+            response['LastEvaluatedKey'] = candidates[start]
+        return response
+
+    def query(self, **request):
+        items = sorted((item for item in self.items if item['PK'] == request['ExpressionAttributeValues'][':pk_val']
+                        and item['SK']['S'].startswith('TIMESTAMP#')), key=lambda item: item['SK']['S'], reverse=True)
+        if 'ExclusiveStartKey' in request:
+            items = [item for item in items if item['SK']['S'] < request['ExclusiveStartKey']['SK']['S']]
+        return {'Items': items[:request['Limit']]}
+
+
+def _message(pk, n, expires_at):
+    item = encode_chat_message(pk, f'TIMESTAMP#{n:02d}', 'user', 'text', {'text': f'mensaje {n}'}, {'n': n})
+    item['expires_at'] = {'N': str(expires_at)}
+    return item
+
+
+class TestChatArchive:
+    """Tests del archivo frío de conversaciones (TTL + JSONL gzip en S3)"""
+
+    def test_ttl_attribute(self):
+        item = dynamodb_queries.apply_ttl({'PK': {'S': PK}}, ttl_days=2, now=1000)
+        assert item['expires_at'] == {'N': str(1000 + 2 * 86400)}
+        assert dynamodb_queries.apply_ttl({'PK': {'S': PK}}, ttl_days=0) == {'PK': {'S': PK}}
+
+    def test_archive_and_history_read_through(self):
+        other = 'USER#x#CONV#y'
+        old = [_message(PK, n, 100) for n in range(1, 6)] + [_message(other, 1, 100)]
+        hot = [_message(PK, n, 10 ** 10) for n in range(6, 8)]
+        s3, dynamodb = FakeS3(), FakeDynamoDB(old + hot)
+
+        with patch('app.services.chat_archive.get_s3_client', return_value=s3), \
+             patch('app.services.chat_archive.get_dynamodb_client', return_value=dynamodb):
+            stats = chat_archive.archive_expiring_items(lead_days=1, segments=3, bucket='archivo',
+                                                        max_items_per_object=2, now=0)
+            assert stats['items'] == 6
+            assert all(key.endswith('.jsonl.gz') for _, key in s3.objects if not key.endswith(chat_archive.ARCHIVE_PROGRESS_KEY))
+
+            # TTL vencido: DynamoDB borra los items antiguos, el historial sigue completo
+            dynamodb.items = hot
+            with patch('app.services.chat_archive.CHAT_ARCHIVE_BUCKET', 'archivo'), \
+                 patch('app.services.dynamodb_queries.get_dynamodb_client', return_value=dynamodb):
+                first = dynamodb_queries.get_history_page(PK, 4)
+                second = dynamodb_queries.get_history_page(PK, 4, cursor=first['next_cursor'], include_metadata=True)
+
+        assert [item['SK']['S'] for item in first['Items']] == ['TIMESTAMP#07', 'TIMESTAMP#06', 'TIMESTAMP#05', 'TIMESTAMP#04']
+        assert [item['SK']['S'] for item in second['Items']] == ['TIMESTAMP#03', 'TIMESTAMP#02', 'TIMESTAMP#01']
+        assert second['next_cursor'] is None
+        assert 'metadata' not in first['Items'][2] and second['Items'][0]['metadata'] == {'M': {'n': {'N': '3'}}}
+        assert chat_archive.load_jsonl_gz(chat_archive.dump_jsonl_gz(old[:1])) == old[:1]
+
+    def test_read_only_fetches_objects_before_cursor(self):
+        """Con el rango de SK en la clave, solo se descargan los objetos necesarios"""
+        s3 = FakeS3()
+        with patch('app.services.chat_archive.get_s3_client', return_value=s3), \
+             patch('app.services.chat_archive.get_dynamodb_client',
+                   return_value=FakeDynamoDB([_message(PK, n, 100) for n in range(1, 8)])):
+            chat_archive.archive_expiring_items(lead_days=1, segments=1, bucket='archivo',
+                                                max_items_per_object=2, now=0)
+            # Objeto de una corrida anterior, sin rango en la clave: se sigue leyendo
+            legacy_key = f"{chat_archive.conversation_prefix(PK)}old-s0-0.jsonl.gz"
+            s3.objects[('archivo', legacy_key)] = chat_archive.dump_jsonl_gz([_message(PK, 1, 100)])
+
+            s3.reads.clear()
+            page = chat_archive.read_archived_messages(PK, before_sk='TIMESTAMP#05', limit=2, bucket='archivo')
+
+        assert [item['SK']['S'] for item in page] == ['TIMESTAMP#04', 'TIMESTAMP#03']
+        assert [chat_archive.archive_key_range(key) for key in s3.reads] == [None, ('TIMESTAMP#03', 'TIMESTAMP#04')]
+
+    def test_each_run_only_archives_the_new_window(self):
+        """Una corrida sigue desde el horizonte de la anterior: ningún item se sube dos veces"""
+        day = 86400
+        items = [_message(PK, 1, 2 * day), _message(PK, 2, 5 * day), _message(PK, 3, 9 * day)]
+        s3, dynamodb = FakeS3(), FakeDynamoDB(items)
+
+        with patch('app.services.chat_archive.get_s3_client', return_value=s3), \
+             patch('app.services.chat_archive.get_dynamodb_client', return_value=dynamodb), \
+             patch('app.services.chat_archive.CHAT_TTL_DAYS', 30):
+            runs = [chat_archive.archive_expiring_items(lead_days=3, segments=1, bucket='archivo', now=now)['items']
+                    for now in (0, 3 * day, 3 * day, 7 * day)]
+
+        assert runs == [1, 1, 0, 1]
+        assert dynamodb.scans == 3  # la tercera corrida (mismo horizonte) no escanea
+        assert chat_archive.archive_window_start({'archived_until': 10 * day, 'run_at': 0}, ttl_days=2) == 2 * day
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
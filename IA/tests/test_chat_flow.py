@@ -0,0 +1,132 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.services import chatbot_engine
+
+
+def _effects(state, **overrides):
+    """Efectos en memoria: registra los turnos guardados en `saved`"""
+    saved = []
+    effects = {
+        'load_state': lambda pk: dict(state),
+        'save_turn': lambda *args, **kwargs: saved.append((args, kwargs)),
+        'load_recommendations': lambda pk, st, pending=None: [],
+    }
+    effects.update(overrides)
+    return effects, saved
+
+
+def _async(effects):
+    async_effects = {}
+    for name, func in effects.items():
+        async def _call(*args, _func=func, **kwargs):
+            return _func(*args, **kwargs)
+        async_effects[name] = _call
+    return async_effects
+
+
+class TestChatTurnFlow:
+    """Tests del flujo de stages compartido por la versión sync y async"""
+
+    @patch('app.graph.chat_graph.get_property_types', return_value=['casa'])
+    def test_reset_saves_turn_with_reset_flag(self, mock_types):
+        effects, saved = _effects({'stage': 'display_properties', 'conversation_length': 6, 'version': 3})
+
+        flow = chatbot_engine.chat_turn_flow('u', 'c', 'nueva búsqueda', 'Ana')
+        stage, response = chatbot_engine.run_chat_flow(flow, effects)
+
+        assert stage == 'extract'
+        assert 'nueva búsqueda' in response['model_response']
+        assert saved[0][1] == {'reset': True}
+
+    def test_async_flow_hydrates_recommendations(self):
+        state = {'stage': 'recommend', 'awaiting_confirmation': True, 'conversation_length': 4, 'version': 2,
+                 'result_set': {'id': 'rs1', 'property_ids': ['p1'], 'count': 1}}
+        properties = [{'id': 'p1', 'title': 'Depa en Lima', 'text': 'Depa', 'score': 0.9}]
+        effects, saved = _effects(state, load_recommendations=lambda pk, st, pending=None: properties)
+
+        flow = chatbot_engine.chat_turn_flow('u', 'c', 'quiero ver las propiedades', 'Ana')
+        stage, response = asyncio.run(chatbot_engine.arun_chat_flow(flow, _async(effects)))
+
+        assert stage == 'display_properties'
+        assert 'Ref: p1' in response['model_response']
+        assert len(saved) == 1
+
+    def test_effect_errors_are_raised_inside_the_flow(self):
+        state = {'stage': 'update_criteria', 'refinement_type': 'presupuesto', 'conversation_length': 8, 'version': 4,
+                 'lead': {'ubicacion': 'Lima'}}
+
+        def failing_llm(prompt):
+            raise RuntimeError("bedrock throttled")
+
+        effects, saved = _effects(state, lead_with_prompt=failing_llm)
+
+        flow = chatbot_engine.chat_turn_flow('u', 'c', 'hasta 2000 soles', 'Ana')
+        stage, response = chatbot_engine.run_chat_flow(flow, effects)
+
+        assert stage == 'update_criteria'
+        assert 'no pude procesar' in response['model_response']
+
+
+class TestStageGraph:
+    """Tests del grafo de stages"""
+
+    def test_checkpoint_is_saved_with_the_turn(self):
+        state = {'stage': 'display_properties', 'conversation_length': 6, 'version': 3, 'lead': {}}
+        effects, saved = _effects(state)
+
+        flow = chatbot_engine.chat_turn_flow('u', 'c', 'quiero más detalles', 'Ana')
+        stage, response = chatbot_engine.run_chat_flow(flow, effects)
+
+        state_updates = saved[0][0][6]
+        assert stage == 'property_details'
+        assert state_updates['stage'] == 'property_details'
+        assert state_updates['checkpoint']['node'] == 'display_properties'
+        assert state_updates['checkpoint']['next_stage'] == 'property_details'
+
+    def test_undeclared_transition_is_rejected(self):
+        from app.graph.stage_graph import StageGraph, StageGraphError
+        graph = StageGraph("test")
+        graph.router(lambda ctx: 'a')
+
+        @graph.node('a', transitions=['b'])
+        def node_a(ctx):
+            return 'c'
+
+        with pytest.raises(StageGraphError):
+            graph.compile()
+
+        @graph.node('b')
+        def node_b(ctx):
+            return 'b'
+
+        with pytest.raises(StageGraphError):
+            chatbot_engine.run_chat_flow(graph.run_turn(object()), {})
+
+    def test_plain_and_generator_nodes(self):
+        """Los nodos sin I/O son funciones normales; los que piden efectos, generadores"""
+        from types import SimpleNamespace
+        from app.graph.stage_graph import StageGraph
+        graph = StageGraph("test")
+        graph.router(lambda ctx: ctx.start)
+
+        @graph.node('plain', transitions=['io'])
+        def plain(ctx):
+            return 'io'
+
+        @graph.node('io')
+        def io(ctx):
+            ctx.value = yield chatbot_engine.effect('load')
+            return 'io'
+
+        plain_ctx = SimpleNamespace(start='plain')
+        assert chatbot_engine.run_chat_flow(graph.run_turn(plain_ctx), {}) == 'io'
+        assert plain_ctx.checkpoint['next_stage'] == 'io'
+
+        io_ctx = SimpleNamespace(start='io')
+        assert chatbot_engine.run_chat_flow(graph.run_turn(io_ctx), {'load': lambda: 42}) == 'io'
+        assert io_ctx.value == 42
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
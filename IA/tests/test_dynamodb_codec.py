@@ -0,0 +1,85 @@
+import pytest
+from decimal import Decimal
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from app.models.ChatMessage import ChatMessage
+from app.models.PropertyLead import PropertyLead
+from app.services import dynamodb_codec
+from app.services.dynamodb_queries import convert_floats_to_decimal, get_metadata
+
+
+def _message():
+    return {
+        'PK': 'USER#u#CONV#c', 'SK': 'TIMESTAMP#2025-01-01T00:00:00Z', 'role': 'assistant',
+        'content_type': 'property_list',
+        'content': {'properties': [{'id': 'p1', 'score': 0.87, 'precio': 1500, 'tags': ['a', None]}]},
+        'metadata': {'stage': 'recommend', 'conversation_length': 4.0, 'awaiting_confirmation': True,
+                     'lead': PropertyLead(ubicacion='Lima', presupuesto=2000)}
+    }
+
+
+class TestDynamoDBCodec:
+    """Tests del codec DynamoDB de una sola pasada"""
+
+    def test_encode_matches_boto3_serializer(self):
+        raw = ChatMessage(**_message()).model_dump()
+        serializer = TypeSerializer()
+        expected = {k: serializer.serialize(v) for k, v in convert_floats_to_decimal(raw).items()}
+
+        assert dynamodb_codec.encode_item(raw) == expected
+        assert dynamodb_codec.encode_chat_message(raw['PK'], raw['SK'], raw['role'], raw['content_type'],
+                                                  raw['content'], _message()['metadata']) == expected
+
+    def test_decode_matches_boto3_deserializer(self):
+        item = dynamodb_codec.encode_item(ChatMessage(**_message()).model_dump())
+        deserializer = TypeDeserializer()
+
+        assert dynamodb_codec.decode_item(item) == {k: deserializer.deserialize(v) for k, v in item.items()}
+        assert dynamodb_codec.decode_value({'N': '0.87'}) == Decimal('0.87')
+
+    def test_lazy_decoding_only_touches_requested_attributes(self):
+        item = dynamodb_codec.encode_item(ChatMessage(**_message()).model_dump())
+        item['content'] = {'X': 'tipo desconocido: falla si se decodifica'}
+
+        lazy = dynamodb_codec.LazyItem(item)
+        assert lazy['role'] == 'assistant'
+        assert get_metadata({'Items': [item]})[0]['stage'] == 'recommend'
+        with pytest.raises(TypeError):
+            lazy['content']
+
+    def test_rejects_unsupported_numbers(self):
+        with pytest.raises(TypeError):
+            dynamodb_codec.encode_value(float('nan'))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+
+class TestPayloadCompression:
+    """content / metadata grandes se guardan comprimidos y se leen de forma transparente"""
+
+    def _large_message(self, codec):
+        content = {'text': '**Departamento en Miraflores** con vista al mar. ' * 200}
+        metadata = {'stage': 'display_properties', 'score': Decimal('0.87'),
+                    'recommendations': [{'id': f'p{i}', 'precio': 1500 + i} for i in range(50)]}
+        item = dynamodb_codec.encode_chat_message('USER#u#CONV#c', 'TIMESTAMP#1', 'assistant', 'text', content, metadata)
+        return item, dynamodb_codec.compress_payloads(dict(item), codec=codec, min_bytes=512), content, metadata
+
+    @pytest.mark.parametrize('codec', ['gzip', 'zstd'])
+    def test_round_trip(self, codec):
+        plain, item, content, metadata = self._large_message(codec)
+
+        assert 'B' in item['content'] and 'B' in item['metadata']
+        assert len(item['content']['B']) < len(str(plain['content']))
+        decoded = dynamodb_codec.decode_item(item)
+        assert decoded['content'] == content
+        assert decoded['metadata'] == metadata
+        assert get_metadata({'Items': [item]}) == [metadata]
+        assert dynamodb_codec.LazyItem(item)['content'] == content
+
+    def test_small_payloads_and_disabled_codec_are_untouched(self):
+        small = dynamodb_codec.encode_chat_message('PK', 'SK', 'user', 'text', {'text': 'hola'}, {'stage': 'extract'})
+        assert dynamodb_codec.compress_payloads(dict(small), codec='gzip', min_bytes=512) == small
+
+        plain, _, _, _ = self._large_message('gzip')
+        assert dynamodb_codec.compress_payloads(dict(plain), codec='off', min_bytes=512) == plain
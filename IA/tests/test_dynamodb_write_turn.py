@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from botocore.exceptions import ClientError
+from app.services import dynamodb_queries
+
+
+def _item(sk):
+    return {'PK': {'S': 'USER#u#CONV#c'}, 'SK': {'S': sk}}
+
+
+class TestWriteTurn:
+    """Tests para la escritura combinada de un turno"""
+
+    @patch('app.services.dynamodb_queries.get_dynamodb_client')
+    def test_transaction_writes_messages_and_state(self, mock_client):
+        client = mock_client.return_value
+        client.transact_write_items.return_value = {'ConsumedCapacity': [{'CapacityUnits': 6.0}]}
+
+        result = dynamodb_queries.write_turn('T', [_item('TIMESTAMP#1'), _item('TIMESTAMP#2')],
+                                             state_item=_item('STATE'), expected_version=3, mode='transaction')
+
+        actions = client.transact_write_items.call_args.kwargs['TransactItems']
+        assert len(actions) == 3
+        assert actions[2]['Put']['ExpressionAttributeValues'] == {':expected_version': {'N': '3'}}
+        assert result == {'consumed_capacity': 6.0}
+
+    @patch('app.services.dynamodb_queries.get_dynamodb_client')
+    def test_state_conflict_writes_nothing(self, mock_client):
+        client = mock_client.return_value
+        client.transact_write_items.side_effect = ClientError({
+            'Error': {'Code': 'TransactionCanceledException'},
+            'CancellationReasons': [{'Code': 'None'}, {'Code': 'None'}, {'Code': 'ConditionalCheckFailed'}]
+        }, 'TransactWriteItems')
+
+        with pytest.raises(dynamodb_queries.StateConflictError):
+            dynamodb_queries.write_turn('T', [_item('TIMESTAMP#1'), _item('TIMESTAMP#2')],
+                                        state_item=_item('STATE'), expected_version=1, mode='transaction')
+
+        assert client.transact_write_items.call_count == 1  # no se reescriben solo los mensajes
+
+    @patch('app.services.dynamodb_queries.time.sleep')
+    @patch('app.services.dynamodb_queries.get_dynamodb_client')
+    def test_batch_retries_unprocessed_items(self, mock_client, mock_sleep):
+        client = mock_client.return_value
+        unprocessed = {'T': [{'PutRequest': {'Item': _item('STATE')}}]}
+        client.batch_write_item.side_effect = [
+            {'UnprocessedItems': unprocessed, 'ConsumedCapacity': [{'CapacityUnits': 2.0}]},
+            {'UnprocessedItems': {}, 'ConsumedCapacity': [{'CapacityUnits': 1.0}]},
+        ]
+
+        result = dynamodb_queries.write_turn('T', [_item('TIMESTAMP#1'), _item('TIMESTAMP#2')],
+                                             state_item=_item('STATE'), mode='batch')
+
+        assert client.batch_write_item.call_count == 2
+        assert client.batch_write_item.call_args.kwargs['RequestItems'] == unprocessed
+        assert result['consumed_capacity'] == 3.0
+        assert mock_sleep.call_count == 1
+
+
+class TestResultSetRead:
+    """El result set se escribe en un turno y se lee en el siguiente"""
+
+    @patch('app.services.dynamodb_queries.get_dynamodb_client')
+    def test_result_set_read_is_strongly_consistent(self, mock_client):
+        mock_client.return_value.get_item.return_value = {}
+
+        dynamodb_queries.get_result_set('USER#u#CONV#c', 'rs1')
+
+        assert mock_client.return_value.get_item.call_args.kwargs['ConsistentRead'] is True
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -79,5 +79,34 @@ class TestSearchService:
         results = search_similar_properties("test query")
         assert results == []
 
+    @patch('app.services.embeddings.search_opensearch.get_opensearch_client')
+    @patch('app.services.embeddings.search_opensearch.embed_text')
+    def test_search_after_paginates(self, mock_embed, mock_client):
+        """Test paginación con search_after"""
+        mock_embed.return_value = [0.1, 0.2, 0.3]
+        hits = [{"_id": f"p{i}", "_score": 0.9 - i / 10, "sort": [0.9 - i / 10, f"p{i}"], "_source": {}} for i in range(2)]
+        mock_client.return_value.search.return_value = {"hits": {"hits": hits}}
+
+        first = search_similar_properties("depa", k=2, candidates=20)
+        search_similar_properties("depa", k=2, candidates=20, search_after=first.next_cursor)
+
+        body = mock_client.return_value.search.call_args.kwargs["body"]
+        assert first.next_cursor == [0.8, "p1"]
+        assert body["search_after"] == [0.8, "p1"] and body["query"]["knn"]["embedding"]["k"] == 20
+        assert body["sort"] == [{"_score": "desc"}, {"property_id": "asc"}] and "from" not in body
+
+    @patch('app.services.stages.stage2_recommend.search_similar_properties')
+    def test_recommend_handler_passes_cursor(self, mock_search):
+        """El handler de OpenSearch pide la página siguiente con search_after"""
+        from app.models.PropertyLead import PropertyLead
+        from app.services.stages.stage2_recommend import handler
+        mock_search.return_value = []
+
+        handler(PropertyLead(ubicacion='Miraflores', transaccion='alquiler'), cursor=[0.8, "p1"])
+
+        kwargs = mock_search.call_args.kwargs
+        assert kwargs["search_after"] == [0.8, "p1"] and kwargs["ciudad"] == "miraflores"
+        assert kwargs["candidates"] >= kwargs["k"]
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,55 @@
+import pytest
+from unittest.mock import patch
+from app.services import dynamodb_queries
+
+PK = 'USER#u#CONV#c'
+
+
+def _message(sk, text):
+    return {'SK': {'S': sk}, 'role': {'S': 'user'}, 'content': {'M': {'text': {'S': text}}},
+            'content_type': {'S': 'text'}}
+
+
+class TestHistoryPagination:
+    """Tests para el historial paginado con cursor"""
+
+    @patch('app.services.dynamodb_queries.get_dynamodb_client')
+    def test_page_projects_without_metadata_and_returns_cursor(self, mock_client):
+        last_key = {'PK': {'S': PK}, 'SK': {'S': 'TIMESTAMP#2'}}
+        mock_client.return_value.query.return_value = {
+            'Items': [_message('TIMESTAMP#3', 'c'), _message('TIMESTAMP#2', 'b')],
+            'LastEvaluatedKey': last_key
+        }
+
+        page = dynamodb_queries.get_history_page(PK, 2, newest_first=False)
+
+        request = mock_client.return_value.query.call_args.kwargs
+        assert 'metadata' not in request['ExpressionAttributeNames'].values()
+        assert request['ScanIndexForward'] is False and request['Limit'] == 2
+        assert [item['SK']['S'] for item in page['Items']] == ['TIMESTAMP#2', 'TIMESTAMP#3']
+        assert dynamodb_queries.decode_cursor(page['next_cursor'], PK) == last_key
+
+    @patch('app.services.dynamodb_queries.get_dynamodb_client')
+    def test_cursor_continues_from_last_key(self, mock_client):
+        last_key = {'PK': {'S': PK}, 'SK': {'S': 'TIMESTAMP#2'}}
+        mock_client.return_value.query.return_value = {'Items': []}
+
+        page = dynamodb_queries.get_history_page(PK, 2, cursor=dynamodb_queries.encode_cursor(last_key),
+                                                 include_metadata=True)
+
+        request = mock_client.return_value.query.call_args.kwargs
+        assert request['ExclusiveStartKey'] == last_key
+        assert 'metadata' in request['ExpressionAttributeNames'].values()
+        assert page == {'Items': [], 'next_cursor': None}
+
+    def test_cursor_from_another_conversation_is_rejected(self):
+        cursor = dynamodb_queries.encode_cursor({'PK': {'S': 'USER#x#CONV#y'}, 'SK': {'S': 'TIMESTAMP#1'}})
+
+        with pytest.raises(ValueError):
+            dynamodb_queries.decode_cursor(cursor, PK)
+        with pytest.raises(ValueError):
+            dynamodb_queries.decode_cursor('no-es-un-cursor', PK)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
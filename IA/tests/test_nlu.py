@@ -0,0 +1,44 @@
+import pytest
+from app.utils.nlu import KeywordAutomaton, normalize_text, parse_message
+from app.utils.intent_recognition import check_intent
+from app.services.stages.stage4_refine_search import identify_refinement_type
+from app.services.stages.stage1_extract_intuitive import extract_info_intuitive, is_greeting_message
+from app.models.PropertyLead import PropertyLead
+
+
+class TestNLU:
+    """Tests del preprocesamiento NLU compartido"""
+
+    def test_normalize_text(self):
+        assert normalize_text("  ¿Cuánto CUESTA el baño?  ") == "cuanto cuesta el bano"
+        assert normalize_text("hasta 1.500 soles, 2.5 baños") == "hasta 1500 soles 2.5 banos"
+
+    def test_automaton_reports_overlapping_sets(self):
+        automaton = KeywordAutomaton({'reset': ['nueva búsqueda'], 'nueva': ['nueva'], 'search': ['busqueda'], 'no': ['xyz']})
+
+        assert automaton.match(normalize_text("Quiero una NUEVA búsqueda")) == {'reset', 'nueva', 'search'}
+        assert automaton.match("nada") == frozenset()
+
+    def test_message_is_parsed_once(self):
+        parsed = parse_message("Busco 2 dormitorios en Miraflores")
+
+        assert parse_message("Busco 2 dormitorios en Miraflores") is parsed
+        assert parse_message(parsed) is parsed
+        assert parsed.numbers == [2]
+
+    def test_consumers_share_the_parsed_message(self):
+        parsed = parse_message("¡Sí! Una casa en Miraflores con 3 habitaciones para alquilar")
+        lead = extract_info_intuitive(parsed, PropertyLead())
+
+        assert check_intent(parsed) == 'affirmative'
+        assert identify_refinement_type(parsed) == 'tipo_propiedad'
+        assert lead.tipo_propiedad == ['casa']
+        assert lead.ubicacion == 'Miraflores'
+        assert lead.transaccion == 'alquiler'
+        assert lead.numero_dormitorios == 3
+        assert not is_greeting_message(parsed)
+        assert is_greeting_message("Buenos días")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from app.core.postgres_pool import PostgresPool, PostgresPoolTimeout
+
+
+def build_pool(max_size=2, **kwargs):
+    """Crea un PostgresPool con psycopg2 mockeado"""
+    with patch('psycopg2.pool.ThreadedConnectionPool') as mock_pool_cls:
+        mock_pool_cls.return_value.getconn.side_effect = lambda: MagicMock(closed=0)
+        pool = PostgresPool(min_size=1, max_size=max_size, acquire_timeout=0.05, **kwargs)
+    return pool
+
+
+class TestPostgresPool:
+    """Tests para el pool compartido de PostgreSQL"""
+
+    def test_statement_timeout_is_applied(self):
+        with patch('psycopg2.pool.ThreadedConnectionPool') as mock_pool_cls:
+            PostgresPool(min_size=1, max_size=2, statement_timeout_ms=1234)
+        assert mock_pool_cls.call_args.kwargs['options'] == "-c statement_timeout=1234"
+
+    def test_exhausted_pool_times_out(self):
+        pool = build_pool(max_size=1)
+        conn = pool.getconn()
+
+        with pytest.raises(PostgresPoolTimeout):
+            pool.getconn()
+
+        pool.putconn(conn)
+        assert pool.stats()["checkout_timeouts"] == 1
+        assert pool.stats()["in_use"] == 0
+
+    def test_closed_connection_is_discarded_on_checkout(self):
+        pool = build_pool()
+        closed_conn = MagicMock(closed=1)
+        healthy_conn = MagicMock(closed=0)
+        pool._pool.getconn.side_effect = [closed_conn, healthy_conn]
+
+        conn = pool.getconn()
+
+        assert conn is healthy_conn
+        assert pool.stats()["discarded"] == 1
+        pool._pool.putconn.assert_called_with(closed_conn, close=True)
+
+    def test_idle_connection_is_health_checked(self):
+        pool = build_pool(healthcheck_idle_seconds=0)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        pool._pool.getconn.side_effect = [conn]
+
+        assert pool.getconn() is conn
+        assert pool.stats()["healthchecks"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,192 @@
+import pytest
+from decimal import Decimal
+from app.models.PropertyLead import PropertyLead
+from unittest.mock import patch
+from app.services.stages.stage2_recommend_postgres import build_property_query, format_properties, format_property_page, to_asyncpg_placeholders
+from app.services.property_query import PropertyPage
+
+
+class TestPropertySearchQuery:
+    """Tests del armado de la búsqueda de propiedades en PostgreSQL"""
+
+    def test_like_mode_is_unchanged(self):
+        query, params = build_property_query(PropertyLead(ubicacion='Miraflores'), mode="like")
+
+        assert "LOWER(address) LIKE %s" in query and "search_vector" not in query
+        assert params == ['%miraflores%', '%miraflores%']
+
+    @patch('app.services.stages.stage2_recommend_postgres.lead_catalogs', return_value=((), ()))
+    def test_fulltext_mode_uses_indexed_predicates_and_ranks(self, mock_catalogs):
+        lead = PropertyLead(ubicacion='Miraflores', tipo_propiedad=['departamento'], transaccion='alquiler')
+        query, params = build_property_query(lead, mode="fulltext")
+
+        assert "search_vector @@ plainto_tsquery('spanish', %s)" in query
+        assert "ts_rank(search_vector" in query and "similarity(lower(address), %s)" in query
+        assert "ORDER BY score DESC" in query
+        assert query.count("%s") == len(params)
+        assert params[:3] == ['Miraflores departamento', 'miraflores', 'miraflores']
+        assert f"${len(params)}" in to_asyncpg_placeholders(query) and "%s" not in to_asyncpg_placeholders(query)
+
+    def test_ranked_rows_keep_real_ids_and_scores(self):
+        rows = [(42, 'Depa', 'Vista al mar', 'departamento', 'Miraflores', 'alquiler', 0.61234)]
+
+        properties = format_properties(rows)
+
+        assert properties[0]['id'] == '42' and properties[0]['score'] == 0.6123
+        assert format_properties([('Casa', None, 'casa', 'Lima', 'venta')])[0]['id'] == 'postgres_prop_0'
+
+
+    @patch('app.services.stages.stage2_recommend_postgres.lead_catalogs',
+           return_value=(['Departamento', 'Casa'], ['alquiler', 'venta']))
+    def test_every_lead_field_becomes_a_predicate(self, mock_catalogs):
+        lead = PropertyLead(tipo_propiedad=['departamento'], transaccion='alquiler', presupuesto=2000,
+                            numero_dormitorios=3, numero_banos=2, metraje_minimo=80,
+                            amenidades=['Piscina', 'gimnasio '], pet_friendly=True)
+        query, params = build_property_query(lead, mode="fulltext")
+
+        for predicate in ("lower(property_type) = %s", "lower(operation_type) = %s", "(price IS NULL OR price <= %s)",
+                          "(bedrooms IS NULL OR bedrooms >= %s)", "(bathrooms IS NULL OR bathrooms >= %s)",
+                          "(area_m2 IS NULL OR area_m2 >= %s)", "(amenities = '{}' OR amenities @> %s::text[])",
+                          "pet_friendly IS NOT FALSE"):
+            assert predicate in query
+        assert params[1:] == ['departamento', 'alquiler', 2200.0, 3, 2, 80, ['gimnasio', 'piscina']]
+        assert query.count("%s") == len(params)
+
+
+    def test_lead_filters_keep_rows_without_data(self):
+        """Filas con las columnas del lead en NULL (sin cargar) siguen apareciendo con un lead completo"""
+        import sqlite3
+        from app.services.property_query import PropertyQuery, add_structured_filters
+        lead = PropertyLead(presupuesto=2000, numero_dormitorios=3, numero_banos=2, metraje_minimo=80, pet_friendly=True)
+        # amenities usa operadores de arrays de PostgreSQL: se revisa el predicado, el resto se evalúa en SQLite
+        amenities = add_structured_filters(PropertyQuery(), PropertyLead(amenidades=['Piscina']))
+        assert amenities.where == ["(amenities = '{}' OR amenities @> %s::text[])"]
+
+        query = add_structured_filters(PropertyQuery(), lead)
+        db = sqlite3.connect(':memory:')
+        db.execute("CREATE TABLE properties (id, price, bedrooms, bathrooms, area_m2, pet_friendly)")
+        db.executemany("INSERT INTO properties VALUES (?, ?, ?, ?, ?, ?)", [
+            (1, None, None, None, None, None),
+            (2, 1800, 3, 2, 90, True),
+            (3, 5000, None, None, None, None),
+            (4, None, None, None, None, False),
+        ])
+        sql = " AND ".join(query.where).replace('%s', '?')
+        rows = db.execute(f"SELECT id FROM properties WHERE {sql} ORDER BY id", query.where_params).fetchall()
+
+        assert [row[0] for row in rows] == [1, 2]
+
+    @patch('app.services.stages.stage2_recommend_postgres.lead_filter_columns_available', return_value=True)
+    def test_like_mode_applies_lead_filters_when_columns_exist(self, mock_columns):
+        lead = PropertyLead(ubicacion='Miraflores', presupuesto=1000, pet_friendly=True)
+        query, params = build_property_query(lead, mode="like")
+
+        assert "(price IS NULL OR price <= %s)" in query and "pet_friendly IS NOT FALSE" in query
+        assert params == ['%miraflores%', '%miraflores%', 1100.0]
+
+        mock_columns.return_value = False
+        query, params = build_property_query(lead, mode="like")
+        assert "price" not in query and params == ['%miraflores%', '%miraflores%']
+
+    @patch('app.services.stages.stage2_recommend_postgres.lead_catalogs', return_value=((), ()))
+    def test_geo_mode_filters_by_distance_and_orders_by_knn(self, mock_catalogs):
+        from app.services.tools.geo_lookup import GeoLocation
+        locations = [GeoLocation(1, 'Miraflores', 'district', -77.03, -12.12, True),
+                     GeoLocation(2, 'Parque Kennedy', 'landmark', -77.0298, -12.1219, False)]
+        lead = PropertyLead(ubicacion='Miraflores', cercania=['cerca al parque kennedy'], numero_dormitorios=2)
+
+        with patch('app.services.tools.geo_lookup.get_catalog', return_value=locations):
+            query, params = build_property_query(lead, mode="geo")
+            district_query, district_params = build_property_query(lead.model_copy(update={'cercania': None}), mode="geo")
+            fallback, _ = build_property_query(PropertyLead(ubicacion='Arequipa'), mode="geo")
+
+        assert "ST_DWithin(geolocation::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, %s)" in query
+        assert "AS distance_m" in query and "ORDER BY geolocation::geography <-> " in query
+        assert params[-2:] == [-77.0298, -12.1219] and 1500.0 in params
+        assert "(SELECT geom FROM locations WHERE id = %s)" in district_query and 300.0 in district_params
+        assert query.count("%s") == len(params)
+        assert "search_vector" in fallback
+
+        rows = [(7, 'Depa', 'Cerca al parque', 'departamento', 'Miraflores', 'alquiler', 0.8, 412.6)]
+        assert format_properties(rows)[0]['distance_m'] == 413
+
+
+class TestKeysetPagination:
+    """Tests de la paginación keyset ("ver más")"""
+
+    @patch('app.services.stages.stage2_recommend_postgres.lead_catalogs', return_value=((), ()))
+    def test_cursor_adds_seek_predicate_instead_of_offset(self, mock_catalogs):
+        lead = PropertyLead(ubicacion='Miraflores')
+        first, _ = build_property_query(lead, mode="fulltext")
+        query, params = build_property_query(lead, mode="fulltext", cursor={'key': Decimal('0.5'), 'id': Decimal('42')})
+
+        assert "ORDER BY score DESC, id DESC" in first and "LIMIT 11" in first
+        assert ")::float8, id) < (%s::float8, %s)" in query and "OFFSET" not in query
+        # El score se selecciona con la misma precisión con la que se compara
+        assert ")::float8 AS score" in first
+        assert params[-2:] == [0.5, 42] and type(params[-1]) is int
+        assert query.count("%s") == len(params)
+
+    def test_like_mode_pages_by_id(self):
+        lead = PropertyLead(ubicacion='Miraflores')
+        first, first_params = build_property_query(lead, mode="like")
+        query, params = build_property_query(lead, mode="like", cursor={'id': Decimal('42')})
+
+        assert "ORDER BY id LIMIT 11" in first and "id >" not in first
+        assert "AND id > %s ORDER BY id LIMIT 11" in query and "OFFSET" not in query
+        assert params == first_params + [42] and type(params[-1]) is int
+
+        rows = [{'id': i, 'title': f'Depa {i}', 'description': '', 'property_type': 'departamento', 'address': 'Lima',
+                 'operation_type': 'alquiler'} for i in (40, 42, 45)]
+        assert format_property_page(rows, page_size=2).next_cursor == {'id': 42}
+        assert format_property_page(rows, page_size=3).next_cursor is None
+
+    def test_rows_by_column_name_include_price(self):
+        """Las queries entregan filas por nombre de columna (cursor.description / asyncpg)"""
+        rows = [{'id': i, 'title': f'Depa {i}', 'description': '', 'property_type': 'departamento', 'address': 'Lima',
+                 'operation_type': 'alquiler', 'price': Decimal('1500.00') if i else None, 'score': 1 - i / 10}
+                for i in range(3)]
+
+        page = format_property_page(rows, page_size=2)
+
+        assert [p['price'] for p in page] == [None, 1500.0] and page[1]['score'] == 0.9
+        assert page.next_cursor == {'key': 0.9, 'id': 1}
+
+    def test_page_keeps_cursor_of_last_shown_row(self):
+        rows = [(i, f'Depa {i}', '', 'departamento', 'Lima', 'alquiler', 1 - i / 10) for i in range(3)]
+
+        page = format_property_page(rows, page_size=2)
+        assert [p['id'] for p in page] == ['0', '1'] and page.next_cursor == {'key': 0.9, 'id': 1}
+        assert format_property_page(rows, page_size=3).next_cursor is None
+
+        geo_rows = [row + (100.0 * i, 0.25 * i) for i, row in enumerate(rows)]
+        assert format_property_page(geo_rows, page_size=2).next_cursor == {'key': 0.25, 'id': 1}
+
+    @patch('app.graph.chat_graph.get_property_types', return_value=['casa'])
+    def test_ver_mas_fetches_next_page_from_state_cursor(self, mock_types):
+        from app.services import chatbot_engine
+        from app.services.dynamodb_queries import serialize_state
+        from app.services.storage.factory import get_chat_storage, set_chat_storage
+        from app.services.storage.memory import MemoryStorage
+
+        storage = MemoryStorage()
+        storage.write_turn([], serialize_state('USER#u#CONV#c', {
+            'version': 1, 'conversation_length': 4, 'stage': 'display_properties', 'user_name': 'Ana',
+            'lead': {'ubicacion': 'Miraflores'},
+            'result_set': {'id': 'rs1', 'count': 10, 'page': 1, 'next_cursor': {'key': 0.5, 'id': 42}}}))
+        second_page = PropertyPage([{'id': '43', 'text': 'Depa', 'score': 0.4}])
+        set_chat_storage(storage)
+        try:
+            with patch('app.services.stages.stage2_recommend_postgres.handler', return_value=second_page) as handler:
+                stage, response = chatbot_engine.proccess_chat_turn('u', 'c', 'ver más', 'Ana')
+            state = get_chat_storage().get_state('USER#u#CONV#c')
+        finally:
+            set_chat_storage(None)
+
+        assert handler.call_args.kwargs['cursor'] == {'key': 0.5, 'id': 42}
+        assert stage == 'display_properties' and 'Ref: 43' in response['model_response']
+        assert state['result_set']['page'] == 2 and 'next_cursor' not in state['result_set']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,115 @@
+import pytest
+from unittest.mock import patch
+from app.models.PropertyLead import PropertyLead
+from app.services import search_cache
+from app.services.property_query import PropertyPage
+from app.services.search_cache import bucket_budget, canonical_lead, search_cache_key
+from app.services.stages.stage2_recommend_postgres import handler, build_property_query, format_properties
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    search_cache._RESULTS.clear()
+    with patch('app.services.search_cache.current_generation', return_value=3) as generation:
+        yield generation
+    search_cache._RESULTS.clear()
+
+
+class TestSearchCache:
+    """Tests del cache de resultados por lead canónico"""
+
+    def test_equivalent_leads_share_the_key(self):
+        first = PropertyLead(ubicacion='Jesús María ', tipo_propiedad=['Departamento', 'casa'],
+                             transaccion='Alquiler', presupuesto=1950)
+        second = PropertyLead(ubicacion='jesus maria', tipo_propiedad=['casa', 'departamento', 'Casa'],
+                              transaccion='alquiler', presupuesto=2000)
+
+        assert bucket_budget(first).presupuesto == 2000
+        assert canonical_lead(bucket_budget(first)) == canonical_lead(bucket_budget(second))
+        assert search_cache_key(bucket_budget(first)) == search_cache_key(bucket_budget(second))
+        assert search_cache_key(second) != search_cache_key(second, cursor={'key': 0.5, 'id': 42})
+
+    def test_handler_serves_repeated_leads_from_cache(self, fresh_cache):
+        page = PropertyPage([{'id': '42', 'text': 'Depa', 'score': 0.9}])
+        page.next_cursor = {'key': 0.9, 'id': 42}
+        lead = PropertyLead(ubicacion='Miraflores', transaccion='alquiler')
+
+        with patch('app.services.stages.stage2_recommend_postgres.fetch_property_page', return_value=page) as fetch:
+            first = handler(lead)
+            first[0]['score'] = 0  # los stages modifican las listas: no debe afectar al cache
+            second = handler({'ubicacion': 'MIRAFLORES', 'transaccion': 'Alquiler'})
+            fresh_cache.return_value = 4  # invalidate_search_cache() en otro proceso
+            handler(lead)
+
+        assert fetch.call_count == 2
+        assert second[0] == {'id': '42', 'text': 'Depa', 'score': 0.9} and second.next_cursor == {'key': 0.9, 'id': 42}
+        assert search_cache.search_cache_stats()['hits'] == 1
+
+    def test_async_handler_builds_the_query_off_the_event_loop(self):
+        """Con el cache frío build_property_query consulta PostgreSQL (sync): corre en el bulkhead"""
+        import asyncio
+        import threading
+        from unittest.mock import AsyncMock, MagicMock
+        from app.services.stages.stage2_recommend_postgres import ahandler
+
+        threads = []
+
+        def build(lead, cursor=None):
+            threads.append(threading.current_thread().name)
+            return "SELECT id FROM properties WHERE price <= %s", [2000]
+
+        conn = MagicMock()
+        conn.fetch = AsyncMock(return_value=[{'id': 1, 'title': 'Depa', 'description': '', 'price': 1500.0}])
+        connection = MagicMock()
+        connection.__aenter__ = AsyncMock(return_value=conn)
+        connection.__aexit__ = AsyncMock(return_value=False)
+
+        with patch('app.services.stages.stage2_recommend_postgres.build_property_query', side_effect=build), \
+             patch('app.services.stages.stage2_recommend_postgres.get_async_postgres_connection', return_value=connection):
+            properties = asyncio.run(ahandler(PropertyLead(ubicacion='Lima', presupuesto=2000)))
+
+        assert threads and threads[0].startswith("bulkhead-postgres")
+        assert conn.fetch.call_args.args == ("SELECT id FROM properties WHERE price <= $1", 2000)
+        assert [prop['id'] for prop in properties] == ['1']
+
+    def test_cached_page_is_filtered_by_the_exact_budget(self):
+        """Los leads de un mismo bucket comparten la página; cada uno ve solo lo que cabe en su presupuesto"""
+        page = PropertyPage([{'id': '1', 'price': 1500.0}, {'id': '2', 'price': 2150.0}, {'id': '3', 'price': None}])
+        page.next_cursor = {'key': 0.5, 'id': 3}
+
+        with patch('app.services.stages.stage2_recommend_postgres.fetch_property_page', return_value=page) as fetch:
+            wide = handler(PropertyLead(ubicacion='Lima', presupuesto=2000))
+            narrow = handler(PropertyLead(ubicacion='Lima', presupuesto=1910))
+
+        assert fetch.call_count == 1 and fetch.call_args.args[0].presupuesto == 2000
+        assert [prop['id'] for prop in wide] == ['1', '2', '3']
+        # 1910 * 1.1 = 2101: la propiedad de 2150 solo cabía en el presupuesto redondeado
+        assert [prop['id'] for prop in narrow] == ['1', '3'] and narrow.next_cursor == {'key': 0.5, 'id': 3}
+
+    def test_generation_errors_keep_the_last_value(self, fresh_cache):
+        from app.utils.cache import RefreshingCache
+        generations = RefreshingCache(search_cache._load_generation, ttl_seconds=0, error_backoff_seconds=0)
+
+        with patch('app.core.postgres_pool.get_postgres_cursor') as cursor:
+            cursor.return_value.__enter__.return_value.fetchone.return_value = (5,)
+            assert generations.get() == 5
+            cursor.side_effect = Exception("db caída")
+            assert generations.get() == 5
+
+    def test_errors_are_not_cached(self):
+        with patch('app.services.stages.stage2_recommend_postgres.fetch_property_page',
+                   side_effect=[Exception("db caída"), PropertyPage()]) as fetch:
+            assert handler(PropertyLead(ubicacion='Lima')) == []
+            handler(PropertyLead(ubicacion='Lima'))
+
+        assert fetch.call_count == 2
+
+    def test_like_mode_returns_real_ids(self):
+        query, _ = build_property_query(PropertyLead(ubicacion='Lima'), mode="like")
+
+        assert query.strip().startswith("SELECT id, title") and "ORDER BY id LIMIT 11" in query
+        assert format_properties([(7, 'Casa', None, 'casa', 'Lima', 'venta')])[0]['id'] == '7'
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,173 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.services import chatbot_engine
+from app.services.dynamodb_codec import encode_chat_message
+from app.services.dynamodb_queries import serialize_state, serialize_result_set, StateConflictError
+from app.services.storage.factory import create_chat_storage, get_chat_storage, set_chat_storage
+from app.services.storage.memory import MemoryStorage
+from app.services.storage.sqlite import SQLiteStorage
+
+PK = 'USER#u#CONV#c'
+
+
+def _message(n, pk=PK):
+    return encode_chat_message(pk, f'TIMESTAMP#{n:02d}', 'user', 'text', {'text': f'mensaje {n}'}, {'n': n})
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryStorage()
+    else:
+        storage = SQLiteStorage(str(tmp_path / 'chat.db'))
+        yield storage
+        storage.close()
+
+
+def _sks(response):
+    return [item['SK']['S'] for item in response['Items']]
+
+
+class TestChatStorage:
+    """Tests de los backends locales: misma semántica de orden que DynamoDB"""
+
+    def test_message_queries_follow_sort_key_order(self, storage):
+        storage.write_turn([_message(n) for n in (3, 1, 5, 2, 4)] + [_message(9, pk='USER#x#CONV#y')],
+                           state_item=serialize_state(PK, {'version': 1}), expected_version=0)
+
+        assert _sks(storage.latest_messages(PK, limit=2)) == ['TIMESTAMP#04', 'TIMESTAMP#05']
+        assert _sks(storage.latest_messages(PK, limit=2, order=False)) == ['TIMESTAMP#05', 'TIMESTAMP#04']
+        assert _sks(storage.messages_between(PK, 'TIMESTAMP#01', 'TIMESTAMP#05', 2)) == ['TIMESTAMP#03', 'TIMESTAMP#04']
+        assert _sks(storage.messages_between(PK, 'TIMESTAMP#01', 'TIMESTAMP#05', 2, oldest_first=True)) == ['TIMESTAMP#02', 'TIMESTAMP#03']
+
+        first = storage.history_page(PK, 3)
+        second = storage.history_page(PK, 3, cursor=first['next_cursor'], newest_first=False, include_metadata=True)
+        assert _sks(first) == ['TIMESTAMP#05', 'TIMESTAMP#04', 'TIMESTAMP#03']
+        assert 'metadata' not in first['Items'][0]
+        assert _sks(second) == ['TIMESTAMP#01', 'TIMESTAMP#02'] and second['next_cursor'] is None
+        assert second['Items'][0]['metadata'] == {'M': {'n': {'N': '1'}}}
+
+    def test_state_version_conflict_writes_nothing(self, storage):
+        storage.write_turn([_message(1)], state_item=serialize_state(PK, {'version': 1, 'stage': 'extract'}), expected_version=0)
+        with pytest.raises(StateConflictError):
+            storage.write_turn([_message(2)], state_item=serialize_state(PK, {'version': 2, 'stage': 'recommend'}),
+                               expected_version=5)
+
+        assert storage.get_state(PK) == {'version': 1, 'stage': 'extract'}
+        assert _sks(storage.latest_messages(PK, limit=5)) == ['TIMESTAMP#01']
+        assert storage.get_result_set(PK, 'nada') == [] and storage.get_state('USER#x#CONV#y') is None
+
+    def test_save_turn_reapplies_updates_on_a_fresh_state(self, storage):
+        set_chat_storage(storage)
+        try:
+            storage.write_turn([], state_item=serialize_state(PK, {'version': 3, 'stage': 'recommend', 'lead': 'otro'}),
+                               expected_version=0)
+            stale = {'version': 1, 'stage': 'extract'}
+
+            new_state = chatbot_engine.save_turn(PK, 'hola', {'model_response': 'respuesta'}, {}, 'extract', stale, {'stage': 'confirm'})
+
+            assert new_state == {'version': 4, 'stage': 'confirm', 'lead': 'otro'}
+            assert storage.get_state(PK) == new_state
+            assert len(storage.latest_messages(PK, limit=5)['Items']) == 2
+        finally:
+            set_chat_storage(None)
+
+    @patch('app.core.config.CHAT_STATE_CONFLICT_RETRIES', 0)
+    def test_save_turn_persists_nothing_when_retries_run_out(self, storage):
+        set_chat_storage(storage)
+        try:
+            storage.write_turn([], state_item=serialize_state(PK, {'version': 3}), expected_version=0)
+
+            assert chatbot_engine.save_turn(PK, 'hola', {'model_response': 'respuesta'}, {}, 'extract', {'version': 1}, {'stage': 'confirm'}) is None
+            assert asyncio.run(chatbot_engine.asave_turn(PK, 'hola', {'model_response': 'respuesta'}, {}, 'extract', {'version': 1}, {'stage': 'confirm'})) is None
+
+            assert storage.get_state(PK) == {'version': 3}
+            assert storage.latest_messages(PK, limit=5)['Items'] == []
+        finally:
+            set_chat_storage(None)
+
+    @patch('app.core.config.CHAT_TTL_DAYS', 30)
+    def test_save_turn_renews_the_ttl_of_items_still_in_use(self, storage):
+        set_chat_storage(storage)
+        try:
+            old = [{**_message(n), 'expires_at': {'N': '100'}} for n in (1, 2, 3)]
+            result_set = {**serialize_result_set(PK, 'rs1', [{'id': 7}]), 'expires_at': {'N': '100'}}
+            state = {'version': 1, 'summarized_until': 'TIMESTAMP#01', 'result_set': {'id': 'rs1'}}
+            storage.write_turn(old + [result_set], state_item=serialize_state(PK, state), expected_version=0)
+
+            new_state = chatbot_engine.save_turn(PK, 'hola', {'model_response': 'respuesta'}, {}, 'extract', state, {})
+            chatbot_engine.save_turn(PK, 'otra', {'model_response': 'respuesta'}, {}, 'extract', new_state, {})
+
+            expiry = {item['SK']['S']: int(item['expires_at']['N']) for item in storage.latest_messages(PK, limit=10)['Items']
+                      if item['SK']['S'] in ('TIMESTAMP#01', 'TIMESTAMP#02', 'TIMESTAMP#03')}
+            assert expiry['TIMESTAMP#01'] == 100  # ya resumido: no se renueva
+            assert expiry['TIMESTAMP#02'] > 100 and expiry['TIMESTAMP#03'] > 100
+            assert int(storage._get(PK, 'RESULTSET#rs1')['expires_at']['N']) > 100
+            assert storage.get_result_set(PK, 'rs1') == [{'id': 7}]
+            assert storage.get_state(PK)['ttl_renewed_at'] == new_state['ttl_renewed_at']  # el segundo turno no renueva
+        finally:
+            set_chat_storage(None)
+
+    @patch('app.graph.chat_graph.get_property_types', return_value=['casa'])
+    def test_engine_runs_offline(self, mock_types, storage):
+        set_chat_storage(storage)
+        try:
+            for _ in range(2):
+                stage, response = chatbot_engine.proccess_chat_turn('u', 'c', 'nueva búsqueda', 'Ana')
+            assert stage == 'extract'
+            assert get_chat_storage().get_state(PK)['version'] == 2
+            assert len(storage.history_page(PK, 10)['Items']) == 4
+        finally:
+            set_chat_storage(None)
+
+    def test_rolling_summary_folds_oldest_pending_first(self, storage):
+        storage.write_turn([_message(n) for n in range(1, 51)])
+        window = storage.latest_messages(PK, limit=4)['Items']
+        state = {'conversation_length': 50, 'summarized_count': 0}
+        set_chat_storage(storage)
+        try:
+            with patch('app.services.chatbot_engine.CHAT_SUMMARY_MAX_FOLD', 40), \
+                 patch('app.services.stages.stage_logic.summarize_rolling', return_value='resumen'):
+                first = chatbot_engine.update_rolling_summary(PK, state, window)
+                second = chatbot_engine.update_rolling_summary(PK, {**state, **first}, window)
+        finally:
+            set_chat_storage(None)
+
+        assert first['summarized_until'] == 'TIMESTAMP#40' and first['summarized_count'] == 40
+        assert second['summarized_until'] == 'TIMESTAMP#46' and second['summarized_count'] == 46
+
+    def test_async_methods_match_sync(self, storage):
+        """Las versiones a* dan lo mismo que las sync (SQLite las corre en un hilo)"""
+        import asyncio
+        import threading
+
+        threads = []
+        latest_messages = storage.latest_messages
+
+        def spy(*args):
+            threads.append(threading.current_thread())
+            return latest_messages(*args)
+
+        storage.latest_messages = spy
+        storage.write_turn([_message(n) for n in (1, 2, 3)])
+        response = asyncio.run(storage.alatest_messages(PK, 2))
+
+        assert _sks(response) == ['TIMESTAMP#02', 'TIMESTAMP#03']
+        assert (threads[0] is threading.main_thread()) == isinstance(storage, MemoryStorage)
+
+    def test_interface_is_abstract(self):
+        from app.services.storage.base import ChatStorage, SortedItemStorage
+        with pytest.raises(TypeError):
+            ChatStorage()
+        with pytest.raises(TypeError):
+            SortedItemStorage()
+
+    def test_factory_rejects_unknown_backend(self):
+        assert isinstance(create_chat_storage('memory'), MemoryStorage)
+        with pytest.raises(ValueError):
+            create_chat_storage('redis')
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
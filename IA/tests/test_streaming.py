@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.services import streaming
+
+
+class FakeChat:
+    """Modelo falso: astream emite fragmentos, ainvoke retorna el texto completo"""
+
+    async def astream(self, messages):
+        for text in ["Hola", [{"type": "text", "text": " Ana"}], ""]:
+            yield SimpleNamespace(content=text)
+
+    async def ainvoke(self, messages):
+        return SimpleNamespace(content="Hola Ana")
+
+
+class TestStreaming:
+    """Tests del streaming de tokens"""
+
+    def test_chat_turn_forwards_tokens_then_done(self):
+        async def fake_turn(**kwargs):
+            text = await streaming.astream_llm_text(FakeChat(), [("user", "hola")])
+            return 'extract', {'model_response': text}
+
+        async def _run():
+            return [item async for item in streaming.astream_chat_turn('u', 'c', 'hola')]
+
+        with patch('app.services.chatbot_engine.aprocess_chat_turn', side_effect=fake_turn):
+            events = asyncio.run(_run())
+
+        assert [e["event"] for e in events] == ["token", "token", "done"]
+        assert "".join(e["data"] for e in events[:2]) == "Hola Ana"
+        assert events[-1]["data"] == {"stage": 'extract', "response": {'model_response': "Hola Ana"}}
+
+    def test_without_sink_uses_ainvoke(self):
+        chat = FakeChat()
+        chat.astream = MagicMock()
+
+        assert asyncio.run(streaming.astream_llm_text(chat, [])) == "Hola Ana"
+        chat.astream.assert_not_called()
+
+    def test_turn_error_is_reported(self):
+        async def _run():
+            return [item async for item in streaming.astream_chat_turn('u', 'c', 'hola')]
+
+        with patch('app.services.chatbot_engine.aprocess_chat_turn', new=AsyncMock(side_effect=RuntimeError("boom"))):
+            events = asyncio.run(_run())
+
+        assert events == [{"event": "error", "data": "boom"}]
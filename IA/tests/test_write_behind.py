@@ -0,0 +1,92 @@
+import time
+import pytest
+from unittest.mock import patch
+from app.services.write_behind import WriteBehindQueue
+from app.services.dynamodb_queries import StateConflictError
+
+
+def _item(sk, **extra):
+    return {'PK': {'S': 'USER#u#CONV#c'}, 'SK': {'S': sk}, **extra}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = WriteBehindQueue(path=str(tmp_path / "wb.db"), table_name="T", batch_size=10, max_attempts=2)
+    yield q
+    q.close()
+
+
+class TestWriteBehindQueue:
+    """Tests para la cola write-behind local"""
+
+    @patch('app.services.write_behind.write_turn')
+    def test_flush_writes_in_order_and_empties_queue(self, mock_write, queue):
+        queue.enqueue('USER#u#CONV#c', [_item('TIMESTAMP#1')], _item('STATE', version={'N': '1'}), expected_version=0)
+        queue.enqueue('USER#u#CONV#c', [_item('TIMESTAMP#2')], _item('STATE', version={'N': '2'}), expected_version=1)
+
+        assert queue.flush() == 2
+        assert [c.kwargs['expected_version'] for c in mock_write.call_args_list] == [0, 1]
+        assert queue.pending_count() == 0
+
+    @patch('app.services.write_behind.write_turn', side_effect=RuntimeError("dynamo down"))
+    def test_failed_turn_blocks_conversation_and_keeps_state_readable(self, mock_write, queue):
+        queue.enqueue('USER#u#CONV#c', [_item('TIMESTAMP#1')], _item('STATE', version={'N': '1'}))
+        queue.enqueue('USER#u#CONV#c', [_item('TIMESTAMP#2')], _item('STATE', version={'N': '2'}))
+
+        assert queue.flush(ignore_backoff=True) == 0
+        assert mock_write.call_count == 1  # el segundo turno espera al primero
+        assert queue.has_pending('USER#u#CONV#c')
+        assert queue.pending_item('USER#u#CONV#c', 'STATE')['version'] == 2
+
+    @patch('app.services.write_behind.write_turn', side_effect=RuntimeError("dynamo down"))
+    def test_turn_is_dead_lettered_after_max_attempts(self, mock_write, queue):
+        queue.enqueue('USER#u#CONV#c', [_item('TIMESTAMP#1', blob={'B': b'\x00gz'})])
+
+        queue.flush(ignore_backoff=True)
+        queue.flush(ignore_backoff=True)
+
+        assert queue.pending_count() == 0
+        assert queue.metrics()["dead"] == 1
+        assert mock_write.call_args.args[1][0]['blob'] == {'B': b'\x00gz'}
+
+
+    @patch('app.services.write_behind.write_turn')
+    def test_workers_sharing_the_file_never_send_a_turn_twice(self, mock_write, queue, tmp_path):
+        other = WriteBehindQueue(path=str(tmp_path / "wb.db"), table_name="T", batch_size=10)
+        try:
+            queue.enqueue('USER#u#CONV#c', [_item('TIMESTAMP#1')])
+            queue.enqueue('USER#u#CONV#c', [_item('TIMESTAMP#2')])
+            claimed = queue._claim(None, time.time())  # el primer worker está escribiendo
+
+            assert other.flush(ignore_backoff=True) == 0  # conversación en vuelo: no se toca
+            assert len(claimed) == 2 and mock_write.call_count == 0
+            assert other.has_pending('USER#u#CONV#c')
+
+            # Claim abandonado (worker caído): otro worker lo retoma
+            assert other._claim(None, time.time() + other.claim_timeout + 1)
+        finally:
+            other.close()
+
+    @patch('app.services.write_behind.get_conversation_state', return_value={'version': 4, 'lead': 'otro'})
+    @patch('app.services.write_behind.write_turn')
+    def test_state_conflict_reapplies_updates_on_the_fresh_state(self, mock_write, mock_state, queue):
+        mock_write.side_effect = [StateConflictError('USER#u#CONV#c', 1), {'consumed_capacity': 1.0}]
+        queue.enqueue('USER#u#CONV#c', [_item('TIMESTAMP#1')], _item('STATE', version={'N': '2'}), expected_version=1,
+                      state_updates={'stage': 'confirm', 'summary': None})
+
+        assert queue.flush(ignore_backoff=True) == 1
+        retry = mock_write.call_args
+        assert retry.kwargs['expected_version'] == 4
+        assert retry.kwargs['state_item']['version'] == {'N': '5'}
+        assert retry.kwargs['state_item']['lead'] == {'S': 'otro'} and 'summary' not in retry.kwargs['state_item']
+        assert retry.args[1] == [_item('TIMESTAMP#1')]
+
+    @patch('app.services.write_behind.write_turn', side_effect=StateConflictError('USER#u#CONV#c', 1))
+    def test_state_conflict_without_updates_is_a_failure(self, mock_write, queue):
+        queue.enqueue('USER#u#CONV#c', [_item('TIMESTAMP#1')], _item('STATE', version={'N': '2'}), expected_version=1)
+
+        assert queue.flush(ignore_backoff=True) == 0
+        assert mock_write.call_count == 1 and queue.has_pending('USER#u#CONV#c')
+
+if __name__ == "__main__":
+    pytest.main([__file__])